@@ -41,9 +41,9 @@ class OtatoolTarget():
 
     def __init__(self, port=None, baud=None, partition_table_offset=PARTITION_TABLE_OFFSET, partition_table_file=None,
                  spi_flash_sec_size=SPI_FLASH_SEC_SIZE, esptool_args=[], esptool_write_args=[],
-                 esptool_read_args=[], esptool_erase_args=[]):
+                 esptool_read_args=[], esptool_erase_args=[], single_session=False):
         self.target = ParttoolTarget(port, baud, partition_table_offset, partition_table_file, esptool_args,
-                                     esptool_write_args, esptool_read_args, esptool_erase_args)
+                                     esptool_write_args, esptool_read_args, esptool_erase_args, single_session)
         self.spi_flash_sec_size = spi_flash_sec_size
 
         temp_file = tempfile.NamedTemporaryFile(delete=False)
@@ -55,6 +55,15 @@ class OtatoolTarget():
         finally:
             os.unlink(temp_file.name)
 
+    def close(self):
+        self.target.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def _check_otadata_partition(self):
         if not self.otadata:
             raise Exception('No otadata partition found')
@@ -250,6 +259,9 @@ def main():
 
     parser.add_argument('--baud', '-b', help='baudrate to use', type=int)
 
+    parser.add_argument('--single-session', help='perform the operation, reading of the partition table and otadata \
+                                                in a single esptool session', action='store_true')
+
     parser.add_argument('--partition-table-offset', '-o', help='offset to read the partition table from',  type=str)
 
     parser.add_argument('--partition-table-file', '-f', help='file (CSV/binary) to read the partition table from; \
@@ -321,6 +333,9 @@ def main():
     if args.baud:
         target_args['baud'] = args.baud
 
+    if args.single_session:
+        target_args['single_session'] = True
+
     target = OtatoolTarget(**target_args)
 
     # Create the operation table and execute the operation
@@ -359,14 +374,15 @@ def main():
         except KeyError:
             pass
 
-    if quiet:
-        # If exceptions occur, suppress and exit quietly
-        try:
+    with target:
+        if quiet:
+            # If exceptions occur, suppress and exit quietly
+            try:
+                op(**common_args)
+            except Exception:
+                sys.exit(2)
+        else:
             op(**common_args)
-        except Exception:
-            sys.exit(2)
-    else:
-        op(**common_args)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,6 @@
 # SPDX-FileCopyrightText: 2021-2022 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
+import mmap
 from inspect import getmembers, isroutine
 from typing import Optional
 
@@ -8,7 +9,7 @@ from construct import Const, Int8ul, Int16ul, Int32ul, PaddedString, Struct, cor
 from .exceptions import InconsistentFATAttributes, NotInitialized
 from .fatfs_state import BootSectorState
 from .utils import (ALLOWED_SECTOR_SIZES, ALLOWED_SECTORS_PER_CLUSTER, EMPTY_BYTE, FAT32, FULL_BYTE,
-                    SHORT_NAMES_ENCODING, FATDefaults, generate_4bytes_random, pad_string)
+                    SHORT_NAMES_ENCODING, UINT16_MAX, UINT32_MAX, FATDefaults, generate_4bytes_random, pad_string)
 
 
 class BootSector:
@@ -28,7 +29,7 @@ class BootSector:
     # the FAT specification defines 512 bytes for the boot sector header
     BOOT_HEADER_SIZE = 512
 
-    BOOT_SECTOR_HEADER = Struct(
+    BPB_COMMON_FIELDS = (
         # this value reflects BS_jmpBoot used for ESP32 boot sector (any other accepted)
         'BS_jmpBoot' / Const(b'\xeb\xfe\x90'),
         'BS_OEMName' / PaddedString(MAX_OEM_NAME_SIZE, SHORT_NAMES_ENCODING),
@@ -36,7 +37,7 @@ class BootSector:
         'BPB_SecPerClus' / Int8ul,
         'BPB_RsvdSecCnt' / Int16ul,
         'BPB_NumFATs' / Int8ul,
-        'BPB_RootEntCnt' / Int16ul,
+        'BPB_RootEntCnt' / Int16ul,  # for FAT32 always zero
         'BPB_TotSec16' / Int16ul,  # zero if the FAT type is 32, otherwise number of sectors
         'BPB_Media' / Int8ul,
         'BPB_FATSz16' / Int16ul,  # for FAT32 always zero, for FAT12/FAT16 number of sectors per FAT
@@ -44,75 +45,159 @@ class BootSector:
         'BPB_NumHeads' / Int16ul,
         'BPB_HiddSec' / Int32ul,
         'BPB_TotSec32' / Int32ul,  # zero if the FAT type is 12/16, otherwise number of sectors
+    )
+    BS_FIELDS = (
         'BS_DrvNum' / Const(b'\x80'),
         'BS_Reserved1' / Const(EMPTY_BYTE),
         'BS_BootSig' / Const(b'\x29'),
         'BS_VolID' / Int32ul,
         'BS_VolLab' / PaddedString(MAX_VOL_LAB_SIZE, SHORT_NAMES_ENCODING),
         'BS_FilSysType' / PaddedString(MAX_FS_TYPE_SIZE, SHORT_NAMES_ENCODING),
+    )
+
+    BPB_COMMON = Struct(*BPB_COMMON_FIELDS)
+    BOOT_SECTOR_HEADER = Struct(
+        *BPB_COMMON_FIELDS,
+        *BS_FIELDS,
         'BS_EMPTY' / Const(448 * EMPTY_BYTE),
         'Signature_word' / Const(FATDefaults.SIGNATURE_WORD)
     )
     assert BOOT_SECTOR_HEADER.sizeof() == BOOT_HEADER_SIZE
 
+    # FAT32 extends BPB by the fields preceding the fields of BS
+    BOOT_SECTOR_HEADER_FAT32 = Struct(
+        *BPB_COMMON_FIELDS,
+        'BPB_FATSz32' / Int32ul,
+        'BPB_ExtFlags' / Int16ul,  # zero means all the FATs are mirrored at runtime
+        'BPB_FSVer' / Const(2 * EMPTY_BYTE),
+        'BPB_RootClus' / Int32ul,  # the first cluster of the root directory
+        'BPB_FSInfo' / Int16ul,  # sector number of the FSInfo structure in the reserved region
+        'BPB_BkBootSec' / Int16ul,  # sector number of the copy of the boot record in the reserved region
+        'BPB_Reserved' / Const(12 * EMPTY_BYTE),
+        *BS_FIELDS,
+        'BS_EMPTY' / Const(420 * EMPTY_BYTE),
+        'Signature_word' / Const(FATDefaults.SIGNATURE_WORD)
+    )
+    assert BOOT_SECTOR_HEADER_FAT32.sizeof() == BOOT_HEADER_SIZE
+
+    # FSInfo contains hints for the allocation of the free clusters on FAT32, 0xFFFFFFFF means unknown
+    FSINFO_SECTOR = Struct(
+        'FSI_LeadSig' / Const(b'RRaA'),
+        'FSI_Reserved1' / Const(480 * EMPTY_BYTE),
+        'FSI_StrucSig' / Const(b'rrAa'),
+        'FSI_Free_Count' / Int32ul,
+        'FSI_Nxt_Free' / Int32ul,
+        'FSI_Reserved2' / Const(12 * EMPTY_BYTE),
+        'FSI_TrailSig' / Const(b'\x00\x00\x55\xAA'),
+    )
+    assert FSINFO_SECTOR.sizeof() == BOOT_HEADER_SIZE
+
     def __init__(self, boot_sector_state: Optional[BootSectorState] = None) -> None:
         self._parsed_header: dict = {}
         self.boot_sector_state: BootSectorState = boot_sector_state
 
-    def generate_boot_sector(self) -> None:
+    def _build_header(self) -> bytes:
+        boot_sector_state: BootSectorState = self.boot_sector_state
+        is_fat32: bool = boot_sector_state.fatfs_type == FAT32
+        use_tot_sec32: bool = is_fat32 or boot_sector_state.sectors_count > UINT16_MAX
+        header_fields: dict = dict(
+            BS_OEMName=pad_string(boot_sector_state.oem_name, size=BootSector.MAX_OEM_NAME_SIZE),
+            BPB_BytsPerSec=boot_sector_state.sector_size,
+            BPB_SecPerClus=boot_sector_state.sectors_per_cluster,
+            BPB_RsvdSecCnt=boot_sector_state.reserved_sectors_cnt,
+            BPB_NumFATs=boot_sector_state.fat_tables_cnt,
+            BPB_RootEntCnt=boot_sector_state.entries_root_count,
+            # BPB_TotSec16 is filled if the number of sectors fits it and the type is not FAT32, otherwise BPB_TotSec32
+            BPB_TotSec16=0x00 if use_tot_sec32 else boot_sector_state.sectors_count,
+            BPB_Media=boot_sector_state.media_type,
+            BPB_FATSz16=0x00 if is_fat32 else boot_sector_state.sectors_per_fat_cnt,
+            BPB_SecPerTrk=boot_sector_state.sec_per_track,
+            BPB_NumHeads=boot_sector_state.num_heads,
+            BPB_HiddSec=boot_sector_state.hidden_sectors,
+            BPB_TotSec32=boot_sector_state.sectors_count if use_tot_sec32 else 0x00,
+            BS_VolID=generate_4bytes_random(),
+            BS_VolLab=pad_string(boot_sector_state.volume_label, size=BootSector.MAX_VOL_LAB_SIZE),
+            BS_FilSysType=pad_string(boot_sector_state.file_sys_type, size=BootSector.MAX_FS_TYPE_SIZE)
+        )
+        if not is_fat32:
+            return BootSector.BOOT_SECTOR_HEADER.build(header_fields)
+        return BootSector.BOOT_SECTOR_HEADER_FAT32.build(dict(header_fields,
+                                                              BPB_FATSz32=boot_sector_state.sectors_per_fat_cnt,
+                                                              BPB_ExtFlags=0x00,
+                                                              BPB_RootClus=boot_sector_state.root_dir_cluster,
+                                                              BPB_FSInfo=boot_sector_state.fsinfo_sector,
+                                                              BPB_BkBootSec=boot_sector_state.backup_boot_sector))
+
+    def _build_reserved_region(self) -> bytes:
+        """
+        The reserved region starts with the boot sector, FAT32 places the FSInfo sector
+        and the backup of both into the reserved region as well.
+        """
+        boot_sector_state: BootSectorState = self.boot_sector_state
+        sector_size: int = boot_sector_state.sector_size
+        reserved_region: bytearray = bytearray(boot_sector_state.reserved_sectors_cnt * sector_size)
+        reserved_region[:BootSector.BOOT_HEADER_SIZE] = self._build_header()
+        if boot_sector_state.fatfs_type == FAT32:
+            fsinfo: bytes = BootSector.FSINFO_SECTOR.build(dict(FSI_Free_Count=UINT32_MAX, FSI_Nxt_Free=UINT32_MAX))
+            fsinfo_address: int = boot_sector_state.fsinfo_sector * sector_size
+            reserved_region[fsinfo_address:fsinfo_address + BootSector.BOOT_HEADER_SIZE] = fsinfo
+            backup_address: int = boot_sector_state.backup_boot_sector * sector_size
+            reserved_region[backup_address:backup_address + fsinfo_address + sector_size] = (
+                reserved_region[:fsinfo_address + sector_size])
+        return reserved_region
+
+    def generate_boot_sector(self, image_path: Optional[str] = None) -> None:
+        """
+        Generates the empty file system. The data region of FAT12 and FAT16 is filled with the erased flash value.
+
+        :param image_path: if set, the image is created as the sparse file at the path and memory-mapped,
+            so the image of a large volume is not held in memory. The unused regions are left as holes in the file.
+        """
         boot_sector_state: BootSectorState = self.boot_sector_state
         if boot_sector_state is None:
             raise NotInitialized('The BootSectorState instance is not initialized!')
-        volume_uuid = generate_4bytes_random()
-        pad_header: bytes = (boot_sector_state.sector_size - BootSector.BOOT_HEADER_SIZE) * EMPTY_BYTE
-        data_content: bytes = boot_sector_state.data_sectors * boot_sector_state.sector_size * FULL_BYTE
-        root_dir_content: bytes = boot_sector_state.root_dir_sectors_cnt * boot_sector_state.sector_size * EMPTY_BYTE
-        fat_tables_content: bytes = (boot_sector_state.sectors_per_fat_cnt
-                                     * boot_sector_state.fat_tables_cnt
-                                     * boot_sector_state.sector_size
-                                     * EMPTY_BYTE)
-        self.boot_sector_state.binary_image = (
-            BootSector.BOOT_SECTOR_HEADER.build(
-                dict(BS_OEMName=pad_string(boot_sector_state.oem_name, size=BootSector.MAX_OEM_NAME_SIZE),
-                     BPB_BytsPerSec=boot_sector_state.sector_size,
-                     BPB_SecPerClus=boot_sector_state.sectors_per_cluster,
-                     BPB_RsvdSecCnt=boot_sector_state.reserved_sectors_cnt,
-                     BPB_NumFATs=boot_sector_state.fat_tables_cnt,
-                     BPB_RootEntCnt=boot_sector_state.entries_root_count,
-                     # if fat type is 12 or 16 BPB_TotSec16 is filled and BPB_TotSec32 is 0x00 and vice versa
-                     BPB_TotSec16=0x00 if boot_sector_state.fatfs_type == FAT32 else boot_sector_state.sectors_count,
-                     BPB_Media=boot_sector_state.media_type,
-                     BPB_FATSz16=boot_sector_state.sectors_per_fat_cnt,
-                     BPB_SecPerTrk=boot_sector_state.sec_per_track,
-                     BPB_NumHeads=boot_sector_state.num_heads,
-                     BPB_HiddSec=boot_sector_state.hidden_sectors,
-                     BPB_TotSec32=boot_sector_state.sectors_count if boot_sector_state.fatfs_type == FAT32 else 0x00,
-                     BS_VolID=volume_uuid,
-                     BS_VolLab=pad_string(boot_sector_state.volume_label,
-                                          size=BootSector.MAX_VOL_LAB_SIZE),
-                     BS_FilSysType=pad_string(boot_sector_state.file_sys_type,
-                                              size=BootSector.MAX_FS_TYPE_SIZE)
-                     )
-            ) + pad_header + fat_tables_content + root_dir_content + data_content
-        )
+        # FAT32 volumes are used for large storage, there is no reason to preset their data region
+        data_content_byte: bytes = EMPTY_BYTE if boot_sector_state.fatfs_type == FAT32 else FULL_BYTE
+        reserved_region: bytes = self._build_reserved_region()
+        if image_path is None:
+            data_content: bytes = boot_sector_state.data_sectors * boot_sector_state.sector_size * data_content_byte
+            root_dir_content: bytes = (boot_sector_state.root_dir_sectors_cnt * boot_sector_state.sector_size
+                                       * EMPTY_BYTE)
+            fat_tables_content: bytes = (boot_sector_state.sectors_per_fat_cnt
+                                         * boot_sector_state.fat_tables_cnt
+                                         * boot_sector_state.sector_size
+                                         * EMPTY_BYTE)
+            self.boot_sector_state.binary_image = bytearray(
+                reserved_region + fat_tables_content + root_dir_content + data_content)
+            return
+
+        with open(image_path, 'w+b') as image_file:
+            image_file.truncate(boot_sector_state.size)
+            image_file.write(reserved_region)
+            if data_content_byte != EMPTY_BYTE:
+                image_file.seek(boot_sector_state.data_region_start)
+                for _ in range(boot_sector_state.data_sectors):
+                    image_file.write(boot_sector_state.sector_size * data_content_byte)
+            image_file.flush()
+            self.boot_sector_state.binary_image = mmap.mmap(image_file.fileno(), boot_sector_state.size)
 
     def parse_boot_sector(self, binary_data: bytes) -> None:
         """
         Checks the validity of the boot sector and derives the metadata from boot sector to the structured shape.
         """
+        header_bytes: bytes = binary_data[:BootSector.BOOT_HEADER_SIZE]
         try:
-            self._parsed_header = BootSector.BOOT_SECTOR_HEADER.parse(binary_data)
+            # FAT32 is the only FAT type without the number of sectors per FAT in BPB_FATSz16
+            is_fat32: bool = BootSector.BPB_COMMON.parse(header_bytes)['BPB_FATSz16'] == 0x00
+            header_format = BootSector.BOOT_SECTOR_HEADER_FAT32 if is_fat32 else BootSector.BOOT_SECTOR_HEADER
+            self._parsed_header = header_format.parse(header_bytes)
         except core.StreamError:
             raise NotInitialized('The boot sector header is not parsed successfully!')
 
         if self._parsed_header['BPB_TotSec16'] != 0x00:
             sectors_count_: int = self._parsed_header['BPB_TotSec16']
         elif self._parsed_header['BPB_TotSec32'] != 0x00:
-            # uncomment for FAT32 implementation
-            # sectors_count_ = self._parsed_header['BPB_TotSec32']
-            # possible_fat_types = [FAT32]
-            assert self._parsed_header['BPB_TotSec16'] == 0
-            raise NotImplementedError('FAT32 not implemented!')
+            sectors_count_ = self._parsed_header['BPB_TotSec32']
         else:
             raise InconsistentFATAttributes('The number of FS sectors cannot be zero!')
 
@@ -141,6 +226,13 @@ class BootSector:
                                                  volume_label=self._parsed_header['BS_VolLab'],
                                                  file_sys_type=self._parsed_header['BS_FilSysType'],
                                                  volume_uuid=self._parsed_header['BS_VolID'])
+        if is_fat32:
+            self.boot_sector_state.init_fat32_layout()
+            self.boot_sector_state.reserved_sectors_cnt = self._parsed_header['BPB_RsvdSecCnt']
+            self.boot_sector_state.sectors_per_fat_cnt = self._parsed_header['BPB_FATSz32']
+            self.boot_sector_state.root_dir_cluster = self._parsed_header['BPB_RootClus']
+            self.boot_sector_state.fsinfo_sector = self._parsed_header['BPB_FSInfo']
+            self.boot_sector_state.backup_boot_sector = self._parsed_header['BPB_BkBootSec']
         self.boot_sector_state.binary_image = binary_data
         assert self.boot_sector_state.file_sys_type in (f'FAT{self.boot_sector_state.fatfs_type}   ', 'FAT     ')
 
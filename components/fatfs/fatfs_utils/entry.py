@@ -55,7 +55,7 @@ class Entry:
         'DIR_CrtTime' / Int16ul,  # ignored by esp-idf fatfs library
         'DIR_CrtDate' / Int16ul,  # ignored by esp-idf fatfs library
         'DIR_LstAccDate' / Int16ul,  # must be same as DIR_WrtDate
-        'DIR_FstClusHI' / Const(2 * EMPTY_BYTE),
+        'DIR_FstClusHI' / Int16ul,  # high word of the first cluster, always zero for FAT12 and FAT16
         'DIR_WrtTime' / Int16ul,
         'DIR_WrtDate' / Int16ul,
         'DIR_FstClusLO' / Int16ul,
@@ -74,7 +74,7 @@ class Entry:
 
     @staticmethod
     def get_cluster_id(obj_: dict) -> int:
-        cluster_id_: int = obj_['DIR_FstClusLO']
+        cluster_id_: int = (obj_['DIR_FstClusHI'] << 16) | obj_['DIR_FstClusLO']
         return cluster_id_
 
     @property
@@ -225,7 +225,8 @@ class Entry:
                 DIR_Name_ext=pad_string(object_extension, size=MAX_EXT_SIZE),
                 DIR_Attr=entity_type,
                 DIR_NTRes=0x00 if (not self.fatfs_state.long_names_enabled) or (not fits_short) else 0x18,
-                DIR_FstClusLO=first_cluster_id,
+                DIR_FstClusHI=first_cluster_id >> 16,
+                DIR_FstClusLO=first_cluster_id & 0xFFFF,
                 DIR_FileSize=size,
                 DIR_CrtDate=date_entry_,  # ignored by esp-idf fatfs library
                 DIR_LstAccDate=date_entry_,  # must be same as DIR_WrtDate
@@ -1,35 +1,164 @@
 # SPDX-FileCopyrightText: 2021-2022 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
 
-from typing import List, Optional
+import sys
+from array import array
+from typing import List, Optional, Tuple
 
+from .boot_sector import BootSector
 from .cluster import Cluster
 from .exceptions import NoFreeClusterException
 from .fatfs_state import BootSectorState
+from .utils import FAT12, FAT16, FAT32, UINT32_MAX
+
+
+class Clusters:
+    """
+    The sequence of clusters of the FAT. Instances of the class Cluster are created only when they are accessed,
+    so the memory needed does not grow with the size of the volume.
+    """
+
+    def __init__(self, fat: 'FAT') -> None:
+        self._fat: FAT = fat
+
+    def __len__(self) -> int:
+        return self._fat.clusters_count
+
+    def __getitem__(self, cluster_id: int) -> Cluster:
+        if not 0 <= cluster_id < self._fat.clusters_count:
+            raise IndexError(f'Cluster {cluster_id} is out of range!')
+        return Cluster(cluster_id=cluster_id, boot_sector_state=self._fat.boot_sector_state, fat=self._fat)
 
 
 class FAT:
     """
     The FAT represents the FAT region in file system. It is responsible for storing clusters
     and chaining them in case we need to extend file or directory to more clusters.
+
+    The values of the clusters are held in the array and encoded to the binary image by the method `write_table`.
+    Free clusters are tracked by the bitmap, thus the clusters can be allocated, freed and allocated again.
     """
 
+    # FAT32 uses only 28 bits of the entry
+    FAT32_ENTRY_MASK: int = 0x0FFFFFFF
+
     def allocate_root_dir(self) -> None:
         """
         The root directory is implicitly created with the FatFS,
         its block is on the index 1 (second index) and is allocated implicitly.
+        FAT32 sets the second entry to the end of chain value and the root directory
+        allocates the first free cluster.
         """
-        self.clusters[Cluster.ROOT_BLOCK_ID].allocate_cluster()
+        if self.fatfs_type != FAT32:
+            self.clusters[Cluster.ROOT_BLOCK_ID].allocate_cluster()
+            return
+        self.set_cluster_value(Cluster.ROOT_BLOCK_ID, Cluster.ALLOCATED_BLOCK_FAT32)
+        root_dir_cluster: Cluster = self.find_free_cluster()
+        assert root_dir_cluster.id == self.boot_sector_state.root_dir_cluster
 
     def __init__(self, boot_sector_state: BootSectorState, init_: bool) -> None:
-        self._first_free_cluster_id = 1
+        """
+        :param boot_sector_state: auxiliary structure holding the file-system's metadata
+        :param init_: True for initialization of the reserved cluster and the root directory, otherwise the table
+          is only read from the binary image
+        """
         self.boot_sector_state = boot_sector_state
-        self.clusters: List[Cluster] = [Cluster(cluster_id=i,
-                                                boot_sector_state=self.boot_sector_state,
-                                                init_=init_) for i in range(self.boot_sector_state.clusters)]
+        self.fatfs_type: int = self.boot_sector_state.fatfs_type
+        self.clusters_count: int = self.boot_sector_state.clusters
+        self.clusters: Clusters = Clusters(self)
+        self._table: array = self._read_table()
+        # the byte is 1 if the cluster with the same index is free, the reserved clusters are never free
+        if self._table.count(0x00) == self.clusters_count:
+            self._free_clusters: bytearray = bytearray(b'\x01') * self.clusters_count
+        else:
+            mask_: int = self.FAT32_ENTRY_MASK if self.fatfs_type == FAT32 else (1 << self.fatfs_type) - 1
+            self._free_clusters = bytearray(value_ & mask_ == 0x00 for value_ in self._table)
+        self._free_clusters[:Cluster.ROOT_BLOCK_ID + 1] = bytes(Cluster.ROOT_BLOCK_ID + 1)
+        # there is no free cluster preceding this one
+        self._first_free_cluster_id: int = Cluster.ROOT_BLOCK_ID + 1
         if init_:
+            # First cluster in FAT is reserved, low 8 bits contains BPB_Media and the rest is filled with 1
+            # e.g. the esp32 media type is 0xF8 thus the FAT[0] = 0xFF8 for FAT12, 0xFFF8 for FAT16
+            self.set_cluster_value(Cluster.RESERVED_BLOCK_ID, Cluster.INITIAL_BLOCK_SWITCH[self.fatfs_type])
             self.allocate_root_dir()
 
+    def _read_table(self) -> array:
+        """
+        Decodes the values of all the clusters from the FAT region of the binary image.
+
+        For FAT12 is the block stored in one and half byte. If the order of the block is even the first byte and second
+        half of the second byte belongs to the block. First half of the second byte and the third byte belongs to
+        the second block.
+
+        e.g. b'\xff\x0f\x00' stores two blocks. First of them is evenly ordered (index 0) and is set to 0xfff,
+        that means full block that is final in chain of blocks
+        and second block is set to 0x000 that means empty block.
+
+        three bytes - AB XC YZ - stores two blocks - CAB YZX
+        """
+        start_: int = self.boot_sector_state.fat_table_start_address
+        bin_img_: bytearray = self.boot_sector_state.binary_image
+        table_: array = array(self._typecode)
+        if self.fatfs_type in (FAT16, FAT32):
+            table_.frombytes(bin_img_[start_:start_ + table_.itemsize * self.clusters_count])
+            if sys.byteorder == 'big':
+                table_.byteswap()
+        elif self.fatfs_type == FAT12:
+            fat_: bytearray = bin_img_[start_:start_ + (3 * self.clusters_count + 1) // 2 + 1]
+            for id_ in range(self.clusters_count):
+                address_: int = 3 * id_ // 2
+                if id_ % 2 == 0:
+                    table_.append(fat_[address_] | ((fat_[address_ + 1] & 0x0F) << 8))
+                else:
+                    table_.append(((fat_[address_] & 0xF0) >> 4) | (fat_[address_ + 1] << 4))
+        else:
+            raise NotImplementedError('Only valid fatfs types are FAT12, FAT16 and FAT32.')
+        return table_
+
+    @property
+    def _typecode(self) -> str:
+        return 'I' if self.fatfs_type == FAT32 else 'H'
+
+    def write_table(self) -> None:
+        """
+        Encodes the values of all the clusters to the FAT region of the binary image.
+        The order of the half bytes of FAT12 is described in the method `_read_table`.
+        """
+        start_: int = self.boot_sector_state.fat_table_start_address
+        bin_img_: bytearray = self.boot_sector_state.binary_image
+        if self.fatfs_type in (FAT16, FAT32):
+            table_: array = array(self._typecode, self._table)
+            if sys.byteorder == 'big':
+                table_.byteswap()
+            bin_img_[start_:start_ + table_.itemsize * self.clusters_count] = table_.tobytes()
+            if self.fatfs_type == FAT32:
+                self._write_fsinfo()
+            return
+        fat_: bytearray = bytearray((3 * self.clusters_count + 1) // 2)
+        for id_ in range(0, self.clusters_count - 1, 2):
+            even_, odd_ = self._table[id_], self._table[id_ + 1]
+            address_: int = 3 * id_ // 2
+            fat_[address_] = even_ & 0xFF
+            fat_[address_ + 1] = (even_ >> 8) | ((odd_ & 0x0F) << 4)
+            fat_[address_ + 2] = odd_ >> 4
+        if self.clusters_count % 2:
+            last_: int = self._table[-1]
+            fat_[-2:] = bytes((last_ & 0xFF, (last_ >> 8) | (bin_img_[start_ + len(fat_) - 1] & 0xF0)))
+        bin_img_[start_:start_ + len(fat_)] = fat_
+
+    def _write_fsinfo(self) -> None:
+        """
+        Updates the count of the free clusters and the hint for the next free cluster in FSInfo and in its backup.
+        """
+        next_free_cluster_id_: int = self._free_clusters.find(1, self._first_free_cluster_id)
+        fsinfo_: bytes = BootSector.FSINFO_SECTOR.build(
+            dict(FSI_Free_Count=self.free_clusters_count,
+                 FSI_Nxt_Free=UINT32_MAX if next_free_cluster_id_ == -1 else next_free_cluster_id_))
+        for sector_ in (self.boot_sector_state.fsinfo_sector,
+                        self.boot_sector_state.backup_boot_sector + self.boot_sector_state.fsinfo_sector):
+            address_: int = sector_ * self.boot_sector_state.sector_size
+            self.boot_sector_state.binary_image[address_:address_ + len(fsinfo_)] = fsinfo_
+
     def get_cluster_value(self, cluster_id_: int) -> int:
         """
         The method retrieves the values of the FAT memory block.
@@ -38,54 +167,87 @@ class FAT:
 
         The reserved value is 0xFF8, the value of first cluster if 0xFFF, thus is last in chain,
         and the value of the second cluster is 0x555, so refers to the cluster number 0x555.
+        The reserved high 4 bits of FAT32 entries, which other formatters may set, are masked out.
         """
-        fat_cluster_value_: int = self.clusters[cluster_id_].get_from_fat()
+        fat_cluster_value_: int = self._table[cluster_id_]
+        if self.fatfs_type == FAT32:
+            fat_cluster_value_ &= self.FAT32_ENTRY_MASK
         return fat_cluster_value_
 
+    def set_cluster_value(self, cluster_id_: int, value: int) -> None:
+        """
+        Sets the value of the cluster in FAT, the cluster is free if the value is zero.
+        """
+        # value must fit into number of bits of the fat (12, 16 or 32)
+        assert value <= (1 << self.fatfs_type) - 1
+        self._table[cluster_id_] = value
+        if cluster_id_ > Cluster.ROOT_BLOCK_ID:
+            self._free_clusters[cluster_id_] = value == 0x00
+            if value == 0x00:
+                self._first_free_cluster_id = min(self._first_free_cluster_id, cluster_id_)
+
     def is_cluster_last(self, cluster_id_: int) -> bool:
         """
         Checks if the cluster is last in its cluster chain. If the value of the cluster is
-        0xFFF for FAT12, 0xFFFF for FAT16 or 0xFFFFFFFF for FAT32, the cluster is the last.
+        0xFFF for FAT12, 0xFFFF for FAT16 or 0x0FFFFFFF for FAT32, the cluster is the last.
         """
         value_ = self.get_cluster_value(cluster_id_)
-        is_cluster_last_: bool = value_ == (1 << self.boot_sector_state.fatfs_type) - 1
+        is_cluster_last_: bool = value_ == Cluster.ALLOCATED_BLOCK_SWITCH[self.fatfs_type]
         return is_cluster_last_
 
+    def get_chain_extents(self, cluster_id_: int, size: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Resolves the chain of clusters starting with the cluster `cluster_id_` to the list of extents
+        (address in the binary image, length). The clusters adjacent in the data region are merged into one extent,
+        so the content of the file written to the consecutive clusters is described by a single extent.
+
+        :param cluster_id_: the first cluster of the chain
+        :param size: the size of the file, None if the object is directory and the whole chain is used
+        """
+        sector_size: int = self.boot_sector_state.sector_size
+        extents: List[Tuple[int, int]] = []
+        extent_address_: int = Cluster.compute_cluster_data_address(self.boot_sector_state, cluster_id_)
+        extent_length_: int = sector_size
+        while not self.is_cluster_last(cluster_id_) and (size is None or extent_length_ < size):
+            cluster_id_ = self.get_cluster_value(cluster_id_)
+            data_address_ = Cluster.compute_cluster_data_address(self.boot_sector_state, cluster_id_)
+            if data_address_ == extent_address_ + extent_length_:
+                extent_length_ += sector_size
+                continue
+            extents.append((extent_address_, extent_length_))
+            if size is not None:
+                size -= extent_length_
+            extent_address_, extent_length_ = data_address_, sector_size
+        extents.append((extent_address_, extent_length_ if size is None else min(extent_length_, size)))
+        return extents
+
     def get_chained_content(self, cluster_id_: int, size: Optional[int] = None) -> bytearray:
         """
         The purpose of the method is retrieving the content from chain of clusters when the FAT FS partition
         is analyzed. The file entry provides the reference to the first cluster, this method
-        traverses linked list of clusters and append partial results to the content.
+        traverses linked list of clusters and joins the content of the extents of the chain.
         """
-        binary_image: bytearray = self.boot_sector_state.binary_image
+        binary_view: memoryview = memoryview(self.boot_sector_state.binary_image)
+        return bytearray().join(binary_view[address_: address_ + length_]
+                                for address_, length_ in self.get_chain_extents(cluster_id_, size))
 
-        data_address_ = Cluster.compute_cluster_data_address(self.boot_sector_state, cluster_id_)
-        content_ = binary_image[data_address_: data_address_ + self.boot_sector_state.sector_size]
-
-        while not self.is_cluster_last(cluster_id_):
-            cluster_id_ = self.get_cluster_value(cluster_id_)
-            data_address_ = Cluster.compute_cluster_data_address(self.boot_sector_state, cluster_id_)
-            content_ += binary_image[data_address_: data_address_ + self.boot_sector_state.sector_size]
-        # the size is None if the object is directory
-        if size is None:
-            return content_
-        return content_[:size]
+    @property
+    def free_clusters_count(self) -> int:
+        return self._free_clusters.count(1)
 
     def find_free_cluster(self) -> Cluster:
         """
-        Returns the first free cluster and increments value of `self._first_free_cluster_id`.
-        The method works only in context of creating a partition from scratch.
-        In situations where the clusters are allocated and freed during the run of the program,
-        might the method cause `Out of space` error despite there would be free clusters.
+        Allocates and returns the free cluster with the lowest ID.
+        The search starts at the lowest cluster that might be free, which is the next cluster when the partition
+        is created from scratch, thus the allocation takes constant time.
         """
-
-        if self._first_free_cluster_id + 1 >= len(self.clusters):
-            raise NoFreeClusterException('No free cluster available!')
-        cluster = self.clusters[self._first_free_cluster_id + 1]
-        if not cluster.is_empty:
+        cluster_id_: int = self._free_clusters.find(1, self._first_free_cluster_id)
+        if cluster_id_ == -1:
+            self._first_free_cluster_id = self.clusters_count
             raise NoFreeClusterException('No free cluster available!')
+        cluster = self.clusters[cluster_id_]
         cluster.allocate_cluster()
-        self._first_free_cluster_id += 1
+        self._first_free_cluster_id = cluster_id_ + 1
         return cluster
 
     def allocate_chain(self, first_cluster: Cluster, size: int) -> None:
@@ -95,6 +257,36 @@ class FAT:
         current = first_cluster
         for _ in range(size - 1):
             free_cluster = self.find_free_cluster()
-            current.next_cluster = free_cluster
             current.set_in_fat(free_cluster.id)
             current = free_cluster
+
+    def free_chain(self, first_cluster: Cluster) -> int:
+        """
+        Frees all the clusters in the chain starting by the given cluster, so they can be allocated again.
+
+        :returns: Number of the freed clusters.
+        """
+        freed_clusters_cnt: int = 0
+        current: Optional[Cluster] = first_cluster
+        while current is not None:
+            next_cluster = current.next_cluster
+            current.set_in_fat(0x00)
+            freed_clusters_cnt += 1
+            current = next_cluster
+        return freed_clusters_cnt
+
+    def reallocate_chain(self, first_cluster: Cluster, size: int) -> None:
+        """
+        Shrinks or extends the allocated chain starting by the given cluster to the required number of clusters.
+        """
+        current = first_cluster
+        for _ in range(size - 1):
+            next_cluster = current.next_cluster
+            if next_cluster is None:
+                next_cluster = self.find_free_cluster()
+                current.set_in_fat(next_cluster.id)
+            current = next_cluster
+        next_cluster = current.next_cluster
+        current.next_cluster = None
+        if next_cluster is not None:
+            self.free_chain(next_cluster)
@@ -5,7 +5,7 @@ from textwrap import dedent
 from typing import Optional
 
 from .exceptions import InconsistentFATAttributes
-from .utils import (ALLOWED_SECTOR_SIZES, FAT12, FAT12_MAX_CLUSTERS, FAT16, FAT16_MAX_CLUSTERS,
+from .utils import (ALLOWED_SECTOR_SIZES, FAT12_MAX_CLUSTERS, FAT16_MAX_CLUSTERS, FAT32,
                     RESERVED_CLUSTERS_COUNT, FATDefaults, get_fat_sectors_count, get_fatfs_type,
                     get_non_data_sectors_cnt, number_of_clusters)
 
@@ -54,6 +54,8 @@ class FATFSState:
         if (size // sector_size) * sectors_per_cluster in (FAT12_MAX_CLUSTERS, FAT16_MAX_CLUSTERS):
             print('WARNING: It is not recommended to create FATFS with bounding '
                   f'count of clusters: {FAT12_MAX_CLUSTERS} or {FAT16_MAX_CLUSTERS}')
+        if self.boot_sector_state.fatfs_type == FAT32:
+            self.boot_sector_state.init_fat32_layout()
         self.check_fat_type()
 
     @property
@@ -71,8 +73,9 @@ class FATFSState:
                 f"""FAT type you specified is inconsistent with other attributes of the system.
                     The specified FATFS type: FAT{self._explicit_fat_type}
                     The actual FATFS type: FAT{_type}"""))
-        if _type not in (FAT12, FAT16):
-            raise NotImplementedError('FAT32 is currently not supported.')
+        if self.boot_sector_state.is_fat32_layout and _type != FAT32:
+            raise InconsistentFATAttributes('The size of the partition is on the boundary of FAT16 and FAT32, '
+                                            'the FAT32 layout leaves too few clusters for FAT32.')
 
 
 class BootSectorState:
@@ -108,8 +111,28 @@ class BootSectorState:
         self.volume_label: str = volume_label
         self.file_sys_type: str = file_sys_type
         self.volume_uuid: int = volume_uuid
+        # FAT12 and FAT16 have the root directory in the fixed region preceding the data region,
+        # its cluster ID 1 is used only internally by the generator
+        self.root_dir_cluster: int = 1
+        self.fsinfo_sector: int = 0
+        self.backup_boot_sector: int = 0
         self._binary_image: bytearray = bytearray(b'')
 
+    @property
+    def is_fat32_layout(self) -> bool:
+        return self.fsinfo_sector != 0
+
+    def init_fat32_layout(self) -> None:
+        """
+        FAT32 has no fixed root directory region, the root directory is a chain of clusters in the data region.
+        The reserved region contains the FSInfo sector and the backup of the boot sector.
+        """
+        self.root_dir_sectors_cnt = 0
+        self.reserved_sectors_cnt = max(self.reserved_sectors_cnt, FATDefaults.FAT32_RESERVED_SECTORS_COUNT)
+        self.root_dir_cluster = FATDefaults.FAT32_ROOT_DIR_CLUSTER
+        self.fsinfo_sector = FATDefaults.FSINFO_SECTOR
+        self.backup_boot_sector = FATDefaults.BACKUP_BOOT_SECTOR
+
     @property
     def binary_image(self) -> bytearray:
         return self._binary_image
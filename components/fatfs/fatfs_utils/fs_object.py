@@ -99,12 +99,16 @@ class Directory:
         # entries will be initialized after the cluster allocation
         self.entries: List[Entry] = []
         self.entities: List[Union[File, Directory]] = []  # type: ignore
-        self._entry = entry  # currently not in use (will use later for e.g. modification time, etc.)
+        self._entry = entry
 
     @property
     def is_root(self) -> bool:
         return self.parent is self
 
+    @property
+    def entry(self) -> Optional[Entry]:
+        return self._entry
+
     @property
     def first_cluster(self) -> Cluster:
         return self._first_cluster
@@ -179,8 +183,7 @@ class Directory:
         while current.next_cluster is not None:
             current = current.next_cluster
         new_cluster: Cluster = self.fat.find_free_cluster()
-        current.set_in_fat(new_cluster.id)
-        assert current is not new_cluster
+        assert current.id != new_cluster.id
         current.next_cluster = new_cluster
         self.entries += self.create_entries(new_cluster)
 
@@ -0,0 +1,231 @@
+# SPDX-FileCopyrightText: 2022 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .entry import Entry
+from .utils import EMPTY_BYTE, build_date_entry, build_time_entry
+
+FATFS_MANIFEST_VERSION: int = 1
+
+# (path of the object in the image, path of the object on the host, True if the object is a directory)
+INPUT_OBJECT = Tuple[str, str, bool]
+
+
+def get_file_hash(file_path: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file_:
+        for chunk in iter(lambda: file_.read(64 * 1024), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def list_input_objects(input_directory: str) -> List[INPUT_OBJECT]:
+    """
+    Lists the content of the input directory in the same order as FATFS.generate encodes it into the image.
+    """
+    objects: List[INPUT_OBJECT] = []
+    for name in sorted(os.listdir(input_directory)):
+        real_path: str = os.path.join(input_directory, name)
+        is_dir: bool = os.path.isdir(real_path)
+        objects.append((name.upper(), real_path, is_dir))
+        if is_dir:
+            objects += [(f'{name.upper()}/{image_path}', path_, is_dir_)
+                        for image_path, path_, is_dir_ in list_input_objects(real_path)]
+    return objects
+
+
+def get_fatfs_datetime(real_path: str) -> Tuple[int, int]:
+    object_timestamp = datetime.fromtimestamp(os.path.getctime(real_path))
+    return (build_date_entry(object_timestamp.year, object_timestamp.month, object_timestamp.day),
+            build_time_entry(object_timestamp.hour, object_timestamp.minute, object_timestamp.second))
+
+
+class FATFSImageManifest:
+    """
+    The class FATFSImageManifest caches the description of the generated image: the options used
+    for the generation and for every object in the image the content hash, the address of its short entry
+    and the extents of its cluster chain in the data region.
+
+    The allocation of clusters and entries depends only on the options and on the names, order and cluster counts
+    of the objects. When these are the same as in the cached build, the image is updated in place by rewriting
+    the clusters of the changed files and their entries (size and timestamps).
+    """
+
+    def __init__(self, options: Dict[str, Any], objects: List[Dict[str, Any]], image_offset: int = 0) -> None:
+        """
+        :param options: options of the generator, change of any of them requires regeneration of the image
+        :param objects: cached description of the objects in the image
+        :param image_offset: offset of the FAT filesystem in the image file (nonzero for wear levelling images)
+        """
+        self.options: Dict[str, Any] = options
+        self.objects: List[Dict[str, Any]] = objects
+        self.image_offset: int = image_offset
+        self.image_stat: Optional[List[int]] = None
+
+    @staticmethod
+    def load(manifest_path: str) -> Optional['FATFSImageManifest']:
+        try:
+            with open(manifest_path, 'r') as manifest_file:
+                data = json.load(manifest_file)
+            if data.get('version') != FATFS_MANIFEST_VERSION:
+                return None
+            manifest = FATFSImageManifest(data['options'], data['objects'], data['image_offset'])
+            manifest.image_stat = data['image_stat']
+            return manifest
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, manifest_path: str, image_path: str) -> None:
+        image_stat = os.stat(image_path)
+        self.image_stat = [image_stat.st_size, image_stat.st_mtime_ns]
+        with open(manifest_path, 'w') as manifest_file:
+            json.dump({'version': FATFS_MANIFEST_VERSION,
+                       'options': self.options,
+                       'image_offset': self.image_offset,
+                       'image_stat': self.image_stat,
+                       'objects': self.objects}, manifest_file)
+
+    def check_layout(self, options: Dict[str, Any], image_path: str, objects: List[INPUT_OBJECT]) -> Optional[str]:
+        """
+        :returns: The reason why the cached image cannot be updated in place, None if it can.
+        """
+        if options != self.options:
+            return 'generator options changed'
+        try:
+            image_stat = os.stat(image_path)
+        except OSError:
+            return 'image file is missing'
+        if [image_stat.st_size, image_stat.st_mtime_ns] != self.image_stat:
+            return 'image file was modified'
+        if [(image_path_, is_dir) for image_path_, _, is_dir in objects] != [(cached['path'], cached['is_dir'])
+                                                                             for cached in self.objects]:
+            return 'list of files and directories changed'
+        cluster_size: int = self.options['sector_size']
+        for (image_path_, real_path, is_dir), cached in zip(objects, self.objects):
+            if is_dir:
+                continue
+            clusters_cnt: int = (os.path.getsize(real_path) + cluster_size - 1) // cluster_size
+            if clusters_cnt != sum(length for _, length in cached['extents']) // cluster_size:
+                return f'number of clusters of `{image_path_}` changed'
+        return None
+
+    def patch_image(self, image_path: str, objects: List[INPUT_OBJECT], use_default_datetime: bool) -> int:
+        """
+        Rewrites the clusters and the entries of the files whose content changed.
+        If the timestamps are preserved, entries of the objects with changed timestamps are updated too.
+
+        :returns: Number of the files whose content was rewritten.
+        """
+        patched_files: int = 0
+        with open(image_path, 'r+b') as image_file:
+            for (_, real_path, is_dir), cached in zip(objects, self.objects):
+                date_time: List[int] = cached['datetime']
+                if not use_default_datetime:
+                    date_time = list(get_fatfs_datetime(real_path))
+                file_hash: Optional[str] = None if is_dir else get_file_hash(real_path)
+                if file_hash == cached['sha256'] and date_time == cached['datetime']:
+                    continue
+                if file_hash != cached['sha256']:
+                    self._write_content(image_file, real_path, cached['extents'])
+                    cached['sha256'] = file_hash
+                    patched_files += 1
+                self._update_entry(image_file, cached['entry_address'], None if is_dir else os.path.getsize(real_path),
+                                   date_time)
+                cached['datetime'] = date_time
+        return patched_files
+
+    def _write_content(self, image_file: Any, real_path: str, extents: List[List[int]]) -> None:
+        with open(real_path, 'rb') as content_file:
+            for address, length in extents:
+                content: bytes = content_file.read(length)
+                image_file.seek(self.image_offset + address)
+                # allocated clusters are cleaned, so the rest of the last cluster is zeroed as in the newly generated image
+                image_file.write(content + (length - len(content)) * EMPTY_BYTE)
+
+    def _update_entry(self, image_file: Any, entry_address: int, size: Optional[int], date_time: List[int]) -> None:
+        image_file.seek(self.image_offset + entry_address)
+        parsed_entry = Entry.ENTRY_FORMAT_SHORT_NAME.parse(image_file.read(Entry.ENTRY_FORMAT_SHORT_NAME.sizeof()))
+        if size is not None:
+            parsed_entry.DIR_FileSize = size
+        parsed_entry.DIR_CrtDate = parsed_entry.DIR_LstAccDate = parsed_entry.DIR_WrtDate = date_time[0]
+        parsed_entry.DIR_CrtTime = parsed_entry.DIR_WrtTime = date_time[1]
+        image_file.seek(self.image_offset + entry_address)
+        image_file.write(Entry.ENTRY_FORMAT_SHORT_NAME.build(parsed_entry))
+
+    @staticmethod
+    def from_fatfs(options: Dict[str, Any],
+                   fatfs: Any,
+                   objects: List[INPUT_OBJECT],
+                   image_offset: int = 0) -> 'FATFSImageManifest':
+        """
+        Collects placement of the objects from the instance of FATFS the image was generated with.
+        """
+        sector_size: int = fatfs.state.boot_sector_state.sector_size
+        cached_objects: List[Dict[str, Any]] = []
+        for image_path, real_path, is_dir in objects:
+            fs_object = fatfs.root_directory.recursive_search(image_path.split('/'), fatfs.root_directory)
+            parsed_entry = Entry.ENTRY_FORMAT_SHORT_NAME.parse(fs_object.entry.entry_bytes)
+            extents: List[List[int]] = []
+            if not is_dir:
+                # File.write fills the clusters by sector sized chunks
+                cluster = fs_object.first_cluster
+                for _ in range((parsed_entry.DIR_FileSize + sector_size - 1) // sector_size):
+                    if extents and extents[-1][0] + extents[-1][1] == cluster.cluster_data_address:
+                        extents[-1][1] += sector_size
+                    else:
+                        extents.append([cluster.cluster_data_address, sector_size])
+                    cluster = cluster.next_cluster
+            cached_objects.append({'path': image_path,
+                                   'is_dir': is_dir,
+                                   'sha256': None if is_dir else get_file_hash(real_path),
+                                   'datetime': [parsed_entry.DIR_WrtDate, parsed_entry.DIR_WrtTime],
+                                   'entry_address': fs_object.entry.entry_address,
+                                   'extents': extents})
+        return FATFSImageManifest(options, cached_objects, image_offset)
+
+
+def _get_manifest_options(args: argparse.Namespace) -> Dict[str, Any]:
+    options: Dict[str, Any] = dict(vars(args))
+    for name in ('output_file', 'manifest_file', 'verbose'):
+        options.pop(name)
+    options['input_directory'] = os.path.abspath(args.input_directory)
+    return options
+
+
+def update_image_in_place(args: argparse.Namespace, image_offset: int = 0) -> bool:
+    """
+    Updates the image generated by the previous run if the manifest allows it.
+
+    :returns: True if the image is up to date, False if it has to be generated from scratch.
+    """
+    manifest: Optional[FATFSImageManifest] = FATFSImageManifest.load(args.manifest_file)
+    objects: List[INPUT_OBJECT] = list_input_objects(args.input_directory)
+    reason: Optional[str] = 'no valid manifest'
+    if manifest is not None and manifest.image_offset != image_offset:
+        reason = 'offset of the filesystem in the image changed'
+    elif manifest is not None:
+        reason = manifest.check_layout(_get_manifest_options(args), args.output_file, objects)
+    if manifest is None or reason is not None:
+        if args.verbose:
+            print(f'FATFS image cache miss ({reason}): generating the whole image')
+        return False
+    patched_files: int = manifest.patch_image(args.output_file, objects, args.use_default_datetime)
+    manifest.save(args.manifest_file, args.output_file)
+    files_cnt: int = len([is_dir for _, _, is_dir in objects if not is_dir])
+    if args.verbose:
+        print(f'FATFS image cache hit: updated {patched_files} of {files_cnt} files in place')
+    return True
+
+
+def save_image_manifest(args: argparse.Namespace, fatfs: Any, image_offset: int = 0) -> None:
+    manifest = FATFSImageManifest.from_fatfs(_get_manifest_options(args),
+                                             fatfs,
+                                             list_input_objects(args.input_directory),
+                                             image_offset)
+    manifest.save(args.manifest_file, args.output_file)
@@ -26,6 +26,7 @@ FULL_BYTE: bytes = b'\xff'
 EMPTY_BYTE: bytes = b'\x00'
 # redundant
 BYTES_PER_DIRECTORY_ENTRY: int = 32
+UINT16_MAX: int = (1 << 16) - 1
 UINT32_MAX: int = (1 << 32) - 1
 MAX_NAME_SIZE: int = 8
 MAX_EXT_SIZE: int = 3
@@ -82,12 +83,14 @@ def get_fatfs_type(clusters_count: int) -> int:
 
 def get_fat_sectors_count(clusters_count: int, sector_size: int) -> int:
     fatfs_type_ = get_fatfs_type(clusters_count)
-    if fatfs_type_ == FAT32:
-        raise NotImplementedError('FAT32 is not supported!')
     # number of byte halves
     cluster_s: int = fatfs_type_ // 4
-    fat_size_bytes: int = (
-        clusters_count * 2 + cluster_s) if fatfs_type_ == FAT16 else (clusters_count * 3 + 1) // 2 + cluster_s
+    if fatfs_type_ == FAT32:
+        fat_size_bytes: int = clusters_count * 4 + cluster_s
+    elif fatfs_type_ == FAT16:
+        fat_size_bytes = clusters_count * 2 + cluster_s
+    else:
+        fat_size_bytes = (clusters_count * 3 + 1) // 2 + cluster_s
     return (fat_size_bytes + sector_size - 1) // sector_size
 
 
@@ -198,13 +201,21 @@ def get_args_for_partition_generator(desc: str, wl: bool) -> argparse.Namespace:
                         action='store_true',
                         help='For test purposes. If the flag is set the files are created with '
                              'the default timestamp that is the 1st of January 1980')
+    parser.add_argument('--manifest_file',
+                        default=None,
+                        help='Path to the manifest caching content hashes and placement of the objects in the image. '
+                             'If the layout of the input directory did not change since the previous run, '
+                             'the existing image is updated in place instead of being regenerated.')
+    parser.add_argument('--verbose',
+                        action='store_true',
+                        help='Print whether the image was updated in place using the manifest file.')
     parser.add_argument('--fat_type',
                         default=0,
                         type=int,
-                        choices=[FAT12, FAT16, 0],
+                        choices=[FAT12, FAT16, FAT32, 0],
                         help="""
-                        Type of fat. Select 12 for fat12, 16 for fat16. Don't set, or set to 0 for automatic
-                        calculation using cluster size and partition size.
+                        Type of fat. Select 12 for fat12, 16 for fat16, 32 for fat32. Don't set, or set to 0 for
+                        automatic calculation using cluster size and partition size.
                         """)
 
     args = parser.parse_args()
@@ -290,6 +301,12 @@ class FATDefaults:
     MEDIA_TYPE: int = 0xf8
     SIGNATURE_WORD: bytes = b'\x55\xAA'
 
+    # FAT32 defaults
+    FAT32_RESERVED_SECTORS_COUNT: int = 32
+    FAT32_ROOT_DIR_CLUSTER: int = 2
+    FSINFO_SECTOR: int = 1
+    BACKUP_BOOT_SECTOR: int = 6
+
     # wear levelling defaults
     VERSION: int = 2
     TEMP_BUFFER_SIZE: int = 32
@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
+import shutil
 from datetime import datetime
 from typing import Any, List, Optional
 
@@ -11,6 +12,7 @@ from fatfs_utils.exceptions import NoFreeClusterException
 from fatfs_utils.fat import FAT
 from fatfs_utils.fatfs_state import FATFSState
 from fatfs_utils.fs_object import Directory
+from fatfs_utils.image_manifest import save_image_manifest, update_image_in_place
 from fatfs_utils.long_filename_utils import get_required_lfn_entries_count
 from fatfs_utils.utils import (BYTES_PER_DIRECTORY_ENTRY, FATFS_INCEPTION, FATFS_MIN_ALLOC_UNIT,
                                RESERVED_CLUSTERS_COUNT, FATDefaults, get_args_for_partition_generator,
@@ -41,7 +43,12 @@ class FATFS:
                  file_sys_type: str = FATDefaults.FILE_SYS_TYPE,
                  root_entry_count: int = FATDefaults.ROOT_ENTRIES_COUNT,
                  explicit_fat_type: int = None,
-                 media_type: int = FATDefaults.MEDIA_TYPE) -> None:
+                 media_type: int = FATDefaults.MEDIA_TYPE,
+                 image_path: Optional[str] = None) -> None:
+        """
+        :param image_path: if set, the new image is created as the sparse file at this path and memory-mapped,
+            otherwise the image is held in memory. The sparse file is needed for large FAT32 volumes.
+        """
         # root directory bytes should be aligned by sector size
         assert (root_entry_count * BYTES_PER_DIRECTORY_ENTRY) % sector_size == 0
         # number of bytes in the root dir must be even multiple of BPB_BytsPerSec
@@ -65,17 +72,19 @@ class FATFS:
                                             volume_label=volume_label,
                                             oem_name=oem_name,
                                             use_default_datetime=use_default_datetime)
-        binary_image: bytes = bytearray(
-            read_filesystem(binary_image_path) if binary_image_path else self.create_empty_fatfs())
+        self.image_path: Optional[str] = None if binary_image_path else image_path
+        binary_image: bytearray = (
+            read_filesystem(binary_image_path) if binary_image_path else self.create_empty_fatfs(image_path))
         self.state.binary_image = binary_image
 
         self.fat: FAT = FAT(boot_sector_state=self.state.boot_sector_state, init_=True)
 
+        # the root directory of FAT32 has no fixed size (the root directory region is empty)
         root_dir_size = self.state.boot_sector_state.root_dir_sectors_cnt * self.state.boot_sector_state.sector_size
         self.root_directory: Directory = Directory(name='A',  # the name is not important, must be string
-                                                   size=root_dir_size,
+                                                   size=root_dir_size or None,
                                                    fat=self.fat,
-                                                   cluster=self.fat.clusters[1],
+                                                   cluster=self.fat.clusters[self.state.boot_sector_state.root_dir_cluster],
                                                    fatfs_state=self.state)
         self.root_directory.init_directory()
 
@@ -132,14 +141,21 @@ class FATFS:
         """
         self.root_directory.write_to_file(path_from_root, content)
 
-    def create_empty_fatfs(self) -> Any:
+    def create_empty_fatfs(self, image_path: Optional[str] = None) -> Any:
         boot_sector_ = BootSector(boot_sector_state=self.state.boot_sector_state)
-        boot_sector_.generate_boot_sector()
+        boot_sector_.generate_boot_sector(image_path)
         return boot_sector_.binary_image
 
     def write_filesystem(self, output_path: str) -> None:
-        with open(output_path, 'wb') as output:
-            output.write(bytearray(self.state.binary_image))
+        self.fat.write_table()
+        if self.image_path is None:
+            with open(output_path, 'wb') as output:
+                output.write(self.state.binary_image)
+            return
+        # the image is memory-mapped from the file self.image_path
+        self.state.binary_image.flush()
+        if os.path.abspath(output_path) != os.path.abspath(self.image_path):
+            shutil.copyfile(self.image_path, output_path)
 
     def _generate_partition_from_folder(self,
                                         folder_relative_path: str,
@@ -229,16 +245,22 @@ def main() -> None:
                                    ) * args.sector_size
                                   )
 
+    if args.manifest_file and update_image_in_place(args):
+        return
+
     fatfs = FATFS(sector_size=args.sector_size,
                   sectors_per_cluster=args.sectors_per_cluster,
                   size=args.partition_size,
                   root_entry_count=args.root_entry_count,
                   explicit_fat_type=args.fat_type,
                   long_names_enabled=args.long_name_support,
-                  use_default_datetime=args.use_default_datetime)
+                  use_default_datetime=args.use_default_datetime,
+                  image_path=args.output_file)
 
     fatfs.generate(args.input_directory)
     fatfs.write_filesystem(args.output_file)
+    if args.manifest_file:
+        save_image_manifest(args, fatfs)
 
 
 if __name__ == '__main__':
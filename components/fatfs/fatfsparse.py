@@ -2,16 +2,21 @@
 # SPDX-FileCopyrightText: 2022 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
 import argparse
+import mmap
 import os
+from typing import List, Tuple
 
 import construct
 from fatfs_utils.boot_sector import BootSector
 from fatfs_utils.entry import Entry
 from fatfs_utils.fat import FAT
 from fatfs_utils.fatfs_state import BootSectorState
-from fatfs_utils.utils import FULL_BYTE, LONG_NAMES_ENCODING, PAD_CHAR, FATDefaults, lfn_checksum, read_filesystem
+from fatfs_utils.utils import FAT32, FULL_BYTE, LONG_NAMES_ENCODING, PAD_CHAR, FATDefaults, lfn_checksum
 from wl_fatfsgen import remove_wl
 
+# the file content is written by chunks, the pages of the memory-mapped image are released after each chunk
+COPY_CHUNK_SIZE: int = 1024 * 1024
+
 
 def build_file_name(name1: bytes, name2: bytes, name3: bytes) -> str:
     full_name_ = name1 + name2 + name3
@@ -42,6 +47,24 @@ def get_obj_name(obj_: dict, directory_bytes_: bytes, entry_position_: int, lfn_
     return ''.join(map(lambda x: x[1], sorted(full_name.items()))) or obj_name_
 
 
+def extract_file(path: str, binary_array_: bytes, extents_: List[Tuple[int, int]]) -> None:
+    """
+    Writes the content of the file described by the extents of its cluster chain.
+    The extents are written as the slices of the memory view of the image, so the content is not copied in memory.
+    If the image is memory-mapped, the pages already written are released, so the memory used stays flat.
+    """
+    binary_view_: memoryview = memoryview(binary_array_)
+    release_pages_: bool = isinstance(binary_array_, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED')
+    with open(path, 'wb') as new_file:
+        for address_, length_ in extents_:
+            for chunk_address_ in range(address_, address_ + length_, COPY_CHUNK_SIZE):
+                chunk_end_: int = min(chunk_address_ + COPY_CHUNK_SIZE, address_ + length_)
+                new_file.write(binary_view_[chunk_address_: chunk_end_])
+                if release_pages_:
+                    page_address_: int = chunk_address_ - chunk_address_ % mmap.PAGESIZE
+                    binary_array_.madvise(mmap.MADV_DONTNEED, page_address_, chunk_end_ - page_address_)  # type: ignore
+
+
 def traverse_folder_tree(directory_bytes_: bytes,
                          name: str,
                          state_: BootSectorState,
@@ -63,23 +86,25 @@ def traverse_folder_tree(directory_bytes_: bytes,
 
         if obj_['DIR_Attr'] == 0:  # empty entry
             continue
+        if obj_['DIR_Attr'] == Entry.ATTR_LONG_NAME:
+            # the entry might be parsed successfully as the short one by coincidence
+            args.long_name_support = True
+            continue
 
         obj_name_: str = get_obj_name(obj_,
                                       directory_bytes_,
                                       entry_position_=i,
                                       lfn_checksum_=lfn_checksum(obj_['DIR_Name'] + obj_['DIR_Name_ext']))
         if obj_['DIR_Attr'] == Entry.ATTR_ARCHIVE:
-            content_ = b''
+            extents_: List[Tuple[int, int]] = []
             if obj_['DIR_FileSize'] > 0:
-                content_ = fat_.get_chained_content(cluster_id_=Entry.get_cluster_id(obj_),
-                                                    size=obj_['DIR_FileSize'])
-            with open(os.path.join(name, obj_name_), 'wb') as new_file:
-                new_file.write(content_)
+                extents_ = fat_.get_chain_extents(cluster_id_=Entry.get_cluster_id(obj_), size=obj_['DIR_FileSize'])
+            extract_file(os.path.join(name, obj_name_), binary_array_, extents_)
         elif obj_['DIR_Attr'] == Entry.ATTR_DIRECTORY:
             # avoid creating symlinks to itself and parent folder
             if obj_name_ in ('.', '..'):
                 continue
-            child_directory_bytes_ = fat_.get_chained_content(cluster_id_=obj_['DIR_FstClusLO'])
+            child_directory_bytes_ = fat_.get_chained_content(cluster_id_=Entry.get_cluster_id(obj_))
             traverse_folder_tree(directory_bytes_=child_directory_bytes_,
                                  name=os.path.join(name, obj_name_),
                                  state_=state_,
@@ -138,7 +163,9 @@ if __name__ == '__main__':
         args.wl_layer = 'enabled'
     args.wl_layer = args.wl_layer or 'detect'
 
-    fs = read_filesystem(args.input_image)
+    # the image is memory-mapped, so the size of the image is not limited by the available memory
+    with open(args.input_image, 'rb') as image_file:
+        fs = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
 
     # An algorithm for removing wear levelling:
     # 1. find an remove dummy sector:
@@ -159,9 +186,13 @@ if __name__ == '__main__':
     boot_sector_.parse_boot_sector(fs)
     fat = FAT(boot_sector_.boot_sector_state, init_=False)
 
-    boot_dir_start_ = boot_sector_.boot_sector_state.root_directory_start
-    boot_dir_sectors = boot_sector_.boot_sector_state.root_dir_sectors_cnt
-    full_ = fs[boot_dir_start_: boot_dir_start_ + boot_dir_sectors * boot_sector_.boot_sector_state.sector_size]
+    if boot_sector_.boot_sector_state.fatfs_type == FAT32:
+        # the root directory of FAT32 is chained as any other directory
+        full_ = fat.get_chained_content(cluster_id_=boot_sector_.boot_sector_state.root_dir_cluster)
+    else:
+        boot_dir_start_ = boot_sector_.boot_sector_state.root_directory_start
+        boot_dir_sectors = boot_sector_.boot_sector_state.root_dir_sectors_cnt
+        full_ = fs[boot_dir_start_: boot_dir_start_ + boot_dir_sectors * boot_sector_.boot_sector_state.sector_size]
     traverse_folder_tree(full_,
                          boot_sector_.boot_sector_state.volume_label.rstrip(chr(PAD_CHAR)),
                          boot_sector_.boot_sector_state, fat, fs)
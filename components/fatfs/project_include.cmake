@@ -46,8 +46,10 @@ function(fatfs_create_partition_image partition base_dir)
 
     if("${size}" AND "${offset}")
         set(image_file ${CMAKE_BINARY_DIR}/${partition}.bin)
+        set(manifest_file ${CMAKE_BINARY_DIR}/${partition}_fatfs_manifest.json)
         # Execute FATFS image generation; this always executes as there is no way to specify for CMake to watch for
-        # contents of the base dir changing.
+        # contents of the base dir changing. If the layout of the base dir didn't change, the manifest allows
+        # the generator to update the existing image in place.
         add_custom_target(fatfs_${partition}_bin ALL
             COMMAND ${fatfsgen_py} ${base_dir_full_path}
             ${fatfs_long_names_option}
@@ -55,10 +57,11 @@ function(fatfs_create_partition_image partition base_dir)
             --partition_size ${size}
             --output_file ${image_file}
             --sector_size "${fatfs_sector_size}"
+            --manifest_file ${manifest_file}
             )
         set_property(DIRECTORY "${CMAKE_CURRENT_SOURCE_DIR}" APPEND PROPERTY
             ADDITIONAL_CLEAN_FILES
-            ${image_file})
+            ${image_file} ${manifest_file})
 
         idf_component_get_property(main_args esptool_py FLASH_ARGS)
         idf_component_get_property(sub_args esptool_py FLASH_SUB_ARGS)
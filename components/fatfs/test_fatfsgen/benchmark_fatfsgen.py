@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# SPDX-FileCopyrightText: 2022 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Measures generation and parsing of the large FAT32 image, e.g. the image preloaded onto the SD card.
+
+    python benchmark_fatfsgen.py --partition_size 8589934592 --files 1000 --file_size 1048576
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from subprocess import check_call
+
+FATFS_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def generate_input_directory(path: str, files_cnt: int, file_size: int) -> None:
+    for index in range(files_cnt):
+        # spread the files into the directories, so the directory chaining is measured as well
+        directory: str = os.path.join(path, f'DIR{index // 100}')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'F{index}.BIN'), 'wb') as file_:
+            file_.write(os.urandom(file_size))
+
+
+def measure(name: str, args: list, cwd: str, data_size: int) -> None:
+    start: float = time.perf_counter()
+    check_call([sys.executable] + args, cwd=cwd)
+    elapsed: float = time.perf_counter() - start
+    print(f'{name}: {elapsed:.2f} s, {data_size / elapsed / (1024 * 1024):.1f} MB/s of the file content')
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='FATFS generator benchmark')
+    parser.add_argument('--partition_size', default=8 * 1024 * 1024 * 1024, type=int,
+                        help='Size of the generated image in bytes')
+    parser.add_argument('--files', default=1000, type=int, help='Number of the files in the image')
+    parser.add_argument('--file_size', default=1024 * 1024, type=int, help='Size of each file in bytes')
+    args = parser.parse_args()
+
+    work_dir: str = tempfile.mkdtemp(prefix='fatfsgen_benchmark_')
+    try:
+        input_dir: str = os.path.join(work_dir, 'input')
+        image_path: str = os.path.join(work_dir, 'fatfs_image.img')
+        generate_input_directory(input_dir, args.files, args.file_size)
+        data_size: int = args.files * args.file_size
+
+        measure('fatfsgen.py', [os.path.join(FATFS_DIR, 'fatfsgen.py'), input_dir,
+                                '--partition_size', str(args.partition_size),
+                                '--output_file', image_path], work_dir, data_size)
+        allocated: int = os.stat(image_path).st_blocks * 512
+        print(f'image size: {args.partition_size} B, allocated on the disk: {allocated} B')
+        measure('fatfsparse.py', [os.path.join(FATFS_DIR, 'fatfsparse.py'), image_path], work_dir, data_size)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
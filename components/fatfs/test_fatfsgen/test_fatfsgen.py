@@ -15,13 +15,14 @@ import fatfsgen  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.boot_sector import BootSector  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.cluster import Cluster  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.entry import Entry  # noqa E402  # pylint: disable=C0413
+from fatfs_utils.fat import FAT  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.exceptions import InconsistentFATAttributes  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.exceptions import NotInitialized  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.exceptions import TooLongNameException  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.exceptions import WriteDirectoryException  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.exceptions import LowerCaseException, NoFreeClusterException  # noqa E402  # pylint: disable=C0413
 from fatfs_utils.utils import right_strip_string  # noqa E402  # pylint: disable=C0413
-from fatfs_utils.utils import FAT12, read_filesystem  # noqa E402  # pylint: disable=C0413
+from fatfs_utils.utils import FAT12, FAT16_MAX_CLUSTERS, read_filesystem  # noqa E402  # pylint: disable=C0413
 
 
 class FatFSGen(unittest.TestCase):
@@ -129,6 +130,63 @@ class FatFSGen(unittest.TestCase):
         self.assertEqual(file_system[0x1000: 0x100e], b'\xf8\xff\xff\x03\xf0\xff\x00\x00\x00\x00\x00\x00\x00\x00')
         self.assertEqual(file_system[0x7000: 0x8000], b'a' + (CFG['sector_size'] - 1) * b'\x00')
 
+    def test_free_and_reallocate_chain(self) -> None:
+        fatfs = fatfsgen.FATFS()
+        fatfs.create_file('WRITEF', extension='TXT')
+        fatfs.write_content(path_from_root=['WRITEF.TXT'], content=3 * CFG['sector_size'] * b'a')
+        fatfs.create_file('NEXTF', extension='TXT')
+        fatfs.write_content(path_from_root=['NEXTF.TXT'], content=b'b')
+        first_cluster = fatfs.fat.clusters[2]
+        free_clusters_cnt = fatfs.fat.free_clusters_count
+
+        fatfs.fat.reallocate_chain(first_cluster, 1)
+        self.assertEqual(fatfs.fat.free_clusters_count, free_clusters_cnt + 2)
+        self.assertTrue(fatfs.fat.is_cluster_last(2))
+        # freed clusters are allocated again before the following ones
+        fatfs.fat.reallocate_chain(first_cluster, 4)
+        self.assertEqual(fatfs.fat.free_clusters_count, free_clusters_cnt - 1)
+        fatfs.write_filesystem(CFG['output_file'])
+        file_system = read_filesystem(CFG['output_file'])
+        self.assertEqual(file_system[0x1000: 0x100c], b'\xf8\xff\xff\x03\x40\x00\x06\xf0\xff\xff\x0f\x00')
+        self.assertEqual(fatfs.fat.free_chain(first_cluster), 4)
+        self.assertEqual(fatfs.fat.free_clusters_count, free_clusters_cnt + 3)
+        self.assertEqual(fatfs.fat.find_free_cluster().id, 2)
+
+    def test_chain_extents(self) -> None:
+        fatfs = fatfsgen.FATFS()
+        fatfs.create_file('WRITEF', extension='TXT')
+        fatfs.write_content(path_from_root=['WRITEF.TXT'], content=3 * CFG['sector_size'] * b'a')
+        fatfs.create_file('NEXTF', extension='TXT')
+        fatfs.write_content(path_from_root=['NEXTF.TXT'], content=b'b')
+        fatfs.fat.reallocate_chain(fatfs.fat.clusters[2], 4)
+        # the clusters 2, 3 and 4 are adjacent, the cluster 5 belongs to NEXTF.TXT
+        self.assertEqual(fatfs.fat.get_chain_extents(2), [(0x6000, 0x3000), (0xa000, 0x1000)])
+        self.assertEqual(fatfs.fat.get_chain_extents(2, size=0x3000), [(0x6000, 0x3000)])
+        self.assertEqual(fatfs.fat.get_chain_extents(2, size=0x300a), [(0x6000, 0x3000), (0xa000, 0xa)])
+        self.assertEqual(fatfs.fat.get_chain_extents(2, size=0x100), [(0x6000, 0x100)])
+        self.assertEqual(fatfs.fat.get_chained_content(5, size=1), b'b')
+
+    def test_chain_extents_fat32_reserved_bits(self) -> None:
+        fatfs = fatfsgen.FATFS(size=300 * 1024 * 1024)
+        fatfs.create_file('WRITEF', extension='TXT')
+        fatfs.write_content(path_from_root=['WRITEF.TXT'], content=3 * CFG['sector_size'] * b'a')
+        fatfs.create_file('NEXTF', extension='TXT')
+        fatfs.write_content(path_from_root=['NEXTF.TXT'], content=b'b')
+        fatfs.fat.reallocate_chain(fatfs.fat.clusters[3], 5)
+        fatfs.fat.write_table()
+        extents = fatfs.fat.get_chain_extents(3)
+        self.assertEqual(len(extents), 2)
+
+        # other formatters may set the reserved high 4 bits of the FAT32 entries
+        state = fatfs.state.boot_sector_state
+        for cluster_id in range(state.clusters):
+            state.binary_image[state.fat_table_start_address + 4 * cluster_id + 3] |= 0xF0
+        fat = FAT(state, init_=False)
+        self.assertEqual(fat.get_chain_extents(3), extents)
+        self.assertEqual(fat.get_chained_content(3, size=3 * CFG['sector_size']), 3 * CFG['sector_size'] * b'a')
+        self.assertEqual(fat.get_chained_content(6, size=1), b'b')
+        self.assertEqual(fat.free_clusters_count, fatfs.fat.free_clusters_count)
+
     def test_full_sector_folder(self) -> None:
         fatfs = fatfsgen.FATFS()
         fatfs.create_directory('TESTFOLD')
@@ -197,7 +255,8 @@ class FatFSGen(unittest.TestCase):
         self.assertEqual(fatfs.state.boot_sector_state.fatfs_type, 16)
 
     def test_fatfs32_detection(self) -> None:
-        self.assertRaises(NotImplementedError, fatfsgen.FATFS, size=256 * 1024 * 1024)
+        fatfs = fatfsgen.FATFS(size=300 * 1024 * 1024)
+        self.assertEqual(fatfs.state.boot_sector_state.fatfs_type, 32)
 
     def test_deep_structure(self) -> None:
         fatfs = fatfsgen.FATFS()
@@ -434,8 +493,62 @@ class FatFSGen(unittest.TestCase):
             output,
             b'WARNING: It is not recommended to create FATFS with bounding count of clusters: 4085 or 65525\n')
 
+    def test_boundary_clusters_fat16(self) -> None:
+        fatfs = fatfsgen.FATFS(size=268419193)
+        self.assertEqual(fatfs.state.boot_sector_state.fatfs_type, 16)
+        self.assertEqual(fatfs.state.binary_image[0x13:0x15], b'\xfc\xff')
+
     def test_boundary_clusters_fat32(self) -> None:
-        self.assertRaises(NotImplementedError, fatfsgen.FATFS, size=268419193)
+        # the largest FAT16 volume with 4096 B sectors has 65593 sectors
+        fatfs = fatfsgen.FATFS(size=65593 * 4096)
+        self.assertEqual(fatfs.state.boot_sector_state.fatfs_type, 16)
+        self.assertEqual(fatfs.state.boot_sector_state.clusters, FAT16_MAX_CLUSTERS)
+
+        # the FAT32 layout without the root directory region leaves less than FAT16_MAX_CLUSTERS + 1 clusters
+        self.assertRaises(InconsistentFATAttributes, fatfsgen.FATFS, size=65594 * 4096)
+        self.assertRaises(InconsistentFATAttributes, fatfsgen.FATFS, size=65620 * 4096)
+
+        fatfs = fatfsgen.FATFS(size=65621 * 4096)
+        self.assertEqual(fatfs.state.boot_sector_state.fatfs_type, 32)
+        self.assertEqual(fatfs.state.boot_sector_state.clusters, FAT16_MAX_CLUSTERS + 1)
+        # BPB_RootEntCnt, BPB_TotSec16 and BPB_FATSz16 are zero for FAT32
+        self.assertEqual(fatfs.state.binary_image[0x11:0x13], b'\x00\x00')
+        self.assertEqual(fatfs.state.binary_image[0x13:0x15], b'\x00\x00')
+        self.assertEqual(fatfs.state.binary_image[0x16:0x18], b'\x00\x00')
+
+    def test_fatfs16_total_sectors32(self) -> None:
+        fatfs = fatfsgen.FATFS(size=256 * 1024 * 1024)
+        self.assertEqual(fatfs.state.boot_sector_state.fatfs_type, 16)
+        # the number of sectors does not fit BPB_TotSec16
+        self.assertEqual(fatfs.state.binary_image[0x13:0x15], b'\x00\x00')
+        self.assertEqual(fatfs.state.binary_image[0x20:0x24], b'\x00\x00\x01\x00')
+
+    def test_manifest_update_in_place(self) -> None:
+        manifest_file = os.path.join('output_data', 'manifest.json')
+        generate_args = ['python', '../fatfsgen.py', CFG['test_dir2'], '--use_default_datetime',
+                         '--long_name_support', '--manifest_file', manifest_file, '--verbose']
+        output: bytes = check_output(generate_args, stderr=STDOUT)
+        self.assertEqual(output, b'FATFS image cache miss (no valid manifest): generating the whole image\n')
+        # nothing is printed without --verbose and the option doesn't invalidate the manifest
+        self.assertEqual(check_output(generate_args[:-1], stderr=STDOUT), b'')
+
+        with open(os.path.join(CFG['test_dir2'], 'test', 'testfil2'), 'w') as file:
+            file.write('this is changed test\n')
+        output = check_output(generate_args, stderr=STDOUT)
+        self.assertEqual(output, b'FATFS image cache hit: updated 1 of 3 files in place\n')
+        check_output(['python', '../fatfsgen.py', CFG['test_dir2'], '--use_default_datetime', '--long_name_support',
+                      '--output_file', CFG['output_file']])
+        file_system = read_filesystem('fatfs_image.img')
+        reference_file_system = read_filesystem(CFG['output_file'])
+        # the volume ID in the boot sector is random
+        self.assertEqual(file_system[:0x27], reference_file_system[:0x27])
+        self.assertEqual(file_system[0x2b:], reference_file_system[0x2b:])
+
+        with open(os.path.join(CFG['test_dir2'], 'testfile'), 'w') as file:
+            file.write(5000 * 'a')
+        output = check_output(generate_args, stderr=STDOUT)
+        self.assertEqual(output, b'FATFS image cache miss (number of clusters of `TESTFILE` changed): '
+                                 b'generating the whole image\n')
 
     def test_inconsistent_fat12(self) -> None:
         self.assertRaises(InconsistentFATAttributes, fatfsgen.FATFS, size=20480000, explicit_fat_type=FAT12)
@@ -488,11 +601,12 @@ class FatFSGen(unittest.TestCase):
         bs = BootSector(fatfs.state.boot_sector_state)
         bs.generate_boot_sector()
         bs.parse_boot_sector(bs.binary_image)
-        x = 'FATFS properties:,clusters: 252,data_region_start: 24576,data_sectors: ' \
+        x = 'FATFS properties:,backup_boot_sector: 0,clusters: 252,data_region_start: 24576,data_sectors: ' \
             '250,entries_root_count: 512,fat_table_start_address: 4096,fat_tables_cnt: 1,' \
-            'fatfs_type: 12,file_sys_type: FAT     ,hidden_sectors: 0,media_type: 248,' \
+            'fatfs_type: 12,file_sys_type: FAT     ,fsinfo_sector: 0,hidden_sectors: 0,is_fat32_layout: False,' \
+            'media_type: 248,' \
             'non_data_sectors: 6,num_heads: 255,oem_name: MSDOS5.0,reserved_sectors_cnt: 1,' \
-            'root_dir_sectors_cnt: 4,root_directory_start: 8192,sec_per_track: 63,sector_size: 4096,' \
+            'root_dir_cluster: 1,root_dir_sectors_cnt: 4,root_directory_start: 8192,sec_per_track: 63,sector_size: 4096,' \
             'sectors_count: 256,sectors_per_cluster: 1,sectors_per_fat_cnt: 1,size: 1048576,' \
             'volume_label: Espressif  ,volume_uuid: 1144419653,'
         self.assertEqual(x.split(',')[:-2], str(bs).split('\n')[:-2])  # except for volume id
@@ -324,6 +324,26 @@ class FatFSGen(unittest.TestCase):
         run(['python', '../fatfsparse.py', 'fatfs_image.img'], stderr=STDOUT)
         assert compare_folders('testf', 'Espressif')
 
+    def test_e2e_fat32(self) -> None:
+        # the root directory of 130 entries does not fit a single cluster and has to be chained
+        struct_: dict = {
+            'type': 'folder',
+            'name': 'testf',
+            'content': [self.file_(f'NEW{i}.TXT') for i in range(129)] + [{
+                'type': 'folder',
+                'name': 'XYZ',
+                'content': [self.file_('NEWFLE')]
+            }]
+        }
+        generate_local_folder_structure(struct_, path_='.')
+        run([
+            'python',
+            f'{os.path.join(os.path.dirname(__file__), "..", "fatfsgen.py")}',
+            'testf', '--partition_size', str(300 * 1024 * 1024)
+        ], stderr=STDOUT)
+        run(['python', '../fatfsparse.py', 'fatfs_image.img'], stderr=STDOUT)
+        assert compare_folders('testf', 'Espressif')
+
     def test_parse_long_name(self) -> None:
         self.assertEqual(
             Entry.parse_entry_long(
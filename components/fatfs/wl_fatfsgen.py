@@ -4,6 +4,7 @@
 
 from construct import Const, Int32ul, Struct
 from fatfs_utils.exceptions import WLNotInitialized
+from fatfs_utils.image_manifest import save_image_manifest, update_image_in_place
 from fatfs_utils.utils import (FULL_BYTE, UINT32_MAX, FATDefaults, crc32, generate_4bytes_random,
                                get_args_for_partition_generator)
 from fatfsgen import FATFS
@@ -137,6 +138,7 @@ class WLFATFS:
         self.fatfs_binary_image = self.plain_fatfs.state.binary_image
 
     def init_wl(self) -> None:
+        self.plain_fatfs.fat.write_table()
         self.fatfs_binary_image = self.plain_fatfs.state.binary_image
         self._add_dummy_sector()
         # config must be added after state, do not change the order of these two calls!
@@ -202,14 +204,18 @@ class WLFATFS:
 if __name__ == '__main__':
     desc = 'Create a FAT filesystem with support for wear levelling and populate it with directory content'
     args = get_args_for_partition_generator(desc, wl=True)
-    wl_fatfs = WLFATFS(sectors_per_cluster=args.sectors_per_cluster,
-                       size=args.partition_size,
-                       sector_size=args.sector_size,
-                       root_entry_count=args.root_entry_count,
-                       explicit_fat_type=args.fat_type,
-                       long_names_enabled=args.long_name_support,
-                       use_default_datetime=args.use_default_datetime)
-
-    wl_fatfs.plain_fatfs.generate(args.input_directory)
-    wl_fatfs.init_wl()
-    wl_fatfs.wl_write_filesystem(args.output_file)
+    # the plain FAT filesystem follows the dummy sector in the image
+    if not (args.manifest_file and update_image_in_place(args, image_offset=FATDefaults.WL_SECTOR_SIZE)):
+        wl_fatfs = WLFATFS(sectors_per_cluster=args.sectors_per_cluster,
+                           size=args.partition_size,
+                           sector_size=args.sector_size,
+                           root_entry_count=args.root_entry_count,
+                           explicit_fat_type=args.fat_type,
+                           long_names_enabled=args.long_name_support,
+                           use_default_datetime=args.use_default_datetime)
+
+        wl_fatfs.plain_fatfs.generate(args.input_directory)
+        wl_fatfs.init_wl()
+        wl_fatfs.wl_write_filesystem(args.output_file)
+        if args.manifest_file:
+            save_image_manifest(args, wl_fatfs.plain_fatfs, image_offset=FATDefaults.WL_SECTOR_SIZE)
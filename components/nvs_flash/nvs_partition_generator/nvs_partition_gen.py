@@ -14,12 +14,14 @@ import codecs
 import csv
 import datetime
 import distutils.dir_util
+import functools
 import os
 import random
 import struct
 import sys
 import textwrap
 import zlib
+from collections import OrderedDict
 from io import open
 
 try:
@@ -36,14 +38,94 @@ VERSION1_PRINT = 'V1 - Multipage Blob Support Disabled'
 VERSION2_PRINT = 'V2 - Multipage Blob Support Enabled'
 
 
-def reverse_hexbytes(addr_tmp):
-    addr = []
-    reversed_bytes = ''
-    for i in range(0, len(addr_tmp), 2):
-        addr.append(addr_tmp[i:i + 2])
-    reversed_bytes = ''.join(reversed(addr))
+class XtsAes(object):
+    """
+    XTS-AES cipher working on whole runs of 32-byte NVS entries. Each entry is one XTS data unit
+    (two AES blocks) whose tweak is its flash address relative to the start of the partition.
+    Instead of creating a new XTS `Cipher` for every entry, one AES-ECB context is kept per key
+    half, the encrypted tweaks are precomputed per page and all entries of a run are
+    encrypted/decrypted in a single pass.
+    """
+    BLOCK_SIZE = 16
+    ENTRY_SIZE = 32
+    GF_128_MASK = (1 << 128) - 1
+    GF_128_FDBK = 0x87
+    PAGE_SIZE = 4096
+    FIRST_ENTRY_OFFSET = 64
+    ENTRIES_PER_PAGE = 126
+    # Pages are processed one after another, the tweaks of only a few recent pages are kept
+    MAX_CACHED_PAGES = 8
 
-    return reversed_bytes
+    def __init__(self, key):
+        backend = default_backend()
+        data_cipher = Cipher(algorithms.AES(key[:32]), modes.ECB(), backend=backend)
+        tweak_cipher = Cipher(algorithms.AES(key[32:]), modes.ECB(), backend=backend)
+        self.data_encryptor = data_cipher.encryptor()
+        self.data_decryptor = data_cipher.decryptor()
+        self.tweak_encryptor = tweak_cipher.encryptor()
+        self.page_tweaks = OrderedDict()
+
+    def get_page_tweaks(self, page_num):
+        # Masks (tweak for the first and second AES block) of every entry of the page, as an integer
+        tweaks = self.page_tweaks.get(page_num)
+        if tweaks is not None:
+            self.page_tweaks.move_to_end(page_num)
+        else:
+            rel_addr = page_num * XtsAes.PAGE_SIZE + XtsAes.FIRST_ENTRY_OFFSET
+            addrs = b''.join((rel_addr + entry_no * XtsAes.ENTRY_SIZE).to_bytes(XtsAes.BLOCK_SIZE, 'little')
+                             for entry_no in range(XtsAes.ENTRIES_PER_PAGE))
+            encr_addrs = self.tweak_encryptor.update(addrs)
+            masks = bytearray(XtsAes.ENTRIES_PER_PAGE * XtsAes.ENTRY_SIZE)
+            for entry_no in range(XtsAes.ENTRIES_PER_PAGE):
+                idx = entry_no * XtsAes.BLOCK_SIZE
+                tweak = int.from_bytes(encr_addrs[idx:idx + XtsAes.BLOCK_SIZE], 'little')
+                # Tweak of the second block is the first one multiplied by alpha in GF(2^128)
+                next_tweak = (tweak << 1) & XtsAes.GF_128_MASK
+                if tweak >> 127:
+                    next_tweak ^= XtsAes.GF_128_FDBK
+                mask_idx = entry_no * XtsAes.ENTRY_SIZE
+                masks[mask_idx:mask_idx + XtsAes.BLOCK_SIZE] = encr_addrs[idx:idx + XtsAes.BLOCK_SIZE]
+                masks[mask_idx + XtsAes.BLOCK_SIZE:mask_idx + XtsAes.ENTRY_SIZE] = next_tweak.to_bytes(XtsAes.BLOCK_SIZE, 'little')
+            tweaks = int.from_bytes(masks, 'little')
+            self.page_tweaks[page_num] = tweaks
+            if len(self.page_tweaks) > XtsAes.MAX_CACHED_PAGES:
+                self.page_tweaks.popitem(last=False)
+        return tweaks
+
+    def get_masks(self, page_num, entry_no, data_len):
+        # Masks for `data_len` bytes of entries starting at `entry_no`
+        shift = entry_no * XtsAes.ENTRY_SIZE * 8
+        return (self.get_page_tweaks(page_num) >> shift) & ((1 << (data_len * 8)) - 1)
+
+    def process(self, ecb_context, data, page_num, entry_no):
+        data_len = len(data)
+        assert data_len % XtsAes.ENTRY_SIZE == 0, 'Data must consist of whole NVS entries'
+        assert entry_no + data_len // XtsAes.ENTRY_SIZE <= XtsAes.ENTRIES_PER_PAGE, 'Page overflow!!'
+        masks = self.get_masks(page_num, entry_no, data_len)
+        masked_data = (int.from_bytes(data, 'little') ^ masks).to_bytes(data_len, 'little')
+        processed_data = int.from_bytes(ecb_context.update(masked_data), 'little') ^ masks
+        return processed_data.to_bytes(data_len, 'little')
+
+    def encrypt(self, data, page_num, entry_no):
+        return self.process(self.data_encryptor, data, page_num, entry_no)
+
+    def decrypt(self, data, page_num, entry_no):
+        return self.process(self.data_decryptor, data, page_num, entry_no)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_xts_aes_for_key(key):
+    # Only a few recently used keys are kept, mfg_gen --keygen uses a different key for every device
+    return XtsAes(key)
+
+
+def get_xts_aes(key):
+    """ Return XtsAes instance shared by all pages (and NVS binaries) encrypted with the same key.
+    Key is either 64 raw bytes or its hex representation
+    """
+    if len(key) != 64:
+        key = codecs.decode(key, 'hex')
+    return _get_xts_aes_for_key(bytes(key))
 
 
 def desc_format(*args):
@@ -90,7 +172,9 @@ class Page(object):
     }
 
     def __init__(self, page_num, version, is_rsrv_page=False):
+        self.page_num = page_num
         self.entry_num = 0
+        self.is_encrypted = False
         self.bitmap_array = array.array('B')
         self.version = version
         self.page_buf = bytearray(b'\xff') * Page.PAGE_PARAMS['max_size']
@@ -133,86 +217,19 @@ class Page(object):
         end_idx = Page.BITMAPARRAY_OFFSET + Page.BITMAPARRAY_SIZE_IN_BYTES
         self.page_buf[start_idx:end_idx] = self.bitmap_array
 
-    def encrypt_entry(self, data_arr, tweak_arr, encr_key):
-        # Encrypt 32 bytes of data using XTS-AES encryption
-        backend = default_backend()
-        plain_text = codecs.decode(data_arr, 'hex')
-        tweak = codecs.decode(tweak_arr, 'hex')
-
-        cipher = Cipher(algorithms.AES(encr_key), modes.XTS(tweak), backend=backend)
-        encryptor = cipher.encryptor()
-        encrypted_data = encryptor.update(plain_text)
-
-        return encrypted_data
-
-    def encrypt_data(self, data_input, no_of_entries, nvs_obj):
-        # Set values needed for encryption and encrypt data byte wise
-        encr_data_to_write = bytearray()
-        data_len_needed = 64  # in hex
-        tweak_len_needed = 32  # in hex
-        key_len_needed = 64
-        init_tweak_val = '0'
-        init_data_val = 'f'
-        tweak_tmp = ''
-        encr_key_input = None
-
-        # Extract encryption key and tweak key from given key input
-        if len(nvs_obj.encr_key) == key_len_needed:
-            encr_key_input = nvs_obj.encr_key
-        else:
-            encr_key_input = codecs.decode(nvs_obj.encr_key, 'hex')
-
-        rel_addr = nvs_obj.page_num * Page.PAGE_PARAMS['max_size'] + Page.FIRST_ENTRY_OFFSET
-
-        if not isinstance(data_input, bytearray):
-            byte_arr = bytearray(b'\xff') * 32
-            byte_arr[0:len(data_input)] = data_input
-            data_input = byte_arr
-
-        data_input = binascii.hexlify(data_input)
-
-        entry_no = self.entry_num
-        start_idx = 0
-        end_idx = start_idx + 64
-
-        for _ in range(0, no_of_entries):
-            # Set tweak value
-            offset = entry_no * Page.SINGLE_ENTRY_SIZE
-            addr = hex(rel_addr + offset)[2:]
-            addr_len = len(addr)
-            if addr_len > 2:
-                if not addr_len % 2:
-                    addr_tmp = addr
-                else:
-                    addr_tmp = init_tweak_val + addr
-                tweak_tmp = reverse_hexbytes(addr_tmp)
-                tweak_val = tweak_tmp + (init_tweak_val * (tweak_len_needed - (len(tweak_tmp))))
-            else:
-                tweak_val = addr + (init_tweak_val * (tweak_len_needed - len(addr)))
-
-            # Encrypt data
-            data_bytes = data_input[start_idx:end_idx]
-            if type(data_bytes) == bytes:
-                data_bytes = data_bytes.decode()
-
-            data_val = data_bytes + (init_data_val * (data_len_needed - len(data_bytes)))
-            encr_data_ret = self.encrypt_entry(data_val, tweak_val, encr_key_input)
-            encr_data_to_write = encr_data_to_write + encr_data_ret
-            # Update values for encrypting next set of data bytes
-            start_idx = end_idx
-            end_idx = start_idx + 64
-            entry_no += 1
-
-        return encr_data_to_write
+    def encrypt_entries(self, xts_aes):
+        # Encrypt all entries written to the page in one pass using XTS-AES encryption
+        if self.is_encrypted:
+            return
+        self.is_encrypted = True
+        if not self.entry_num:
+            return
+        start_idx = Page.FIRST_ENTRY_OFFSET
+        end_idx = start_idx + self.entry_num * Page.SINGLE_ENTRY_SIZE
+        self.page_buf[start_idx:end_idx] = xts_aes.encrypt(self.page_buf[start_idx:end_idx], self.page_num, 0)
 
     def write_entry_to_buf(self, data, entrycount,nvs_obj):
-        encr_data = bytearray()
-
-        if nvs_obj.encrypt:
-            encr_data_ret = self.encrypt_data(data, entrycount,nvs_obj)
-            encr_data[0:len(encr_data_ret)] = encr_data_ret
-            data = encr_data
-
+        # Entries are kept in plain text here, they are encrypted page-wise by `encrypt_entries`
         data_offset = Page.FIRST_ENTRY_OFFSET + (Page.SINGLE_ENTRY_SIZE * self.entry_num)
         start_idx = data_offset
         end_idx = data_offset + len(data)
@@ -575,6 +592,8 @@ class NVS(object):
     def get_binary_data(self):
         data = bytearray()
         for page in self.pages:
+            if self.encrypt:
+                page.encrypt_entries(get_xts_aes(self.encr_key))
             data += page.get_data()
         return data
 
@@ -742,43 +761,10 @@ def encrypt(args):
 
 def decrypt_data(data_input, decr_key, page_num, entry_no, entry_size):
     '''
-    Decrypt NVS data entry
+    Decrypt NVS data entries, `data_input` may span several consecutive entries of a page
     '''
-    page_max_size = 4096
-    first_entry_offset = 64
-    init_tweak_val = '0'
-    tweak_len_needed = 32  # in hex
-    tweak_tmp = ''
-
-    data_input = binascii.hexlify(data_input)
-    rel_addr = page_num * page_max_size + first_entry_offset
-
-    # Set tweak value
-    offset = entry_no * entry_size
-    addr = hex(rel_addr + offset)[2:]
-    addr_len = len(addr)
-    if addr_len > 2:
-        if not addr_len % 2:
-            addr_tmp = addr
-        else:
-            addr_tmp = init_tweak_val + addr
-        tweak_tmp = reverse_hexbytes(addr_tmp)
-        tweak_val = tweak_tmp + (init_tweak_val * (tweak_len_needed - (len(tweak_tmp))))
-    else:
-        tweak_val = addr + (init_tweak_val * (tweak_len_needed - len(addr)))
-
-    if type(data_input) == bytes:
-        data_input = data_input.decode()
-
-    # Decrypt 32 bytes of data using XTS-AES decryption
-    backend = default_backend()
-    plain_text = codecs.decode(data_input, 'hex')
-    tweak = codecs.decode(tweak_val, 'hex')
-    cipher = Cipher(algorithms.AES(decr_key), modes.XTS(tweak), backend=backend)
-    decryptor = cipher.decryptor()
-    decrypted_data = decryptor.update(plain_text)
-
-    return decrypted_data
+    assert entry_size == XtsAes.ENTRY_SIZE
+    return get_xts_aes(decr_key).decrypt(bytes(data_input), page_num, entry_no)
 
 
 def decrypt(args):
@@ -788,12 +774,10 @@ def decrypt(args):
     '''
     bin_ext = '.bin'
     nvs_read_bytes = 32
-    decrypted_entry_no = 0
-    file_entry_no = 0
     page_num = 0
     page_max_size = 4096
-    start_entry_offset = 0
-    empty_data_entry = bytearray(b'\xff') * nvs_read_bytes
+    first_entry_offset = 64
+    empty_data_entry = bytes(b'\xff') * nvs_read_bytes
 
     # Check if key file has .bin extension
     input_files = [args.input, args.key, args.output]
@@ -806,27 +790,20 @@ def decrypt(args):
 
     args.outdir, args.output = set_target_filepath(args.outdir, args.output)
 
-    output_buf = bytearray(b'\xff')
-
     with open(args.input, 'rb') as input_file, open(args.output,'wb') as output_file:
         while True:
-            if file_entry_no == 128:
-                decrypted_entry_no = 0
-                file_entry_no = 0
-                page_num += 1
-            data_entry = input_file.read(nvs_read_bytes)
-            if not data_entry:
+            page_buf = bytearray(input_file.read(page_max_size))
+            if not page_buf:
                 break
-            if data_entry != empty_data_entry and file_entry_no not in [0,1]:
-                data_entry = decrypt_data(data_entry, decr_key, page_num, decrypted_entry_no, nvs_read_bytes)
-                decrypted_entry_no += 1
-            write_entry_no = ((page_num * page_max_size) + file_entry_no)
-            start_idx = start_entry_offset + (write_entry_no  * nvs_read_bytes)
-            end_idx = nvs_read_bytes
-            output_buf[start_idx:end_idx] = data_entry
-            file_entry_no += 1
-            start_entry_offset += nvs_read_bytes
-        output_file.write(output_buf)
+            # Written entries are contiguous from the start of the page, decrypt them in one pass
+            entries_end = first_entry_offset
+            while entries_end < len(page_buf) and page_buf[entries_end:entries_end + nvs_read_bytes] != empty_data_entry:
+                entries_end += nvs_read_bytes
+            if entries_end > first_entry_offset:
+                page_buf[first_entry_offset:entries_end] = decrypt_data(page_buf[first_entry_offset:entries_end],
+                                                                        decr_key, page_num, 0, nvs_read_bytes)
+            output_file.write(page_buf)
+            page_num += 1
 
     print('\nCreated NVS decrypted binary: ===>', args.output)
 
@@ -4,7 +4,7 @@
 import binascii
 import json
 import sys
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from nvs_parser import NVS_Entry, NVS_Partition, nvs_const
 
@@ -346,10 +346,13 @@ def dump_written_blobs(nvs_partition: NVS_Partition) -> None:
     ns = {}
     empty_entry = NVS_Entry(-1, bytearray(32), 'Erased')
 
-    # Gather namespaces, blob indexes and legacy blobs
+    # Gather namespaces, blob indexes, legacy blobs and entries of every namespace:key
+    keyed_entries: Dict[Tuple[int, Optional[str]], List[NVS_Entry]] = {}
     for page in nvs_partition.pages:
         for entry in page.entries:
             if entry.state == 'Written':
+                if entry.metadata['type'] != 'blob_index':
+                    keyed_entries.setdefault((entry.metadata['namespace'], entry.key), []).append(entry)
                 if entry.metadata['type'] == 'blob_index':
                     blobs[f'{entry.metadata["namespace"]:03d}{entry.key}'] = [entry] + [
                         empty_entry
@@ -363,21 +366,15 @@ def dump_written_blobs(nvs_partition: NVS_Partition) -> None:
 
     # Dump blobs
     for key in blobs:
-        for page in nvs_partition.pages:
-            for entry in page.entries:
-                # Gather all blob chunks
-                if (
-                    entry.state == 'Written'
-                    and entry.metadata['type'] != 'blob_index'
-                    and entry.metadata['namespace']
-                    == blobs[key][0].metadata['namespace']
-                    and entry.key == blobs[key][0].key
-                ):
-                    blobs[key][
-                        1
-                        + entry.metadata['chunk_index']
-                        - blobs[key][0].data['chunk_start']
-                    ] = entry
+        # Gather all blob chunks
+        for entry in keyed_entries.get(
+            (blobs[key][0].metadata['namespace'], blobs[key][0].key), []
+        ):
+            blobs[key][
+                1
+                + entry.metadata['chunk_index']
+                - blobs[key][0].data['chunk_start']
+            ] = entry
 
         blob_index = blobs[key][0]
         blob_chunks = blobs[key][1:]
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # SPDX-FileCopyrightText: 2022-2023 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from zlib import crc32
 
 
@@ -54,18 +54,149 @@ class NotAlignedError(ValueError):
     pass
 
 
+class IncompleteBlobError(ValueError):
+    pass
+
+
+# Chunk index of all the entries except of the blob data chunks
+CHUNK_ANY = 0xFF
+
+
 class NVS_Partition:
+    """
+    The pages and entries are decoded lazily. The list `pages` is decoded on its first use, `iter_pages` and
+    `items` decode one page, resp. one entry at a time. The lookups (`get`, `get_entry`, `get_blob`) use the index
+    of written entries, which is built in a single pass over the raw data without decoding the entries.
+    """
     def __init__(self, name: str, raw_data: bytearray):
         if len(raw_data) % nvs_const.page_size != 0:
             raise NotAlignedError(
                 f'Given partition data is not aligned to page size ({len(raw_data)} % {nvs_const.page_size} = {len(raw_data)%nvs_const.page_size})'
             )
 
-        # Divide partition into pages
         self.name = name
-        self.pages = []
-        for i in range(0, len(raw_data), nvs_const.page_size):
-            self.pages.append(NVS_Page(raw_data[i: i + nvs_const.page_size], i))
+        self.raw_data = raw_data
+        self._pages: Optional[List['NVS_Page']] = None
+        self._namespaces: Dict[str, int] = {}
+        # (namespace index, key, chunk index) -> (page sequence number, page address, entry index)
+        self._index: Optional[Dict[Tuple[int, str, int], Tuple[int, int, int]]] = None
+
+    @property
+    def pages(self) -> List['NVS_Page']:
+        if self._pages is None:
+            self._pages = list(self.iter_pages())
+        return self._pages
+
+    def iter_pages(self) -> Iterator['NVS_Page']:
+        for i in range(0, len(self.raw_data), nvs_const.page_size):
+            yield NVS_Page(self.raw_data[i: i + nvs_const.page_size], i)
+
+    @property
+    def namespaces(self) -> Dict[str, int]:
+        """
+        Written namespaces and their indexes.
+        """
+        self._build_index()
+        return dict(self._namespaces)
+
+    def _build_index(self) -> None:
+        if self._index is not None:
+            return
+        self._index = {}
+        entries_per_page = nvs_const.page_size // nvs_const.entry_size - 2
+        written = 0b10
+        for page_address in range(0, len(self.raw_data), nvs_const.page_size):
+            status = int.from_bytes(self.raw_data[page_address: page_address + 4], byteorder='little')
+            if nvs_const.page_status.get(status) not in ['Active', 'Full', 'Erasing']:
+                continue
+            sequence_number = int.from_bytes(self.raw_data[page_address + 4: page_address + 8], byteorder='little')
+            bitmap = self.raw_data[page_address + nvs_const.entry_size: page_address + 2 * nvs_const.entry_size]
+            i = 0
+            while i < entries_per_page:
+                entry_address = page_address + (i + 2) * nvs_const.entry_size
+                span = self.raw_data[entry_address + 2]
+                if span in [0xFF, 0]:  # 'Default' span length to prevent span overflow
+                    span = 1
+                if (bitmap[i // 4] >> (i % 4) * 2) & 3 == written:
+                    key = NVS_Entry.key_decode(self.raw_data[entry_address + 8: entry_address + 24])
+                    namespace = self.raw_data[entry_address]
+                    if key is not None and namespace == 0:
+                        self._namespaces[key] = self.raw_data[entry_address + 24]
+                    elif key is not None:
+                        index_key = (namespace, key, self.raw_data[entry_address + 3])
+                        location = (sequence_number, page_address, i)
+                        # an item is written to the new place before the old one is erased, the newer one is valid
+                        if index_key not in self._index or self._index[index_key] < location:
+                            self._index[index_key] = location
+                i += span
+
+    def _entry_at(self, page_address: int, entry_index: int) -> 'NVS_Entry':
+        page_data = self.raw_data[page_address: page_address + nvs_const.page_size]
+        entry_states = NVS_Page.decode_entry_states(page_data[nvs_const.entry_size: 2 * nvs_const.entry_size])
+        entry, _ = NVS_Page.decode_entry(page_data, entry_states, entry_index + 2)
+        return entry
+
+    def get_entry(self, namespace: str, key: str, chunk_index: int = CHUNK_ANY) -> Optional['NVS_Entry']:
+        """
+        Returns the written entry of the key in the namespace (the blob data chunk if `chunk_index` is given).
+        """
+        self._build_index()
+        assert self._index is not None
+        namespace_index = self._namespaces.get(namespace)
+        location = self._index.get((namespace_index, key, chunk_index)) if namespace_index is not None else None
+        if location is None:
+            return None
+        return self._entry_at(location[1], location[2])
+
+    def get_blob(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        Reassembles the blob from its data chunks in the order of their chunk indexes.
+        """
+        blob_index = self.get_entry(namespace, key)
+        if blob_index is None or blob_index.data is None:
+            return None
+        if blob_index.metadata['type'] == 'blob':  # Blob (Version 1) is not chunked
+            return blob_index.variable_length_data()
+        if blob_index.metadata['type'] != 'blob_index':
+            return None
+        blob = bytearray()
+        for chunk_index in range(blob_index.data['chunk_start'], blob_index.data['chunk_start'] + blob_index.data['chunk_count']):
+            chunk = self.get_entry(namespace, key, chunk_index)
+            if chunk is None:
+                raise IncompleteBlobError(f'Blob {namespace}:{key} is missing the chunk {chunk_index}!')
+            blob += chunk.variable_length_data()
+        if len(blob) != blob_index.data['size']:
+            raise IncompleteBlobError(f'Blob {namespace}:{key} has {len(blob)} B instead of {blob_index.data["size"]} B!')
+        return bytes(blob)
+
+    def get(self, namespace: str, key: str) -> Union[int, str, bytes, None]:
+        """
+        Returns the value of the key in the namespace: integer, string or reassembled blob.
+        None is returned if the key is not written.
+        """
+        entry = self.get_entry(namespace, key)
+        if entry is None or entry.data is None:
+            return None
+        if entry.metadata['type'] in ['blob', 'blob_index']:
+            return self.get_blob(namespace, key)
+        if entry.metadata['type'] == 'string':
+            return entry.variable_length_data().decode('utf-8', errors='replace').rstrip('\x00')
+        value: Optional[int] = entry.data['value']
+        return value
+
+    def items(self, namespace: Optional[str] = None) -> Iterator[Tuple[str, str, 'NVS_Entry']]:
+        """
+        Iterates over the written entries (except of blob data chunks) in the order of their addresses,
+        yields (namespace, key, entry). The entries are decoded one by one during the iteration.
+        """
+        self._build_index()
+        assert self._index is not None
+        namespace_names = {index: name for name, index in self._namespaces.items()}
+        locations = sorted((location[1:], index_key) for index_key, location in self._index.items()
+                           if index_key[2] == CHUNK_ANY and index_key[0] in namespace_names)
+        for (page_address, entry_index), (namespace_index, key, _) in locations:
+            if namespace is None or namespace_names[namespace_index] == namespace:
+                yield namespace_names[namespace_index], key, self._entry_at(page_address, entry_index)
 
     def toJSON(self) -> Dict[str, Any]:
         return dict(name=self.name, pages=self.pages)
@@ -104,51 +235,64 @@ class NVS_Page:
         }
 
         # Load entry state bitmap
-        entry_states = []
-        for c in self.raw_entry_state_bitmap:
-            for index in range(0, 8, 2):
-                entry_states.append(
-                    nvs_const.entry_status.get((c >> index) & 3, 'Invalid')
-                )
-        entry_states = entry_states[:-2]
+        entry_states = NVS_Page.decode_entry_states(self.raw_entry_state_bitmap)
 
         # Load entries
         i = 2
         while i < int(
             nvs_const.page_size / nvs_const.entry_size
         ):  # Loop through every entry
-            span = page_data[(i * nvs_const.entry_size) + 2]
-            if span in [0xFF, 0]:  # 'Default' span length to prevent span overflow
-                span = 1
-
-            # Load an entry
-            entry = NVS_Entry(
-                i - 2,
-                page_data[i * nvs_const.entry_size: (i + 1) * nvs_const.entry_size],
-                entry_states[i - 2],
-            )
+            entry, span = NVS_Page.decode_entry(page_data, entry_states, i)
             self.entries.append(entry)
-
-            # Load all children entries
-            if span != 1:
-                for span_idx in range(1, span):
-                    page_addr = i + span_idx
-                    entry_idx = page_addr - 2
-                    if page_addr * nvs_const.entry_size >= nvs_const.page_size:
-                        break
-                    child_entry = NVS_Entry(
-                        entry_idx,
-                        page_data[
-                            page_addr
-                            * nvs_const.entry_size: (page_addr + 1)
-                            * nvs_const.entry_size
-                        ],
-                        entry_states[entry_idx],
-                    )
-                    entry.child_assign(child_entry)
-                entry.compute_crc()
             i += span
 
+    @staticmethod
+    def decode_entry_states(raw_entry_state_bitmap: bytearray) -> List[str]:
+        entry_states = []
+        for c in raw_entry_state_bitmap:
+            for index in range(0, 8, 2):
+                entry_states.append(
+                    nvs_const.entry_status.get((c >> index) & 3, 'Invalid')
+                )
+        return entry_states[:-2]
+
+    @staticmethod
+    def decode_entry(page_data: bytearray, entry_states: List[str], i: int) -> Tuple['NVS_Entry', int]:
+        """
+        Decodes the entry at the position `i` of the page (including the page header and the entry state bitmap)
+        together with its children entries, returns the entry and its span.
+        """
+        span = page_data[(i * nvs_const.entry_size) + 2]
+        if span in [0xFF, 0]:  # 'Default' span length to prevent span overflow
+            span = 1
+
+        # Load an entry
+        entry = NVS_Entry(
+            i - 2,
+            page_data[i * nvs_const.entry_size: (i + 1) * nvs_const.entry_size],
+            entry_states[i - 2],
+        )
+
+        # Load all children entries
+        if span != 1:
+            for span_idx in range(1, span):
+                page_addr = i + span_idx
+                entry_idx = page_addr - 2
+                if page_addr * nvs_const.entry_size >= nvs_const.page_size:
+                    break
+                child_entry = NVS_Entry(
+                    entry_idx,
+                    page_data[
+                        page_addr
+                        * nvs_const.entry_size: (page_addr + 1)
+                        * nvs_const.entry_size
+                    ],
+                    entry_states[entry_idx],
+                )
+                entry.child_assign(child_entry)
+            entry.compute_crc()
+        return entry, span
+
     def toJSON(self) -> Dict[str, Any]:
         return dict(
             is_empty=self.is_empty,
@@ -202,16 +346,6 @@ class NVS_Entry:
 
             return {'value': None}
 
-        def key_decode(data: bytearray) -> Optional[str]:
-            decoded = ''
-            for n in data.rstrip(b'\x00'):
-                char = chr(n)
-                if char.isascii():
-                    decoded += char
-                else:
-                    return None
-            return decoded
-
         self.raw = entry_data
         self.state = entry_state
         self.is_empty = self.raw == bytearray({0xFF}) * nvs_const.entry_size
@@ -238,12 +372,33 @@ class NVS_Entry:
             },
         }
         self.children: List['NVS_Entry'] = []
-        self.key = key_decode(key)
+        self.key = NVS_Entry.key_decode(key)
         if self.key is None:
             self.data = None
         else:
             self.data = item_convert(entry_type, data)
 
+    @staticmethod
+    def key_decode(data: bytearray) -> Optional[str]:
+        decoded = ''
+        for n in data.rstrip(b'\x00'):
+            char = chr(n)
+            if char.isascii():
+                decoded += char
+            else:
+                return None
+        return decoded
+
+    def variable_length_data(self) -> bytes:
+        """
+        Merges the children entries of the variable length entry (string, blob or blob data chunk)
+        and discards the padding.
+        """
+        data = b''.join(bytes(e.raw) for e in self.children)
+        if self.data:
+            data = data[: self.data['size']]
+        return data
+
     def dump_raw(self) -> str:
         hex_bytes = ''
         decoded = ''
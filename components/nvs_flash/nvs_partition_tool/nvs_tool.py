@@ -2,9 +2,15 @@
 # SPDX-FileCopyrightText: 2022-2023 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
 import argparse
+import binascii
+import io
+import json
 import os
 import sys
 import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Dict, List, Optional
 
 import nvs_logger
 import nvs_parser
@@ -16,7 +22,10 @@ def program_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description='Parse NVS partition', formatter_class=argparse.RawTextHelpFormatter
     )
-    parser.add_argument('file', help='Path to dumped NVS partition')
+    parser.add_argument(
+        'file',
+        help='Path to dumped NVS partition or to a directory of dumps to be processed in the batch mode',
+    )
     parser.add_argument(
         '-i',
         '--integrity-check',
@@ -56,15 +65,106 @@ def program_args() -> argparse.Namespace:
     parser.add_argument(
         '-f', '--format', choices=tmp, default='text', help='Output format'
     )
+    parser.add_argument(
+        '--batch-report',
+        default='-',
+        help='Batch mode: path of the JSON lines report with one line per dump (default: stdout)',
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=None,
+        help='Batch mode: number of processes the dumps are processed by (default: number of CPUs)',
+    )
     return parser.parse_args()
 
 
+def encode_value(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return binascii.b2a_base64(value, newline=False).decode('ascii')  # Binary to Base64 ASCII representation
+    return value
+
+
+def batch_report(file: str, integrity_check: bool) -> str:
+    """
+    Parses the dump and summarizes it into a single JSON line: page and entry states, namespaces,
+    namespace:key=value pairs (blobs are reassembled and encoded in base64) and optionally the integrity check.
+    """
+    report: Dict[str, Any] = {'file': file}
+    try:
+        with open(file, 'rb') as f:
+            nvs = nvs_parser.NVS_Partition(os.path.basename(file), bytearray(f.read()))
+    except (OSError, ValueError) as e:
+        report['error'] = str(e)
+        return json.dumps(report)
+
+    page_states: Dict[str, int] = {}
+    entry_states: Dict[str, int] = {}
+    for i in range(0, len(nvs.raw_data), nvs_const.page_size):
+        status = int.from_bytes(nvs.raw_data[i: i + 4], byteorder='little')
+        page_status = nvs_const.page_status.get(status, 'Invalid')
+        page_states[page_status] = page_states.get(page_status, 0) + 1
+        bitmap = nvs.raw_data[i + nvs_const.entry_size: i + 2 * nvs_const.entry_size]
+        for entry_state in nvs_parser.NVS_Page.decode_entry_states(bitmap):
+            entry_states[entry_state] = entry_states.get(entry_state, 0) + 1
+    report['pages'] = page_states
+    report['entries'] = entry_states
+    report['namespaces'] = nvs.namespaces
+
+    items: Dict[str, Dict[str, Any]] = {}
+    errors: List[str] = []
+    for namespace, key, _ in nvs.items():
+        value: Optional[Any] = None
+        try:
+            value = nvs.get(namespace, key)
+        except nvs_parser.IncompleteBlobError as e:
+            errors.append(str(e))
+        items.setdefault(namespace, {})[key] = encode_value(value)
+    report['items'] = items
+    report['errors'] = errors
+
+    if integrity_check:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            nvs_logger.integrity_check(nvs)
+        report['integrity_check'] = [line for line in output.getvalue().splitlines() if line.strip()]
+    return json.dumps(report)
+
+
+def batch_main(args: argparse.Namespace) -> None:
+    """
+    Processes all the dumps in the directory by the pool of processes and writes the report
+    with one JSON line per dump in the order of the file names.
+    """
+    nvs_log.set_color('never')
+    files = sorted(
+        os.path.join(args.file, name)
+        for name in os.listdir(args.file)
+        if os.path.isfile(os.path.join(args.file, name))
+    )
+    report_file = sys.stdout if args.batch_report == '-' else open(args.batch_report, 'w')
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            for line in executor.map(
+                batch_report, files, [args.integrity_check] * len(files), chunksize=4
+            ):
+                report_file.write(line + '\n')
+    finally:
+        if report_file is not sys.stdout:
+            report_file.close()
+
+
 def main() -> None:
     args = program_args()
 
     if nvs_const.entry_size != 32:
         raise ValueError(f'Entry size is not 32B! This is currently non negotiable.')
 
+    if os.path.isdir(args.file):
+        batch_main(args)
+        return
+
     nvs_log.set_color(args.color)
     nvs_log.set_format(args.format)
 
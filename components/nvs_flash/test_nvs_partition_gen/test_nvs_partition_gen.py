@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+GENERATOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nvs_partition_generator')
+TESTDATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+
+sys.path.append(GENERATOR_DIR)
+try:
+    import nvs_partition_gen
+except ImportError:
+    raise
+
+
+def xts_aes_reference(key, data, rel_addr, decrypt=False):  # type: (bytes, bytes, int, bool) -> bytes
+    """Encrypt/decrypt data entry by entry, with one XTS cipher per entry."""
+    output = b''
+    for offset in range(0, len(data), 32):
+        tweak = (rel_addr + offset).to_bytes(16, 'little')
+        cipher = Cipher(algorithms.AES(key), modes.XTS(tweak), backend=default_backend())
+        context = cipher.decryptor() if decrypt else cipher.encryptor()
+        output += context.update(data[offset:offset + 32])
+    return output
+
+
+class NVSPartitionGenEncryptionTest(unittest.TestCase):
+    def setUp(self):  # type: () -> None
+        self.cwd = os.getcwd()
+        # Sample CSV files refer to the test data relative to the generator directory
+        os.chdir(GENERATOR_DIR)
+        self.outdir = tempfile.mkdtemp()
+
+    def tearDown(self):  # type: () -> None
+        os.chdir(self.cwd)
+        shutil.rmtree(self.outdir)
+
+    def run_encrypt(self, input_csv, size, inputkey):  # type: (str, str, str) -> bytes
+        args = argparse.Namespace(input=input_csv, output='encr.bin', size=size, version=2, outdir=self.outdir,
+                                  keygen=False, keyfile=None, inputkey=inputkey)
+        nvs_partition_gen.encrypt(args)
+        with open(os.path.join(self.outdir, 'encr.bin'), 'rb') as f:
+            return f.read()
+
+    def run_generate(self, input_csv, size):  # type: (str, str) -> bytes
+        args = argparse.Namespace(input=input_csv, output='plain.bin', size=size, version=2, outdir=self.outdir)
+        nvs_partition_gen.generate(args)
+        with open(os.path.join(self.outdir, 'plain.bin'), 'rb') as f:
+            return f.read()
+
+    def test_encrypt_singlepage_blob(self):  # type: () -> None
+        image = self.run_encrypt('sample_singlepage_blob.csv', '0x3000', 'testdata/sample_encryption_keys.bin')
+        with open(os.path.join(TESTDATA_DIR, 'sample_singlepage_blob_encr.bin'), 'rb') as f:
+            self.assertEqual(image, f.read())
+
+    def test_encrypt_multipage_blob(self):  # type: () -> None
+        image = self.run_encrypt('sample_multipage_blob.csv', '0x5000', 'testdata/sample_encryption_keys_hmac.bin')
+        with open(os.path.join(TESTDATA_DIR, 'sample_multipage_blob_encr_hmac.bin'), 'rb') as f:
+            self.assertEqual(image, f.read())
+
+    def test_decrypt(self):  # type: () -> None
+        args = argparse.Namespace(input=os.path.join(TESTDATA_DIR, 'sample_multipage_blob_encr_hmac.bin'),
+                                  key='testdata/sample_encryption_keys_hmac.bin', output='decr.bin', outdir=self.outdir)
+        nvs_partition_gen.decrypt(args)
+        with open(os.path.join(self.outdir, 'decr.bin'), 'rb') as f:
+            self.assertEqual(f.read(), self.run_generate('sample_multipage_blob.csv', '0x5000'))
+
+    def test_xts_aes_matches_per_entry_cipher(self):  # type: () -> None
+        key = bytes(range(64))
+        data = os.urandom(126 * 32)
+        xts_aes = nvs_partition_gen.get_xts_aes(key)
+        for page_num, entry_no in [(0, 0), (1, 5), (7, 0), (300, 125)]:
+            entries = data[:(126 - entry_no) * 32]
+            rel_addr = page_num * 4096 + 64 + entry_no * 32
+            encrypted = xts_aes.encrypt(entries, page_num, entry_no)
+            self.assertEqual(encrypted, xts_aes_reference(key, entries, rel_addr))
+            self.assertEqual(xts_aes.decrypt(encrypted, page_num, entry_no), entries)
+
+    def test_xts_aes_caches_are_bounded(self):  # type: () -> None
+        # Every device has its own key in mfg_gen --keygen, ciphers and tweaks must not accumulate
+        for i in range(20):
+            nvs_partition_gen.get_xts_aes(bytes([i]) * 64)
+        self.assertLessEqual(nvs_partition_gen._get_xts_aes_for_key.cache_info().currsize, 4)
+
+        xts_aes = nvs_partition_gen.get_xts_aes(bytes(range(64)))
+        data = os.urandom(32)
+        for page_num in range(50):
+            xts_aes.encrypt(data, page_num, 0)
+        self.assertLessEqual(len(xts_aes.page_tweaks), nvs_partition_gen.XtsAes.MAX_CACHED_PAGES)
+        # evicted tweaks are computed again
+        self.assertEqual(xts_aes.encrypt(data, 0, 0), xts_aes_reference(bytes(range(64)), data, 64))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+import argparse
+import base64
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+GENERATOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nvs_partition_generator')
+TOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nvs_partition_tool')
+
+sys.path.append(GENERATOR_DIR)
+sys.path.append(TOOL_DIR)
+try:
+    import nvs_parser
+    import nvs_partition_gen
+    import nvs_tool
+except ImportError:
+    raise
+
+ENTRY_SIZE = 32
+PAGE_SIZE = 4096
+
+
+class NVSPartitionToolTest(unittest.TestCase):
+    def setUp(self):  # type: () -> None
+        self.outdir = tempfile.mkdtemp()
+        # a blob bigger than a page is split into chunks in different pages
+        self.blob = os.urandom(6000)
+        with open(os.path.join(self.outdir, 'blob.bin'), 'wb') as f:
+            f.write(self.blob)
+        with open(os.path.join(self.outdir, 'input.csv'), 'w') as f:
+            f.write('key,type,encoding,value\n'
+                    'firstNamespace,namespace,,\n'
+                    'u8Key,data,u8,127\n'
+                    'i32Key,data,i32,-2147483648\n'
+                    'stringKey,data,string,Lorem ipsum\n'
+                    'blobKey,file,binary,{}\n'
+                    'secondNamespace,namespace,,\n'
+                    'u8Key,data,u8,5\n'
+                    'hexKey,data,hex2bin,010203abcdef\n'.format(os.path.join(self.outdir, 'blob.bin')))
+        args = argparse.Namespace(input=os.path.join(self.outdir, 'input.csv'), output='nvs.bin', size='0x5000',
+                                  version=2, outdir=self.outdir)
+        nvs_partition_gen.generate(args)
+        with open(os.path.join(self.outdir, 'nvs.bin'), 'rb') as f:
+            self.image = bytearray(f.read())
+
+    def tearDown(self):  # type: () -> None
+        shutil.rmtree(self.outdir)
+
+    def erase_entry(self, nvs, namespace, key, chunk_index):  # type: (nvs_parser.NVS_Partition, str, str, int) -> bytearray
+        """Returns a copy of the image with the entry of the blob chunk marked as erased."""
+        nvs._build_index()
+        assert nvs._index is not None
+        _, page_address, entry_index = nvs._index[(nvs.namespaces[namespace], key, chunk_index)]
+        image = bytearray(self.image)
+        bitmap_address = page_address + ENTRY_SIZE + entry_index // 4
+        image[bitmap_address] &= ~(0b11 << (entry_index % 4) * 2) & 0xFF
+        return image
+
+    def test_lookup(self):  # type: () -> None
+        nvs = nvs_parser.NVS_Partition('nvs.bin', self.image)
+        self.assertEqual(nvs.namespaces, {'firstNamespace': 1, 'secondNamespace': 2})
+        self.assertEqual(nvs.get('firstNamespace', 'u8Key'), 127)
+        self.assertEqual(nvs.get('firstNamespace', 'i32Key'), -2147483648)
+        self.assertEqual(nvs.get('firstNamespace', 'stringKey'), 'Lorem ipsum')
+        self.assertEqual(nvs.get('secondNamespace', 'u8Key'), 5)
+        self.assertEqual(nvs.get('secondNamespace', 'hexKey'), bytes.fromhex('010203abcdef'))
+        self.assertIsNone(nvs.get('secondNamespace', 'i32Key'))
+        self.assertIsNone(nvs.get('missingNamespace', 'u8Key'))
+
+        self.assertEqual([(namespace, key) for namespace, key, _ in nvs.items()],
+                         [('firstNamespace', 'u8Key'), ('firstNamespace', 'i32Key'), ('firstNamespace', 'stringKey'),
+                          ('firstNamespace', 'blobKey'), ('secondNamespace', 'u8Key'), ('secondNamespace', 'hexKey')])
+        self.assertEqual([key for _, key, _ in nvs.items('secondNamespace')], ['u8Key', 'hexKey'])
+        self.assertEqual([entry.metadata['type'] for _, _, entry in nvs.items('secondNamespace')], ['uint8_t', 'blob_index'])
+
+    def test_multipage_blob(self):  # type: () -> None
+        nvs = nvs_parser.NVS_Partition('nvs.bin', self.image)
+        blob_index = nvs.get_entry('firstNamespace', 'blobKey')
+        assert blob_index is not None
+        self.assertEqual(blob_index.metadata['type'], 'blob_index')
+        self.assertGreater(blob_index.data['chunk_count'], 1)
+
+        chunk_pages = set()
+        for chunk_index in range(blob_index.data['chunk_count']):
+            self.assertIsNotNone(nvs.get_entry('firstNamespace', 'blobKey', chunk_index))
+            chunk_pages.add(nvs._index[(1, 'blobKey', chunk_index)][1])  # type: ignore
+        self.assertGreater(len(chunk_pages), 1)
+
+        self.assertEqual(nvs.get_blob('firstNamespace', 'blobKey'), self.blob)
+        self.assertEqual(nvs.get('firstNamespace', 'blobKey'), self.blob)
+
+    def test_incomplete_blob(self):  # type: () -> None
+        nvs = nvs_parser.NVS_Partition('nvs.bin', self.image)
+        truncated = nvs_parser.NVS_Partition('nvs.bin', self.erase_entry(nvs, 'firstNamespace', 'blobKey', 1))
+        with self.assertRaisesRegex(nvs_parser.IncompleteBlobError, 'missing the chunk 1'):
+            truncated.get('firstNamespace', 'blobKey')
+        # the other items are still readable
+        self.assertEqual(truncated.get('firstNamespace', 'u8Key'), 127)
+
+    def test_batch_report(self):  # type: () -> None
+        nvs = nvs_parser.NVS_Partition('nvs.bin', self.image)
+        dumps = os.path.join(self.outdir, 'dumps')
+        os.mkdir(dumps)
+        with open(os.path.join(dumps, 'a.bin'), 'wb') as f:
+            f.write(self.image)
+        with open(os.path.join(dumps, 'b.bin'), 'wb') as f:
+            f.write(self.erase_entry(nvs, 'firstNamespace', 'blobKey', 0))
+        with open(os.path.join(dumps, 'c.bin'), 'wb') as f:
+            f.write(self.image[:PAGE_SIZE + 1])
+        report_path = os.path.join(self.outdir, 'report.jsonl')
+        nvs_tool.batch_main(argparse.Namespace(file=dumps, batch_report=report_path, jobs=2, integrity_check=True))
+
+        with open(report_path, 'r') as f:
+            reports = [json.loads(line) for line in f]
+        self.assertEqual([os.path.basename(report['file']) for report in reports], ['a.bin', 'b.bin', 'c.bin'])
+
+        complete, incomplete, not_aligned = reports
+        self.assertEqual(complete['namespaces'], {'firstNamespace': 1, 'secondNamespace': 2})
+        self.assertEqual(complete['pages'], {'Full': 4, 'Empty': 1})
+        self.assertEqual(complete['items']['firstNamespace']['u8Key'], 127)
+        self.assertEqual(complete['items']['firstNamespace']['stringKey'], 'Lorem ipsum')
+        self.assertEqual(base64.b64decode(complete['items']['firstNamespace']['blobKey']), self.blob)
+        self.assertEqual(base64.b64decode(complete['items']['secondNamespace']['hexKey']),
+                         bytes.fromhex('010203abcdef'))
+        self.assertEqual(complete['errors'], [])
+        self.assertIsInstance(complete['integrity_check'], list)
+
+        self.assertIsNone(incomplete['items']['firstNamespace']['blobKey'])
+        self.assertEqual(incomplete['items']['firstNamespace']['u8Key'], 127)
+        self.assertEqual(len(incomplete['errors']), 1)
+        self.assertIn('missing the chunk 0', incomplete['errors'][0])
+        self.assertEqual(incomplete['entries']['Erased'], complete['entries'].get('Erased', 0) + 1)
+
+        self.assertIn('error', not_aligned)
+        self.assertNotIn('items', not_aligned)
+
+
+if __name__ == '__main__':
+    unittest.main()
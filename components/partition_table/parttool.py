@@ -8,11 +8,15 @@
 from __future__ import division, print_function
 
 import argparse
+import contextlib
+import hashlib
 import os
 import re
 import subprocess
 import sys
 import tempfile
+import time
+import zlib
 
 import gen_esp32part as gen
 
@@ -23,6 +27,16 @@ ESPTOOL_PY = os.path.join(COMPONENTS_PATH, 'esptool_py', 'esptool', 'esptool.py'
 
 PARTITION_TABLE_OFFSET = 0x8000
 
+# baud rate negotiated with the flasher stub for the operations in a single esptool session
+SESSION_BAUD = 921600
+
+FLASH_SECTOR_SIZE = 0x1000
+
+# diff-aware writing compares the blocks of this size first and only the changed blocks sector by sector
+DIFF_BLOCK_SIZE = 0x10000
+
+FLASH_ERASED_BYTE = b'\xff'
+
 
 quiet = False
 
@@ -56,12 +70,149 @@ class PartitionType(_PartitionId):
 PARTITION_BOOT_DEFAULT = _PartitionId()
 
 
+class EsptoolSession():
+    """
+    A connection to the chip kept open for several flash operations. The chip is reset, the flasher stub
+    is uploaded and the baud rate is negotiated only once, when the session is opened.
+    """
+
+    def __init__(self, port=None, baud=None):
+        # the scripting API of esptool>=4.5, ImportError is raised if it is not available
+        from esptool.cmds import detect_chip, detect_flash_size
+        from esptool.loader import ESPLoader
+        from esptool.util import FatalError, flash_size_bytes
+        self.FatalError = FatalError
+
+        rom_baud = ESPLoader.ESP_ROM_BAUD
+        with contextlib.ExitStack() as context:
+            # the serial port is closed at the end of the context of the loader
+            self.esp = context.enter_context(detect_chip(port or ESPLoader.DEFAULT_PORT, rom_baud))
+            self.esp = self.esp.run_stub()
+
+            baud = baud or SESSION_BAUD
+            if baud > rom_baud:
+                try:
+                    self.esp.change_baud(baud)
+                except FatalError as e:
+                    status('Changing the baud rate to {} failed ({}), staying at {}'.format(baud, e, rom_baud))
+
+            # the flash is configured with its real size like esptool does before writing with --flash_size keep
+            if not self.esp.IS_STUB:
+                self.esp.flash_spi_attach(0)
+            flash_size = None if self.esp.secure_download_mode else detect_flash_size(self.esp)
+            if flash_size is not None:
+                self.esp.flash_set_parameters(flash_size_bytes(flash_size))
+
+            # the port is kept open until the session is closed
+            self._context = context.pop_all()
+
+    def _report(self, operation, size, start_time):
+        elapsed = max(time.time() - start_time, 1e-6)
+        status('{} 0x{:x} bytes in {:.2f} s ({:.0f} bytes/s)'.format(operation, size, elapsed, size / elapsed))
+
+    def read_flash(self, offset, size):
+        start_time = time.time()
+        content = self.esp.read_flash(offset, size)
+        self._report('Read', size, start_time)
+        return content
+
+    def erase_region(self, offset, size):
+        start_time = time.time()
+        self.esp.erase_region(offset, size)
+        self._report('Erased', size, start_time)
+
+    def write_flash(self, offset, content):
+        """
+        Writes the compressed content (the flasher stub erases the written range) and verifies it
+        by the MD5 checksum computed by the stub.
+        """
+        start_time = time.time()
+        compressed = zlib.compress(content, 9)
+        blocks = self.esp.flash_defl_begin(len(content), len(compressed), offset)
+        for seq in range(blocks):
+            block = compressed[seq * self.esp.FLASH_WRITE_SIZE:(seq + 1) * self.esp.FLASH_WRITE_SIZE]
+            self.esp.flash_defl_block(block, seq)
+        # the stub acknowledges the last block before it is written, the following command waits for it
+        if self.esp.flash_md5sum(offset, len(content)) != hashlib.md5(content).hexdigest():
+            raise self.FatalError('MD5 of the content written at offset 0x{:x} does not match'.format(offset))
+        self._report('Wrote', len(content), start_time)
+
+    def _is_unchanged(self, offset, image, start, size):
+        return self.esp.flash_md5sum(offset + start, size) == hashlib.md5(image[start:start + size]).hexdigest()
+
+    def write_flash_diff(self, offset, content, size):
+        """
+        Writes the content to the region of `size` bytes like erasing the region and writing the content would,
+        but erases and writes only the sectors which differ. The sectors are compared by the MD5 checksum
+        computed by the stub, first by blocks of DIFF_BLOCK_SIZE and only the changed blocks sector by sector.
+
+        Returns the number of skipped sectors.
+        """
+        start_time = time.time()
+        image = content + FLASH_ERASED_BYTE * (size - len(content))
+        changed = []
+        for block in range(0, size, DIFF_BLOCK_SIZE):
+            block_size = min(DIFF_BLOCK_SIZE, size - block)
+            if self._is_unchanged(offset, image, block, block_size):
+                continue
+            changed += [sector for sector in range(block, block + block_size, FLASH_SECTOR_SIZE)
+                        if not self._is_unchanged(offset, image, sector, FLASH_SECTOR_SIZE)]
+
+        # merge the consecutive changed sectors, so each run is written by one command
+        runs = []
+        for sector in changed:
+            if runs and runs[-1][1] == sector:
+                runs[-1][1] = sector + FLASH_SECTOR_SIZE
+            else:
+                runs.append([sector, sector + FLASH_SECTOR_SIZE])
+
+        write_start_time = time.time()
+        for (start, end) in runs:
+            data = image[start:end]
+            if data.count(FLASH_ERASED_BYTE) == len(data):
+                self.erase_region(offset + start, end - start)
+            else:
+                self.write_flash(offset + start, data)
+        write_time = time.time() - write_start_time
+
+        sectors = size // FLASH_SECTOR_SIZE
+        skipped = sectors - len(changed)
+        elapsed = time.time() - start_time
+        summary = 'Skipped {} of {} sectors (0x{:x} bytes) matching the content on the device, {} sectors rewritten in {:.2f} s'.format(
+            skipped, sectors, skipped * FLASH_SECTOR_SIZE, len(changed), elapsed)
+        if changed and write_time > 0:
+            # the skipped sectors would have been rewritten at the rate of the rewritten ones
+            write_rate = len(changed) * FLASH_SECTOR_SIZE / write_time
+            summary += ', estimated {:.2f} s saved ({:.0f} bytes/s)'.format(skipped * FLASH_SECTOR_SIZE / write_rate, write_rate)
+        elif not changed:
+            summary += ', no sector rewritten to estimate the time saved'
+        status(summary)
+        return skipped
+
+    def close(self):
+        try:
+            self.esp.hard_reset()
+        finally:
+            self._context.close()
+
+
 class ParttoolTarget():
 
     def __init__(self, port=None, baud=None, partition_table_offset=PARTITION_TABLE_OFFSET, partition_table_file=None,
-                 esptool_args=[], esptool_write_args=[], esptool_read_args=[], esptool_erase_args=[]):
+                 esptool_args=[], esptool_write_args=[], esptool_read_args=[], esptool_erase_args=[],
+                 single_session=False):
+        """
+        If `single_session` is set, all the operations (including reading of the partition table from the device)
+        are performed in one esptool session opened by the constructor. The session is closed and the chip
+        is reset by `close`, or when the target is used as a context manager, at the end of the `with` block.
+        If the installed esptool does not provide the scripting API, every operation runs esptool.py as usual.
+        """
         self.port = port
         self.baud = baud
+        self.session = None
+
+        if single_session and (esptool_args or esptool_write_args or esptool_read_args or esptool_erase_args):
+            raise ValueError('Additional esptool arguments cannot be used in a single esptool session')
 
         gen.offset_part_table = partition_table_offset
 
@@ -83,6 +234,12 @@ class ParttoolTarget():
         self.esptool_read_args = parse_esptool_args(esptool_read_args)
         self.esptool_erase_args = parse_esptool_args(esptool_erase_args)
 
+        if single_session:
+            try:
+                self.session = EsptoolSession(port, baud)
+            except ImportError as e:
+                status('The esptool scripting API is not available ({}), esptool.py is run for every operation'.format(e))
+
         if partition_table_file:
             partition_table = None
             with open(partition_table_file, 'rb') as f:
@@ -95,6 +252,9 @@ class ParttoolTarget():
                 with open(partition_table_file, 'r') as f:
                     f.seek(0)
                     partition_table = gen.PartitionTable.from_csv(f.read())
+        elif self.session:
+            partition_table = gen.PartitionTable.from_binary(
+                self.session.read_flash(partition_table_offset, gen.MAX_PARTITION_LENGTH))
         else:
             temp_file = tempfile.NamedTemporaryFile(delete=False)
             temp_file.close()
@@ -108,6 +268,17 @@ class ParttoolTarget():
 
         self.partition_table = partition_table
 
+    def close(self):
+        if self.session:
+            self.session.close()
+            self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     # set `out` to None to redirect the output to the STDOUT
     # otherwise set `out` to file descriptor
     # beware that the method does not close the file descriptor
@@ -152,32 +323,63 @@ class ParttoolTarget():
 
     def erase_partition(self, partition_id):
         partition = self.get_partition_info(partition_id)
+        if self.session:
+            self.session.erase_region(partition.offset, partition.size)
+            return
         self._call_esptool(['erase_region', str(partition.offset),  str(partition.size)] + self.esptool_erase_args)
 
     def read_partition(self, partition_id, output):
         partition = self.get_partition_info(partition_id)
+        if self.session:
+            content = self.session.read_flash(partition.offset, partition.size)
+            with open(output, 'wb') as output_file:
+                output_file.write(content)
+            return
         self._call_esptool(['read_flash', str(partition.offset), str(partition.size), output] + self.esptool_read_args)
 
-    def write_partition(self, partition_id, input):
-        self.erase_partition(partition_id)
-
+    def write_partition(self, partition_id, input, diff=False):
+        """
+        If `diff` is set, only the sectors of the partition whose content differs from the input file (padded
+        by the erased flash bytes) are erased and written. Diff-aware writing requires a single esptool session.
+        """
         partition = self.get_partition_info(partition_id)
 
         with open(input, 'rb') as input_file:
-            content_len = len(input_file.read())
+            content = input_file.read()
 
-            if content_len > partition.size:
+            if len(content) > partition.size:
                 raise Exception('Input file size exceeds partition size')
 
+        if diff and not self.session:
+            raise ValueError('Diff-aware writing requires a single esptool session')
+
+        if diff:
+            self.session.write_flash_diff(partition.offset, content, partition.size)
+            return
+
+        if self.session:
+            # writing erases the written sectors, so only the rest of the partition is erased separately
+            written_size = (len(content) + FLASH_SECTOR_SIZE - 1) // FLASH_SECTOR_SIZE * FLASH_SECTOR_SIZE
+            if written_size < partition.size:
+                self.session.erase_region(partition.offset + written_size, partition.size - written_size)
+            if content:
+                self.session.write_flash(partition.offset, content)
+            return
+
+        self.erase_partition(partition_id)
         self._call_esptool(['write_flash', str(partition.offset), input] + self.esptool_write_args)
 
 
-def _write_partition(target, partition_id, input):
-    target.write_partition(partition_id, input)
+def _write_partition(target, partition_id, input, diff=False):
+    target.write_partition(partition_id, input, diff)
     partition = target.get_partition_info(partition_id)
     status("Written contents of file '{}' at offset 0x{:x}".format(input, partition.offset))
 
 
+def _write_partition_diff(target, partition_id, input):
+    _write_partition(target, partition_id, input, diff=True)
+
+
 def _read_partition(target, partition_id, output):
     target.read_partition(partition_id, output)
     partition = target.get_partition_info(partition_id)
@@ -219,6 +421,27 @@ def _get_partition_info(target, partition_id, info):
     print(' '.join(infos))
 
 
+class _AppendOperation(argparse.Action):
+    """
+    Collects the operations of the batch in the order they are given on the command line.
+    """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        operations = list(getattr(namespace, self.dest) or [])
+        operations.append((option_string.lstrip('-'), values))
+        setattr(namespace, self.dest, operations)
+
+
+def _run_batch(target, operations, diff=False):
+    batch_ops = {
+        'erase': _erase_partition,
+        'read': _read_partition,
+        'write': _write_partition_diff if diff else _write_partition,
+    }
+    for (operation, values) in operations:
+        batch_ops[operation](target, PartitionName(values[0]), *values[1:])
+
+
 def main():
     global quiet
 
@@ -264,6 +487,8 @@ def main():
     write_part_subparser = subparsers.add_parser('write_partition', help='write contents of a binary file to partition on device',
                                                  parents=[partition_selection_parser])
     write_part_subparser.add_argument('--input', help='file whose contents are to be written to the partition offset')
+    write_part_subparser.add_argument('--diff', help='compare the file with the partition on device and erase and write \
+                                      only the changed sectors (uses a single esptool session)', action='store_true')
 
     subparsers.add_parser('erase_partition', help='erase the contents of a partition on the device', parents=[partition_selection_parser])
 
@@ -272,17 +497,29 @@ def main():
                                                 choices=['name', 'type', 'subtype', 'offset', 'size', 'encrypted'], default=['offset', 'size'], nargs='+')
     print_partition_info_subparser.add_argument('--part_list', help='Get a list of partitions suitable for a given type', action='store_true')
 
+    batch_subparser = subparsers.add_parser('batch', help='perform several operations on partitions selected by name in a single \
+                                            esptool session; the operations are performed in the order they are given')
+    batch_subparser.add_argument('--read', help='read the partition to the file', nargs=2, metavar=('NAME', 'OUTPUT'),
+                                 action=_AppendOperation, dest='batch_operations')
+    batch_subparser.add_argument('--write', help='write the file to the partition', nargs=2, metavar=('NAME', 'INPUT'),
+                                 action=_AppendOperation, dest='batch_operations')
+    batch_subparser.add_argument('--erase', help='erase the partition', nargs=1, metavar='NAME',
+                                 action=_AppendOperation, dest='batch_operations')
+    batch_subparser.add_argument('--diff', help='write only the sectors which differ from the content on device', action='store_true')
+
     args = parser.parse_args()
     quiet = args.quiet
 
     # No operation specified, display help and exit
-    if args.operation is None:
+    if args.operation is None or (args.operation == 'batch' and not args.batch_operations):
         if not quiet:
             parser.print_help()
         sys.exit(1)
 
     # Prepare the partition to perform operation on
-    if args.partition_name:
+    if args.operation == 'batch':
+        partition_id = None
+    elif args.partition_name:
         partition_id = PartitionName(args.partition_name)
     elif args.partition_type:
         if not args.partition_subtype:
@@ -321,13 +558,41 @@ def main():
     if args.esptool_erase_args:
         target_args['esptool_erase_args'] = args.esptool_erase_args
 
-    if args.extra_partition_subtypes:
+    if getattr(args, 'extra_partition_subtypes', None):
         gen.add_extra_subtypes(args.extra_partition_subtypes)
 
+    diff = getattr(args, 'diff', False)
+    if (args.operation == 'batch' or diff) and (args.esptool_args or args.esptool_write_args or args.esptool_read_args or
+                                                args.esptool_erase_args):
+        parser.error('{} cannot be used with additional esptool arguments'.format('batch' if args.operation == 'batch' else '--diff'))
+
+    if args.operation == 'batch':
+        target_args['single_session'] = True
+        try:
+            with ParttoolTarget(**target_args) as target:
+                if diff and not target.session:
+                    parser.error('--diff requires the esptool scripting API (esptool v4.5 or newer)')
+                _run_batch(target, args.batch_operations, args.diff)
+        except Exception as e:
+            if quiet:
+                sys.exit(2)
+            if not isinstance(e, gen.InputError):
+                raise
+            print(e, file=sys.stderr)
+            sys.exit(2)
+        return
+
+    if diff:
+        target_args['single_session'] = True
+
     target = ParttoolTarget(**target_args)
+    if diff and not target.session:
+        parser.error('--diff requires the esptool scripting API (esptool v4.5 or newer)')
 
     # Create the operation table and execute the operation
     common_args = {'target':target, 'partition_id':partition_id}
+    if args.operation == 'write_partition':
+        common_args['diff'] = args.diff
     parttool_ops = {
         'erase_partition':(_erase_partition, []),
         'read_partition':(_read_partition, ['output']),
@@ -340,18 +605,19 @@ def main():
     for op_arg in op_args:
         common_args.update({op_arg:vars(args)[op_arg]})
 
-    if quiet:
-        # If exceptions occur, suppress and exit quietly
-        try:
-            op(**common_args)
-        except Exception:
-            sys.exit(2)
-    else:
-        try:
-            op(**common_args)
-        except gen.InputError as e:
-            print(e, file=sys.stderr)
-            sys.exit(2)
+    with target:
+        if quiet:
+            # If exceptions occur, suppress and exit quietly
+            try:
+                op(**common_args)
+            except Exception:
+                sys.exit(2)
+        else:
+            try:
+                op(**common_args)
+            except gen.InputError as e:
+                print(e, file=sys.stderr)
+                sys.exit(2)
 
 
 if __name__ == '__main__':
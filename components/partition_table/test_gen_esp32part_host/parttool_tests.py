@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+import hashlib
+import os
+import sys
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+try:
+    from typing import Any, List, Set, Tuple
+except ImportError:
+    pass  # only needed to check type annotations
+
+try:
+    import parttool
+except ImportError:
+    sys.path.append('..')
+    import parttool
+
+from esptool.util import FatalError, flash_size_bytes
+
+PARTITIONS_CSV = """
+# Name,Type,SubType,Offset,Size,Flags
+nvs,data,nvs,0x9000,0x6000,
+factory,app,factory,0x10000,0x20000,
+"""
+
+
+def fake_loader():  # type: () -> mock.MagicMock
+    """ESPLoader with the flasher stub running, the serial port is closed at the end of its context."""
+    loader = mock.MagicMock()
+    loader.IS_STUB = True
+    loader.secure_download_mode = False
+    loader.run_stub.return_value = loader
+    loader.__enter__.return_value = loader
+    return loader
+
+
+class FakeFlash(object):
+    """
+    The flasher stub working with a flash of the given content. The erased and written regions are recorded.
+    """
+    FLASH_WRITE_SIZE = 0x4000
+    # a sector is erased or written in a second of the fake time
+    WRITE_RATE = 0x1000
+
+    def __init__(self, content):  # type: (bytes) -> None
+        self.flash = bytearray(content)
+        self.erased = []  # type: List[Tuple[int, int]]
+        self.written = []  # type: List[Tuple[int, int]]
+        self.md5_sizes = set()  # type: Set[int]
+        self.time = 0.0
+
+    def flash_md5sum(self, offset, size):  # type: (int, int) -> str
+        self.md5_sizes.add(size)
+        return hashlib.md5(self.flash[offset:offset + size]).hexdigest()
+
+    def erase_region(self, offset, size):  # type: (int, int) -> None
+        self.erased.append((offset, size))
+        self.time += size / self.WRITE_RATE
+        self.flash[offset:offset + size] = parttool.FLASH_ERASED_BYTE * size
+
+    def flash_defl_begin(self, size, compsize, offset):  # type: (int, int, int) -> int
+        self.written.append((offset, size))
+        self.time += size / self.WRITE_RATE
+        self.compressed = b''
+        return (compsize + self.FLASH_WRITE_SIZE - 1) // self.FLASH_WRITE_SIZE
+
+    def flash_defl_block(self, data, seq):  # type: (bytes, int) -> None
+        self.compressed += data
+        offset, size = self.written[-1]
+        try:
+            content = zlib.decompress(self.compressed)
+        except zlib.error:
+            return  # not all the blocks are received yet
+        self.flash[offset:offset + size] = content
+
+
+class EsptoolSessionTests(unittest.TestCase):
+
+    def setUp(self):  # type: () -> None
+        self.loader = fake_loader()
+        patches = [mock.patch('esptool.cmds.detect_chip', return_value=self.loader),
+                   mock.patch('esptool.cmds.detect_flash_size', return_value='4MB'),
+                   mock.patch.object(parttool, 'quiet', True)]  # type: List[Any]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_open(self):  # type: () -> None
+        parttool.EsptoolSession('/dev/ttyUSB1', 460800)
+        self.loader.run_stub.assert_called_once_with()
+        self.loader.change_baud.assert_called_once_with(460800)
+        self.loader.flash_spi_attach.assert_not_called()
+        self.loader.flash_set_parameters.assert_called_once_with(flash_size_bytes('4MB'))
+        self.loader.__exit__.assert_not_called()
+
+    def test_open_without_stub(self):  # type: () -> None
+        self.loader.IS_STUB = False
+        with mock.patch('esptool.cmds.detect_flash_size', return_value=None):
+            parttool.EsptoolSession()
+        self.loader.change_baud.assert_called_once_with(parttool.SESSION_BAUD)
+        self.loader.flash_spi_attach.assert_called_once_with(0)
+        self.loader.flash_set_parameters.assert_not_called()
+
+    def test_baud_rate_not_changed(self):  # type: () -> None
+        self.loader.change_baud.side_effect = FatalError('not supported')
+        session = parttool.EsptoolSession()
+        self.assertIs(session.esp, self.loader)
+        self.loader.flash_set_parameters.assert_called_once_with(flash_size_bytes('4MB'))
+
+    def test_failed_open_closes_port(self):  # type: () -> None
+        self.loader.run_stub.side_effect = FatalError('failed to upload the stub')
+        with self.assertRaises(FatalError):
+            parttool.EsptoolSession()
+        self.loader.__exit__.assert_called_once()
+
+    def test_close(self):  # type: () -> None
+        session = parttool.EsptoolSession()
+        session.close()
+        self.loader.hard_reset.assert_called_once_with()
+        self.loader.__exit__.assert_called_once()
+
+    def test_target_reads_partition_table_in_session(self):  # type: () -> None
+        self.loader.read_flash.return_value = parttool.gen.PartitionTable.from_csv(PARTITIONS_CSV).to_binary()
+
+        with parttool.ParttoolTarget(port='/dev/ttyUSB1', single_session=True) as target:
+            self.loader.read_flash.assert_called_once_with(parttool.PARTITION_TABLE_OFFSET, parttool.gen.MAX_PARTITION_LENGTH)
+            self.assertEqual(target.get_partition_info(parttool.PartitionName('factory')).offset, 0x10000)
+        self.loader.hard_reset.assert_called_once_with()
+        self.loader.__exit__.assert_called_once()
+
+    def test_target_without_scripting_api(self):  # type: () -> None
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(PARTITIONS_CSV)
+        self.addCleanup(os.unlink, f.name)
+
+        with mock.patch.dict(sys.modules, {'esptool.cmds': None}):
+            target = parttool.ParttoolTarget(partition_table_file=f.name, single_session=True)
+        self.assertIsNone(target.session)
+        with mock.patch.object(target, '_call_esptool') as call_esptool:
+            target.erase_partition(parttool.PartitionName('nvs'))
+        call_esptool.assert_called_once_with(['erase_region', str(0x9000), str(0x6000)])
+        with self.assertRaisesRegex(ValueError, 'requires a single esptool session'):
+            target.write_partition(parttool.PartitionName('nvs'), f.name, diff=True)
+
+    def test_diff_without_scripting_api(self):  # type: () -> None
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(PARTITIONS_CSV)
+        self.addCleanup(os.unlink, f.name)
+
+        for argv in [['-q', '-f', f.name, 'write_partition', '-n', 'nvs', '--input', f.name, '--diff'],
+                     ['-q', '-f', f.name, 'batch', '--write', 'nvs', f.name, '--diff']]:
+            with mock.patch.dict(sys.modules, {'esptool.cmds': None}), mock.patch.object(sys, 'argv', ['parttool.py'] + argv), \
+                    mock.patch('sys.stderr') as stderr, self.assertRaises(SystemExit) as e:
+                parttool.main()
+            self.assertEqual(e.exception.code, 2)
+            self.assertIn('--diff requires the esptool scripting API', ''.join(c[0][0] for c in stderr.write.call_args_list))
+
+    def test_diff_with_esptool_args(self):  # type: () -> None
+        argv = ['parttool.py', '--esptool-args', 'after=no_reset', 'write_partition', '-n', 'nvs', '--input', 'nvs.bin', '--diff']
+        with mock.patch.object(sys, 'argv', argv), mock.patch('sys.stderr'), self.assertRaises(SystemExit) as e:
+            parttool.main()
+        self.assertEqual(e.exception.code, 2)
+        self.loader.run_stub.assert_not_called()
+
+
+class WriteFlashDiffTests(unittest.TestCase):
+    OFFSET = 0x10000
+    SIZE = 0x20000
+
+    def setUp(self):  # type: () -> None
+        patch = mock.patch.object(parttool, 'quiet', True)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.content = os.urandom(self.SIZE)
+
+    def write_diff(self, flash_content, content):  # type: (bytes, bytes) -> Tuple[FakeFlash, int]
+        loader = fake_loader()
+        with mock.patch('esptool.cmds.detect_chip', return_value=loader), \
+                mock.patch('esptool.cmds.detect_flash_size', return_value=None):
+            session = parttool.EsptoolSession()
+        # the partition is preceded and followed by other data, which must not change
+        session.esp = esp = FakeFlash(b'\x55' * self.OFFSET + flash_content + b'\xaa' * self.OFFSET)
+        with mock.patch('time.time', side_effect=lambda: esp.time), mock.patch.object(parttool, 'status') as status:
+            skipped = session.write_flash_diff(self.OFFSET, content, self.SIZE)
+        self.summary = status.call_args[0][0]
+        self.assertEqual(esp.flash[:self.OFFSET], b'\x55' * self.OFFSET)
+        self.assertEqual(esp.flash[self.OFFSET + self.SIZE:], b'\xaa' * self.OFFSET)
+        padded = content + parttool.FLASH_ERASED_BYTE * (self.SIZE - len(content))
+        self.assertEqual(esp.flash[self.OFFSET:self.OFFSET + self.SIZE], padded)
+        return esp, skipped
+
+    def test_no_change(self):  # type: () -> None
+        esp, skipped = self.write_diff(self.content, self.content)
+        self.assertEqual(skipped, self.SIZE // parttool.FLASH_SECTOR_SIZE)
+        self.assertEqual((esp.erased, esp.written), ([], []))
+        # the unchanged blocks are not compared sector by sector
+        self.assertEqual(esp.md5_sizes, {parttool.DIFF_BLOCK_SIZE})
+        self.assertTrue(self.summary.endswith(', no sector rewritten to estimate the time saved'), self.summary)
+
+    def test_single_sector(self):  # type: () -> None
+        flash = bytearray(self.content)
+        flash[0x11000 + 10] ^= 0xFF
+        esp, skipped = self.write_diff(bytes(flash), self.content)
+        self.assertEqual(skipped, self.SIZE // parttool.FLASH_SECTOR_SIZE - 1)
+        self.assertEqual(esp.erased, [])
+        self.assertEqual(esp.written, [(self.OFFSET + 0x11000, parttool.FLASH_SECTOR_SIZE)])
+        self.assertEqual(self.summary, 'Skipped 31 of 32 sectors (0x1f000 bytes) matching the content on the device, '
+                         '1 sectors rewritten in 1.00 s, estimated 31.00 s saved (4096 bytes/s)')
+
+    def test_adjacent_sectors_merged(self):  # type: () -> None
+        flash = bytearray(self.content)
+        # the run crosses the boundary of the compared blocks, the other sector is separate
+        for address in [0xe000, 0xf000, 0x10000, 0x12000]:
+            flash[address] ^= 0xFF
+        esp, skipped = self.write_diff(bytes(flash), self.content)
+        self.assertEqual(skipped, self.SIZE // parttool.FLASH_SECTOR_SIZE - 4)
+        self.assertEqual(esp.written, [(self.OFFSET + 0xe000, 3 * parttool.FLASH_SECTOR_SIZE),
+                                       (self.OFFSET + 0x12000, parttool.FLASH_SECTOR_SIZE)])
+        # the skipped sectors are estimated at the rate of the rewritten ones
+        self.assertTrue(self.summary.endswith('4 sectors rewritten in 4.00 s, estimated 28.00 s saved (4096 bytes/s)'), self.summary)
+
+    def test_unaligned_tail(self):  # type: () -> None
+        content = self.content[:0x8800]
+        erased = parttool.FLASH_ERASED_BYTE * (self.SIZE - 0x9000)
+        # the last sector of the content is padded by the erased bytes
+        esp, skipped = self.write_diff(self.content[:0x9000] + erased, content)
+        self.assertEqual(skipped, self.SIZE // parttool.FLASH_SECTOR_SIZE - 1)
+        self.assertEqual((esp.erased, esp.written), ([], [(self.OFFSET + 0x8000, parttool.FLASH_SECTOR_SIZE)]))
+
+        # the sectors after the content are only erased
+        flash = bytearray(content + parttool.FLASH_ERASED_BYTE * (self.SIZE - len(content)))
+        flash[0x10000:0x12000] = b'\0' * 0x2000
+        esp, skipped = self.write_diff(bytes(flash), content)
+        self.assertEqual(skipped, self.SIZE // parttool.FLASH_SECTOR_SIZE - 2)
+        self.assertEqual((esp.erased, esp.written), ([(self.OFFSET + 0x10000, 2 * parttool.FLASH_SECTOR_SIZE)], []))
+
+        # a run of the changed sectors is written as one, including the padding
+        esp, skipped = self.write_diff(self.content, content)
+        self.assertEqual(skipped, 8)
+        self.assertEqual((esp.erased, esp.written), ([], [(self.OFFSET + 0x8000, self.SIZE - 0x8000)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,6 +17,7 @@ function(spiffs_create_partition_image partition base_dir)
 
     if("${size}" AND "${offset}")
         set(image_file ${CMAKE_BINARY_DIR}/${partition}.bin)
+        set(manifest_file ${CMAKE_BINARY_DIR}/${partition}_spiffs_manifest.json)
 
         if(CONFIG_SPIFFS_USE_MAGIC)
             set(use_magic "--use-magic")
@@ -31,7 +32,8 @@ function(spiffs_create_partition_image partition base_dir)
         endif()
 
         # Execute SPIFFS image generation; this always executes as there is no way to specify for CMake to watch for
-        # contents of the base dir changing.
+        # contents of the base dir changing. If only contents of the files changed, the manifest allows the generator
+        # to update the existing image in place.
         add_custom_target(spiffs_${partition}_bin ALL
             COMMAND ${spiffsgen_py} ${size} ${base_dir_full_path} ${image_file}
             --page-size=${CONFIG_SPIFFS_PAGE_SIZE}
@@ -40,12 +42,13 @@ function(spiffs_create_partition_image partition base_dir)
             ${follow_symlinks}
             ${use_magic}
             ${use_magic_len}
+            --manifest-file=${manifest_file}
             DEPENDS ${arg_DEPENDS}
             )
 
         set_property(DIRECTORY "${CMAKE_CURRENT_SOURCE_DIR}" APPEND PROPERTY
             ADDITIONAL_CLEAN_FILES
-            ${image_file})
+            ${image_file} ${manifest_file})
 
         idf_component_get_property(main_args esptool_py FLASH_ARGS)
         idf_component_get_property(sub_args esptool_py FLASH_SUB_ARGS)
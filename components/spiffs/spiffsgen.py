@@ -8,7 +8,8 @@
 from __future__ import division, print_function
 
 import argparse
-import io
+import hashlib
+import json
 import math
 import os
 import struct
@@ -36,6 +37,8 @@ SPIFFS_SPAN_IX_LEN = 2  # spiffs_span_ix
 SPIFFS_PAGE_IX_LEN = 2  # spiffs_page_ix
 SPIFFS_BLOCK_IX_LEN = 2  # spiffs_block_ix
 
+SPIFFS_MANIFEST_VERSION = 1
+
 
 class SpiffsBuildConfig(object):
     def __init__(self,
@@ -139,6 +142,7 @@ class SpiffsObjLuPage(SpiffsPage):
 
         self.obj_ids_limit = self.build_config.OBJ_LU_PAGES_OBJ_IDS_LIM
         self.obj_ids = list()  # type: typing.List[ObjIdsItem]
+        self.magicfied = False
 
     def _calc_magic(self, blocks_lim):  # type: (int) -> int
         # Calculate the magic value mirroring computation done by the macro SPIFFS_MAGIC defined in
@@ -176,7 +180,11 @@ class SpiffsObjLuPage(SpiffsPage):
     def magicfy(self, blocks_lim):  # type: (int) -> None
         # Only use magic value if no valid obj id has been written to the spot, which is the
         # spot taken up by the last obj id on last lookup page. The parent is responsible
-        # for determining which is the last lookup page and calling this function.
+        # for determining which is the last lookup page and calling this function. The magic value
+        # is added only once, as the binary of the block can be generated repeatedly.
+        if self.magicfied:
+            return
+        self.magicfied = True
         remaining = self.obj_ids_limit
         empty_obj_id_dict = {
             1: 0xFF,
@@ -361,19 +369,23 @@ class SpiffsBlock(object):
     def is_full(self):  # type: () -> bool
         return self.remaining_pages <= 0
 
+    def contains_page(self, page):  # type: (typing.Optional[SpiffsPage]) -> bool
+        return any(p is page for p in self.pages)
+
     def to_binary(self, blocks_lim):  # type: (int) -> bytes
-        img = b''
+        pages = []
 
         if self.build_config.use_magic:
             for (idx, page) in enumerate(self.pages):
                 if idx == self.build_config.OBJ_LU_PAGES_PER_BLOCK - 1:
                     assert isinstance(page, SpiffsObjLuPage)
                     page.magicfy(blocks_lim)
-                img += page.to_binary()
+                pages.append(page.to_binary())
         else:
             for page in self.pages:
-                img += page.to_binary()
+                pages.append(page.to_binary())
 
+        img = b''.join(pages)
         assert len(img) <= self.build_config.block_size
 
         img += b'\xFF' * (self.build_config.block_size - len(img))
@@ -381,23 +393,49 @@ class SpiffsBlock(object):
 
 
 class SpiffsFS(object):
-    def __init__(self, img_size, build_config):  # type: (int, SpiffsBuildConfig) -> None
+    def __init__(self, img_size, build_config, image_file=None
+                 ):  # type: (int, SpiffsBuildConfig, typing.Optional[typing.BinaryIO]) -> None
+        """
+        If image_file is given, the image is streamed to it: every block is written out
+        as soon as it is sealed and dropped from memory, and write_image() has to be called
+        after all files are created. Otherwise the image is kept in memory and returned by to_binary().
+        """
         if img_size % build_config.block_size != 0:
             raise RuntimeError('image size should be a multiple of block size')
 
         self.img_size = img_size
         self.build_config = build_config
+        self.image_file = image_file
 
+        # Blocks not yet written to image_file (all blocks if not streaming)
         self.blocks = list()  # type: typing.List[SpiffsBlock]
         self.blocks_lim = self.img_size // self.build_config.block_size
         self.remaining_blocks = self.blocks_lim
         self.cur_obj_id = 1  # starting object id
 
+        # Object id and offsets of data pages (in span index order) for every created object
+        self.obj_placements = dict()  # type: typing.Dict[str, typing.Tuple[int, typing.List[int]]]
+
+    def _write_sealed_blocks(self, last_block_sealed):  # type: (bool) -> None
+        # Write out blocks which will not be modified anymore, in order. The last block is sealed only
+        # when a new block is about to be created. Writing stops at the block holding the index page of
+        # the object being created, as it still receives references to new data pages.
+        if self.image_file is None:
+            return
+
+        cur_obj_idx_page = self.blocks[-1].cur_obj_idx_page if self.blocks else None
+        sealed_blocks = len(self.blocks) if last_block_sealed else len(self.blocks) - 1
+        while sealed_blocks > 0 and not self.blocks[0].contains_page(cur_obj_idx_page):
+            block = self.blocks.pop(0)
+            self.image_file.write(block.to_binary(self.blocks_lim))
+            sealed_blocks -= 1
+
     def _create_block(self):  # type: () -> SpiffsBlock
         if self.is_full():
             raise SpiffsFullError('the image size has been exceeded')
 
-        block = SpiffsBlock(len(self.blocks), self.build_config)
+        self._write_sealed_blocks(last_block_sealed=True)
+        block = SpiffsBlock(self.blocks_lim - self.remaining_blocks, self.build_config)
         self.blocks.append(block)
         self.remaining_blocks -= 1
         return block
@@ -411,18 +449,19 @@ class SpiffsFS(object):
 
         name = img_path
 
-        with open(file_path, 'rb') as obj:
-            contents = obj.read()
-
-        stream = io.BytesIO(contents)
+        with open(file_path, 'rb') as stream:
+            self._create_obj(name, stream, os.fstat(stream.fileno()).st_size)
 
+    def _create_obj(self, name, stream, size):  # type: (str, typing.BinaryIO, int) -> None
+        # Contents are read from the stream one data page at a time
         try:
             block = self.blocks[-1]
-            block.begin_obj(self.cur_obj_id, len(contents), name)
+            block.begin_obj(self.cur_obj_id, size, name)
         except (IndexError, SpiffsFullError):
             block = self._create_block()
-            block.begin_obj(self.cur_obj_id, len(contents), name)
+            block.begin_obj(self.cur_obj_id, size, name)
 
+        data_pages = list()  # type: typing.List[int]
         contents_chunk = stream.read(self.build_config.OBJ_DATA_PAGE_CONTENT_LEN)
 
         while contents_chunk:
@@ -432,12 +471,13 @@ class SpiffsFS(object):
                     # This can fail because either (1) all the pages in block have been
                     # used or (2) object index has been exhausted.
                     block.update_obj(contents_chunk)
+                    data_pages.append(block.pages[-1].offset)
                 except SpiffsFullError:
                     # If its (1), use the outer exception handler
                     if block.is_full():
                         raise SpiffsFullError
                     # If its (2), write another object index page
-                    block.begin_obj(self.cur_obj_id, len(contents), name,
+                    block.begin_obj(self.cur_obj_id, size, name,
                                     obj_index_span_ix=block.cur_obj_index_span_ix,
                                     obj_data_span_ix=block.cur_obj_data_span_ix)
                     continue
@@ -456,27 +496,132 @@ class SpiffsFS(object):
             contents_chunk = stream.read(self.build_config.OBJ_DATA_PAGE_CONTENT_LEN)
 
         block.end_obj()
+        self._write_sealed_blocks(last_block_sealed=False)
 
+        self.obj_placements[name] = (self.cur_obj_id, data_pages)
         self.cur_obj_id += 1
 
-    def to_binary(self):  # type: () -> bytes
-        img = b''
-        all_blocks = []
+    def _remaining_blocks_binary(self):  # type: () -> typing.Iterator[bytes]
+        # Binary of the blocks not yet written out, followed by the unused blocks of the image.
+        # The state of the filesystem is not changed, so the binary can be generated repeatedly.
         for block in self.blocks:
-            all_blocks.append(block.to_binary(self.blocks_lim))
-        bix = len(self.blocks)
-        if self.build_config.use_magic:
-            # Create empty blocks with magic numbers
-            while self.remaining_blocks > 0:
-                block = SpiffsBlock(bix, self.build_config)
-                all_blocks.append(block.to_binary(self.blocks_lim))
-                self.remaining_blocks -= 1
-                bix += 1
-        else:
-            # Just fill remaining spaces FF's
-            all_blocks.append(b'\xFF' * (self.img_size - len(all_blocks) * self.build_config.block_size))
-        img += b''.join([blk for blk in all_blocks])
-        return img
+            yield block.to_binary(self.blocks_lim)
+        for bix in range(self.blocks_lim - self.remaining_blocks, self.blocks_lim):
+            if self.build_config.use_magic:
+                # Create empty blocks with magic numbers
+                yield SpiffsBlock(bix, self.build_config).to_binary(self.blocks_lim)
+            else:
+                # Just fill remaining spaces FF's
+                yield b'\xFF' * self.build_config.block_size
+
+    def to_binary(self):  # type: () -> bytes
+        if self.image_file is not None:
+            raise RuntimeError('image is streamed to a file, use write_image() instead')
+        return b''.join(self._remaining_blocks_binary())
+
+    def write_image(self):  # type: () -> None
+        # Finish the streamed image, block by block
+        if self.image_file is None:
+            raise RuntimeError('no image file to write to, use to_binary() instead')
+        for block_binary in self._remaining_blocks_binary():
+            self.image_file.write(block_binary)
+
+
+def get_file_hash(file_path):  # type: (str) -> str
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class SpiffsImageManifest(object):
+    """
+    Cache describing a generated image: build options, and for every file its content hash and
+    the offsets of its data pages. The layout of a SPIFFS image depends only on the build options
+    and on the names, order and sizes of the files. If these stay the same, the image can be updated
+    by rewriting just the data pages of the files whose content changed.
+    """
+    def __init__(self, options, files):  # type: (typing.Dict[str, typing.Any], typing.List[typing.Dict[str, typing.Any]]) -> None
+        self.options = options
+        self.files = files
+        self.image_stat = None  # type: typing.Optional[typing.List[int]]
+
+    @staticmethod
+    def load(manifest_path):  # type: (str) -> typing.Optional[SpiffsImageManifest]
+        try:
+            with open(manifest_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != SPIFFS_MANIFEST_VERSION:
+                return None
+            manifest = SpiffsImageManifest(data['options'], data['files'])
+            manifest.image_stat = data['image_stat']
+            return manifest
+        except (OSError, IOError, ValueError, KeyError):
+            return None
+
+    def save(self, manifest_path, image_path):  # type: (str, str) -> None
+        image_stat = os.stat(image_path)
+        self.image_stat = [image_stat.st_size, image_stat.st_mtime_ns]
+        with open(manifest_path, 'w') as f:
+            json.dump({'version': SPIFFS_MANIFEST_VERSION,
+                       'options': self.options,
+                       'image_stat': self.image_stat,
+                       'files': self.files}, f)
+
+    def check_layout(self, options, image_path, files):
+        # type: (typing.Dict[str, typing.Any], str, typing.List[typing.Tuple[str, str]]) -> typing.Optional[str]
+        """
+        Returns the reason why the cached image can't be patched, or None if it can.
+        """
+        if options != self.options:
+            return 'build options changed'
+        try:
+            image_stat = os.stat(image_path)
+        except OSError:
+            return 'image file is missing'
+        if [image_stat.st_size, image_stat.st_mtime_ns] != self.image_stat:
+            return 'image file was modified'
+        if [img_path for img_path, _ in files] != [cached['path'] for cached in self.files]:
+            return 'list of files changed'
+        for (img_path, full_path), cached in zip(files, self.files):
+            if os.path.getsize(full_path) != cached['size']:
+                return "size of '%s' changed" % img_path
+        return None
+
+    def patch_image(self, image_path, files, build_config):
+        # type: (str, typing.List[typing.Tuple[str, str]], SpiffsBuildConfig) -> int
+        """
+        Rewrites data pages of the files whose content changed, returns number of patched files.
+        """
+        patched_files = 0
+        with open(image_path, 'r+b') as image_file:
+            for (img_path, full_path), cached in zip(files, self.files):
+                file_hash = get_file_hash(full_path)
+                if file_hash == cached['sha256']:
+                    continue
+                with open(full_path, 'rb') as stream:
+                    for span_ix, offset in enumerate(cached['data_pages']):
+                        contents = stream.read(build_config.OBJ_DATA_PAGE_CONTENT_LEN)
+                        page = SpiffsObjDataPage(offset, cached['obj_id'], span_ix, contents, build_config)
+                        image_file.seek(offset)
+                        image_file.write(page.to_binary())
+                cached['sha256'] = file_hash
+                patched_files += 1
+        return patched_files
+
+    @staticmethod
+    def from_spiffs(options, spiffs, files):
+        # type: (typing.Dict[str, typing.Any], SpiffsFS, typing.List[typing.Tuple[str, str]]) -> SpiffsImageManifest
+        cached_files = []
+        for img_path, full_path in files:
+            obj_id, data_pages = spiffs.obj_placements[img_path]
+            cached_files.append({'path': img_path,
+                                 'size': os.path.getsize(full_path),
+                                 'sha256': get_file_hash(full_path),
+                                 'obj_id': obj_id,
+                                 'data_pages': data_pages})
+        return SpiffsImageManifest(options, cached_files)
 
 
 class CustomHelpFormatter(argparse.HelpFormatter):
@@ -562,6 +707,16 @@ def main():  # type: () -> None
                         action='store_true',
                         help='Use aligned object index tables. Specify if SPIFFS_ALIGNED_OBJECT_INDEX_TABLES is set.')
 
+    parser.add_argument('--manifest-file',
+                        help='Path to the manifest file caching content hashes and placement of the files in the image. '
+                             'If given and only contents of some files changed since the previous run, '
+                             'the existing image is updated in place instead of being regenerated.',
+                        default=None)
+
+    parser.add_argument('--verbose',
+                        action='store_true',
+                        help='Print whether the image was updated in place using the manifest file.')
+
     parser.set_defaults(use_magic=True, use_magic_len=True)
 
     args = parser.parse_args()
@@ -569,24 +724,44 @@ def main():  # type: () -> None
     if not os.path.exists(args.base_dir):
         raise RuntimeError('given base directory %s does not exist' % args.base_dir)
 
-    with open(args.output_file, 'wb') as image_file:
-        image_size = int(args.image_size, 0)
-        spiffs_build_default = SpiffsBuildConfig(args.page_size, SPIFFS_PAGE_IX_LEN,
-                                                 args.block_size, SPIFFS_BLOCK_IX_LEN, args.meta_len,
-                                                 args.obj_name_len, SPIFFS_OBJ_ID_LEN, SPIFFS_SPAN_IX_LEN,
-                                                 True, True, 'big' if args.big_endian else 'little',
-                                                 args.use_magic, args.use_magic_len, args.aligned_obj_ix_tables)
+    image_size = int(args.image_size, 0)
+    spiffs_build_default = SpiffsBuildConfig(args.page_size, SPIFFS_PAGE_IX_LEN,
+                                             args.block_size, SPIFFS_BLOCK_IX_LEN, args.meta_len,
+                                             args.obj_name_len, SPIFFS_OBJ_ID_LEN, SPIFFS_SPAN_IX_LEN,
+                                             True, True, 'big' if args.big_endian else 'little',
+                                             args.use_magic, args.use_magic_len, args.aligned_obj_ix_tables)
+
+    files = []
+    for root, dirs, dir_files in os.walk(args.base_dir, followlinks=args.follow_symlinks):
+        for f in dir_files:
+            full_path = os.path.join(root, f)
+            files.append(('/' + os.path.relpath(full_path, args.base_dir).replace('\\', '/'), full_path))
+
+    options = {'image_size': image_size}
+    options.update(vars(spiffs_build_default))
+
+    if args.manifest_file:
+        manifest = SpiffsImageManifest.load(args.manifest_file)
+        reason = manifest.check_layout(options, args.output_file, files) if manifest else 'no valid manifest'
+        if manifest and reason is None:
+            patched_files = manifest.patch_image(args.output_file, files, spiffs_build_default)
+            manifest.save(args.manifest_file, args.output_file)
+            if args.verbose:
+                print('SPIFFS image cache hit: updated %d of %d files in place' % (patched_files, len(files)))
+            return
+        if args.verbose:
+            print('SPIFFS image cache miss (%s): generating the whole image' % reason)
 
-        spiffs = SpiffsFS(image_size, spiffs_build_default)
+    with open(args.output_file, 'wb') as image_file:
+        spiffs = SpiffsFS(image_size, spiffs_build_default, image_file)
 
-        for root, dirs, files in os.walk(args.base_dir, followlinks=args.follow_symlinks):
-            for f in files:
-                full_path = os.path.join(root, f)
-                spiffs.create_file('/' + os.path.relpath(full_path, args.base_dir).replace('\\', '/'), full_path)
+        for img_path, full_path in files:
+            spiffs.create_file(img_path, full_path)
 
-        image = spiffs.to_binary()
+        spiffs.write_image()
 
-        image_file.write(image)
+    if args.manifest_file:
+        SpiffsImageManifest.from_spiffs(options, spiffs, files).save(args.manifest_file, args.output_file)
 
 
 if __name__ == '__main__':
@@ -1,8 +1,11 @@
 #!/usr/bin/env python
 # SPDX-FileCopyrightText: 2019-2022 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
+import io
 import os
+import subprocess
 import sys
+import tempfile
 import unittest
 
 try:
@@ -62,9 +65,74 @@ class SpiffsgenTest(unittest.TestCase):
             spiffs.create_file('/test', __file__)
             image = spiffs.to_binary()
             self.assertEqual(len(image), image_size)
+            # generating the binary does not change the filesystem
+            self.assertEqual(spiffs.to_binary(), image)
             # Note: it would be nice to compile spiffs for host with the given
             # config, and verify that the image is parsed correctly.
 
+    def test_streamed_image(self):  # type: () -> None
+        """Check that the image streamed block by block to a file is identical
+        to the image generated in memory, also for files spanning several blocks.
+        """
+        image_size = 512 * 1024
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = []
+            for size in [0, 1, 250, 4096, 100 * 1024, 3000]:
+                file_path = os.path.join(tmp_dir, 'file_{}'.format(len(file_paths)))
+                with open(file_path, 'wb') as f:
+                    f.write(os.urandom(size))
+                file_paths.append(file_path)
+
+            for use_magic in [True, False]:
+                config = spiffsgen.SpiffsBuildConfig(256, spiffsgen.SPIFFS_PAGE_IX_LEN, 4096, spiffsgen.SPIFFS_BLOCK_IX_LEN,
+                                                     4, 32, spiffsgen.SPIFFS_OBJ_ID_LEN, spiffsgen.SPIFFS_SPAN_IX_LEN,
+                                                     True, True, 'little', use_magic, True, False)
+                spiffs = spiffsgen.SpiffsFS(image_size, config)
+                image_file = io.BytesIO()
+                streamed_spiffs = spiffsgen.SpiffsFS(image_size, config, image_file)
+                for file_path in file_paths:
+                    spiffs.create_file('/' + os.path.basename(file_path), file_path)
+                    streamed_spiffs.create_file('/' + os.path.basename(file_path), file_path)
+                    # Only the block which is still being filled is kept in memory
+                    self.assertEqual(len(streamed_spiffs.blocks), 1)
+                streamed_spiffs.write_image()
+                self.assertEqual(image_file.getvalue(), spiffs.to_binary())
+
+    def test_manifest_patch(self):  # type: () -> None
+        """Check that the image updated in place using the manifest is identical
+        to the image generated from scratch, and that layout changes are detected.
+        """
+        spiffsgen_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spiffsgen.py')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            base_dir = os.path.join(tmp_dir, 'base')
+            os.makedirs(os.path.join(base_dir, 'sub'))
+            for name, size in [('a', 100), ('sub/b', 10000), ('sub/c', 0)]:
+                with open(os.path.join(base_dir, name), 'wb') as f:
+                    f.write(os.urandom(size))
+
+            def run_spiffsgen(image_name, manifest=True, verbose=True):  # type: (str, bool, bool) -> str
+                args = [sys.executable, spiffsgen_path, '0x20000', base_dir, os.path.join(tmp_dir, image_name)]
+                if manifest:
+                    args.append('--manifest-file=' + os.path.join(tmp_dir, 'manifest.json'))
+                if verbose:
+                    args.append('--verbose')
+                return subprocess.check_output(args).decode()
+
+            self.assertIn('cache miss (no valid manifest)', run_spiffsgen('image.bin'))
+            # nothing is printed in the normal case
+            self.assertEqual(run_spiffsgen('image.bin', verbose=False), '')
+            with open(os.path.join(base_dir, 'sub', 'b'), 'wb') as f:
+                f.write(os.urandom(10000))
+            self.assertIn('cache hit: updated 1 of 3 files', run_spiffsgen('image.bin'))
+            run_spiffsgen('reference.bin', manifest=False)
+            with open(os.path.join(tmp_dir, 'image.bin'), 'rb') as image, \
+                    open(os.path.join(tmp_dir, 'reference.bin'), 'rb') as reference:
+                self.assertEqual(image.read(), reference.read())
+
+            with open(os.path.join(base_dir, 'a'), 'ab') as f:
+                f.write(b'longer')
+            self.assertIn("cache miss (size of '/a' changed)", run_spiffsgen('image.bin'))
+
 
 if __name__ == '__main__':
     unittest.main()
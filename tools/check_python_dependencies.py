@@ -26,7 +26,7 @@ except ImportError:
     from importlib_metadata import version as get_version  # type: ignore
 
 try:
-    from typing import Set
+    from typing import Dict, List, Set
 except ImportError:
     # This is a script run during the early phase of setting up the environment. So try to avoid failure caused by
     # Python version incompatibility. The supported Python version is checked elsewhere.
@@ -34,23 +34,14 @@ except ImportError:
 
 PYTHON_PACKAGE_RE = re.compile(r'[^<>=~]+')
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='ESP-IDF Python package dependency checker')
-    parser.add_argument('--requirements', '-r',
-                        help='Path to a requirements file (can be used multiple times)',
-                        action='append', default=[])
-    parser.add_argument('--constraints', '-c', default=[],
-                        help='Path to a constraints file (can be used multiple times)',
-                        action='append')
-    args = parser.parse_args()
 
-    required_set = set()
-    for req_path in args.requirements:
-        with open(req_path) as f:
-            required_set |= set(i for i in map(str.strip, f.readlines()) if len(i) > 0 and not i.startswith('#'))
-
-    constr_dict = {}  # for example package_name -> package_name==1.0
-    for const_path in args.constraints:
+def read_constraints(constraint_paths: List[str]) -> Dict[str, str]:
+    """
+    Returns the constraints from the files by the package names, for example package_name -> package_name==1.0.
+    Raises ValueError for malformed input.
+    """
+    constr_dict = {}
+    for const_path in constraint_paths:
         with open(const_path) as f:
             for con in [i for i in map(str.strip, f.readlines()) if len(i) > 0 and not i.startswith('#')]:
                 if con.startswith('file://'):
@@ -60,15 +51,27 @@ if __name__ == '__main__':
                 elif con.startswith('-e') and '#egg=' in con:  # version control URLs, take the egg= part at the end only
                     con_m = re.search(r'#egg=([^\s]+)', con)
                     if not con_m:
-                        print('Malformed input. Cannot find name in {}'.format(con))
-                        sys.exit(1)
+                        raise ValueError('Malformed input. Cannot find name in {}'.format(con))
                     con = con_m[1]
 
                 name_m = PYTHON_PACKAGE_RE.search(con)
                 if not name_m:
-                    print('Malformed input. Cannot find name in {}'.format(con))
-                    sys.exit(1)
+                    raise ValueError('Malformed input. Cannot find name in {}'.format(con))
                 constr_dict[name_m[0]] = con.partition(' #')[0]  # remove comments
+    return constr_dict
+
+
+def check_requirements(requirement_paths: List[str], constraint_paths: List[str]) -> List[str]:
+    """
+    Checks that the packages from the requirement files and all their dependencies are installed in the versions
+    allowed by the constraint files. Returns the requirements which are not satisfied in string form.
+    """
+    required_set = set()
+    for req_path in requirement_paths:
+        with open(req_path) as f:
+            required_set |= set(i for i in map(str.strip, f.readlines()) if len(i) > 0 and not i.startswith('#'))
+
+    constr_dict = read_constraints(constraint_paths)
 
     not_satisfied = []  # in string form which will be printed
 
@@ -123,25 +126,48 @@ if __name__ == '__main__':
             except PackageNotFoundError as e:
                 not_satisfied.append(f"'{e}' - was not found and is required by the application")
 
+    return not_satisfied
+
+
+def print_not_satisfied(not_satisfied: List[str]) -> None:
+    print('The following Python requirements are not satisfied:')
+    print(os.linesep.join(not_satisfied))
+    if 'IDF_PYTHON_ENV_PATH' in os.environ:
+        # We are running inside a private virtual environment under IDF_TOOLS_PATH,
+        # ask the user to run install.bat again.
+        install_script = 'install.bat' if sys.platform == 'win32' else 'install.sh'
+        print('To install the missing packages, please run "{}"'.format(install_script))
+    else:
+        print('Please follow the instructions found in the "Set up the tools" section of '
+              'ESP-IDF Getting Started Guide.')
+
+    print('Diagnostic information:')
+    idf_python_env_path = os.environ.get('IDF_PYTHON_ENV_PATH')
+    print('    IDF_PYTHON_ENV_PATH: {}'.format(idf_python_env_path or '(not set)'))
+    print('    Python interpreter used: {}'.format(sys.executable))
+    if not idf_python_env_path or idf_python_env_path not in sys.executable:
+        print('    Warning: python interpreter not running from IDF_PYTHON_ENV_PATH')
+        print('    PATH: {}'.format(os.getenv('PATH')))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ESP-IDF Python package dependency checker')
+    parser.add_argument('--requirements', '-r',
+                        help='Path to a requirements file (can be used multiple times)',
+                        action='append', default=[])
+    parser.add_argument('--constraints', '-c', default=[],
+                        help='Path to a constraints file (can be used multiple times)',
+                        action='append')
+    args = parser.parse_args()
+
+    try:
+        not_satisfied = check_requirements(args.requirements, args.constraints)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
     if len(not_satisfied) > 0:
-        print('The following Python requirements are not satisfied:')
-        print(os.linesep.join(not_satisfied))
-        if 'IDF_PYTHON_ENV_PATH' in os.environ:
-            # We are running inside a private virtual environment under IDF_TOOLS_PATH,
-            # ask the user to run install.bat again.
-            install_script = 'install.bat' if sys.platform == 'win32' else 'install.sh'
-            print('To install the missing packages, please run "{}"'.format(install_script))
-        else:
-            print('Please follow the instructions found in the "Set up the tools" section of '
-                  'ESP-IDF Getting Started Guide.')
-
-        print('Diagnostic information:')
-        idf_python_env_path = os.environ.get('IDF_PYTHON_ENV_PATH')
-        print('    IDF_PYTHON_ENV_PATH: {}'.format(idf_python_env_path or '(not set)'))
-        print('    Python interpreter used: {}'.format(sys.executable))
-        if not idf_python_env_path or idf_python_env_path not in sys.executable:
-            print('    Warning: python interpreter not running from IDF_PYTHON_ENV_PATH')
-            print('    PATH: {}'.format(os.getenv('PATH')))
+        print_not_satisfied(not_satisfied)
         sys.exit(1)
 
     print('Python requirements are satisfied.')
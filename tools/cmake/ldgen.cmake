@@ -68,6 +68,7 @@ function(__ldgen_process_template template output)
         --env-file  "${config_env_path}"
         --libraries-file "${build_dir}/ldgen_libraries"
         --objdump   "${CMAKE_OBJDUMP}"
+        --cache-dir "${build_dir}/ldgen_cache"
         ${ldgen_check}
         DEPENDS     ${template} ${ldgen_fragment_files} ${ldgen_depends} ${SDKCONFIG}
         VERBATIM
@@ -10,12 +10,17 @@ try:
 except ImportError:
     from urllib.parse import urlparse
 
+import atexit
+import bisect
+import itertools
+import json
 import os.path
 import socketserver as SocketServer
 import subprocess
 import tempfile
 import threading
 import time
+import weakref
 
 import elftools.elf.constants as elfconst
 import elftools.elf.elffile as elffile
@@ -28,9 +33,122 @@ def clock():
         return time.clock()
 
 
+class Addr2Line:
+    """
+        Retrieves source line locations of addresses by a persistent addr2line process,
+        so ELF file is loaded only once. Addresses are sent to the process in batches
+        and the retrieved locations are cached.
+    """
+    BATCH_SIZE = 256
+
+    def __init__(self, toolchain, elf_path):
+        """
+            Constructor
+
+            Parameters
+            ----------
+            toolchain : string
+                toolchain prefix to retrieve source line locations using addresses
+            elf_path : string
+                path to ELF file to use
+        """
+        self.toolchain = toolchain
+        self.elf_path = elf_path
+        self._proc = None
+        self._locations = {}
+
+    def _start(self):
+        if not self._proc:
+            self._proc = subprocess.Popen(['%saddr2line' % self.toolchain, '-e', self.elf_path],
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def resolve(self, addrs):
+        """
+            Retrieves source line locations of the addresses which are not cached yet.
+
+            Parameters
+            ----------
+            addrs : iterable
+                addresses to retrieve source line locations
+        """
+        pending = [addr for addr in dict.fromkeys(addrs) if addr not in self._locations]
+        if not pending:
+            return
+        self._start()
+        for i in range(0, len(pending), self.BATCH_SIZE):
+            batch = pending[i:i + self.BATCH_SIZE]
+            try:
+                # addr2line prints exactly one line for each address read from stdin
+                self._proc.stdin.write(''.join('0x%x\n' % addr for addr in batch).encode('utf-8'))
+                self._proc.stdin.flush()
+            except (BrokenPipeError, OSError):
+                pass  # addr2line exited, the locations are not retrieved
+            for addr in batch:
+                self._locations[addr] = self._proc.stdout.readline().decode('utf-8')
+
+    def get(self, addr):
+        """
+            Retrieves source line location
+
+            Parameters
+            ----------
+            addr : int
+                address to retrieve source line location
+
+            Returns
+            -------
+            string
+                source line location string
+        """
+        if addr not in self._locations:
+            self.resolve([addr])
+        return self._locations[addr]
+
+    def close(self):
+        """
+            Stops addr2line process
+        """
+        if self._proc:
+            self._proc.stdin.close()
+            self._proc.wait()
+            self._proc.stdout.close()
+            self._proc = None
+
+
+_addr2line_instances = {}
+
+
+@atexit.register
+def _close_addr2line_instances():
+    for instance in _addr2line_instances.values():
+        instance.close()
+
+
+def get_addr2line(toolchain, elf_path):
+    """
+        Retrieves shared Addr2Line object.
+
+        Parameters
+        ----------
+        toolchain : string
+            toolchain prefix to retrieve source line locations using addresses
+        elf_path : string
+            path to ELF file to use
+
+        Returns
+        -------
+        Addr2Line
+            object shared by all users of the same toolchain and ELF file
+    """
+    key = (toolchain, elf_path)
+    if key not in _addr2line_instances:
+        _addr2line_instances[key] = Addr2Line(toolchain, elf_path)
+    return _addr2line_instances[key]
+
+
 def addr2line(toolchain, elf_path, addr):
     """
-        Creates trace reader.
+        Retrieves source line location of address.
 
         Parameters
         ----------
@@ -46,10 +164,7 @@ def addr2line(toolchain, elf_path, addr):
         string
             source line location string
     """
-    try:
-        return subprocess.check_output(['%saddr2line' % toolchain, '-e', elf_path, '0x%x' % addr]).decode('utf-8')
-    except subprocess.CalledProcessError:
-        return ''
+    return get_addr2line(toolchain, elf_path).get(addr)
 
 
 class ParseError(RuntimeError):
@@ -124,6 +239,27 @@ class Reader:
         """
         pass
 
+    def read_chunk(self, sz):
+        """
+            Reads up to a number of bytes which are available without waiting
+
+            Parameters
+            ----------
+            sz : int
+                maximum number of bytes to read
+
+            Returns
+            -------
+            bytes object
+                read bytes, empty if no data is available or the reader does not support reading without waiting
+
+            Raises
+            -------
+            ReaderShutdownRequest
+                if SIGINT was received
+        """
+        return b''
+
     def readline(self):
         """
             Reads line
@@ -181,7 +317,7 @@ class FileReader(Reader):
         """
             see Reader.read()
         """
-        data = b''
+        data = bytearray()
         start_tm = clock()
         while not self.need_stop:
             data += self.trace_file.read(sz - len(data))
@@ -191,7 +327,15 @@ class FileReader(Reader):
                 raise ReaderTimeoutError(self.timeout, sz)
         if self.need_stop:
             raise ReaderShutdownRequest()
-        return data
+        return bytes(data)
+
+    def read_chunk(self, sz):
+        """
+            see Reader.read_chunk()
+        """
+        if self.need_stop:
+            raise ReaderShutdownRequest()
+        return self.trace_file.read(sz)
 
     def get_pos(self):
         """
@@ -236,6 +380,184 @@ class FileReader(Reader):
             raise ReaderShutdownRequest()
         self.trace_file.seek(sz, os.SEEK_CUR)
 
+    def seek(self, pos):
+        """
+            Moves read pointer to a position in file
+
+            Parameters
+            ----------
+            pos : int
+                file position
+        """
+        self.trace_file.seek(pos)
+
+
+class BufferedReader(Reader):
+    """
+        Reader which takes large chunks of data from another reader and decodes them from memory.
+        It waits for the underlying reader only when the chunk does not contain enough data,
+        so the timeout and the shutdown request of the underlying reader are preserved.
+    """
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, reader, chunk_size=CHUNK_SIZE):
+        """
+            Constructor
+
+            Parameters
+            ----------
+            reader : Reader
+                underlying reader
+            chunk_size : int
+                maximum number of bytes taken from the underlying reader at once
+        """
+        Reader.__init__(self, reader.timeout)
+        self.reader = reader
+        self.chunk_size = chunk_size
+        self._data = b''
+        self._view = memoryview(self._data)
+        self._pos = 0
+        # position of the start of the chunk in the trace data
+        self._data_pos = reader.get_pos() if hasattr(reader, 'get_pos') else 0
+
+    def _set_data(self, data):
+        self._data_pos += self._pos
+        self._data = data
+        self._view = memoryview(data)
+        self._pos = 0
+
+    def _fill(self, sz):
+        """
+            Makes at least a number of bytes available at the read position
+
+            Parameters
+            ----------
+            sz : int
+                number of bytes to make available
+        """
+        self._set_data(self._data[self._pos:] + self.reader.read_chunk(max(sz, self.chunk_size)))
+        if len(self._data) < sz:
+            # waits for the rest of data, the chunk is kept if the read times out
+            data = self.reader.read(sz - len(self._data))
+            self._set_data(self._data + data)
+
+    def read(self, sz):
+        """
+            see Reader.read()
+        """
+        if len(self._data) - self._pos < sz:
+            self._fill(sz)
+        pos = self._pos
+        self._pos += sz
+        return bytes(self._view[pos:pos + sz])
+
+    def read_u8(self):
+        """
+            Reads a byte
+
+            Returns
+            -------
+            int
+                read byte
+        """
+        if self._pos >= len(self._data):
+            self._fill(1)
+        b = self._data[self._pos]
+        self._pos += 1
+        return b
+
+    def read_varint(self):
+        """
+            Reads unsigned integer encoded by 7 bits per byte, least significant bits first.
+            The highest bit of each byte except the last one is set.
+
+            Returns
+            -------
+            tuple
+                a tuple containg number of read bytes and decoded value.
+        """
+        data = self._data
+        pos = self._pos
+        end = len(data)
+        val = 0
+        shift = 0
+        while True:
+            if pos >= end:
+                self._pos = pos
+                self._fill(1)
+                data = self._data
+                pos = self._pos
+                end = len(data)
+            b = data[pos]
+            pos += 1
+            val |= (b & 0x7F) << shift
+            shift += 7
+            if not b & 0x80:
+                break
+        self._pos = pos
+        return (shift // 7, val)
+
+    def get_pos(self):
+        """
+            Retrieves current read position
+
+            Returns
+            -------
+            int
+                read position
+        """
+        return self._data_pos + self._pos
+
+    def readline(self, linesep=os.linesep):
+        """
+            see Reader.readline()
+        """
+        line = bytearray()
+        sep = linesep.encode('utf-8')
+        while not line.endswith(sep):
+            line.append(self.read_u8())
+        return line.decode('utf-8')
+
+    def forward(self, sz):
+        """
+            see Reader.forward()
+        """
+        avail = len(self._data) - self._pos
+        if sz <= avail:
+            self._pos += sz
+            return
+        self._pos = len(self._data)
+        self._set_data(b'')
+        self.reader.forward(sz - avail)
+        self._data_pos += sz - avail
+
+    def seek(self, pos):
+        """
+            Moves read pointer to a position in trace data.
+            The underlying reader must support seeking, see FileReader.seek().
+
+            Parameters
+            ----------
+            pos : int
+                position in trace data
+        """
+        if self._data_pos <= pos <= self._data_pos + len(self._data):
+            # the position is in the current chunk
+            self._pos = pos - self._data_pos
+            return
+        self.reader.seek(pos)
+        self._data = b''
+        self._view = memoryview(self._data)
+        self._pos = 0
+        self._data_pos = pos
+
+    def cleanup(self):
+        """
+            see Reader.cleanup()
+        """
+        Reader.cleanup(self)
+        self.reader.cleanup()
+
 
 class NetRequestHandler:
     """
@@ -367,6 +689,147 @@ def reader_create(trc_src, tmo, handler=None):
     return None
 
 
+class TraceIndex:
+    """
+        Sidecar index of trace file, which allows to parse only parts of the trace.
+
+        The index records resynchronization points at regular timestamp intervals. Every point contains
+        the file position of an event, the timestamp of the preceding event, the state of the parser and
+        the execution context on the cores needed to start parsing from that position and IDs of the events between this point and the next one.
+        The index is kept in file next to the trace file and is valid while the trace file is not modified.
+    """
+    VERSION = 2
+    INTERVAL = 0.1
+
+    def __init__(self, trace_path, interval=INTERVAL, tag=''):
+        """
+            Constructor
+
+            Parameters
+            ----------
+            trace_path : string
+                path to trace file
+            interval : float
+                minimal time interval between resynchronization points in seconds
+            tag : string
+                description of the parser configuration, the index is valid only for the same configuration
+        """
+        self.trace_path = trace_path
+        self.path = trace_path + '.idx'
+        self.interval = interval
+        self.tag = tag
+        self.points = []
+        self.complete = False
+        # timestamp when the next point is to be added while building the index
+        self.next_ts = 0
+
+    def _get_trace_info(self):
+        stat = os.stat(self.trace_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def load(self):
+        """
+            Loads index from file
+
+            Returns
+            -------
+            bool
+                True if the index is loaded, False if it is missing or does not match the trace file.
+        """
+        try:
+            with open(self.path, 'r') as f:
+                index = json.load(f)
+            if (index['version'] != TraceIndex.VERSION or index['trace'] != self._get_trace_info() or
+                    index['interval'] != self.interval or index['tag'] != self.tag):
+                return False
+            self.points = index['points']
+        except (OSError, ValueError, KeyError, TypeError):  # missing, corrupted or incompatible index
+            return False
+        for point in self.points:
+            point['ids'] = set(point['ids'])
+        self.complete = True
+        return True
+
+    def save(self):
+        """
+            Saves complete index to file
+        """
+        self.complete = True
+        index = {
+            'version': TraceIndex.VERSION,
+            'trace': self._get_trace_info(),
+            'interval': self.interval,
+            'tag': self.tag,
+            'points': [dict(point, ids=sorted(point['ids'])) for point in self.points],
+        }
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(self.path)), delete=False) as f:
+            json.dump(index, f, separators=(',', ':'))
+        # the temporary file is created only accessible by the owner, the index gets the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(f.name, 0o666 & ~umask)
+        os.replace(f.name, self.path)
+
+    def add_point(self, pos, ts, state):
+        """
+            Adds resynchronization point
+
+            Parameters
+            ----------
+            pos : int
+                position of the next event in trace file
+            ts : float
+                timestamp of the last event
+            state : dict
+                JSON serializable state of the parser and the execution context after the last event
+
+            Returns
+            -------
+            set
+                set to collect IDs of the events following the point
+        """
+        ids = set()
+        self.points.append({'pos': pos, 'ts': ts, 'state': state, 'ids': ids})
+        self.next_ts = ts + self.interval
+        return ids
+
+    def get_ranges(self, start_ts=None, end_ts=None, evt_ids=None):
+        """
+            Finds parts of the trace containing events in time window and with specified IDs.
+
+            Parameters
+            ----------
+            start_ts : float
+                start of time window, None for the beginning of the trace
+            end_ts : float
+                end of time window, None for the end of the trace
+            evt_ids : set
+                IDs of events, None for all events
+
+            Returns
+            -------
+            list
+                list of tuples containing the point to start parsing from and the file position to stop parsing at
+                or None for the end of the trace.
+        """
+        ranges = []
+        for i, point in enumerate(self.points):
+            next_point = self.points[i + 1] if i + 1 < len(self.points) else None
+            if end_ts is not None and point['ts'] > end_ts:
+                continue
+            if start_ts is not None and next_point and next_point['ts'] < start_ts:
+                continue
+            if evt_ids is not None and not point['ids'] & evt_ids:
+                continue
+            end_pos = next_point['pos'] if next_point else None
+            if ranges and ranges[-1][1] == point['pos']:
+                # join with the previous range
+                ranges[-1] = (ranges[-1][0], end_pos)
+            else:
+                ranges.append((point, end_pos))
+        return ranges
+
+
 class TraceEvent:
     """
         Base class for all trace events.
@@ -476,24 +939,35 @@ def get_str_from_elf(felf, str_addr):
         string
             string or None if it was not found
     """
-    tgt_str = ''
-    for sect in felf.iter_sections():
-        if sect['sh_addr'] == 0 or (sect['sh_flags'] & elfconst.SH_FLAGS.SHF_ALLOC) == 0:
-            continue
-        if str_addr < sect['sh_addr'] or str_addr >= sect['sh_addr'] + sect['sh_size']:
+    try:
+        sections, strings = _elf_strings[felf]
+    except KeyError:
+        # the data of the loadable sections are read only once for each ELF file
+        sections = [(sect['sh_addr'], sect['sh_size'], sect.data()) for sect in felf.iter_sections()
+                    if sect['sh_addr'] != 0 and (sect['sh_flags'] & elfconst.SH_FLAGS.SHF_ALLOC) != 0]
+        strings = {}
+        _elf_strings[felf] = (sections, strings)
+
+    if str_addr in strings:
+        return strings[str_addr]
+
+    tgt_str = None
+    for (sh_addr, sh_size, sec_data) in sections:
+        if str_addr < sh_addr or str_addr >= sh_addr + sh_size:
             continue
-        sec_data = sect.data()
-        for i in range(str_addr - sect['sh_addr'], sect['sh_size']):
-            if type(sec_data) is str:
-                ch = sec_data[i]
-            else:
-                ch = str(chr(sec_data[i]))
-            if ch == '\0':
-                break
-            tgt_str += ch
-        if len(tgt_str) > 0:
-            return tgt_str
-    return None
+        start = str_addr - sh_addr
+        end = sec_data.find(b'\0', start)
+        if end == -1:
+            end = len(sec_data)
+        if end > start:
+            tgt_str = sec_data[start:end].decode('latin-1')
+            break
+    strings[str_addr] = tgt_str
+    return tgt_str
+
+
+# loadable sections and already retrieved strings of ELF files
+_elf_strings = weakref.WeakKeyDictionary()
 
 
 class LogTraceEvent:
@@ -672,10 +1146,11 @@ class HeapTraceEvent:
     def __repr__(self):
         if len(self.toolchain) and len(self.elf_path):
             callers = os.linesep
-            for addr in self.trace_event.params['callers'].value:
-                if addr == 0:
-                    break
-                callers += '{}'.format(addr2line(self.toolchain, self.elf_path, addr))
+            caller_addrs = list(itertools.takewhile(lambda addr: addr != 0, self.callers))
+            symbolizer = get_addr2line(self.toolchain, self.elf_path)
+            symbolizer.resolve(caller_addrs)
+            for addr in caller_addrs:
+                callers += '{}'.format(symbolizer.get(addr))
         else:
             callers = ''
             for addr in self.trace_event.params['callers'].value:
@@ -709,8 +1184,8 @@ class BaseHeapTraceDataProcessorImpl:
             print_heap_events : bool
                 if True every heap event will be printed as they arrive
         """
+        # active allocations in the order they were made
         self._alloc_addrs = {}
-        self.allocs = []
         self.frees = []
         self.heap_events_count = 0
         self.print_heap_events = print_heap_events
@@ -730,32 +1205,46 @@ class BaseHeapTraceDataProcessorImpl:
         if event.alloc:
             if event.addr in self._alloc_addrs:
                 raise HeapTraceDuplicateAllocError(event.addr, event.size, self._alloc_addrs[event.addr].size)
-            self.allocs.append(event)
             self._alloc_addrs[event.addr] = event
         else:
             # do not treat free on unknown addresses as errors, because these blocks coould be allocated when tracing was disabled
             if event.addr in self._alloc_addrs:
                 event.size = self._alloc_addrs[event.addr].size
-                self.allocs.remove(self._alloc_addrs[event.addr])
                 del self._alloc_addrs[event.addr]
             else:
                 self.frees.append(event)
 
+    @property
+    def allocs(self):
+        """
+            List of active allocations
+        """
+        return list(self._alloc_addrs.values())
+
     def print_report(self):
         """
             Prints heap report
         """
         print('=============== HEAP TRACE REPORT ===============')
         print('Processed {:d} heap events.'.format(self.heap_events_count))
-        if len(self.allocs) == 0:
+        allocs = self.allocs
+        if len(allocs) == 0:
             print('OK - Heap errors was not found.')
             return
+        # retrieve source line locations of all the reported callers at once
+        for (toolchain, elf_path), events in itertools.groupby(sorted(allocs + self.frees, key=lambda e: (e.toolchain, e.elf_path)),
+                                                               key=lambda e: (e.toolchain, e.elf_path)):
+            if len(toolchain) and len(elf_path):
+                get_addr2line(toolchain, elf_path).resolve(addr for e in events for addr in e.callers if addr != 0)
+        # frees sorted by address, so the ones inside the allocated blocks are found by bisection
+        frees = sorted((free.addr, i) for (i, free) in enumerate(self.frees))
         leaked_bytes = 0
-        for alloc in self.allocs:
+        for alloc in allocs:
             leaked_bytes += alloc.size
             print(alloc)
-            for free in self.frees:
-                if free.addr > alloc.addr and free.addr <= alloc.addr + alloc.size:
-                    print('Possible wrong free operation found')
-                    print(free)
-        print('Found {:d} leaked bytes in {:d} blocks.'.format(leaked_bytes, len(self.allocs)))
+            start = bisect.bisect_right(frees, (alloc.addr, len(frees)))
+            end = bisect.bisect_right(frees, (alloc.addr + alloc.size, len(frees)))
+            for (_, i) in sorted(frees[start:end], key=lambda f: f[1]):
+                print('Possible wrong free operation found')
+                print(self.frees[i])
+        print('Found {:d} leaked bytes in {:d} blocks.'.format(leaked_bytes, len(allocs)))
@@ -0,0 +1,234 @@
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+import array
+import json
+import shutil
+import sys
+import tempfile
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+COLUMNS_MAGIC = b'ESPYTRACE-COLUMNS 1\n'
+
+
+class ColumnarTraceWriter:
+    """
+        Exports trace events to a compact columnar file.
+
+        The file starts with COLUMNS_MAGIC line followed by a JSON header line with the number of events,
+        the names and array type codes of the columns, the interned strings and the size of the parameters.
+        Then the little-endian contents of the columns follow one after another and the parameters of the events
+        at the end. Context and event names, which repeat, are stored as indices of the interned strings.
+        The parameters of each event are stored as a JSON object, the 'params' column holds the offset
+        of the end of the event's parameters, see read_columns().
+    """
+    COLUMNS = [('ts', 'd'), ('core_id', 'B'), ('id', 'I'), ('name', 'I'), ('ctx', 'I'), ('in_irq', 'B'), ('params', 'Q')]
+    # number of events kept in memory, full chunks of the columns are moved to temporary files
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, path: str) -> None:
+        """
+            Constructor.
+
+            Parameters
+            ----------
+            path : string
+                path to the output file
+        """
+        self.path = path
+        self.count = 0
+        self._columns = dict((name, array.array(typecode)) for (name, typecode) in self.COLUMNS)
+        self._spools: Dict[str, IO[bytes]] = dict((name, tempfile.TemporaryFile()) for (name, _) in self.COLUMNS)
+        self._strings: Dict[str, int] = dict()
+        self._params: List[bytes] = []
+        self._params_spool = tempfile.TemporaryFile()
+        self._params_size = 0
+
+    def _intern(self, string: str) -> int:
+        try:
+            return self._strings[string]
+        except KeyError:
+            index = len(self._strings)
+            self._strings[string] = index
+            return index
+
+    @staticmethod
+    def _to_bytes(column: array.array) -> bytes:
+        if sys.byteorder == 'big':
+            column = array.array(column.typecode, column)
+            column.byteswap()
+        return column.tobytes()
+
+    def _spool(self) -> None:
+        for (name, column) in self._columns.items():
+            self._spools[name].write(self._to_bytes(column))
+            del column[:]
+        self._params_spool.write(b''.join(self._params))
+        del self._params[:]
+
+    def on_new_event(self, event: Any) -> None:
+        """
+            Adds event.
+
+            Parameters
+            ----------
+            event : apptrace.TraceEvent
+                event object
+        """
+        columns = self._columns
+        columns['ts'].append(event.ts)
+        columns['core_id'].append(event.core_id)
+        columns['id'].append(event.id)
+        columns['name'].append(self._intern(event.name))
+        columns['ctx'].append(self._intern(event.ctx_name))
+        columns['in_irq'].append(1 if event.in_irq else 0)
+        params = json.dumps(get_params(event), sort_keys=True).encode('utf-8')
+        self._params.append(params)
+        self._params_size += len(params)
+        columns['params'].append(self._params_size)
+        self.count += 1
+        if len(columns['ts']) >= self.CHUNK_SIZE:
+            self._spool()
+
+    def close(self) -> None:
+        """
+            Writes the output file.
+        """
+        self._spool()
+        header = {
+            'count': self.count,
+            'columns': self.COLUMNS,
+            'strings': list(self._strings),
+            'params_size': self._params_size,
+        }
+        with open(self.path, 'wb') as f:
+            f.write(COLUMNS_MAGIC)
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            for spool in [self._spools[name] for (name, _) in self.COLUMNS] + [self._params_spool]:
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+                spool.close()
+
+
+def read_columns(path: str) -> Tuple[Dict[str, array.array], List[str], List[Dict[str, Any]]]:
+    """
+        Reads file written by ColumnarTraceWriter.
+
+        Parameters
+        ----------
+        path : string
+            path to the file
+
+        Returns
+        -------
+        tuple
+            a tuple containing a dict of the columns by their names, a list of the interned strings
+            and a list of the parameters of the events.
+    """
+    with open(path, 'rb') as f:
+        if f.readline() != COLUMNS_MAGIC:
+            raise ValueError('%s is not a columnar trace file' % path)
+        header = json.loads(f.readline().decode('utf-8'))
+        columns = dict()
+        for (name, typecode) in header['columns']:
+            column = array.array(typecode)
+            column.frombytes(f.read(header['count'] * column.itemsize))
+            if sys.byteorder == 'big':
+                column.byteswap()
+            columns[name] = column
+        params_data = f.read(header['params_size'])
+    params = []
+    start = 0
+    for end in columns['params']:
+        params.append(json.loads(params_data[start:end].decode('utf-8')))
+        start = end
+    return columns, header['strings'], params
+
+
+def get_params(event: Any) -> Dict[str, Any]:
+    """
+        Retrieves the values of the event parameters.
+
+        Parameters
+        ----------
+        event : apptrace.TraceEvent
+            event object
+
+        Returns
+        -------
+        dict
+            the values of the parameters by their names
+    """
+    return dict((name, param.value) for (name, param) in event.params.items())
+
+
+def _to_us(ts: float) -> float:
+    # the trace event format uses microseconds, nanoseconds are kept as the fractional part
+    return round(ts * 1e6, 3)
+
+
+class ChromeTraceWriter:
+    """
+        Exports trace events to Chrome trace event format, which can be opened by Perfetto UI and chrome://tracing.
+
+        The events are written as they are processed. Each core is a thread of the trace, the execution contexts
+        (tasks and ISRs) are written as complete events spanning the time they were running and the trace events
+        are written as instant events.
+    """
+    PID = 0
+
+    def __init__(self, path: str) -> None:
+        """
+            Constructor.
+
+            Parameters
+            ----------
+            path : string
+                path to the output file
+        """
+        self._file = open(path, 'w')
+        self._file.write('{"traceEvents":[\n')
+        self._first = True
+        # the context running on each core and the time it started running
+        self._contexts: Dict[int, Tuple[str, float]] = dict()
+        self._last_ts = 0.0
+        self._write({'name': 'process_name', 'ph': 'M', 'pid': self.PID, 'args': {'name': 'ESP'}})
+
+    def _write(self, trace_event: Dict[str, Any]) -> None:
+        self._file.write(('' if self._first else ',\n') + json.dumps(trace_event, separators=(',', ':')))
+        self._first = False
+
+    def _end_context(self, core_id: int, ts: float) -> None:
+        ctx_name, start_ts = self._contexts[core_id]
+        self._write({'name': ctx_name, 'ph': 'X', 'pid': self.PID, 'tid': core_id,
+                     'ts': _to_us(start_ts), 'dur': _to_us(ts - start_ts)})
+
+    def on_new_event(self, event: Any) -> None:
+        """
+            Adds event.
+
+            Parameters
+            ----------
+            event : apptrace.TraceEvent
+                event object
+        """
+        core_id = event.core_id
+        context: Optional[Tuple[str, float]] = self._contexts.get(core_id)
+        if context is None:
+            self._write({'name': 'thread_name', 'ph': 'M', 'pid': self.PID, 'tid': core_id,
+                         'args': {'name': 'core %d' % core_id}})
+        if context is None or context[0] != event.ctx_name:
+            if context is not None:
+                self._end_context(core_id, event.ts)
+            self._contexts[core_id] = (event.ctx_name, event.ts)
+        self._last_ts = max(self._last_ts, event.ts)
+        self._write({'name': event.name, 'ph': 'i', 's': 't', 'pid': self.PID, 'tid': core_id,
+                     'ts': _to_us(event.ts), 'args': get_params(event)})
+
+    def close(self) -> None:
+        """
+            Ends the contexts running at the end of the trace and closes the output file.
+        """
+        for core_id in sorted(self._contexts):
+            self._end_context(core_id, self._last_ts)
+        self._file.write('\n]}\n')
+        self._file.close()
@@ -1,6 +1,6 @@
 # SPDX-FileCopyrightText: 2022-2023 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
-import copy
+import heapq
 import json
 import re
 import struct
@@ -89,14 +89,85 @@ def parse_trace(reader, parser, os_evt_map_file=''):
     os_evt_map_file : string
         Path to file containg events format description.
     """
+    for _ in iterate_trace(reader, parser, os_evt_map_file):
+        pass
+
+
+def iterate_trace(reader, parser, os_evt_map_file='', index=None, start_ts=None, end_ts=None, evt_ids=None):
+    """
+    Parses trace and yields events as they are read.
+
+    Parameters
+    ----------
+    reader : apptrace.Reader
+        Trace reader object.
+    parser : SysViewTraceDataParser
+        Top level parser object.
+    os_evt_map_file : string
+        Path to file containg events format description.
+    index : apptrace.TraceIndex
+        Index of the trace file. If it is complete, only the parts of the trace which can contain
+        the requested events are parsed, otherwise it is built while parsing the whole trace.
+        The execution context at the start of every parsed part is passed to the processor
+        in SysViewTraceDataParser.resumed_ctx, see SysViewTraceDataProcessor.set_context_state().
+    start_ts : float
+        Start of the requested time window. The preceding events are still yielded from the start
+        of the trace or of the parsed part of the trace, because they determine the execution context
+        of the requested ones, see SysViewTraceDataProcessor.set_events_filter().
+    end_ts : float
+        Events with higher timestamps are not yielded.
+    evt_ids : set
+        IDs of the requested events. Other events are still yielded, because they can be
+        necessary to process the requested ones, but the parts of the trace without
+        the requested events are skipped if the index is complete.
+
+    Yields
+    -------
+    SysViewEvent
+        events processed by the parser, so their timestamps are already calculated.
+    """
     global _os_events_map
     # parse OS events formats file
     _os_events_map = _read_events_map(os_evt_map_file)
     parser.esp_ext = ('; ESP_Extension\n' in _read_file_header(reader))
     _read_init_seq(reader)
+    # events are decoded from large chunks of trace data
+    reader = apptrace.BufferedReader(reader)
+    if index is not None and index.complete:
+        for point, end_pos in index.get_ranges(start_ts, end_ts, evt_ids):
+            reader.seek(point['pos'])
+            parser.set_state(point['state']['parser'])
+            parser.resumed_ctx = point['state']['ctx']
+            while end_pos is None or reader.get_pos() < end_pos:
+                event = parser.read_event(reader, _os_events_map)
+                parser.on_new_event(event)
+                if end_ts is not None and event.ts > end_ts:
+                    return
+                yield event
+        return
+    if index is not None:
+        # keeps track of execution context on the cores of this trace to save it in the index points
+        ctx_tracker = SysViewTraceDataProcessor([parser])
+        ids = index.add_point(reader.get_pos(), 0, {'parser': parser.get_state(), 'ctx': ctx_tracker.get_context_state()})
     while True:
-        event = parser.read_event(reader, _os_events_map)
+        try:
+            event = parser.read_event(reader, _os_events_map)
+        except apptrace.ReaderTimeoutError:
+            if index is not None:
+                # the whole trace is parsed
+                index.save()
+            raise
         parser.on_new_event(event)
+        if index is not None:
+            ctx_tracker._process_event(event)
+            ids.add(event.id)
+            if parser.sys_info and event.ts >= index.next_ts:
+                ids = index.add_point(reader.get_pos(), event.ts, {'parser': parser.get_state(), 'ctx': ctx_tracker.get_context_state()})
+        if end_ts is not None and event.ts > end_ts:
+            if index is None:
+                return
+            continue  # the index is built from the whole trace
+        yield event
 
 
 def _read_events_map(os_evt_map_file):
@@ -186,7 +257,7 @@ def _decode_u32(reader):
 
     Parameters
     ----------
-    reader : apptrace.Reader
+    reader : apptrace.BufferedReader
         Trace reader object.
 
     Returns
@@ -194,17 +265,7 @@ def _decode_u32(reader):
     tuple
         a tuple containg number of read bytes and decoded value.
     """
-    sz = 0
-    val = 0
-    while True:
-        b, = struct.unpack('<B', reader.read(1))
-        if b & 0x80:
-            val |= (b & 0x7F) << (7 * sz)
-        else:
-            val |= b << (7 * sz)
-            break
-        sz += 1
-    return (sz + 1,val)
+    return reader.read_varint()
 
 
 def _decode_id(reader):
@@ -213,7 +274,7 @@ def _decode_id(reader):
 
     Parameters
     ----------
-    reader : apptrace.Reader
+    reader : apptrace.BufferedReader
         Trace reader object.
 
     Returns
@@ -230,7 +291,7 @@ def _decode_u64(reader):
 
     Parameters
     ----------
-    reader : apptrace.Reader
+    reader : apptrace.BufferedReader
         Trace reader object.
 
     Returns
@@ -250,7 +311,7 @@ def _decode_str(reader):
 
     Parameters
     ----------
-    reader : apptrace.Reader
+    reader : apptrace.BufferedReader
         Trace reader object.
 
     Returns
@@ -258,14 +319,11 @@ def _decode_str(reader):
     tuple
         a tuple containg number of read bytes and decoded value.
     """
-    sz = 0
-    val = ''
-    sz, = struct.unpack('<B', reader.read(1))
+    sz = reader.read_u8()
     if sz == 0xFF:
-        buf = struct.unpack('<2B', reader.read(2))
-        sz = (buf[1] << 8) | buf[0]
-    val, = struct.unpack('<%ds' % sz, reader.read(sz))
-    val = val.decode('utf-8')
+        sz = reader.read_u8()
+        sz |= reader.read_u8() << 8
+    val = reader.read(sz).decode('utf-8')
     if sz < 0xFF:
         return (sz + 1,val)  # one extra byte for length
     return (sz + 3,val)  # 3 extra bytes for length
@@ -277,7 +335,7 @@ def _decode_plen(reader):
 
     Parameters
     ----------
-    reader : apptrace.Reader
+    reader : apptrace.BufferedReader
         Trace reader object.
 
     Returns
@@ -286,9 +344,9 @@ def _decode_plen(reader):
         decoded value.
     """
     plen = 0
-    b0, = struct.unpack('<B', reader.read(1))
+    b0 = reader.read_u8()
     if b0 & 0x80:
-        b1, = struct.unpack('<B', reader.read(1))
+        b1 = reader.read_u8()
         plen = b1  # higher part
         plen = (plen << 7) | (b0 & ~0x80)  # lower 7 bits
     else:
@@ -315,7 +373,7 @@ class SysViewEvent(apptrace.TraceEvent):
             ----------
             evt_id : int
                 Event ID.
-            reader : apptrace.Reader
+            reader : apptrace.BufferedReader
                 Trace reader object.
             core_id : int
                 Core ID event has been generated on.
@@ -338,7 +396,7 @@ class SysViewEvent(apptrace.TraceEvent):
 
             Parameters
             ----------
-            reader : apptrace.Reader
+            reader : apptrace.BufferedReader
                 Trace reader object.
             events_fmt_map : dict
                 see return value of _read_events_map()
@@ -354,7 +412,7 @@ class SysViewEvent(apptrace.TraceEvent):
         evt_params_templates = events_fmt_map[self.id][1]
         params_len = 0
         for i in range(len(evt_params_templates)):
-            event_param = copy.deepcopy(evt_params_templates[i])
+            event_param = evt_params_templates[i].copy()
             try:
                 cur_pos = reader.get_pos()
                 sz,param_val = event_param.decode(reader, self.plen - params_len)
@@ -403,7 +461,7 @@ class SysViewEventParam:
 
             Parameters
             ----------
-            reader : apptrace.Reader
+            reader : apptrace.BufferedReader
                 Trace reader object.
             max_sz : int
                 Maximum number of bytes to read.
@@ -415,6 +473,20 @@ class SysViewEventParam:
         """
         pass
 
+    def copy(self):
+        """
+            Creates a copy of the parameter's template to hold the decoded value.
+            Templates hold no mutable values, so the attributes are not copied deeply.
+
+            Returns
+            -------
+            SysViewEventParam
+                copy of the parameter.
+        """
+        param = self.__class__.__new__(self.__class__)
+        param.__dict__.update(self.__dict__)
+        return param
+
     def __str__(self):
         return '{}: {}'.format(self.name, self.value)
 
@@ -565,7 +637,7 @@ class SysViewHeapEvent(SysViewEvent):
                 see SysViewEvent.__init__()
             events_off : int
                 Offset for heap events IDs. Greater or equal to SYSVIEW_MODULE_EVENT_OFFSET.
-            reader : apptrace.Reader
+            reader : apptrace.BufferedReader
                 see SysViewEvent.__init__()
             core_id : int
                 see SysViewEvent.__init__()
@@ -594,7 +666,7 @@ class SysViewTraceDataParser(apptrace.TraceDataProcessor):
     STREAMID_LOG = 0
     STREAMID_HEAP = 1
 
-    def __init__(self, print_events=False, core_id=0):
+    def __init__(self, print_events=False, core_id=0, keep_all_events=True):
         """
             Constructor.
 
@@ -604,14 +676,50 @@ class SysViewTraceDataParser(apptrace.TraceDataProcessor):
                 see apptrace.TraceDataProcessor.__init__()
             core_id : int
                 id of the core this parser object relates to.
+            keep_all_events : bool
+                see apptrace.TraceDataProcessor.__init__(). Events do not need to be kept
+                if they are processed while parsing, see SysViewTraceDataProcessor.merge_and_process().
         """
-        apptrace.TraceDataProcessor.__init__(self, print_events=print_events, keep_all_events=True)
+        apptrace.TraceDataProcessor.__init__(self, print_events=print_events, keep_all_events=keep_all_events)
         self.sys_info = None
+        self._sys_freq = None
         self._last_ts = 0
         self.irqs_info = {}
         self.tasks_info = {}
         self.core_id = core_id
         self.esp_ext = False
+        # execution context to be restored by the processor when parsing is resumed, see iterate_trace()
+        self.resumed_ctx = None
+
+    def get_state(self):
+        """
+            Retrieves the state of the parser which is needed to continue parsing from the current position.
+
+            Returns
+            -------
+            dict
+                JSON serializable state, see apptrace.TraceIndex.
+        """
+        return {
+            'last_ts': self._last_ts,
+            'sys_freq': self._sys_freq,
+            'irqs_info': list(self.irqs_info.items()),
+            'tasks_info': list(self.tasks_info.items()),
+        }
+
+    def set_state(self, state):
+        """
+            Restores the state of the parser.
+
+            Parameters
+            ----------
+            state : dict
+                state returned by get_state()
+        """
+        self._last_ts = state['last_ts']
+        self._sys_freq = state['sys_freq']
+        self.irqs_info = dict(state['irqs_info'])
+        self.tasks_info = dict(state['tasks_info'])
 
     def _parse_irq_desc(self, desc):
         """
@@ -647,7 +755,7 @@ class SysViewTraceDataParser(apptrace.TraceDataProcessor):
                 real event timestamp.
         """
         self._last_ts += ts
-        return float(self._last_ts) / self.sys_info.params['sys_freq'].value
+        return float(self._last_ts) / self._sys_freq
 
     def read_extension_event(self, evt_id, core_id, reader):
         """
@@ -658,7 +766,7 @@ class SysViewTraceDataParser(apptrace.TraceDataProcessor):
             ----------
             evt_id : int
                 Event ID.
-            reader : apptrace.Reader
+            reader : apptrace.BufferedReader
                 Trace reader object.
 
             Returns
@@ -688,7 +796,7 @@ class SysViewTraceDataParser(apptrace.TraceDataProcessor):
 
             Parameters
             ----------
-            reader : apptrace.Reader
+            reader : apptrace.BufferedReader
                 Trace reader object.
             os_evt_map : dict
                 see return value of _read_events_map()
@@ -698,12 +806,12 @@ class SysViewTraceDataParser(apptrace.TraceDataProcessor):
             SysViewEvent
                 pre-defined, OS-related or extension event object.
         """
-        evt_hdr, = struct.unpack('<B', reader.read(1))
+        evt_hdr = reader.read_u8()
         # read ID and core num
         evt_id = 0
         if evt_hdr & 0x80:
             # evt_id (2 bytes)
-            b, = struct.unpack('<B', reader.read(1))
+            b = reader.read_u8()
             # higher part
             if self.esp_ext:
                 evt_id,core_id = self._decode_core_id(b)
@@ -742,11 +850,12 @@ class SysViewTraceDataParser(apptrace.TraceDataProcessor):
         if event.id == SYSVIEW_EVTID_TRACE_START:
             event.ts = 0
             self._last_ts = 0
-        elif self.sys_info:
+        elif self._sys_freq is not None:
             event.ts = self._update_ts(event.ts)
 
         if event.id == SYSVIEW_EVTID_INIT:
             self.sys_info = event
+            self._sys_freq = event.params['sys_freq'].value
             event.ts = self._update_ts(event.ts)
         elif event.id == SYSVIEW_EVTID_TASK_INFO:
             self.tasks_info[event.params['tid'].value] = event.params['name'].value
@@ -760,7 +869,7 @@ class SysViewTraceDataParser(apptrace.TraceDataProcessor):
 
 
 class SysViewTraceDataExtEventParser(SysViewTraceDataParser):
-    def __init__(self, events_num, print_events=False, core_id=0):
+    def __init__(self, events_num, print_events=False, core_id=0, keep_all_events=True):
         """
             Constructor.
 
@@ -770,11 +879,28 @@ class SysViewTraceDataExtEventParser(SysViewTraceDataParser):
                 see apptrace.TraceDataProcessor.__init__()
             core_id : int
                 id of the core this parser object relates to.
+            keep_all_events : bool
+                see SysViewTraceDataParser.__init__()
         """
-        SysViewTraceDataParser.__init__(self, core_id=core_id, print_events=print_events)
+        SysViewTraceDataParser.__init__(self, core_id=core_id, print_events=print_events, keep_all_events=keep_all_events)
         self.events_off = 0
         self.events_num = events_num
 
+    def get_state(self):
+        """
+            see SysViewTraceDataParser.get_state()
+        """
+        state = SysViewTraceDataParser.get_state(self)
+        state['events_off'] = self.events_off
+        return state
+
+    def set_state(self, state):
+        """
+            see SysViewTraceDataParser.set_state()
+        """
+        SysViewTraceDataParser.set_state(self, state)
+        self.events_off = state['events_off']
+
     def event_supported(self, event):
         return False if (self.events_off < SYSVIEW_MODULE_EVENT_OFFSET or event.id < self.events_off or
                         event.id >= (self.events_off + self.events_num)) else True
@@ -784,11 +910,11 @@ class SysViewMultiTraceDataParser(SysViewTraceDataParser):
     """
         SystemView trace data parser supporting multiple event streams.
     """
-    def __init__(self, print_events=False, core_id=0):
+    def __init__(self, print_events=False, core_id=0, keep_all_events=True):
         """
             see SysViewTraceDataParser.__init__()
         """
-        SysViewTraceDataParser.__init__(self, print_events, core_id)
+        SysViewTraceDataParser.__init__(self, print_events, core_id, keep_all_events)
         self.stream_parsers = {}
 
     def add_stream_parser(self, stream_id, parser):
@@ -809,6 +935,22 @@ class SysViewMultiTraceDataParser(SysViewTraceDataParser):
         parser.root_proc = self
         self.stream_parsers[stream_id] = parser
 
+    def get_state(self):
+        """
+            see SysViewTraceDataParser.get_state()
+        """
+        state = SysViewTraceDataParser.get_state(self)
+        state['streams'] = [[stream_id, parser.get_state()] for (stream_id, parser) in self.stream_parsers.items()]
+        return state
+
+    def set_state(self, state):
+        """
+            see SysViewTraceDataParser.set_state()
+        """
+        SysViewTraceDataParser.set_state(self, state)
+        for stream_id, stream_state in state['streams']:
+            self.stream_parsers[stream_id].set_state(stream_state)
+
     def read_extension_event(self, evt_id, core_id, reader):
         """
             Reads extension event.
@@ -818,7 +960,7 @@ class SysViewMultiTraceDataParser(SysViewTraceDataParser):
             ----------
             evt_id : int
                 see SysViewTraceDataParser.read_extension_event()
-            reader : apptrace.Reader
+            reader : apptrace.BufferedReader
                 see SysViewTraceDataParser.read_extension_event()
 
             Returns
@@ -894,6 +1036,10 @@ class SysViewTraceDataProcessor(apptrace.TraceDataProcessor):
         self.ctx_stack = {}
         self.prev_ctx = {}
         self.no_ctx_events = []
+        self.exporters = []
+        self.events_filter = None
+        self.start_ts = None
+        self.end_ts = None
         for t in traces:
             self.traces[t.core_id] = t
             # current context item is a tuple of task ID or IRQ num and 'in_irq' flag
@@ -1008,6 +1154,10 @@ class SysViewTraceDataProcessor(apptrace.TraceDataProcessor):
                 raise SysViewTraceParseError('Event for unknown core %d' % event.core_id)
         else:
             trace = self.traces[event.core_id]
+        if trace.resumed_ctx is not None:
+            # parsing of the trace is resumed after skipped events
+            self.set_context_state(trace.resumed_ctx)
+            trace.resumed_ctx = None
         if event.id == SYSVIEW_EVTID_ISR_ENTER:
             if event.params['irq_num'].value not in trace.irqs_info:
                 raise SysViewTraceParseError('Enter unknown ISR %d' % event.params['irq_num'].value)
@@ -1057,6 +1207,82 @@ class SysViewTraceDataProcessor(apptrace.TraceDataProcessor):
                 # the 1st context switching event after trace start is SYSVIEW_EVTID_TASK_STOP_READY, so we have been in task context
                 self.prev_ctx[event.core_id] = SysViewEventContext(event.params['tid'].value, False, trace.tasks_info[event.params['tid'].value])
 
+    def get_context_state(self):
+        """
+            Retrieves execution context on every core, which is needed to continue processing of the trace
+            after skipped events.
+
+            Returns
+            -------
+            list
+                JSON serializable state, see apptrace.TraceIndex.
+        """
+        state = []
+        for core_id, ctx_stack in self.ctx_stack.items():
+            prev_ctx = self.prev_ctx.get(core_id)
+            state.append([core_id, [[ctx.handle, ctx.irq, ctx.name] for ctx in ctx_stack],
+                          [prev_ctx.handle, prev_ctx.irq, prev_ctx.name] if prev_ctx else None])
+        return state
+
+    def set_context_state(self, state):
+        """
+            Restores execution context on the cores in the state.
+
+            Parameters
+            ----------
+            state : list
+                state returned by get_context_state()
+        """
+        for core_id, ctx_stack, prev_ctx in state:
+            self.ctx_stack[core_id] = [SysViewEventContext(*ctx) for ctx in ctx_stack]
+            self.prev_ctx[core_id] = SysViewEventContext(*prev_ctx) if prev_ctx else None
+
+    def add_exporter(self, exporter):
+        """
+            Adds exporter of the processed events.
+
+            Parameters
+            ----------
+            exporter : object
+                object with on_new_event(event) method, which is called for every event
+                after its context is known, see export.ChromeTraceWriter.
+        """
+        self.exporters.append(exporter)
+
+    def set_events_filter(self, evt_ids, start_ts=None, end_ts=None):
+        """
+            Selects events to be processed. Other events are used only to keep track of execution context.
+
+            Parameters
+            ----------
+            evt_ids : set
+                IDs of the selected events, None selects all events.
+            start_ts : float
+                start of the time window of the selected events, None for the beginning of the trace.
+            end_ts : float
+                end of the time window of the selected events, None for the end of the trace.
+        """
+        self.events_filter = evt_ids
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+
+    def _event_selected(self, event):
+        """
+            Checks whether event is selected by the filter of the root processor.
+        """
+        root = self.root_proc
+        return ((root.events_filter is None or event.id in root.events_filter) and
+                (root.start_ts is None or event.ts >= root.start_ts) and
+                (root.end_ts is None or event.ts <= root.end_ts))
+
+    def _save_event(self, event):
+        """
+            Counts and saves event and passes it to the exporters.
+        """
+        apptrace.TraceDataProcessor.on_new_event(self, event)
+        for exporter in self.exporters:
+            exporter.on_new_event(event)
+
     def on_new_event(self, event):
         """
             Processes heap events.
@@ -1076,24 +1302,39 @@ class SysViewTraceDataProcessor(apptrace.TraceDataProcessor):
             for cached_evt in self.no_ctx_events:
                 cached_evt.ctx_name = prev_ctx.name
                 cached_evt.in_irq = prev_ctx.irq
+                if not self._event_selected(cached_evt):
+                    continue
                 # count and save the event
-                apptrace.TraceDataProcessor.on_new_event(self, cached_evt)
+                self._save_event(cached_evt)
                 if self.event_supported(event):
                     self.handle_event(event)
             del self.no_ctx_events[:]
+        if not self._event_selected(event):
+            return
         # count and save the event
-        apptrace.TraceDataProcessor.on_new_event(self, event)
+        self._save_event(event)
         if self.event_supported(event):
             self.handle_event(event)
 
-    def merge_and_process(self):
+    def merge_and_process(self, streams=None):
         """
             Merges events from all registered parsers, sorts them by timestamp and processes them.
-        """
-        all_events = []
-        for t in self.traces.values():
-            all_events.extend(t.events)
-        all_events.sort(key=lambda x: x.ts)
+
+            Parameters
+            ----------
+            streams : list
+                iterables of events ordered by timestamp, one per trace, see iterate_trace().
+                If specified, the events are merged and processed as they are parsed, so the parsers
+                do not need to keep them. Otherwise the events kept by the parsers are sorted.
+        """
+        if streams is None:
+            all_events = []
+            for t in self.traces.values():
+                all_events.extend(t.events)
+            all_events.sort(key=lambda x: x.ts)
+        else:
+            # the events with the same timestamp are taken in the order of the streams, as by the stable sort
+            all_events = heapq.merge(*streams, key=lambda x: x.ts)
         for event in all_events:
             self.on_new_event(event)
 
@@ -1240,12 +1481,13 @@ class SysViewHeapTraceDataParser(SysViewTraceDataExtEventParser):
     """
         SystemView trace data parser supporting heap events.
     """
-    def __init__(self, print_events=False, core_id=0):
+    def __init__(self, print_events=False, core_id=0, keep_all_events=True):
         """
             SystemView trace data parser supporting multiple event streams.
             see SysViewTraceDataExtEventParser.__init__()
         """
-        SysViewTraceDataExtEventParser.__init__(self, events_num=len(SysViewHeapEvent.events_fmt.keys()), core_id=core_id, print_events=print_events)
+        SysViewTraceDataExtEventParser.__init__(self, events_num=len(SysViewHeapEvent.events_fmt.keys()), core_id=core_id,
+                                                print_events=print_events, keep_all_events=keep_all_events)
 
     def read_extension_event(self, evt_id, core_id, reader):
         """
@@ -1283,15 +1525,33 @@ class SysViewHeapTraceDataProcessor(SysViewTraceDataProcessor, apptrace.BaseHeap
         self.elf_path = elf_path
         # self.no_ctx_events = []
         self.name = 'heap'
+        self._update_event_ids()
+
+    def _update_event_ids(self):
+        """
+            Updates heap events IDs from the offset assigned to the heap tracing module.
+        """
         stream = self.root_proc.get_trace_stream(0, SysViewTraceDataParser.STREAMID_HEAP)
         self.event_ids = {'alloc': stream.events_off, 'free': stream.events_off + 1}
 
+    def on_new_event(self, event):
+        """
+            see SysViewTraceDataProcessor.on_new_event()
+        """
+        if event.id == SYSVIEW_EVTID_MODULEDESC:
+            # the module description is already parsed, if the events are processed while parsing
+            self._update_event_ids()
+        SysViewTraceDataProcessor.on_new_event(self, event)
+
     def event_supported(self, event):
         heap_stream = self.root_proc.get_trace_stream(event.core_id, SysViewTraceDataParser.STREAMID_HEAP)
         return heap_stream.event_supported(event)
 
     def handle_event(self, event):
         heap_stream = self.root_proc.get_trace_stream(event.core_id, SysViewTraceDataParser.STREAMID_HEAP)
+        if heap_stream.events_off != self.event_ids['alloc']:
+            # the offset is restored without the module description, if parsing is started from trace index
+            self._update_event_ids()
         if (event.id - heap_stream.events_off) == 0:
             heap_event = apptrace.HeapTraceEvent(event, True, toolchain=self.toolchain,
                                                  elf_path=self.elf_path)
@@ -1376,7 +1636,7 @@ class SysViewLogTraceDataProcessor(SysViewTraceDataProcessor, apptrace.BaseLogTr
         """
         if self.root_proc == self:
             SysViewTraceDataProcessor.on_new_event(self, event)
-        if event.id == SYSVIEW_EVTID_PRINT_FORMATTED:
+        if event.id == SYSVIEW_EVTID_PRINT_FORMATTED and self._event_selected(event):
             log_evt = SysViewLogTraceEvent(event.ts, event.params['msg'].value)
             apptrace.BaseLogTraceDataProcessorImpl.on_new_event(self, log_evt)
 
@@ -17,9 +17,33 @@ import sys
 import traceback
 
 import espytrace.apptrace as apptrace
+import espytrace.export as export
 import espytrace.sysview as sysview
 
 
+def trace_events(trace_source, reader, parser, events_map, index=None, start_ts=None, end_ts=None, evt_ids=None):
+    """
+    Yields events of the trace as they are parsed.
+    """
+    try:
+        logging.info("Parse trace from '%s'...", trace_source)
+        if index is not None:
+            if index.load():
+                logging.info("Use trace index '%s'.", index.path)
+            else:
+                logging.info("Build trace index '%s'...", index.path)
+        for event in sysview.iterate_trace(reader, parser, events_map, index, start_ts, end_ts, evt_ids):
+            yield event
+    except (apptrace.ReaderTimeoutError, apptrace.ReaderShutdownRequest) as e:
+        logging.info("Stop parsing trace from '%s'. (%s)", trace_source, e)
+    except Exception as e:
+        logging.error("Failed to parse trace from '%s' (%s)!", trace_source, e)
+        parser.cleanup()
+        raise
+    finally:
+        reader.cleanup()
+
+
 def main():
 
     verbosity_levels = [
@@ -41,11 +65,24 @@ def main():
     parser.add_argument('--toolchain', '-t', help='Toolchain prefix.', type=str, default='xtensa-esp32-elf-')
     parser.add_argument('--events-map', '-e', help='Events map file.', type=str, default=os.path.join(os.path.dirname(__file__), 'SYSVIEW_FreeRTOS.txt'))
     parser.add_argument('--to-json', '-j', help='Print JSON.', action='store_true', default=False)
+    parser.add_argument('--to-chrome-trace', help='Write events to file in Chrome trace event format, e.g. to be opened by Perfetto UI.', type=str)
+    parser.add_argument('--to-columns', help='Write events to file in compact columnar format.', type=str)
+    parser.add_argument('--index', help='Use index of every trace file kept next to it to parse only the parts of the trace with the requested '
+                        'events. The index is built on the first run.', action='store_true')
+    parser.add_argument('--index-interval', help='Time interval between the points of the built index in seconds.', type=float,
+                        default=apptrace.TraceIndex.INTERVAL)
+    parser.add_argument('--start-ts', help='Process only the events with greater or equal timestamps in seconds.', type=float)
+    parser.add_argument('--end-ts', help='Process only the events with lower or equal timestamps in seconds.', type=float)
+    parser.add_argument('--event-ids', help='Comma separated list of IDs of events to be processed. By default all events are processed.',
+                        type=lambda s: set(int(evt_id, 0) for evt_id in s.split(',')))
     parser.add_argument('--verbose', '-v', help='Verbosity level. Default 1', choices=range(0, len(verbosity_levels)), type=int, default=1)
     args = parser.parse_args()
 
+    readers = []
+
     def sig_int_handler(signum, frame):
-        reader.cleanup()
+        for reader in readers:
+            reader.cleanup()
 
     signal.signal(signal.SIGINT, sig_int_handler)
 
@@ -60,17 +97,18 @@ def main():
 
     logging.basicConfig(level=verbosity_levels[args.verbose], format='[%(levelname)s] %(message)s')
 
-    # parse trace files
+    # create parsers of trace files, the events are not kept by them because they are processed while parsing
     parsers = []
+    streams = []
     for i, trace_source in enumerate(args.trace_sources):
         try:
-            parser = sysview.SysViewMultiTraceDataParser(print_events=False, core_id=i)
+            parser = sysview.SysViewMultiTraceDataParser(print_events=False, core_id=i, keep_all_events=False)
             if include_events['heap']:
                 parser.add_stream_parser(sysview.SysViewTraceDataParser.STREAMID_HEAP,
-                                         sysview.SysViewHeapTraceDataParser(print_events=False, core_id=i))
+                                         sysview.SysViewHeapTraceDataParser(print_events=False, core_id=i, keep_all_events=False))
             if include_events['log']:
                 parser.add_stream_parser(sysview.SysViewTraceDataParser.STREAMID_LOG,
-                                         sysview.SysViewLogTraceDataParser(print_events=False, core_id=i))
+                                         sysview.SysViewLogTraceDataParser(print_events=False, core_id=i, keep_all_events=False))
             parsers.append(parser)
         except Exception as e:
             logging.error('Failed to create data parser (%s)!', e)
@@ -80,22 +118,14 @@ def main():
         if not reader:
             logging.error('Failed to create trace reader!')
             sys.exit(2)
-        try:
-            # logging.info("Parse trace from '{}'...".format(trace_source))
-            logging.info("Parse trace from '%s'...", trace_source)
-            sysview.parse_trace(reader, parser, args.events_map)
-            logging.info('Parsing completed.')
-        except (apptrace.ReaderTimeoutError, apptrace.ReaderShutdownRequest) as e:
-            logging.info('Stop parsing trace. (%s)', e)
-        except Exception as e:
-            logging.error('Failed to parse trace (%s)!', e)
-            parser.cleanup()
-            traceback.print_exc()
-            sys.exit(2)
-        finally:
-            reader.cleanup()
-
-    # merge and process traces
+        readers.append(reader)
+        index = None
+        if args.index and isinstance(reader, apptrace.FileReader) and not isinstance(reader, apptrace.NetReader):
+            # the index depends on the set of stream parsers, their state is kept in it
+            index = apptrace.TraceIndex(reader.trace_file_path, args.index_interval, tag=','.join(str(s) for s in sorted(parser.stream_parsers)))
+        streams.append(trace_events(trace_source, reader, parser, args.events_map, index, args.start_ts, args.end_ts, args.event_ids))
+
+    # merge per-core event streams as they are parsed and process them
     try:
         proc = sysview.SysViewMultiStreamTraceDataProcessor(traces=parsers, print_events=args.dump_events, keep_all_events=True if args.to_json else False)
         if include_events['heap']:
@@ -104,6 +134,14 @@ def main():
         if include_events['log']:
             proc.add_stream_processor(sysview.SysViewTraceDataParser.STREAMID_LOG,
                                       sysview.SysViewLogTraceDataProcessor(root_proc=proc, print_log_events=args.print_events))
+        proc.set_events_filter(args.event_ids, args.start_ts, args.end_ts)
+        exporters = []
+        if args.to_chrome_trace:
+            exporters.append(export.ChromeTraceWriter(args.to_chrome_trace))
+        if args.to_columns:
+            exporters.append(export.ColumnarTraceWriter(args.to_columns))
+        for exporter in exporters:
+            proc.add_exporter(exporter)
     except Exception as e:
         logging.error('Failed to create data processor (%s)!', e)
         traceback.print_exc()
@@ -111,7 +149,7 @@ def main():
 
     try:
         logging.info("Process events from '%s'...", args.trace_sources)
-        proc.merge_and_process()
+        proc.merge_and_process(streams)
         logging.info('Processing completed.')
     except Exception as e:
         logging.error('Failed to process trace (%s)!', e)
@@ -122,6 +160,8 @@ def main():
             print(json.dumps(proc, cls=sysview.SysViewTraceDataJsonEncoder, indent=4, separators=(',', ': '), sort_keys=True))
         else:
             proc.print_report()
+        for exporter in exporters:
+            exporter.close()
         proc.cleanup()
 
 
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+# Measures the throughput of decoding SystemView events in a synthetic dual-core trace.
+#
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+try:
+    import espytrace.apptrace as apptrace
+    import espytrace.sysview as sysview
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+    import espytrace.apptrace as apptrace
+    import espytrace.sysview as sysview
+
+FILE_HEADER = b';\n; Version     SEGGER SystemViewer V2.42\n; Author      Espressif Inc\n; ESP_Extension\n;\n'
+
+
+def encode_u32(val: int) -> bytes:
+    data = bytearray()
+    while val >= 0x80:
+        data.append(0x80 | (val & 0x7F))
+        val >>= 7
+    data.append(val)
+    return bytes(data)
+
+
+def encode_event(evt_id: int, core_id: int, params: List[bytes]) -> bytes:
+    if evt_id < 0x40:
+        data = bytes([evt_id | (core_id << 6)])
+    else:
+        data = bytes([0x80 | (evt_id & 0x7F), (evt_id >> 7) | (core_id << 6)])
+    payload = b''.join(params)
+    if evt_id >= sysview.SYSVIEW_EVENT_ID_PREDEF_LEN_MAX:
+        data += bytes([len(payload)]) if len(payload) < 0x80 else bytes([0x80 | (len(payload) & 0x7F), len(payload) >> 7])
+    return data + payload + encode_u32(random.randrange(1, 5000))
+
+
+def generate_trace(path: str, events_num: int) -> None:
+    random.seed(1)
+    tids = [0x3ffb0000 + 0x160 * i for i in range(8)]
+    message = 'heap usage %d'.encode()
+    events: List[Callable[[], Tuple[int, List[bytes]]]] = [
+        lambda: (sysview.SYSVIEW_EVTID_ISR_ENTER, [encode_u32(random.randrange(32))]),
+        lambda: (sysview.SYSVIEW_EVTID_ISR_EXIT, []),
+        lambda: (sysview.SYSVIEW_EVTID_TASK_START_EXEC, [encode_u32(random.choice(tids))]),
+        lambda: (sysview.SYSVIEW_EVTID_TASK_STOP_EXEC, []),
+        lambda: (sysview.SYSVIEW_EVTID_TASK_STOP_READY, [encode_u32(random.choice(tids)), encode_u32(random.randrange(8))]),
+        lambda: (sysview.SYSVIEW_EVTID_IDLE, []),
+        # xQueueGenericSend
+        lambda: (53, [encode_u32(0x3ffc0000 + random.randrange(0x1000)), encode_u32(0x3ffd0000), encode_u32(10), encode_u32(0)]),
+        lambda: (sysview.SYSVIEW_EVTID_PRINT_FORMATTED, [bytes([len(message)]) + message, encode_u32(0), encode_u32(0)]),
+    ]
+    with open(path, 'wb') as f:
+        f.write(FILE_HEADER + bytes(sysview.SYSVIEW_SYNC_LEN))
+        sys_info = [encode_u32(160000000), encode_u32(160000000), encode_u32(0x3ff00000), encode_u32(0)]
+        f.write(encode_event(sysview.SYSVIEW_EVTID_INIT, 0, sys_info))
+        for _ in range(events_num - 1):
+            evt_id, params = random.choice(events)()
+            f.write(encode_event(evt_id, random.randrange(2), params))
+
+
+class CountingParser(sysview.SysViewTraceDataParser):
+    """
+        Parser which only counts the decoded events, so they are not kept in memory.
+    """
+    def __init__(self) -> None:
+        sysview.SysViewTraceDataParser.__init__(self)
+        self.events_num = 0
+
+    def on_new_event(self, event: sysview.SysViewEvent) -> None:
+        self.events_num += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark of decoding SystemView events')
+    parser.add_argument('--events', help='Number of events in the synthetic trace', type=int, default=500000)
+    parser.add_argument('--events-map', help='Events map file', type=str,
+                        default=os.path.join(os.path.dirname(__file__), '..', '..', 'SYSVIEW_FreeRTOS.txt'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trace_path = os.path.join(tmp_dir, 'trace.svdat')
+        generate_trace(trace_path, args.events)
+        trace_size = os.path.getsize(trace_path)
+
+        reader = apptrace.reader_create(trace_path, 0)
+        events_parser = CountingParser()
+        start = time.perf_counter()
+        try:
+            sysview.parse_trace(reader, events_parser, args.events_map)
+        except apptrace.ReaderTimeoutError:
+            pass  # end of trace
+        finally:
+            reader.cleanup()
+        elapsed = time.perf_counter() - start
+
+    if events_parser.events_num != args.events:
+        print('Decoded %d events of %d!' % (events_parser.events_num, args.events))
+        sys.exit(1)
+    print('%d events (%.1f MB) decoded in %.2f s: %.0f events/s, %.1f MB/s'
+          % (args.events, trace_size / 1e6, elapsed, args.events / elapsed, trace_size / 1e6 / elapsed))
+
+
+if __name__ == '__main__':
+    main()
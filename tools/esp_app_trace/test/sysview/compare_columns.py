@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+# Compares the events read from the file written by sysviewtrace_proc.py --to-columns
+# with the events in the output of sysviewtrace_proc.py -j for the same trace.
+#
+
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+sys.path.append(os.path.join(os.environ['IDF_PATH'], 'tools', 'esp_app_trace'))
+from espytrace import export  # noqa: E402
+
+
+# SYSVIEW_EVTID_PRINT_FORMATTED
+PRINT_FORMATTED_ID = 26
+
+
+def to_json_event(event: Dict[str, Any], heap_ids: List[int]) -> Dict[str, Any]:
+    """Converts the exported event like SysViewTraceDataJsonEncoder does."""
+    params = event.pop('params')
+    if event['id'] in heap_ids:
+        event.update({'addr': '0x{:x}'.format(params['addr']), 'size': params.get('size', 0),
+                      'callers': ['0x{:x}'.format(addr) for addr in params['callers']]})
+    elif event['id'] == PRINT_FORMATTED_ID:
+        event.update({'msg': params['msg'], 'lvl': params['lvl']})
+    else:
+        event['params'] = params
+    return event
+
+
+def main() -> None:
+    columns_path, json_path = sys.argv[1:]
+    columns, strings, params = export.read_columns(columns_path)
+    with open(json_path, 'r') as f:
+        trace = json.load(f)
+    heap_ids = list(trace['streams'].get('heap', {}).values())
+    # the print events are in the JSON output twice, as the pre-defined events and as the events of the log stream
+    events = [event for (i, event) in enumerate(trace['events'])
+              if not (event['id'] == PRINT_FORMATTED_ID and 'log' in trace['streams'] and i > 0 and trace['events'][i - 1] == event)]
+
+    if len(events) != len(columns['ts']):
+        sys.exit('{} events in {}, {} in {}'.format(len(columns['ts']), columns_path, len(events), json_path))
+    for (i, event) in enumerate(events):
+        exported = to_json_event({
+            'core_id': columns['core_id'][i],
+            'ctx_name': strings[columns['ctx'][i]],
+            'id': columns['id'][i],
+            'in_irq': bool(columns['in_irq'][i]),
+            'params': params[i],
+            'ts': columns['ts'][i],
+        }, heap_ids)
+        if exported != event:
+            sys.exit('Event {} differs: {} in {}, {} in {}'.format(i, exported, columns_path, event, json_path))
+    print('{} events match'.format(len(events)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+# Compares the output of sysviewtrace_proc.py -j for a time window or a set of event IDs with the events
+# selected from the output of the full run. The events must be the same including their execution contexts,
+# even though the execution contexts are known only from the events preceding the window.
+#
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r') as f:
+        events: List[Dict[str, Any]] = json.load(f)['events']
+    return events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compares events of the time window with the events of the full run')
+    parser.add_argument('full', help='JSON output of the full run')
+    parser.add_argument('window', help='JSON output of the run for the time window or the event IDs')
+    parser.add_argument('--start-ts', type=float)
+    parser.add_argument('--end-ts', type=float)
+    parser.add_argument('--event-ids', type=lambda s: set(int(evt_id, 0) for evt_id in s.split(',')))
+    args = parser.parse_args()
+
+    expected = [event for event in load_events(args.full)
+                if (args.start_ts is None or event['ts'] >= args.start_ts)
+                and (args.end_ts is None or event['ts'] <= args.end_ts)
+                and (args.event_ids is None or event['id'] in args.event_ids)]
+    events = load_events(args.window)
+    if not expected:
+        sys.exit('No events selected from {}'.format(args.full))
+    wrong = [(i, event, expected_event) for (i, (event, expected_event)) in enumerate(zip(events, expected))
+             if event != expected_event]
+    for (i, event, expected_event) in wrong:
+        print('Event {} differs: {} in {}, {} in {}'.format(i, event, args.window, expected_event, args.full))
+    if wrong or len(events) != len(expected):
+        sys.exit('{} of {} events differ, {} events in {}'.format(len(wrong), len(expected), len(events), args.window))
+    print('{} events match'.format(len(events)))
+
+
+if __name__ == '__main__':
+    main()
@@ -27,3 +27,48 @@
     && diff output.json expected_output_mcore.json \
     && python -m coverage report \
 ; } || { echo 'The test for mcore sysviewtrace_proc JSON functionality has failed. Please examine the artifacts.' ; exit 1; }
+
+{ python -m coverage debug sys \
+    && python -m coverage erase &> output \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py --to-chrome-trace output_chrome.json -b test.elf cpu0.svdat cpu1.svdat &>> output \
+    && diff output_chrome.json expected_output_chrome.json \
+    && python -m coverage report \
+; } || { echo 'The test for sysviewtrace_proc Chrome trace export has failed. Please examine the artifacts.' ; exit 1; }
+
+{ python -m coverage debug sys \
+    && python -m coverage erase &> output.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py -j --to-columns output.columns -b test.elf cpu0.svdat cpu1.svdat &>> output.json \
+    && diff output.json expected_output.json \
+    && python compare_columns.py output.columns output.json \
+    && python -m coverage erase &> output.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py -j --to-columns output.columns -b sysview_tracing_heap_log.elf heap_log_mcore.svdat &>> output.json \
+    && python compare_columns.py output.columns output.json \
+    && python -m coverage report \
+; } || { echo 'The test for sysviewtrace_proc columnar export has failed. Please examine the artifacts.' ; exit 1; }
+
+# the events in the time window and with the given IDs must have the same execution context as in the full run
+{ python -m coverage debug sys \
+    && rm -f cpu0.svdat.idx cpu1.svdat.idx heap_log_mcore.svdat.idx \
+    && python -m coverage erase &> output_window.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py -j --start-ts 0.01 --end-ts 0.02 -b test.elf cpu0.svdat cpu1.svdat &>> output_window.json \
+    && python compare_window.py expected_output.json output_window.json --start-ts 0.01 --end-ts 0.02 \
+    && python -m coverage erase &> output_window.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py --index --index-interval 0.005 --start-ts 0.01 --end-ts 0.02 -j -b test.elf cpu0.svdat cpu1.svdat &>> output_window.json \
+    && python compare_window.py expected_output.json output_window.json --start-ts 0.01 --end-ts 0.02 \
+    && python -m coverage erase &> output_window.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py --index --index-interval 0.005 --start-ts 0.01 --end-ts 0.02 -j -b test.elf cpu0.svdat cpu1.svdat &>> output_window.json \
+    && python compare_window.py expected_output.json output_window.json --start-ts 0.01 --end-ts 0.02 \
+    && python -m coverage erase &> output_window.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py --index --index-interval 0.005 --event-ids 53,6 -j -b test.elf cpu0.svdat cpu1.svdat &>> output_window.json \
+    && python compare_window.py expected_output.json output_window.json --event-ids 53,6 \
+    && python -m coverage erase &> output.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py -j -b sysview_tracing_heap_log.elf heap_log_mcore.svdat &>> output.json \
+    && python -m coverage erase &> output_window.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py --index --index-interval 0.05 --start-ts 1.5 --end-ts 1.6 -j -b sysview_tracing_heap_log.elf heap_log_mcore.svdat &>> output_window.json \
+    && python compare_window.py output.json output_window.json --start-ts 1.5 --end-ts 1.6 \
+    && python -m coverage erase &> output_window.json \
+    && python -m coverage run -a $IDF_PATH/tools/esp_app_trace/sysviewtrace_proc.py --index --index-interval 0.05 --start-ts 1.5 --end-ts 1.6 -j -b sysview_tracing_heap_log.elf heap_log_mcore.svdat &>> output_window.json \
+    && python compare_window.py output.json output_window.json --start-ts 1.5 --end-ts 1.6 \
+    && rm -f cpu0.svdat.idx cpu1.svdat.idx heap_log_mcore.svdat.idx \
+    && python -m coverage report \
+; } || { echo 'The test for sysviewtrace_proc trace index functionality has failed. Please examine the artifacts.' ; exit 1; }
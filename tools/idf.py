@@ -22,20 +22,26 @@ import shlex
 import subprocess
 import sys
 from collections import Counter, OrderedDict, _OrderedDictKeysView
+from contextlib import redirect_stdout
+from functools import partial
 from importlib import import_module
+from importlib.util import find_spec
+from io import StringIO
 from pkgutil import iter_modules
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 # pyc files remain in the filesystem when switching between branches which might raise errors for incompatible
 # idf.py extensions. Therefore, pyc file generation is turned off:
 sys.dont_write_bytecode = True
 
+import python_deps_cache  # noqa: E402
 import python_version_checker  # noqa: E402
 
 try:
     from idf_py_actions.errors import FatalError  # noqa: E402
-    from idf_py_actions.tools import (PROG, SHELL_COMPLETE_RUN, SHELL_COMPLETE_VAR, PropertyDict,  # noqa: E402
-                                      debug_print_idf_version, get_target, merge_action_lists, print_warning)
+    from idf_py_actions.tools import (PROG, SHELL_COMPLETE_RUN, SHELL_COMPLETE_VAR, ActionsManifest,  # noqa: E402
+                                      PropertyDict, UsedActionsRecorder, copy_action_lists, debug_print_idf_version,
+                                      get_target, merge_action_lists, print_warning)
     if os.getenv('IDF_COMPONENT_MANAGER') != '0':
         from idf_component_manager import idf_extensions
 except ImportError as e:
@@ -49,6 +55,9 @@ except ImportError as e:
 
     sys.exit(1)
 
+# Arguments showing the help, which needs all the actions
+HELP_ARGS = {'help', '--help', '-h'}
+
 # Use this Python interpreter for any subprocesses we launch
 PYTHON = sys.executable
 
@@ -89,25 +98,34 @@ def check_environment() -> List:
 
     # check Python dependencies
     checks_output.append('Checking Python dependencies...')
-    try:
-        out = subprocess.check_output(
-            [
-                os.environ['PYTHON'],
-                os.path.join(os.environ['IDF_PATH'], 'tools', 'idf_tools.py'),
-                'check-python-dependencies',
-            ],
-            env=os.environ,
-        )
-
-        checks_output.append(out.decode('utf-8', 'ignore').strip())
-    except subprocess.CalledProcessError as e:
-        print_warning(e.output.decode('utf-8', 'ignore'), stream=sys.stderr)
-        debug_print_idf_version()
-        raise SystemExit(1)
+    if python_deps_cache.is_satisfied():
+        # nothing has changed since the last successful check
+        checks_output.append('Python requirements are satisfied.')
+    else:
+        checks_output.append(check_python_dependencies())
 
     return checks_output
 
 
+def check_python_dependencies() -> str:
+    """
+    Run "idf_tools.py check-python-dependencies" in this Python interpreter and return its output
+    """
+    import idf_tools
+
+    out = StringIO()
+    try:
+        with redirect_stdout(out):
+            idf_tools.main(['check-python-dependencies'])
+    except SystemExit as e:
+        if e.code:
+            print_warning(out.getvalue(), stream=sys.stderr)
+            debug_print_idf_version()
+            raise SystemExit(1)
+
+    return out.getvalue().strip()
+
+
 def _safe_relpath(path: str, start: Optional[str]=None) -> str:
     """ Return a relative path, same as os.path.relpath, but only if this is possible.
 
@@ -119,7 +137,11 @@ def _safe_relpath(path: str, start: Optional[str]=None) -> str:
         return os.path.abspath(path)
 
 
-def init_cli(verbose_output: List=None) -> Any:
+def init_cli(verbose_output: List=None, argv: Optional[List[str]]=None) -> Any:
+    """
+    Create the CLI of idf.py. If the command line arguments are given, only the extensions whose actions can be run
+    by them are loaded. Otherwise, all the extensions are loaded.
+    """
     # Click is imported here to run it after check_environment()
     import click
 
@@ -638,8 +660,9 @@ def init_cli(verbose_output: List=None) -> Any:
 
     # Set `complete_var` to not existing environment variable name to prevent early cmd completion
     project_dir = parse_project_dir(standalone_mode=False, complete_var='_IDF.PY_COMPLETE_NOT_EXISTING')
+    target = get_target(project_dir)
 
-    all_actions: Dict = {}
+    all_actions: Dict = merge_action_lists()
     # Load extensions from components dir
     idf_py_extensions_path = os.path.join(os.environ['IDF_PATH'], 'tools', 'idf_py_actions')
     extension_dirs = [os.path.realpath(idf_py_extensions_path)]
@@ -650,34 +673,66 @@ def init_cli(verbose_output: List=None) -> Any:
             if path not in extension_dirs:
                 extension_dirs.append(path)
 
-    extensions = []
+    # The extensions are (name, path of the source, function importing the module). The path of the source is used
+    # by the manifest of actions. Extensions without it are always loaded.
+    extensions: List[Tuple[str, Optional[str], Callable[[], Any]]] = []
     for directory in extension_dirs:
         if directory and not os.path.exists(directory):
             print_warning('WARNING: Directory with idf.py extensions doesn\'t exist:\n    %s' % directory)
             continue
 
         sys.path.append(directory)
-        for _finder, name, _ispkg in sorted(iter_modules([directory])):
+        for _finder, name, ispkg in sorted(iter_modules([directory])):
             if name.endswith('_ext'):
-                extensions.append((name, import_module(name)))
+                extensions.append((name, os.path.join(directory, name if ispkg else name + '.py'), partial(import_module, name)))
 
     # Load component manager idf.py extensions if not explicitly disabled
     if os.getenv('IDF_COMPONENT_MANAGER') != '0':
-        extensions.append(('component_manager_ext', idf_extensions))
+        extensions.append(('component_manager_ext', None, lambda: idf_extensions))
 
     # Optional load `pyclang` for additional clang-tidy related functionalities
-    try:
-        from pyclang import idf_extension
-
-        extensions.append(('idf_clang_tidy_ext', idf_extension))
-    except ImportError:
-        pass
-
-    for name, extension in extensions:
+    pyclang_spec = find_spec('pyclang')
+    if pyclang_spec is not None and pyclang_spec.origin:
+        extensions.append(('idf_clang_tidy_ext', os.path.join(os.path.dirname(pyclang_spec.origin), 'idf_extension.py'),
+                           partial(import_module, 'pyclang.idf_extension')))
+
+    # Without the command line, all the actions have to be known, e.g. for the shell completion
+    manifest = ActionsManifest(os.path.join(sys.prefix, ActionsManifest.FILE_NAME), project_dir, target)
+    required_actions = None
+    # An extension without an up-to-date entry can use the actions of any other extension
+    if (argv and not HELP_ARGS.intersection(argv)
+            and all(manifest.get(source_path) for _name, source_path, _load in extensions if source_path)):
+        required_actions = manifest.get_required_actions(argv)
+
+    for name, source_path, load_extension in extensions:
+        entry = manifest.get(source_path) if source_path else None
+        if (entry is not None and required_actions is not None and not entry['always_load']
+                and not required_actions.intersection(entry['actions'])):
+            # none of the actions of the extension will be run
+            continue
+        try:
+            extension = load_extension()
+        except ImportError:
+            if name == 'idf_clang_tidy_ext':
+                continue
+            raise
         try:
-            all_actions = merge_action_lists(all_actions, extension.action_extensions(all_actions, project_dir))
+            base_actions = copy_action_lists(all_actions)
+            used_actions = all_actions['actions'] = UsedActionsRecorder(all_actions['actions'])
+            extension_actions = extension.action_extensions(all_actions, project_dir)
+            # the extensions owning the actions used by the extension have to be loaded together with it
+            used_action_names = set(used_actions.used)
+            # an extension modifying the actions of the other extensions in place has to be always loaded
+            modifies_base_actions = base_actions != all_actions
+            all_actions = merge_action_lists(all_actions, extension_actions)
         except AttributeError:
             print_warning('WARNING: Cannot load idf.py extension "%s"' % name)
+            continue
+        if source_path:
+            manifest.update(source_path, extension_actions, always_load=modifies_base_actions,
+                            used_actions=used_action_names)
+
+    manifest.save()
 
     # Load extensions from project dir
     if os.path.exists(os.path.join(project_dir, 'idf_ext.py')):
@@ -697,7 +752,7 @@ def init_cli(verbose_output: List=None) -> Any:
     cli_help = (
         'ESP-IDF CLI build management tool. '
         'For commands that are not known to idf.py an attempt to execute it as a build system target will be made. '
-        'Selected target: {}'.format(get_target(project_dir)))
+        'Selected target: {}'.format(target))
 
     return CLI(help=cli_help, verbose_output=verbose_output, all_actions=all_actions)
 
@@ -712,16 +767,17 @@ def main(argv: List[Any] = None) -> None:
     except FileNotFoundError as e:
         raise FatalError(f'ERROR: {e}. Working directory cannot be established. Check its existence.')
 
+    argv = expand_file_arguments(argv or sys.argv[1:])
+
     try:
-        cli = init_cli(verbose_output=checks_output)
+        # The shell completion needs all the actions
+        cli = init_cli(verbose_output=checks_output, argv=None if SHELL_COMPLETE_RUN else argv)
     except ImportError:
         if SHELL_COMPLETE_RUN:
             pass
         else:
             raise
     else:
-        argv = expand_file_arguments(argv or sys.argv[1:])
-
         cli(argv, prog_name=PROG, complete_var=SHELL_COMPLETE_VAR)
 
 
@@ -12,17 +12,20 @@ import time
 from base64 import b64decode
 from textwrap import indent
 from threading import Thread
-from typing import Any, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
 
 from click import INT
 from click.core import Context
-from esp_coredump import CoreDump
 from idf_py_actions.constants import OPENOCD_TAGET_CONFIG, OPENOCD_TAGET_CONFIG_DEFAULT
 from idf_py_actions.errors import FatalError
 from idf_py_actions.serial_ext import BAUD_RATE, PORT
 from idf_py_actions.tools import (PropertyDict, ensure_build_directory, generate_hints, get_default_serial_port,
                                   get_sdkconfig_value, yellow_print)
 
+if TYPE_CHECKING:
+    # esp_coredump is imported when it is used because importing it takes a significant part of the start-up time
+    from esp_coredump import CoreDump
+
 PYTHON = sys.executable
 ESP_ROM_INFO_FILE = 'roms.json'
 GDBINIT_PYTHON_TEMPLATE = '''
@@ -150,7 +153,8 @@ def action_extensions(base_actions: Dict, project_path: str) -> Dict:
                                   gdb_timeout_sec: int = None,
                                   core: str = None,
                                   chip_rev: str = None,
-                                  save_core: str = None) -> CoreDump:
+                                  save_core: str = None) -> 'CoreDump':
+        from esp_coredump import CoreDump
 
         ensure_build_directory(args, ctx.info_name)
         project_desc = get_project_desc(args, ctx)
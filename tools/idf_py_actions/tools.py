@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2022-2023 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
 import asyncio
+import hashlib
 import importlib
 import json
 import os
@@ -8,10 +9,11 @@ import re
 import subprocess
 import sys
 from asyncio.subprocess import Process
+from functools import lru_cache
 from io import open
 from pkgutil import iter_modules
 from types import FunctionType
-from typing import Any, Dict, Generator, List, Match, Optional, TextIO, Tuple, Union
+from typing import Any, Dict, Generator, List, Match, Optional, Pattern, Set, TextIO, Tuple, Union
 
 import click
 import yaml
@@ -21,6 +23,16 @@ from idf_py_actions.errors import NoSerialPortFoundError
 from .constants import GENERATORS
 from .errors import FatalError
 
+# The parser of regular expressions is used to pre-select hints, it is a private module of re
+try:
+    from re import _parser as sre_parse  # type: ignore
+except ImportError:
+    try:
+        # Python < 3.11
+        import sre_parse
+    except ImportError:
+        sre_parse = None
+
 # Name of the program, normally 'idf.py'.
 # Can be overridden from idf.bat using IDF_PY_PROGRAM_NAME
 PROG = os.getenv('IDF_PY_PROGRAM_NAME', 'idf.py')
@@ -167,16 +179,250 @@ def debug_print_idf_version() -> None:
     print_warning(f'ESP-IDF {idf_version() or "version unknown"}')
 
 
+# Compiled form of hints.yml, it is stored in the Python environment
+HINTS_CACHE_FILE = 'idf-py-hints-cache.json'
+HINTS_CACHE_VERSION = 1
+
+# Shorter literals are not selective enough to pre-select hints
+MIN_HINT_LITERAL_LEN = 3
+# Characters frequent in build output, literals preferably don't start with them so they are looked for at fewer places
+COMMON_OUTPUT_CHARS_RE = re.compile(r'[a-z0-9 _/.=-]*')
+
+
+def _max_width(items: List, state: Any) -> Optional[int]:
+    """Returns the maximal length of a match of the parsed regular expression, None if it is not limited"""
+    width = sre_parse.SubPattern(state, items).getwidth()[1]
+    return None if width >= sre_parse.MAXREPEAT else width
+
+
+def _find_literals(items: List, state: Any) -> Optional[Tuple[List[str], Optional[int]]]:
+    """
+    Returns literals of a parsed regular expression such that at least one of them is part of every match,
+    and the maximal length of a match before the literal (None if it is not limited). Returns None if there are no
+    such literals. The longest literals are preferred.
+    """
+    candidates = []
+    run = ''
+    for i, (op, av) in enumerate(items + [(None, None)]):
+        if op == sre_parse.LITERAL:
+            run += chr(av)
+            continue
+        if run:
+            offset = _max_width(items[:i - len(run)], state)
+            # every part of the literal is required as well
+            start = COMMON_OUTPUT_CHARS_RE.match(run).end()  # type: ignore
+            if len(run) - start >= MIN_HINT_LITERAL_LEN:
+                run = run[start:]
+                offset = None if offset is None else offset + start
+            candidates.append(([run], offset))
+            run = ''
+        if op == sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:  # av is (group, add_flags, del_flags, pattern)
+            alternatives = [list(av[3])]
+        elif op == sre_parse.BRANCH:
+            alternatives = [list(alternative) for alternative in av[1]]
+        else:
+            # Repeats, character sets, assertions, ... don't have to contain or match a literal
+            continue
+        literals: List[str] = []
+        offsets: List[Optional[int]] = []
+        for alternative in alternatives:
+            found = _find_literals(alternative, state)
+            if found is None:
+                break
+            literals += found[0]
+            offsets.append(found[1])
+        else:
+            prefix_width = _max_width(items[:i], state)
+            if prefix_width is None or None in offsets:
+                candidates.append((literals, None))
+            else:
+                candidates.append((literals, prefix_width + max(offset or 0 for offset in offsets)))
+
+    candidates = [c for c in candidates if min(len(literal) for literal in c[0]) >= MIN_HINT_LITERAL_LEN]
+    return max(candidates, key=lambda c: min(len(literal) for literal in c[0]), default=None)
+
+
+def _find_regex_literals(regex: str) -> Optional[Tuple[List[str], Optional[int]]]:
+    """
+    Returns literals required by the regular expression as _find_literals() does, or None if they cannot be found.
+    Rules without literals are always matched.
+    """
+    if sre_parse is None:
+        return None
+    try:
+        parsed = sre_parse.parse(regex)
+        if parsed.state.flags & re.IGNORECASE:
+            return None
+        return _find_literals(list(parsed), parsed.state)
+    except Exception:
+        # The parser is not a public API and it can change in future Python versions. Matching every hint separately
+        # is slower but gives the same hints.
+        return None
+
+
+def _trie_regex(words: List[str]) -> str:
+    """
+    Returns a regular expression matching any of the words. Common prefixes are merged, so at a given position the
+    expression compares every character at most once. The longest word is matched if words share a prefix.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # end of a word
+
+    def to_regex(node: Dict) -> str:
+        alternatives = [re.escape(char) + to_regex(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        regex = alternatives[0] if len(alternatives) == 1 else '(?:{})'.format('|'.join(alternatives))
+        if '' in node:
+            regex = '(?:{})?'.format(regex)
+        return regex
+
+    return to_regex(trie)
+
+
+class CompiledHints:
+    """
+    Hints from hints.yml prepared for matching. Hints with variables are expanded into one rule for every set of
+    variables. Most of the rules require a literal to be present in the output, e.g. "error: unknown type name '".
+    These literals are searched for in one pass and only the rules for which one of the literals was found are
+    matched with their regular expressions, starting near the first occurrence of the literal if possible.
+    The output of generate() is the same as matching all the rules in order.
+    """
+    def __init__(self, yml: List[Dict], rules: List[Dict]) -> None:
+        self.yml = yml
+        self.rules = rules
+        self._compiled: Dict[int, Pattern] = {}
+
+        literals = sorted({literal for rule in rules for literal in rule['literals'] or []})
+        self._scanner = re.compile(_trie_regex(literals)) if literals else None
+        # The scanner finds the longest literal starting at a position, its prefixes start at the position as well
+        self._prefixes = {literal: [other for other in literals if literal.startswith(other)] for literal in literals}
+        self._all_have_literals = all(rule['literals'] is not None for rule in rules)
+
+    @classmethod
+    def from_yml(cls, yml: List[Dict]) -> 'CompiledHints':
+        rules = []
+        for index, hint in enumerate(yml):
+            try:
+                variables_list = hint.get('variables')
+                if variables_list:
+                    expanded = [(hint['re'].format(*variables['re_variables']), variables['hint_variables'])
+                                for variables in variables_list]
+                else:
+                    expanded = [(hint['re'], None)]
+                for regex, hint_variables in expanded:
+                    re.compile(regex)
+                    found = _find_regex_literals(regex)
+                    rules.append({
+                        'index': index,
+                        're': regex,
+                        'hint_variables': hint_variables,
+                        'match_to_output': bool(hint.get('match_to_output', '')),
+                        'literals': found[0] if found else None,
+                        'max_offset': found[1] if found else None,
+                    })
+            except KeyError as e:
+                red_print('Argument {} missing in {}. Check hints.yml file.'.format(e, hint))
+                sys.exit(1)
+            except re.error as e:
+                red_print('{} from hints.yml have {} problem. Check hints.yml file.'.format(hint['re'], e))
+                sys.exit(1)
+        return cls(yml, rules)
+
+    @classmethod
+    def load(cls, hints_path: str, cache_path: Optional[str]=None) -> 'CompiledHints':
+        """
+        Loads hints from the YAML file. The compiled form is cached (in the Python environment by default),
+        the YAML file is parsed again only when its content changes.
+        """
+        cache_path = cache_path or os.path.join(sys.prefix, HINTS_CACHE_FILE)
+        with open(hints_path, 'rb') as f:
+            content = f.read()
+        key = {
+            'version': HINTS_CACHE_VERSION,
+            # literals are found by the parser of regular expressions which can change between Python versions
+            'python': sys.version,
+            'path': os.path.realpath(hints_path),
+            'sha256': hashlib.sha256(content).hexdigest(),
+        }
+        try:
+            with open(cache_path, 'r') as f:
+                cache = json.load(f)
+            if cache['key'] == key:
+                return cls(cache['yml'], cache['rules'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        hints = cls.from_yml(yaml.safe_load(content))
+        tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'key': key, 'yml': hints.yml, 'rules': hints.rules}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # The cache is just an optimization, e.g. the Python environment can be read-only
+            pass
+        return hints
+
+    def _search(self, index: int, output: str, pos: int) -> Optional[Match[str]]:
+        if index not in self._compiled:
+            self._compiled[index] = re.compile(self.rules[index]['re'])
+        return self._compiled[index].search(output, pos)
+
+    def generate(self, output: str) -> Generator:
+        """Yields hints for the output with new lines trimmed"""
+        found: Dict[str, int] = {}  # the first position of the found literals
+        match = self._scanner.search(output) if self._scanner else None
+        while match:
+            for literal in self._prefixes[match.group()]:
+                found.setdefault(literal, match.start())
+            # literals can overlap, continue right after the start of the found one
+            match = self._scanner.search(output, match.start() + 1)  # type: ignore
+        if not found and self._all_have_literals:
+            # the usual case for a line of the output
+            return
+
+        for index, rule in enumerate(self.rules):
+            pos = 0
+            if rule['literals'] is not None:
+                if found.keys().isdisjoint(rule['literals']):
+                    continue
+                if rule['max_offset'] is not None:
+                    # a match contains one of the literals, so it cannot start sooner
+                    pos = max(0, min(found[literal] for literal in rule['literals'] if literal in found) - rule['max_offset'])
+            match = self._search(index, output, pos)
+            if not match:
+                continue
+            hint = self.yml[rule['index']]
+            if rule['hint_variables'] is not None:
+                try:
+                    yield ' '.join(['HINT:', hint['hint'].format(*rule['hint_variables'])])
+                except KeyError as e:
+                    red_print('Argument {} missing in {}. Check hints.yml file.'.format(e, hint))
+                    sys.exit(1)
+            else:
+                extra_info = ', '.join(match.groups()) if rule['match_to_output'] else ''
+                try:
+                    yield ' '.join(['HINT:', hint['hint'].format(extra_info)])
+                except KeyError:
+                    raise KeyError("Argument 'hint' missing in {}. Check hints.yml file.".format(hint))
+
+
+@lru_cache()
 def load_hints() -> Dict:
-    """Helper function to load hints yml file"""
+    """Helper function to load hints yml file and hint modules, they are loaded only once"""
     hints: Dict = {
         'yml': [],
         'modules': []
     }
 
     current_module_dir = os.path.dirname(__file__)
-    with open(os.path.join(current_module_dir, 'hints.yml'), 'r') as file:
-        hints['yml'] = yaml.safe_load(file)
+    hints['compiled'] = CompiledHints.load(os.path.join(current_module_dir, 'hints.yml'))
+    hints['yml'] = hints['compiled'].yml
 
     hint_modules_dir = os.path.join(current_module_dir, 'hint_modules')
     if not os.path.exists(hint_modules_dir):
@@ -210,39 +456,9 @@ def generate_hints_buffer(output: str, hints: Dict) -> Generator:
 
     # hints expect new lines trimmed
     output = ' '.join(line.strip() for line in output.splitlines() if line.strip())
-    for hint in hints['yml']:
-        variables_list = hint.get('variables')
-        hint_list, hint_vars, re_vars = [], [], []
-        match: Optional[Match[str]] = None
-        try:
-            if variables_list:
-                for variables in variables_list:
-                    hint_vars = variables['hint_variables']
-                    re_vars = variables['re_variables']
-                    regex = hint['re'].format(*re_vars)
-                    if re.compile(regex).search(output):
-                        try:
-                            hint_list.append(hint['hint'].format(*hint_vars))
-                        except KeyError as e:
-                            red_print('Argument {} missing in {}. Check hints.yml file.'.format(e, hint))
-                            sys.exit(1)
-            else:
-                match = re.compile(hint['re']).search(output)
-        except KeyError as e:
-            red_print('Argument {} missing in {}. Check hints.yml file.'.format(e, hint))
-            sys.exit(1)
-        except re.error as e:
-            red_print('{} from hints.yml have {} problem. Check hints.yml file.'.format(hint['re'], e))
-            sys.exit(1)
-        if hint_list:
-            for message in hint_list:
-                yield ' '.join(['HINT:', message])
-        elif match:
-            extra_info = ', '.join(match.groups()) if hint.get('match_to_output', '') else ''
-            try:
-                yield ' '.join(['HINT:', hint['hint'].format(extra_info)])
-            except KeyError:
-                raise KeyError("Argument 'hint' missing in {}. Check hints.yml file.".format(hint))
+    # hints dictionaries not created by load_hints() don't have the compiled form
+    compiled = hints.get('compiled') or CompiledHints.from_yml(hints['yml'])
+    yield from compiled.generate(output)
 
 
 def generate_hints(*filenames: str) -> Generator:
@@ -650,6 +866,182 @@ def merge_action_lists(*action_lists: Dict) -> Dict:
     return merged_actions
 
 
+def copy_action_lists(action_lists: Any) -> Any:
+    """
+    Copies the dicts and lists of the action lists. The other objects (callbacks, types of options, ...) are shared.
+    """
+    if isinstance(action_lists, dict):
+        return {key: copy_action_lists(value) for key, value in action_lists.items()}
+    if isinstance(action_lists, list):
+        return [copy_action_lists(value) for value in action_lists]
+    return action_lists
+
+
+class UsedActionsRecorder(dict):
+    """
+    Actions of the already loaded extensions passed to action_extensions() of the next extension. The names of the
+    actions the extension looks up, changes or deletes are recorded in `used`. Listing the actions records all of them.
+    """
+    def __init__(self, actions: Dict) -> None:
+        super().__init__(actions)
+        self.used: Set[str] = set()
+
+    def __getitem__(self, name: str) -> Any:
+        self.used.add(name)
+        return super().__getitem__(name)
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        self.used.add(name)
+        super().__setitem__(name, value)
+
+    def __delitem__(self, name: str) -> None:
+        self.used.add(name)
+        super().__delitem__(name)
+
+    def __contains__(self, name: object) -> bool:
+        self.used.add(str(name))
+        return super().__contains__(name)
+
+    def get(self, name: str, default: Any=None) -> Any:
+        self.used.add(name)
+        return super().get(name, default)
+
+    def pop(self, name: str, *default: Any) -> Any:
+        self.used.add(name)
+        return super().pop(name, *default)
+
+    def __iter__(self) -> Any:
+        self.used.update(dict.keys(self))
+        return super().__iter__()
+
+    def keys(self) -> Any:
+        self.used.update(dict.keys(self))
+        return super().keys()
+
+    def values(self) -> Any:
+        self.used.update(dict.keys(self))
+        return super().values()
+
+    def items(self) -> Any:
+        self.used.update(dict.keys(self))
+        return super().items()
+
+
+class ActionsManifest(object):
+    """
+    Cached summary of the actions provided by idf.py extensions: their names, aliases, dependencies and options.
+
+    Importing an extension and calling its action_extensions() can be slow. With the manifest, an extension has to be
+    loaded only if one of its actions can be run, or if it provides global options or global action callbacks
+    affecting every run. The extensions owning the actions used by a loaded extension are loaded as well. The entry
+    of an extension is outdated if any Python file in its directory (or package), the project directory or the target
+    of the project change.
+    """
+    VERSION = 2
+    FILE_NAME = 'idf-py-actions-manifest.json'
+
+    def __init__(self, path: str, project_dir: str, target: Optional[str]) -> None:
+        self.path = path
+        self.project_dir = project_dir
+        self.target = target
+        self.changed = False
+        self._dir_signatures: Dict[str, Optional[List]] = {}
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+            self.extensions: Dict[str, Dict] = manifest['extensions'] if manifest['version'] == self.VERSION else {}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.extensions = {}
+
+    def _get_dir_signature(self, directory: str) -> Optional[List]:
+        if directory not in self._dir_signatures:
+            try:
+                self._dir_signatures[directory] = sorted([entry.name, entry.stat().st_mtime_ns, entry.stat().st_size]
+                                                         for entry in os.scandir(directory)
+                                                         if entry.name.endswith('.py') and entry.is_file())
+            except OSError:
+                self._dir_signatures[directory] = None
+        return self._dir_signatures[directory]
+
+    def _get_signature(self, source_path: str) -> List:
+        signature = [self.project_dir, self.target, self._get_dir_signature(os.path.dirname(source_path))]
+        if os.path.isdir(source_path):
+            signature.append(self._get_dir_signature(source_path))
+        return signature
+
+    def get(self, source_path: str) -> Optional[Dict]:
+        """
+        Returns the entry of the extension, if it is up-to-date.
+        """
+        entry = self.extensions.get(source_path)
+        if entry is not None and entry['signature'] == self._get_signature(source_path):
+            return entry
+        return None
+
+    def update(self, source_path: str, actions: Dict, always_load: bool=False,
+               used_actions: Optional[Set[str]]=None) -> None:
+        """
+        Records the actions returned by action_extensions() of the extension and the names of the actions of the other
+        extensions it used.
+        """
+        always_load = always_load or bool(actions.get('global_options') or actions.get('global_action_callbacks'))
+        summary = {}
+        for name, action in actions.get('actions', {}).items():
+            options = action.get('options') or []
+            # options with these scopes are global options of idf.py
+            always_load = always_load or any(option.get('scope') in ('global', 'shared') for option in options)
+            summary[name] = {
+                'aliases': action.get('aliases') or [],
+                'dependencies': action.get('dependencies') or [],
+                'options': [option['names'] for option in options],
+            }
+        entry = {'signature': self._get_signature(source_path), 'always_load': always_load, 'actions': summary,
+                 'used_actions': sorted(used_actions or [])}
+        if self.extensions.get(source_path) != entry:
+            self.extensions[source_path] = entry
+            self.changed = True
+
+    def get_required_actions(self, argv: List[str]) -> Set[str]:
+        """
+        Returns the names of the actions which can be run by the command line: the actions whose names or aliases
+        are in the arguments and their dependencies. The actions used by the extensions to be loaded are required
+        as well, so that the extensions owning them are loaded first.
+        """
+        action_dependencies: Dict[str, List[str]] = {}
+        action_names: Dict[str, str] = {}
+        for entry in self.extensions.values():
+            for name, action in entry['actions'].items():
+                action_dependencies[name] = action['dependencies']
+                for alias in [name] + action['aliases']:
+                    action_names[alias] = name
+
+        entries = [entry for entry in (self.get(source_path) for source_path in self.extensions) if entry is not None]
+        required: Set[str] = set()
+        to_check = [action_names[arg] for arg in argv if arg in action_names]
+        while True:
+            while to_check:
+                name = to_check.pop()
+                if name not in required:
+                    required.add(name)
+                    to_check += action_dependencies.get(name, [])
+            to_check = [name for entry in entries if entry['always_load'] or required.intersection(entry['actions'])
+                        for name in entry['used_actions'] if name not in required]
+            if not to_check:
+                return required
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': self.VERSION, 'extensions': self.extensions}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # The manifest is just an optimization, e.g. the Python environment can be read-only
+            pass
+
+
 def get_sdkconfig_filename(args: 'PropertyDict', cache_cmdl: Dict=None) -> str:
     """
     Get project's sdkconfig file name.
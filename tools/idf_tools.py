@@ -45,8 +45,10 @@ import subprocess
 import sys
 import tarfile
 import tempfile
+import threading
 import time
 from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor  # noqa: F401
 from json import JSONEncoder
 from ssl import SSLContext  # noqa: F401
 from tarfile import TarFile  # noqa: F401
@@ -63,6 +65,7 @@ except RuntimeError as e:
     print(e)
     raise SystemExit(1)
 
+import python_deps_cache
 from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union  # noqa: F401
 from urllib.error import ContentTooShortError
 from urllib.parse import urljoin, urlparse
@@ -82,6 +85,7 @@ TOOLS_FILE = 'tools/tools.json'
 TOOLS_SCHEMA_FILE = 'tools/tools_schema.json'
 TOOLS_FILE_NEW = 'tools/tools.new.json'
 IDF_ENV_FILE = 'idf-env.json'
+TOOLS_VERSION_CACHE_FILE = 'idf-tools-version-cache.json'
 TOOLS_FILE_VERSION = 1
 IDF_TOOLS_PATH_DEFAULT = os.path.join('~', '.espressif')
 UNKNOWN_VERSION = 'unknown'
@@ -90,6 +94,7 @@ VERSION_REGEX_REPLACE_DEFAULT = r'\1'
 IDF_MAINTAINER = os.environ.get('IDF_MAINTAINER') or False
 TODO_MESSAGE = 'TODO'
 DOWNLOAD_RETRY_COUNT = 3
+DOWNLOAD_JOBS_DEFAULT = 4
 URL_PREFIX_MAP_SEPARATOR = ','
 IDF_TOOLS_INSTALL_CMD = os.environ.get('IDF_TOOLS_INSTALL_CMD')
 IDF_TOOLS_EXPORT_CMD = os.environ.get('IDF_TOOLS_INSTALL_CMD')
@@ -261,6 +266,7 @@ global_non_interactive = False
 global_idf_path = None  # type: Optional[str]
 global_idf_tools_path = None  # type: Optional[str]
 global_tools_json = None  # type: Optional[str]
+global_version_cache = None  # type: Optional[ToolVersionCache]
 
 
 def fatal(text, *args):  # type: (str, str) -> None
@@ -299,25 +305,27 @@ def print_hints_on_download_error(err):  # type: (str) -> None
              'you might be able to work around this issue.')
 
 
+def find_in_extra_paths(executable, extra_paths):  # type: (str, List[str]) -> Optional[str]
+    extensions = ['']
+    if sys.platform == 'win32':
+        extensions.append('.exe')
+    for path in extra_paths:
+        for ext in extensions:
+            fullpath = os.path.join(path, executable + ext)
+            if os.path.exists(fullpath):
+                return fullpath
+    return None
+
+
 def run_cmd_check_output(cmd, input_text=None, extra_paths=None):
     # type: (List[str], Optional[str], Optional[List[str]]) -> bytes
     # If extra_paths is given, locate the executable in one of these directories.
     # Note: it would seem logical to add extra_paths to env[PATH], instead, and let OS do the job of finding the
     # executable for us. However this does not work on Windows: https://bugs.python.org/issue8557.
     if extra_paths:
-        found = False
-        extensions = ['']
-        if sys.platform == 'win32':
-            extensions.append('.exe')
-        for path in extra_paths:
-            for ext in extensions:
-                fullpath = os.path.join(path, cmd[0] + ext)
-                if os.path.exists(fullpath):
-                    cmd[0] = fullpath
-                    found = True
-                    break
-            if found:
-                break
+        fullpath = find_in_extra_paths(cmd[0], extra_paths)
+        if fullpath:
+            cmd[0] = fullpath
 
     try:
         input_bytes = None
@@ -408,8 +416,9 @@ def splittype(url):  # type: (str) -> Tuple[Optional[str], str]
 
 
 # An alternative version of urlretrieve which takes SSL context as an argument
-def urlretrieve_ctx(url, filename, reporthook=None, data=None, context=None):
-    # type: (str, str, Optional[Callable[[int, int, int], None]], Optional[bytes], Optional[SSLContext]) -> Tuple[str, addinfourl]
+# If sha256 is given, it is updated with the data as they are downloaded.
+def urlretrieve_ctx(url, filename, reporthook=None, data=None, context=None, sha256=None):
+    # type: (str, str, Optional[Callable[[int, int, int], None]], Optional[bytes], Optional[SSLContext], Optional[Any]) -> Tuple[str, addinfourl]
     url_type, path = splittype(url)
 
     # urlopen doesn't have context argument in Python <=2.7.9
@@ -443,6 +452,8 @@ def urlretrieve_ctx(url, filename, reporthook=None, data=None, context=None):
                     break
                 read += len(block)
                 tfp.write(block)
+                if sha256:
+                    sha256.update(block)
                 blocknum += 1
                 if reporthook:
                     reporthook(blocknum, bs, size)
@@ -455,7 +466,7 @@ def urlretrieve_ctx(url, filename, reporthook=None, data=None, context=None):
     return result
 
 
-def download(url, destination):  # type: (str, str) -> Optional[Exception]
+def download(url, destination, sha256=None, show_progress=True):  # type: (str, str, Optional[Any], bool) -> Optional[Exception]
     info(f'Downloading {url}')
     info(f'Destination: {destination}')
     try:
@@ -469,8 +480,12 @@ def download(url, destination):  # type: (str, str) -> Optional[Exception]
         else:
             ctx = None
 
-        urlretrieve_ctx(url, destination, report_progress if not global_non_interactive else None, context=ctx)
-        sys.stdout.write('\rDone\n')
+        show_progress = show_progress and not global_non_interactive
+        urlretrieve_ctx(url, destination, report_progress if show_progress else None, context=ctx, sha256=sha256)
+        if show_progress:
+            sys.stdout.write('\rDone\n')
+        else:
+            info(f'Downloaded {url}')
         return None
     except Exception as e:
         # urlretrieve could throw different exceptions, e.g. IOError when the server is down
@@ -698,7 +713,10 @@ class IDFTool(object):
             raise ToolNotFound('Tool {} not found'.format(self.name))
 
         try:
-            version_cmd_result = run_cmd_check_output(cmd, None, extra_paths)
+            if global_version_cache:
+                version_cmd_result = global_version_cache.run(self.name, cmd, extra_paths)
+            else:
+                version_cmd_result = run_cmd_check_output(cmd, None, extra_paths)
         except OSError:
             # tool is not on the path
             raise ToolNotFound('Tool {} not found'.format(self.name))
@@ -795,6 +813,19 @@ class IDFTool(object):
                 else:
                     self.versions_installed.append(version)
 
+    def get_version_probes(self):  # type: () -> List[Tuple[str, List[str], Optional[List[str]]]]
+        """
+        Returns the version commands executed by find_installed_versions(), together with the paths to find
+        the executable in (None for PATH), so they can be passed to ToolVersionCache.prefetch().
+        """
+        cmd = self._current_options.version_cmd  # type: ignore
+        probes = [(self.name, cmd, None)]  # type: List[Tuple[str, List[str], Optional[List[str]]]]
+        if self.is_executable:
+            for version, version_obj in self.versions.items():
+                if version_obj.compatible_with_platform() and os.path.exists(self.get_path_for_version(version)):
+                    probes.append((self.name, cmd, self.get_export_paths(version)))
+        return probes
+
     def latest_installed_version(self):  # type: () -> Optional[str]
         """
         Get the latest installed tool version by directly checking the
@@ -820,7 +851,10 @@ class IDFTool(object):
 
         return None
 
-    def download(self, version):  # type: (str) -> None
+    def download(self, version, show_progress=True):  # type: (str, bool) -> int
+        """
+        Downloads the archive of the version, if it is not downloaded yet. Returns the number of downloaded bytes.
+        """
         assert version in self.versions
         download_obj = self.versions[version].get_download_for_platform(self._platform)
         if not download_obj:
@@ -838,13 +872,15 @@ class IDFTool(object):
                 os.unlink(local_path)
             else:
                 info('file {0} is already downloaded'.format(archive_name))
-                return
+                return 0
 
         downloaded = False
         local_temp_path = local_path + '.tmp'
         for retry in range(DOWNLOAD_RETRY_COUNT):
-            err = download(url, local_temp_path)
-            if not os.path.isfile(local_temp_path) or not self.check_download_file(download_obj, local_temp_path):
+            # the hash is calculated while downloading, so the file does not need to be read again
+            sha256 = hashlib.sha256()
+            err = download(url, local_temp_path, sha256, show_progress)
+            if not os.path.isfile(local_temp_path) or not self.check_download_file(download_obj, local_temp_path, sha256):
                 warn('Download failure: {}'.format(err))
                 warn('Failed to download {} to {}'.format(url, local_temp_path))
                 continue
@@ -855,6 +891,7 @@ class IDFTool(object):
             fatal('Failed to download, and retry count has expired')
             print_hints_on_download_error(str(err))
             raise SystemExit(1)
+        return download_obj.size
 
     def install(self, version):  # type: (str) -> None
         # Currently this is called after calling 'download' method, so here are a few asserts
@@ -875,10 +912,14 @@ class IDFTool(object):
             do_strip_container_dirs(dest_dir, self._current_options.strip_container_dirs)  # type: ignore
 
     @staticmethod
-    def check_download_file(download_obj, local_path):  # type: (IDFToolDownload, str) -> bool
+    def check_download_file(download_obj, local_path, sha256=None):  # type: (IDFToolDownload, str, Optional[Any]) -> bool
         expected_sha256 = download_obj.sha256
         expected_size = download_obj.size
-        file_size, file_sha256 = get_file_size_sha256(local_path)
+        if sha256:
+            # the hash was calculated while downloading the file
+            file_size, file_sha256 = os.path.getsize(local_path), sha256.hexdigest()
+        else:
+            file_size, file_sha256 = get_file_size_sha256(local_path)
         if file_size != expected_size:
             warn('file size mismatch for {}, expected {}, got {}'.format(local_path, expected_size, file_size))
             return False
@@ -1295,6 +1336,124 @@ class ENVState:
         return self.deactivate_file_path
 
 
+class ToolVersionCache:
+    """
+    ToolVersionCache keeps the outputs of the version commands of the tools in between the runs, so unchanged
+    executables are not executed again. The outputs are saved in TOOLS_VERSION_CACHE_FILE and every output is valid
+    while the size and the modification time of the executable are the same.
+    The commands whose outputs are not cached can be executed concurrently by prefetch().
+    """
+    VERSION = 1
+    MAX_WORKERS = 8
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries = {}  # type: Dict[str, Dict[str, Any]]
+        self.changed = False
+        # outputs of the commands or the exceptions raised by them in this run
+        self.results = {}  # type: Dict[str, Union[bytes, Exception]]
+        # time spent by the commands of every tool and the number of executed and cached commands
+        self.stats = OrderedDict()  # type: OrderedDict[str, Dict[str, Any]]
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache['version'] == ToolVersionCache.VERSION:
+                self.entries = cache['entries']
+        except (OSError, ValueError, KeyError, TypeError):  # missing, corrupted or incompatible cache
+            pass
+
+    @staticmethod
+    def find_executable(cmd, extra_paths):  # type: (List[str], Optional[List[str]]) -> Optional[str]
+        """
+        Finds the executable the same way as run_cmd_check_output() does
+        """
+        fullpath = find_in_extra_paths(cmd[0], extra_paths) if extra_paths else None
+        return fullpath or shutil.which(cmd[0])
+
+    def _update_stats(self, tool_name: str, elapsed: float, cached: bool) -> None:
+        with self.lock:
+            stats = self.stats.setdefault(tool_name, {'time': 0.0, 'executed': 0, 'cached': 0})
+            stats['time'] += elapsed
+            stats['cached' if cached else 'executed'] += 1
+
+    def _execute(self, tool_name, cmd, extra_paths):  # type: (str, List[str], Optional[List[str]]) -> bytes
+        start = time.perf_counter()
+        executable = self.find_executable(cmd, extra_paths)
+        if not executable:
+            # the command is expected to fail, run it anyway to get the same error as without the cache
+            try:
+                return run_cmd_check_output(list(cmd), None, extra_paths)
+            finally:
+                self._update_stats(tool_name, time.perf_counter() - start, False)
+
+        key = json.dumps([os.path.abspath(executable)] + cmd[1:])
+        stat = os.stat(executable)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            self._update_stats(tool_name, time.perf_counter() - start, True)
+            return entry['output'].encode('utf-8', 'surrogateescape')  # type: ignore
+
+        try:
+            output = run_cmd_check_output([executable] + cmd[1:], None, None)
+        finally:
+            self._update_stats(tool_name, time.perf_counter() - start, False)
+        with self.lock:
+            self.entries[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                 'output': output.decode('utf-8', 'surrogateescape')}
+            self.changed = True
+        return output
+
+    def run(self, tool_name, cmd, extra_paths=None):  # type: (str, List[str], Optional[List[str]]) -> bytes
+        """
+        Returns the output of the version command, see run_cmd_check_output().
+        The command is executed only if its output is not cached.
+        """
+        result_key = json.dumps([cmd, extra_paths])
+        result = self.results.get(result_key)
+        if result is None:
+            try:
+                result = self._execute(tool_name, cmd, extra_paths)
+            except (OSError, subprocess.CalledProcessError) as e:
+                result = e
+            self.results[result_key] = result
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def prefetch(self, probes):  # type: (List[Tuple[str, List[str], Optional[List[str]]]]) -> None
+        """
+        Executes the version commands whose outputs are not cached concurrently, so the following calls
+        of run() with the same arguments do not wait for them.
+        """
+        def run_probe(probe):  # type: (Tuple[str, List[str], Optional[List[str]]]) -> None
+            try:
+                self.run(*probe)
+            except (OSError, subprocess.CalledProcessError):
+                pass  # reported when run() is called again
+
+        with ThreadPoolExecutor(max_workers=ToolVersionCache.MAX_WORKERS) as executor:
+            list(executor.map(run_probe, probes))
+
+    def save(self) -> None:
+        """
+        Saves the cache if it was changed. Outputs of executables which do not exist anymore are dropped.
+        """
+        if not self.changed:
+            return
+        entries = dict((key, entry) for key, entry in self.entries.items() if os.path.exists(json.loads(key)[0]))
+        try:
+            cache_dir = os.path.dirname(os.path.abspath(self.path))
+            mkdir_p(cache_dir)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=cache_dir, delete=False) as f:
+                json.dump({'version': ToolVersionCache.VERSION, 'entries': entries}, f)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            # the cache is only an optimization
+            warn('Failed to save {} ({})'.format(self.path, e))
+
+
 def load_tools_info():  # type: () -> dict[str, IDFTool]
     """
     Load tools metadata from tools.json, return a dictionary: tool name - tool info
@@ -1630,12 +1789,20 @@ def action_export(args):  # type: ignore
         deactivate_statement(args)
         return
 
+    start_time = time.perf_counter()
     tools_info = load_tools_info()
     tools_info = filter_tools_info(IDFEnv.get_idf_env(), tools_info)
     all_tools_found = True
     export_vars = {}
     paths_to_export = []
 
+    # the versions of the tools are retrieved concurrently and cached for the next runs
+    global global_version_cache
+    global_version_cache = ToolVersionCache(os.path.join(global_idf_tools_path or '', TOOLS_VERSION_CACHE_FILE))
+    global_version_cache.prefetch([probe for tool in tools_info.values() if tool.get_install_type() != IDFTool.INSTALL_NEVER
+                                   for probe in tool.get_version_probes()])
+    global_version_cache.save()
+
     self_restart_cmd = f'{sys.executable} {__file__}{(" --tools-json " + args.tools_json) if args.tools_json else ""}'
     self_restart_cmd = to_shell_specific_paths([self_restart_cmd])[0]
     prefer_system_hint = '' if IDF_TOOLS_EXPORT_CMD else f' To use it, run \'{self_restart_cmd} export --prefer-system\''
@@ -1735,6 +1902,12 @@ def action_export(args):  # type: ignore
         export_statements = export_sep.join([export_format.format(k, v) for k, v in export_vars.items()])
         print(export_statements)
 
+    if args.profile:
+        info('Time spent running version commands of the tools (executed/cached commands):', f=sys.stderr)
+        for name, stats in global_version_cache.stats.items():
+            info('    {}: {:.3f} s ({}/{})'.format(name, stats['time'], stats['executed'], stats['cached']), f=sys.stderr)
+        info('Total time of export: {:.3f} s'.format(time.perf_counter() - start_time), f=sys.stderr)
+
     if not all_tools_found:
         raise SystemExit(1)
 
@@ -1835,6 +2008,58 @@ def get_tools_spec_and_platform_info(selected_platform, targets, tools_spec,
     return tools_spec, tools_info_for_platform
 
 
+def download_and_install_tools(tools, install, jobs):  # type: (List[Tuple[IDFTool, str]], bool, int) -> None
+    """
+    Downloads the given versions of the tools by a number of concurrent jobs. If install is True, every tool is
+    extracted as soon as its archive is downloaded and verified, while the other tools are still being downloaded.
+    """
+    # the same version downloaded or installed twice at once would write the same files
+    unique_tools = []  # type: List[Tuple[IDFTool, str]]
+    for tool_obj, tool_version in tools:
+        if all((tool_obj.name, tool_version) != (t.name, v) for t, v in unique_tools):
+            unique_tools.append((tool_obj, tool_version))
+
+    # only the downloads are timed, not the installs running at the same time
+    download_times = []  # type: List[Tuple[float, float]]
+
+    def download_tool(tool_obj, tool_version, show_progress=True):  # type: (IDFTool, str, bool) -> int
+        start_time = time.perf_counter()
+        size = tool_obj.download(tool_version, show_progress)
+        download_times.append((start_time, time.perf_counter()))
+        return size
+
+    downloaded_size = 0
+    if jobs <= 1:
+        for tool_obj, tool_version in unique_tools:
+            downloaded_size += download_tool(tool_obj, tool_version)
+            if install:
+                tool_obj.install(tool_version)
+        download_time = sum(end - start for start, end in download_times)
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as install_executor:
+            def download_and_submit_install(tool_obj, tool_version):  # type: (IDFTool, str) -> Tuple[int, Optional[Future]]
+                # progress of concurrent downloads would be mixed up in the output
+                size = download_tool(tool_obj, tool_version, show_progress=False)
+                return size, install_executor.submit(tool_obj.install, tool_version) if install else None
+
+            with ThreadPoolExecutor(max_workers=jobs) as download_executor:
+                downloads = [download_executor.submit(download_and_submit_install, tool_obj, tool_version)
+                             for tool_obj, tool_version in unique_tools]
+                installs = []
+                for future in downloads:
+                    size, install_future = future.result()
+                    downloaded_size += size
+                    installs.append(install_future)
+            for install_future in installs:
+                if install_future:
+                    install_future.result()
+        # the concurrent downloads overlap, the time is from the start of the first to the end of the last one
+        download_time = (max(end for _, end in download_times) - min(start for start, _ in download_times)) if download_times else 0
+    if downloaded_size:
+        info('Downloaded {:.1f} MB in {:.1f} s ({:.1f} MB/s)'.format(downloaded_size / 1e6, download_time,
+                                                                     downloaded_size / 1e6 / max(download_time, 1e-6)))
+
+
 def action_download(args):  # type: ignore
     tools_spec = args.tools
     targets = []  # type: list[str]
@@ -1851,6 +2076,7 @@ def action_download(args):  # type: ignore
 
     tools_spec, tools_info_for_platform = get_tools_spec_and_platform_info(args.platform, targets, args.tools)
 
+    tools_to_download = []
     for tool_spec in tools_spec:
         if '@' not in tool_spec:
             tool_name = tool_spec
@@ -1875,7 +2101,9 @@ def action_download(args):  # type: ignore
         _idf_tool_obj = tool_obj.versions[tool_version].get_download_for_platform(args.platform)
         _idf_tool_obj.url = get_idf_download_url_apply_mirrors(args, _idf_tool_obj.url)
 
-        tool_obj.download(tool_version)
+        tools_to_download.append((tool_obj, tool_version))
+
+    download_and_install_tools(tools_to_download, install=False, jobs=args.jobs)
 
 
 def action_install(args):  # type: ignore
@@ -1911,6 +2139,7 @@ def action_install(args):  # type: ignore
             tools_spec = [k for k, v in tools_info.items() if v.get_install_type() != IDFTool.INSTALL_NEVER]
             info('Installing tools: {}'.format(', '.join(tools_spec)))
 
+    tools_to_install = []
     for tool_spec in tools_spec:
         if '@' not in tool_spec:
             tool_name = tool_spec
@@ -1940,8 +2169,9 @@ def action_install(args):  # type: ignore
         _idf_tool_obj = tool_obj.versions[tool_version].get_download_for_platform(PYTHON_PLATFORM)
         _idf_tool_obj.url = get_idf_download_url_apply_mirrors(args, _idf_tool_obj.url)
 
-        tool_obj.download(tool_version)
-        tool_obj.install(tool_version)
+        tools_to_install.append((tool_obj, tool_version))
+
+    download_and_install_tools(tools_to_install, install=True, jobs=args.jobs)
 
 
 def get_wheels_dir():  # type: () -> Optional[str]
@@ -2158,7 +2388,7 @@ def action_check_python_dependencies(args):  # type: ignore
     use_constraints = not args.no_constraints
     req_paths = get_requirements('')  # no new features -> just detect the existing ones
 
-    _, _, virtualenv_python, idf_version = get_python_env_path()
+    idf_python_env_path, _, virtualenv_python, idf_version = get_python_env_path()
 
     if not os.path.isfile(virtualenv_python):
         fatal('{} doesn\'t exist! Please run the install script or "idf_tools.py install-python-env" in order to '
@@ -2174,7 +2404,28 @@ def action_check_python_dependencies(args):  # type: ignore
 
     info('Python being checked: {}'.format(virtualenv_python))
 
-    # The dependency checker will be invoked with virtualenv_python. idf_tools.py could have been invoked with a
+    if os.path.realpath(sys.prefix) == os.path.realpath(idf_python_env_path):
+        # The checked Python environment is the one running this script, so the check can be done without starting
+        # another interpreter and its successful result can be cached.
+        import check_python_dependencies
+        constr_paths = [constr_path] if use_constraints else []
+        try:
+            not_satisfied = check_python_dependencies.check_requirements(req_paths, constr_paths)
+        except ValueError as e:
+            fatal(str(e))
+            raise SystemExit(1)
+        if not_satisfied:
+            python_deps_cache.invalidate()
+            check_python_dependencies.print_not_satisfied(not_satisfied)
+            raise SystemExit(1)
+        # The requirement files are selected by the features in idf-env.json, the constraint file by the IDF version
+        idf_version_files = [os.path.join(global_idf_path or '', 'version.txt'),
+                             os.path.join(global_idf_path or '', 'components', 'esp_common', 'include', 'esp_idf_version.h')]
+        python_deps_cache.save(req_paths + constr_paths + [os.path.join(global_idf_tools_path or '', IDF_ENV_FILE)] + idf_version_files)
+        print('Python requirements are satisfied.')
+        return
+
+    # The dependency checker will be invoked with virtualenv_python. idf_tools.py has been invoked with a
     # different one, therefore, importing is not a suitable option.
     dep_check_cmd = [virtualenv_python,
                      os.path.join(global_idf_path,
@@ -2552,6 +2803,7 @@ def main(argv):  # type: (list[str]) -> None
     export.add_argument('--deactivate', help='Output command for deactivate different ESP-IDF version, previously set with export', action='store_true')
     export.add_argument('--unset', help=argparse.SUPPRESS, action='store_true')
     export.add_argument('--add_paths_extras', help='Add idf-related path extras for deactivate option')
+    export.add_argument('--profile', help='Print time spent running version commands of each tool to stderr', action='store_true')
     install = subparsers.add_parser('install', help='Download and install tools into the tools directory')
     install.add_argument('tools', metavar='TOOL', nargs='*', default=['required'],
                          help='Tools to install. ' +
@@ -2571,6 +2823,10 @@ def main(argv):  # type: (list[str]) -> None
     download.add_argument('--targets', default='all', help='A comma separated list of desired chip targets for installing.' +
                           ' It defaults to installing all supported targets.')
 
+    for subparser in [download, install]:
+        subparser.add_argument('--jobs', type=int, default=DOWNLOAD_JOBS_DEFAULT,
+                               help='Number of tools downloaded (and installed) concurrently. Defaults to {}.'.format(DOWNLOAD_JOBS_DEFAULT))
+
     uninstall = subparsers.add_parser('uninstall', help='Remove installed tools, that are not used by current version of ESP-IDF.')
     uninstall.add_argument('--dry-run', help='Print unused tools.', action='store_true')
     uninstall.add_argument('--remove-archives', help='Remove old archive versions and archives from unused tools.', action='store_true')
@@ -5,32 +5,83 @@
 #
 
 import argparse
-import errno
 import json
 import os
-import subprocess
 import sys
-import tempfile
+import time
+from contextlib import contextmanager
 from io import StringIO
 
 from ldgen.entity import EntityDB
 from ldgen.fragments import parse_fragment_file
+from ldgen.fragments_cache import FragmentsCache
 from ldgen.generation import Generation
 from ldgen.ldgen_common import LdGenFailure
 from ldgen.linker_script import LinkerScript
+from ldgen.output_stamp import OutputStamp
 from ldgen.sdkconfig import SDKConfig
+from ldgen.sections_cache import SectionsCache, read_sections
 from pyparsing import ParseException, ParseFatalException
 
 
+class _Profile:
+    """
+    Measures the time spent in the phases of the linker script generation.
+    """
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def print_report(self):
+        for (name, elapsed) in self.phases:
+            print('ldgen: %-24s %8.3f s' % (name, elapsed))
+        print('ldgen: %-24s %8.3f s' % ('total', sum(elapsed for (_, elapsed) in self.phases)))
+
+
 def _update_environment(args):
+    updated = dict()
+
     env = [(name, value) for (name,value) in (e.split('=',1) for e in args.env)]
     for name, value in env:
         value = ' '.join(value.split())
         os.environ[name] = value
+        updated[name] = value
 
     if args.env_file is not None:
         env = json.load(args.env_file)
         os.environ.update(env)
+        updated.update(env)
+
+    return updated
+
+
+def _write_if_changed(output_path, content):
+    """
+    Writes the output linker script only if its content changed, so that its timestamp
+    does not trigger relinking.
+    """
+    try:
+        with open(output_path, 'r') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with open(output_path, 'w') as f:
+        f.write(content)
+    return True
 
 
 def main():
@@ -98,7 +149,35 @@ def main():
 
     argparser.add_argument(
         '--objdump',
-        help='Path to toolchain objdump')
+        help='Path to toolchain objdump, used for the libraries the built-in archive reader cannot read')
+
+    argparser.add_argument(
+        '--use-objdump',
+        help='Read sections info of all the libraries using objdump instead of the built-in archive reader',
+        action='store_true')
+
+    argparser.add_argument(
+        '--cache-dir',
+        help='Directory to keep the sections info of the libraries and the parsed fragment files in between the runs')
+
+    argparser.add_argument(
+        '--cache-stats',
+        help='Print the hit rate of the sections info and fragment files caches',
+        action='store_true')
+
+    argparser.add_argument(
+        '--jobs', '-j',
+        help='Number of processes reading the sections info of the libraries by objdump, the number of CPUs by default',
+        type=int)
+
+    argparser.add_argument(
+        '--placement-changes',
+        help='File to write the JSON summary of the placements changed since the previous run to')
+
+    argparser.add_argument(
+        '--profile',
+        help='Print the time spent in each phase of the generation',
+        action='store_true')
 
     args = argparser.parse_args()
 
@@ -121,51 +200,104 @@ def main():
     else:
         check_mapping_exceptions = None
 
+    profile = _Profile()
     try:
-        sections_infos = EntityDB()
-        for library in libraries_file:
-            library = library.strip()
-            if library:
-                new_env = os.environ.copy()
-                new_env['LC_ALL'] = 'C'
-                dump = StringIO(subprocess.check_output([objdump, '-h', library], env=new_env).decode())
-                dump.name = library
-                sections_infos.add_sections_info(dump)
-
-        generation_model = Generation(check_mapping, check_mapping_exceptions)
-
-        _update_environment(args)  # assign args.env and args.env_file to os.environ
+        # the stamp of the previous run is kept only in the cache directory
+        stamp = OutputStamp(os.path.join(args.cache_dir, os.path.basename(output_path) + '.stamp')
+                            if args.cache_dir else None)
 
-        sdkconfig = SDKConfig(kconfig_file, config_file)
+        with profile.phase('read sections info'):
+            libraries = [library.strip() for library in libraries_file if library.strip()]
+            sections_cache = SectionsCache(os.path.join(args.cache_dir, 'sections.json') if args.cache_dir else None)
 
-        for fragment_file in fragment_files:
-            try:
-                fragment_file = parse_fragment_file(fragment_file, sdkconfig)
-            except (ParseException, ParseFatalException) as e:
-                # ParseException is raised on incorrect grammar
-                # ParseFatalException is raised on correct grammar, but inconsistent contents (ex. duplicate
-                # keys, key unsupported by fragment, unexpected number of values, etc.)
-                raise LdGenFailure('failed to parse %s\n%s' % (fragment_file, str(e)))
-            generation_model.add_fragments_from_file(fragment_file)
+            sections_infos = EntityDB()
+            for archive, sections in read_sections(libraries, objdump, sections_cache, args.jobs, args.use_objdump):
+                sections_infos.add_sections(archive, sections)
+                # the rebuilt libraries change the output only if their section tables changed
+                stamp.add_input('sections %s' % archive, json.dumps(sections, sort_keys=True))
 
-        mapping_rules = generation_model.generate(sections_infos)
+            sections_cache.save(libraries)
+            if args.cache_stats:
+                print(sections_cache.get_stats())
 
-        script_model = LinkerScript(input_file)
-        script_model.fill(mapping_rules)
-
-        with tempfile.TemporaryFile('w+') as output:
-            script_model.write(output)
-            output.seek(0)
-
-            if not os.path.exists(os.path.dirname(output_path)):
-                try:
-                    os.makedirs(os.path.dirname(output_path))
-                except OSError as exc:
-                    if exc.errno != errno.EEXIST:
-                        raise
+        generation_model = Generation(check_mapping, check_mapping_exceptions)
 
-            with open(output_path, 'w') as f:  # only create output file after generation has suceeded
-                f.write(output.read())
+        env = _update_environment(args)  # assign args.env and args.env_file to os.environ
+
+        with profile.phase('check inputs'):
+            stamp.add_input_file('ldgen', os.path.abspath(__file__))
+            stamp.add_input('output', os.path.abspath(output_path))
+            stamp.add_input('template', input_file.read())
+            input_file.seek(0)
+            for fragment_file in fragment_files:
+                if isinstance(fragment_file, str):
+                    stamp.add_input_file('fragments', fragment_file)
+                else:
+                    stamp.add_input('fragments %s' % fragment_file.name, fragment_file.read())
+                    fragment_file.seek(0)
+            if config_file:
+                stamp.add_input_file('config', config_file)
+            if kconfig_file:
+                stamp.add_input_file('kconfig', kconfig_file)
+            stamp.add_input('env', json.dumps(env, sort_keys=True))
+            stamp.add_input('check mapping', json.dumps([check_mapping, check_mapping_exceptions]))
+
+            up_to_date = stamp.is_up_to_date(output_path)
+
+        changes = dict()
+        written = False
+        if not up_to_date:
+            with profile.phase('load sdkconfig'):
+                sdkconfig = SDKConfig(kconfig_file, config_file)
+
+            with profile.phase('parse fragments'):
+                fragments_cache = FragmentsCache(os.path.join(args.cache_dir, 'fragments.pickle') if args.cache_dir else None)
+                for fragment_file in fragment_files:
+                    try:
+                        if isinstance(fragment_file, str):
+                            fragment_file = fragments_cache.parse(fragment_file, sdkconfig)
+                        else:
+                            fragment_file = parse_fragment_file(fragment_file, sdkconfig)
+                    except (ParseException, ParseFatalException) as e:
+                        # ParseException is raised on incorrect grammar
+                        # ParseFatalException is raised on correct grammar, but inconsistent contents (ex. duplicate
+                        # keys, key unsupported by fragment, unexpected number of values, etc.)
+                        raise LdGenFailure('failed to parse %s\n%s' % (fragment_file, str(e)))
+                    generation_model.add_fragments_from_file(fragment_file)
+
+                # saved before the generation, which gets the parsed fragments
+                fragments_cache.save([f for f in fragment_files if isinstance(f, str)])
+                if args.cache_stats:
+                    print(fragments_cache.get_stats())
+
+            with profile.phase('generate placements'):
+                mapping_rules = generation_model.generate(sections_infos)
+
+            with profile.phase('write linker script'):
+                script_model = LinkerScript(input_file)
+                script_model.fill(mapping_rules)
+
+                output = StringIO()
+                script_model.write(output)
+                content = output.getvalue()
+
+                placements = dict((target, [str(command) for command in commands])
+                                  for (target, commands) in mapping_rules.items())
+                changes = stamp.get_changes(placements)
+
+                # only write the output file after generation has succeeded
+                written = _write_if_changed(output_path, content)
+                stamp.save(content, placements)
+
+        if args.placement_changes:
+            with open(args.placement_changes, 'w') as f:
+                json.dump({'output': output_path,
+                           'regenerated': not up_to_date,
+                           'written': written,
+                           'changes': changes}, f, indent=4)
+
+        if args.profile:
+            profile.print_report()
     except LdGenFailure as e:
         print('linker script generation failed for %s\nERROR: %s' % (input_file.name, e))
         sys.exit(1)
@@ -0,0 +1,198 @@
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import mmap
+import os
+import struct
+from typing import Dict, List, Tuple
+
+AR_MAGIC = b'!<arch>\n'
+AR_THIN_MAGIC = b'!<thin>\n'
+# name[16] date[12] uid[6] gid[6] mode[8] size[10] fmag[2]
+AR_MEMBER_HEADER = struct.Struct('16s12s6s6s8s10s2s')
+AR_FMAG = b'`\n'
+
+ELF_MAGIC = b'\x7fELF'
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+# ELF header following e_ident, section header table is described by e_shoff, e_shentsize, e_shnum and e_shstrndx
+ELF32_HEADER = 'HHIIIIIHHHHHH'
+ELF64_HEADER = 'HHIQQQIHHHHHH'
+# sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, sh_info, sh_addralign, sh_entsize
+ELF32_SECTION_HEADER = 'IIIIIIIIII'
+ELF64_SECTION_HEADER = 'IIQQQQIIQQ'
+
+SHN_UNDEF = 0
+SHN_XINDEX = 0xffff
+
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_RELA = 4
+SHT_REL = 9
+SHT_DYNSYM = 11
+SHT_SYMTAB_SHNDX = 18
+
+SHF_ALLOC = 0x2
+
+
+class ArchiveReaderError(ValueError):
+    """
+    The library is not an archive of ELF objects this reader can handle.
+    """
+
+
+class _SectionHeader:
+
+    def __init__(self, name: int, sh_type: int, flags: int, offset: int, size: int, link: int, info: int) -> None:
+        self.name = name
+        self.type = sh_type
+        self.flags = flags
+        self.offset = offset
+        self.size = size
+        self.link = link
+        self.info = info
+
+
+def _read_section_headers(data: memoryview, offset: int) -> Tuple[List[_SectionHeader], int]:
+    """
+    Returns the section headers of the ELF object at the offset of the data and the index of the section name table.
+    """
+    ident = bytes(data[offset:offset + 16])
+    if ident[:4] != ELF_MAGIC:
+        raise ArchiveReaderError('not an ELF object')
+    if ident[5] not in (ELFDATA2LSB, ELFDATA2MSB) or ident[4] not in (ELFCLASS32, ELFCLASS64):
+        raise ArchiveReaderError('unsupported ELF class or data encoding')
+
+    endian = '<' if ident[5] == ELFDATA2LSB else '>'
+    elf_header = struct.Struct(endian + (ELF32_HEADER if ident[4] == ELFCLASS32 else ELF64_HEADER))
+    section_header = struct.Struct(endian + (ELF32_SECTION_HEADER if ident[4] == ELFCLASS32 else ELF64_SECTION_HEADER))
+
+    (_, _, _, _, _, shoff, _, _, _, _, shentsize, shnum, shstrndx) = elf_header.unpack_from(data, offset + 16)
+    if shoff == 0:
+        return [], SHN_UNDEF
+    if shentsize != section_header.size:
+        raise ArchiveReaderError('unexpected size of the section header')
+
+    def read_header(index: int) -> _SectionHeader:
+        (name, sh_type, flags, _, sh_offset, size, link, info, _, _) = section_header.unpack_from(
+            data, offset + shoff + index * shentsize)
+        return _SectionHeader(name, sh_type, flags, sh_offset, size, link, info)
+
+    # extended section numbering, the real values are in the first section header
+    first = read_header(0)
+    if shnum == 0:
+        shnum = first.size
+    if shstrndx == SHN_XINDEX:
+        shstrndx = first.link
+
+    return [read_header(index) for index in range(shnum)], shstrndx
+
+
+def read_object_sections(data: memoryview, offset: int = 0) -> List[str]:
+    """
+    Returns the names of the sections of the ELF relocatable object at the offset of the data in the same order
+    and with the same filtering as `objdump -h` lists them: the symbol table, the section name table,
+    the string table of the symbol table and the relocations of other sections are not listed.
+    """
+    headers, shstrndx = _read_section_headers(data, offset)
+    if not headers:
+        return []
+
+    symtab_indices = [index for (index, header) in enumerate(headers) if header.type in (SHT_SYMTAB, SHT_DYNSYM)]
+    symtab_strtab_indices = [headers[index].link for index in symtab_indices]
+
+    def is_listed(index: int, header: _SectionHeader) -> bool:
+        if index == SHN_UNDEF or header.type in (SHT_SYMTAB, SHT_DYNSYM, SHT_SYMTAB_SHNDX):
+            return False
+        if header.type == SHT_STRTAB:
+            return index != shstrndx and index not in symtab_strtab_indices
+        if header.type in (SHT_REL, SHT_RELA):
+            # relocations of a section are not a separate section, unless they are dynamic
+            # or do not relocate a section using the symbol table
+            return bool(header.flags & SHF_ALLOC
+                        or header.link not in symtab_indices
+                        or header.info == SHN_UNDEF or header.info >= len(headers)
+                        or headers[header.info].type in (SHT_REL, SHT_RELA))
+        return True
+
+    names_header = headers[shstrndx]
+    names = bytes(data[offset + names_header.offset:offset + names_header.offset + names_header.size])
+
+    def get_name(header: _SectionHeader) -> str:
+        end = names.find(b'\0', header.name)
+        return names[header.name:end if end >= 0 else len(names)].decode()
+
+    return [get_name(header) for (index, header) in enumerate(headers) if is_listed(index, header)]
+
+
+def _iter_archive_members(data: memoryview) -> List[Tuple[str, int, int]]:
+    """
+    Returns the list of (name, offset, size) of the members of the archive in the data.
+    """
+    if bytes(data[:len(AR_MAGIC)]) != AR_MAGIC:
+        if bytes(data[:len(AR_THIN_MAGIC)]) == AR_THIN_MAGIC:
+            raise ArchiveReaderError('thin archives are not supported')
+        raise ArchiveReaderError('not an archive')
+
+    members = []
+    long_names = b''
+    offset = len(AR_MAGIC)
+    while offset + AR_MEMBER_HEADER.size <= len(data):
+        (raw_name, _, _, _, _, raw_size, fmag) = AR_MEMBER_HEADER.unpack_from(data, offset)
+        if fmag != AR_FMAG:
+            raise ArchiveReaderError('malformed archive member header at offset 0x%x' % offset)
+        size = int(raw_size)
+        offset += AR_MEMBER_HEADER.size
+        name = raw_name.decode().rstrip(' ')
+
+        if name == '//':
+            # GNU table of the long names
+            long_names = bytes(data[offset:offset + size])
+        elif name in ('/', '/SYM64/', '__.SYMDEF', '__.SYMDEF SORTED'):
+            # symbol table
+            pass
+        elif name.startswith('#1/'):
+            # BSD long name stored in front of the member data
+            name_size = int(name[3:])
+            name = bytes(data[offset:offset + name_size]).decode().rstrip('\0')
+            members.append((name, offset + name_size, size - name_size))
+        else:
+            if name.startswith('/'):
+                start = int(name[1:])
+                name = long_names[start:long_names.index(b'\n', start)].decode()
+            members.append((name[:-1] if name.endswith('/') else name, offset, size))
+
+        offset += size + (size % 2)
+
+    return members
+
+
+def read_archive_sections(library: str) -> Tuple[str, Dict[str, List[str]]]:
+    """
+    Reads the archive without running the toolchain objdump.
+
+    Returns the archive name and the dictionary of the object names to the lists of their sections,
+    the same as parsed from the `objdump -h` output.
+    """
+    sections = dict()
+    with open(library, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ArchiveReaderError('not an archive')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = memoryview(mapped)
+            try:
+                for (name, offset, _) in _iter_archive_members(data):
+                    sections[name] = read_object_sections(data, offset)
+            except ArchiveReaderError:
+                raise
+            except (struct.error, ValueError, IndexError, UnicodeDecodeError) as e:
+                raise ArchiveReaderError('malformed archive: %s' % e)
+            finally:
+                data.release()
+
+    return os.path.basename(library), sections
@@ -3,9 +3,12 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 
+import bisect
 import collections
 import fnmatch
+import itertools
 import os
+import re
 from enum import Enum
 from functools import total_ordering
 
@@ -60,20 +63,9 @@ class Entity:
                 self.symbol == other.symbol)
 
     def __lt__(self, other):
-        res = False
-        if self.specificity.value < other.specificity.value:
-            res = True
-        elif self.specificity == other.specificity:
-            for s in Entity.Specificity:
-                a = self[s] if self[s] else ''
-                b = other[s] if other[s] else ''
-
-                if a != b:
-                    res = a < b
-                    break
-        else:
-            res = False
-        return res
+        # Entities of the same specificity are compared by their archive, object and symbol
+        return ((self.specificity.value, self.archive or '', self.obj or '', self.symbol or '')
+                < (other.specificity.value, other.archive or '', other.obj or '', other.symbol or ''))
 
     def __hash__(self):
         return hash(self.__repr__())
@@ -110,6 +102,21 @@ class EntityDB:
     def __init__(self):
         self.sections = dict()
 
+        # Indices of the archives and results of the queries, built when the archive
+        # is queried for the first time
+        self._objects_index = dict()
+        self._sections_index = dict()
+        self._symbols_index = dict()
+        self._obj_matches = dict()
+        self._section_matches = dict()
+        self._symbol_matches = dict()
+        self._patterns = dict()
+
+    def _clear_indices(self):
+        for cache in (self._objects_index, self._sections_index, self._symbols_index, self._obj_matches,
+                      self._section_matches, self._symbol_matches):
+            cache.clear()
+
     def add_sections_info(self, sections_info_dump):
         first_line = sections_info_dump.readline()
 
@@ -127,6 +134,15 @@ class EntityDB:
 
         archive = os.path.basename(results.archive_path)
         self.sections[archive] = EntityDB.__info(sections_info_dump.name, sections_info_dump.read())
+        self._clear_indices()
+
+    def add_sections(self, archive, sections):
+        """
+        Adds already parsed sections info of the archive, a dictionary of the object names
+        to the lists of their section names.
+        """
+        self.sections[archive] = sections
+        self._clear_indices()
 
     def _get_infos_from_file(self, info):
         # {object}:  file format elf32-xtensa-le
@@ -179,11 +195,57 @@ class EntityDB:
 
         return self.sections[archive].keys()
 
+    @staticmethod
+    def _get_object_keys(obj):
+        """
+        Returns the list of (rank, name) the object file is matched by. The rank orders the matches
+        the same as the patterns `name.o`, `name.*.obj` and `name.obj` are tried.
+        """
+        keys = []
+        if obj.endswith('.o'):
+            keys.append((0, obj[:-len('.o')]))
+        if obj.endswith('.obj'):
+            stem = obj[:-len('.obj')]
+            # the wildcard in `name.*.obj` matches any characters, including dots
+            index = stem.find('.')
+            while index >= 0:
+                keys.append((1, stem[:index]))
+                index = stem.find('.', index + 1)
+            keys.append((2, stem))
+        return keys
+
+    def _get_objects_index(self, archive):
+        try:
+            return self._objects_index[archive]
+        except KeyError:
+            index = collections.defaultdict(list)
+            for (position, obj) in enumerate(self.get_objects(archive)):
+                for (rank, name) in EntityDB._get_object_keys(obj):
+                    index[os.path.normcase(name)].append((rank, position, obj))
+            self._objects_index[archive] = index
+            return index
+
+    def _get_pattern(self, pattern):
+        # precompiled equivalent of fnmatch.filter
+        try:
+            return self._patterns[pattern]
+        except KeyError:
+            match = re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+            self._patterns[pattern] = match
+            return match
+
     def _match_obj(self, archive, obj):
-        objs = self.get_objects(archive)
-        match_objs = (fnmatch.filter(objs, obj + '.o')
-                      + fnmatch.filter(objs, obj + '.*.obj')
-                      + fnmatch.filter(objs, obj + '.obj'))
+        try:
+            match_objs = self._obj_matches[(archive, obj)]
+        except KeyError:
+            if any(c in obj for c in '*?['):
+                objs = self.get_objects(archive)
+                match_objs = [o for pattern in (obj + '.o', obj + '.*.obj', obj + '.obj')
+                              for o in objs if self._get_pattern(pattern)(os.path.normcase(o))]
+            else:
+                matches = self._get_objects_index(archive).get(os.path.normcase(obj), [])
+                match_objs = [o for (_, _, o) in sorted(matches)]
+            self._obj_matches[(archive, obj)] = match_objs
 
         if len(match_objs) > 1:
             raise ValueError("Multiple matches for object: '%s: %s': %s" % (archive, obj, str(match_objs)))
@@ -200,9 +262,57 @@ class EntityDB:
             res = self.sections[archive][obj]
         return res
 
-    def _match_symbol(self, archive, obj, symbol):
+    def _get_sections_index(self, archive, obj):
+        # sorted list of (name, position) of the sections, so the sections starting
+        # with a prefix are found by bisection
+        try:
+            return self._sections_index[(archive, obj)]
+        except KeyError:
+            index = sorted((os.path.normcase(s), position) for (position, s) in enumerate(self.get_sections(archive, obj)))
+            self._sections_index[(archive, obj)] = index
+            return index
+
+    def get_matching_sections(self, archive, obj, pattern):
+        """
+        Returns the sections of the object matching the wildcard pattern, in the same order as fnmatch.filter.
+        """
+        try:
+            return self._section_matches[(archive, obj, pattern)]
+        except KeyError:
+            pass
+
         sections = self.get_sections(archive, obj)
-        return [s for s in sections if s.endswith(symbol)]
+        index = self._get_sections_index(archive, obj)
+        match = self._get_pattern(pattern)
+        # only the sections starting with the part of the pattern preceding the first wildcard can match
+        prefix = re.split(r'[*?[]', os.path.normcase(pattern), 1)[0]
+        positions = []
+        for (name, position) in itertools.islice(index, bisect.bisect_left(index, (prefix,)), None):
+            if not name.startswith(prefix):
+                break
+            if match(name):
+                positions.append(position)
+
+        res = [sections[position] for position in sorted(positions)]
+        self._section_matches[(archive, obj, pattern)] = res
+        return res
+
+    def _get_symbols_index(self, archive, obj):
+        # parts of the section names following the last dot
+        try:
+            return self._symbols_index[(archive, obj)]
+        except KeyError:
+            index = set(s[s.rfind('.') + 1:] for s in self.get_sections(archive, obj) if '.' in s)
+            self._symbols_index[(archive, obj)] = index
+            return index
+
+    def _match_symbol(self, archive, obj, symbol):
+        try:
+            return self._symbol_matches[(archive, obj, symbol)]
+        except KeyError:
+            res = [s for s in self.get_sections(archive, obj) if s.endswith(symbol)]
+            self._symbol_matches[(archive, obj, symbol)] = res
+            return res
 
     def check_exists(self, entity):
         res = True
@@ -213,7 +323,9 @@ class EntityDB:
             elif entity.specificity == Entity.Specificity.OBJ:
                 res = self._match_obj(entity.archive, entity.obj) is not None
             elif entity.specificity == Entity.Specificity.SYMBOL:
-                res = len(self._match_symbol(entity.archive, entity.obj, entity.symbol)) > 0
+                # sections named after the symbol are found in the index, the others by the suffix
+                res = (entity.symbol in self._get_symbols_index(entity.archive, entity.obj)
+                       or len(self._match_symbol(entity.archive, entity.obj, entity.symbol)) > 0)
             else:
                 res = False
 
@@ -0,0 +1,116 @@
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from .fragments import FragmentFile, parse_fragment_file
+from .ldgen_common import get_sources_digest
+from .sdkconfig import SDKConfig
+
+# conditional expressions evaluated while parsing the fragment file and their results
+CONDITIONS = List[Tuple[str, bool]]
+
+
+class _RecordingSDKConfig:
+    """
+    Evaluates the conditional expressions by the SDKConfig and records them with their results.
+    """
+
+    def __init__(self, sdkconfig: SDKConfig) -> None:
+        self.sdkconfig = sdkconfig
+        self.conditions: CONDITIONS = []
+
+    def evaluate_expression(self, expression: str) -> bool:
+        result: bool = self.sdkconfig.evaluate_expression(expression)
+        self.conditions.append((expression, result))
+        return result
+
+
+class FragmentsCache:
+    """
+    Persistent cache of the parsed fragment files.
+
+    A fragment file is parsed again only if its content changed, or if any of the conditions evaluated
+    while it was parsed has a different result with the current sdkconfig. Several variants of the parsed
+    file are kept, so switching between configurations does not require parsing either. The cache made
+    by different sources of ldgen is not used, as the parsed fragment files might be different.
+    """
+
+    VERSION = 1
+    MAX_VARIANTS = 4
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = dict()
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    data = pickle.load(f)
+                if data['version'] == FragmentsCache.VERSION and data['sources'] == get_sources_digest():
+                    self.files = data['files']
+            except Exception:  # missing, corrupted or incompatible cache is rebuilt
+                pass
+
+    @staticmethod
+    def _conditions_hold(conditions: CONDITIONS, sdkconfig: SDKConfig) -> bool:
+        try:
+            return all(sdkconfig.evaluate_expression(expression) == result for (expression, result) in conditions)
+        except Exception:  # the expression cannot be evaluated with the current sdkconfig
+            return False
+
+    def parse(self, path: str, sdkconfig: SDKConfig) -> FragmentFile:
+        with open(path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+
+        entry = self.files.get(path)
+        if entry is None or entry['sha256'] != content_hash:
+            entry = {'sha256': content_hash, 'variants': []}
+            self.files[path] = entry
+
+        variants = entry['variants']
+        for (index, (conditions, fragment_file)) in enumerate(variants):
+            if FragmentsCache._conditions_hold(conditions, sdkconfig):
+                self.hits += 1
+                variants.insert(0, variants.pop(index))
+                return fragment_file
+
+        self.misses += 1
+        recording_sdkconfig = _RecordingSDKConfig(sdkconfig)
+        fragment_file = parse_fragment_file(path, recording_sdkconfig)
+        variants.insert(0, (recording_sdkconfig.conditions, fragment_file))
+        del variants[FragmentsCache.MAX_VARIANTS:]
+        return fragment_file
+
+    def save(self, paths: List[str]) -> None:
+        """
+        Saves the entries of the given fragment files, the entries of the files no longer in the build are dropped.
+        """
+        if not self.path:
+            return
+
+        data = {
+            'version': FragmentsCache.VERSION,
+            'sources': get_sources_digest(),
+            'files': dict((path, self.files[path]) for path in paths if path in self.files),
+        }
+
+        # ldgen is run for each linker script template, the cache is replaced atomically
+        cache_dir = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=cache_dir, delete=False) as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, self.path)
+
+    def get_stats(self) -> str:
+        total = self.hits + self.misses
+        return ('fragments cache: %d hits, %d misses (%.1f%% hit rate)'
+                % (self.hits, self.misses, 100.0 * self.hits / total if total else 0.0))
@@ -4,7 +4,6 @@
 #
 
 import collections
-import fnmatch
 import itertools
 from collections import namedtuple
 
@@ -125,7 +124,7 @@ class EntityNode:
     """
 
     def __init__(self, parent, name):
-        self.children = []
+        self.children = dict()
         self.parent = parent
         self.name = name
         self.child_t = EntityNode
@@ -138,14 +137,11 @@ class EntityNode:
         name = entity[Entity.Specificity(child_specificity)]
         assert name and name != Entity.ALL
 
-        child = [c for c in self.children if c.name == name]
-        assert (len(child) <= 1)
-
-        if not child:
+        try:
+            child = self.children[name]
+        except KeyError:
             child = self.child_t(self, name)
-            self.children.append(child)
-        else:
-            child = child[0]
+            self.children[name] = child
 
         return child
 
@@ -162,7 +158,7 @@ class EntityNode:
 
         # Process the commands generated from this node's children
         # recursively
-        for child in sorted(self.children, key=lambda c: c.name):
+        for child in sorted(self.children.values(), key=lambda c: c.name):
             children_commands = child.get_output_commands()
             process_commands(children_commands)
 
@@ -277,7 +273,7 @@ class ObjectNode(EntityNode):
         EntityNode.__init__(self, parent, name)
         self.child_t = SymbolNode
         self.entity = Entity(self.parent.name, self.name)
-        self.subplacements = list()
+        self.subplacements = set()
 
     def child_placement(self, entity, sections, target, flags, sections_db):
         child = self.add_child(entity)
@@ -293,10 +289,9 @@ class ObjectNode(EntityNode):
 
             if not obj_sections or obj_sections == sections:
                 # Expand this section for the first time
-                found_sections = sections_db.get_sections(self.parent.name, self.name)
                 obj_sections = []
                 for s in sections:
-                    obj_sections.extend(fnmatch.filter(found_sections, s))
+                    obj_sections.extend(sections_db.get_matching_sections(self.parent.name, self.name, s))
 
             if obj_sections:
                 symbol = entity.symbol
@@ -318,7 +313,7 @@ class ObjectNode(EntityNode):
 
                         if subplace:
                             obj_placement.basis.add_subplacement(obj_placement)
-                            self.subplacements.append(sections)
+                            self.subplacements.add(sections)
                         else:
                             obj_placement.force_significant()
 
@@ -425,9 +420,15 @@ class Generation:
 
     def _prepare_entity_mappings(self, scheme_dictionary, entities):
         # Prepare entity mappings processed from mapping fragment entries.
+        section_strs = dict()
+
         def get_section_strs(section):
-            s_list = [Sections.get_section_data_from_entry(s) for s in section.entries]
-            return frozenset([item for sublist in s_list for item in sublist])
+            try:
+                return section_strs[section.name]
+            except KeyError:
+                s_list = [Sections.get_section_data_from_entry(s) for s in section.entries]
+                section_strs[section.name] = frozenset([item for sublist in s_list for item in sublist])
+                return section_strs[section.name]
 
         entity_mappings = dict()
 
@@ -3,7 +3,29 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 
+import functools
+import hashlib
+import os
+
+
 class LdGenFailure(RuntimeError):
     """
     Parent class for any ldgen runtime failure which is due to input data
     """
+
+
+@functools.lru_cache(maxsize=None)
+def get_sources_digest() -> str:
+    """
+    Digest of the sources of the ldgen package. The data kept between the runs, which depend on how ldgen
+    parses and processes its inputs, are not valid for another version of the sources.
+    """
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith('.py'):
+            with open(os.path.join(package_dir, name), 'rb') as f:
+                content = f.read()
+            digest.update(b'%d:%s%d:' % (len(name), name.encode(), len(content)))
+            digest.update(content)
+    return digest.hexdigest()
@@ -0,0 +1,102 @@
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Union
+
+from .ldgen_common import get_sources_digest
+
+# output commands placed in each target, as they appear in the linker script
+PLACEMENTS = Dict[str, List[str]]
+
+
+class OutputStamp:
+    """
+    Digest of all the inputs of the linker script generation, kept together with the digest of the generated
+    linker script and its placements in between the runs. A run with the same inputs as the previous one, whose
+    output was not modified since, would generate the same linker script and can be skipped. The sources
+    of ldgen are one of the inputs, a changed ldgen might generate a different linker script.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.inputs = hashlib.sha256()
+        self.previous: Dict[str, Any] = dict()
+        self.add_input('ldgen sources', get_sources_digest())
+
+        if path:
+            try:
+                with open(path, 'r') as f:
+                    previous = json.load(f)
+                if previous['version'] == OutputStamp.VERSION:
+                    self.previous = previous
+            except (OSError, ValueError, KeyError, TypeError):  # missing, corrupted or incompatible stamp
+                pass
+
+    def add_input(self, name: str, content: Union[str, bytes]) -> None:
+        data = content.encode() if isinstance(content, str) else content
+        # the lengths keep the boundaries of the inputs unambiguous
+        self.inputs.update(b'%d:%s%d:' % (len(name), name.encode(), len(data)))
+        self.inputs.update(data)
+
+    def add_input_file(self, name: str, path: str) -> None:
+        with open(path, 'rb') as f:
+            self.add_input('%s %s' % (name, path), f.read())
+
+    @staticmethod
+    def _get_output_digest(output_path: str) -> Optional[str]:
+        try:
+            with open(output_path, 'r') as f:
+                return hashlib.sha256(f.read().encode()).hexdigest()
+        except OSError:
+            return None
+
+    def is_up_to_date(self, output_path: str) -> bool:
+        """
+        Returns True if the inputs are the same as in the previous run and the output was not modified since.
+        """
+        return bool(self.previous
+                    and self.previous['inputs'] == self.inputs.hexdigest()
+                    and self.previous['output'] == OutputStamp._get_output_digest(output_path))
+
+    def get_changes(self, placements: PLACEMENTS) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Returns the output commands added to and removed from each target since the previous run. All
+        the commands are reported as added if the previous placements are not known.
+        """
+        previous: PLACEMENTS = self.previous.get('placements', dict())
+        changes = dict()
+        for target in sorted(set(placements) | set(previous)):
+            old = previous.get(target, [])
+            new = placements.get(target, [])
+            old_set = set(old)
+            new_set = set(new)
+            added = [command for command in new if command not in old_set]
+            removed = [command for command in old if command not in new_set]
+            if added or removed:
+                changes[target] = {'added': added, 'removed': removed}
+        return changes
+
+    def save(self, output: str, placements: PLACEMENTS) -> None:
+        if not self.path:
+            return
+
+        stamp = {
+            'version': OutputStamp.VERSION,
+            'inputs': self.inputs.hexdigest(),
+            'output': hashlib.sha256(output.encode()).hexdigest(),
+            'placements': placements,
+        }
+
+        stamp_dir = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(stamp_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=stamp_dir, delete=False) as f:
+            json.dump(stamp, f)
+        os.replace(f.name, self.path)
@@ -0,0 +1,187 @@
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from typing import Any, Dict, List, Optional, Tuple
+
+from .archive_reader import ArchiveReaderError, read_archive_sections
+from .entity import EntityDB
+from .ldgen_common import LdGenFailure
+
+# archive name and the dictionary of the object names to the lists of their section names
+ARCHIVE_SECTIONS = Tuple[str, Dict[str, List[str]]]
+
+
+class SectionsCache:
+    """
+    Persistent cache of the section tables of the libraries in the build.
+
+    An entry is valid if the size and modification time of the library are the same as when it was cached.
+    If they differ, but the content hash is the same (e.g. the library was rebuilt with the same result),
+    the entry is still used. Number of the hits and misses is counted for the run and in total.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = dict()
+        self.hashes: Dict[str, str] = dict()
+        self.hits = 0
+        self.misses = 0
+        self.total_hits = 0
+        self.total_misses = 0
+
+        if path:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if data['version'] == SectionsCache.VERSION:
+                    self.entries = data['entries']
+                    self.total_hits = data['hits']
+                    self.total_misses = data['misses']
+            except (OSError, ValueError, KeyError):
+                pass
+
+    @staticmethod
+    def _get_file_hash(library: str) -> str:
+        file_hash = hashlib.sha256()
+        with open(library, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def _get_hash(self, library: str) -> str:
+        if library not in self.hashes:
+            self.hashes[library] = SectionsCache._get_file_hash(library)
+        return self.hashes[library]
+
+    def get(self, library: str) -> Optional[ARCHIVE_SECTIONS]:
+        """
+        Returns the archive name and the sections of its objects if the library is cached, otherwise None.
+        """
+        entry = self.entries.get(library)
+        if entry is not None:
+            stat = os.stat(library)
+            if [stat.st_size, stat.st_mtime_ns] != entry['stat']:
+                if self._get_hash(library) != entry['sha256']:
+                    entry = None
+                else:
+                    entry['stat'] = [stat.st_size, stat.st_mtime_ns]
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry['archive'], entry['sections']
+
+    def put(self, library: str, archive: str, sections: Dict[str, List[str]]) -> None:
+        stat = os.stat(library)
+        self.entries[library] = {
+            'stat': [stat.st_size, stat.st_mtime_ns],
+            'sha256': self._get_hash(library),
+            'archive': archive,
+            'sections': sections,
+        }
+
+    def save(self, libraries: List[str]) -> None:
+        """
+        Saves the entries of the given libraries, the entries of the libraries no longer in the build are dropped.
+        """
+        if not self.path:
+            return
+
+        data = {
+            'version': SectionsCache.VERSION,
+            'hits': self.total_hits + self.hits,
+            'misses': self.total_misses + self.misses,
+            'entries': dict((library, self.entries[library]) for library in libraries if library in self.entries),
+        }
+
+        # ldgen is run for each linker script template, the cache is replaced atomically
+        cache_dir = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=cache_dir, delete=False) as f:
+            json.dump(data, f)
+        os.replace(f.name, self.path)
+
+    def get_stats(self) -> str:
+        def hit_rate(hits: int, misses: int) -> float:
+            return 100.0 * hits / (hits + misses) if hits + misses else 0.0
+
+        total_hits = self.total_hits + self.hits
+        total_misses = self.total_misses + self.misses
+        return ('sections cache: %d hits, %d misses (%.1f%% hit rate), in total %d hits, %d misses (%.1f%% hit rate)'
+                % (self.hits, self.misses, hit_rate(self.hits, self.misses),
+                   total_hits, total_misses, hit_rate(total_hits, total_misses)))
+
+
+def dump_sections(library: str, objdump: str) -> ARCHIVE_SECTIONS:
+    """
+    Runs objdump on the library and parses its output.
+
+    Returns the archive name and the sections of its objects.
+    """
+    env = os.environ.copy()
+    env['LC_ALL'] = 'C'
+    dump = StringIO(subprocess.check_output([objdump, '-h', library], env=env).decode())
+    dump.name = library
+
+    entity_db = EntityDB()
+    entity_db.add_sections_info(dump)
+    archive = next(iter(entity_db.get_archives()))
+    return archive, dict((obj, entity_db.sections[archive][obj]) for obj in entity_db.get_objects(archive))
+
+
+def read_sections(libraries: List[str], objdump: Optional[str], cache: SectionsCache,
+                  jobs: Optional[int] = None, use_objdump: bool = False) -> List[ARCHIVE_SECTIONS]:
+    """
+    Returns the list of (archive, sections) of the libraries in the same order.
+
+    The libraries missing in the cache are read by the archive reader. The libraries the reader cannot handle,
+    or all of them if `use_objdump` is set, are dumped by objdump and parsed concurrently by `jobs` processes
+    (by default the number of CPUs).
+    """
+    results: List[Optional[ARCHIVE_SECTIONS]] = [cache.get(library) for library in libraries]
+    missing = []
+    for (index, library) in enumerate(libraries):
+        if results[index] is not None:
+            continue
+        if not use_objdump:
+            try:
+                archive, sections = read_archive_sections(library)
+                cache.put(library, archive, sections)
+                results[index] = (archive, sections)
+                continue
+            except ArchiveReaderError as e:
+                if not objdump:
+                    raise LdGenFailure('unable to read sections info of %s: %s' % (library, e))
+        missing.append(library)
+
+    dumped: List[ARCHIVE_SECTIONS] = []
+    if missing:
+        if not objdump:
+            raise LdGenFailure('objdump is required to read sections info of the libraries')
+        if len(missing) > 1 and jobs != 1:
+            with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(missing))) as executor:
+                dumped = list(executor.map(dump_sections, missing, [objdump] * len(missing)))
+        else:
+            dumped = [dump_sections(library, objdump) for library in missing]
+
+    dumped_iter = iter(dumped)
+    for (index, library) in enumerate(libraries):
+        if results[index] is None:
+            archive, sections = next(dumped_iter)
+            cache.put(library, archive, sections)
+            results[index] = (archive, sections)
+
+    return [result for result in results if result is not None]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""
+Compares reading of the sections info of the libraries by the built-in archive reader and by objdump,
+e.g. for the libraries of a built project:
+
+    python benchmark_sections_reader.py --libraries-file build/ldgen_libraries --objdump xtensa-esp32-elf-objdump
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+try:
+    from ldgen.archive_reader import read_archive_sections
+    from ldgen.sections_cache import ARCHIVE_SECTIONS, dump_sections
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from ldgen.archive_reader import read_archive_sections
+    from ldgen.sections_cache import ARCHIVE_SECTIONS, dump_sections
+
+
+def measure(name: str, read: Callable[[str], ARCHIVE_SECTIONS], libraries: List[str]) -> Tuple[float, List[ARCHIVE_SECTIONS]]:
+    start = time.perf_counter()
+    results = [read(library) for library in libraries]
+    elapsed = time.perf_counter() - start
+    objects = sum(len(sections) for (_, sections) in results)
+    print(f'{name}: {elapsed:.2f} s for {len(libraries)} libraries with {objects} objects')
+    return elapsed, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ldgen sections info reader benchmark')
+    parser.add_argument('--libraries-file', type=argparse.FileType('r'), required=True,
+                        help='File that contains the list of libraries in the build (build/ldgen_libraries)')
+    parser.add_argument('--objdump', required=True, help='Path to toolchain objdump')
+    args = parser.parse_args()
+
+    libraries = [library.strip() for library in args.libraries_file if library.strip()]
+
+    native_time, native_results = measure('archive reader', read_archive_sections, libraries)
+    objdump_time, objdump_results = measure('objdump', lambda library: dump_sections(library, args.objdump), libraries)
+    print(f'archive reader is {objdump_time / native_time:.1f}x faster')
+
+    for (library, native, objdump) in zip(libraries, native_results, objdump_results):
+        if native != objdump:
+            print(f'sections info of {library} differs')
+
+
+if __name__ == '__main__':
+    main()
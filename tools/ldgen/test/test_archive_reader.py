@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+from typing import List, Tuple
+
+try:
+    from ldgen.archive_reader import ArchiveReaderError, read_archive_sections
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    from ldgen.archive_reader import ArchiveReaderError, read_archive_sections
+
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_RELA = 4
+SHT_NOBITS = 8
+
+
+def build_object(endian: str, sections: List[Tuple[str, int, int, int]]) -> bytes:
+    """
+    Builds ELF32 relocatable object with the given (name, type, link, info) sections
+    followed by the section name table.
+    """
+    names = b'\0'
+    name_offsets = []
+    for (name, _, _, _) in sections + [('.shstrtab', SHT_STRTAB, 0, 0)]:
+        name_offsets.append(len(names))
+        names += name.encode() + b'\0'
+
+    shoff = 52 + len(names)
+    shnum = len(sections) + 2
+    header = (b'\x7fELF' + bytes([1, 1 if endian == '<' else 2, 1]) + bytes(9)
+              + struct.pack(endian + 'HHIIIIIHHHHHH', 1, 94, 1, 0, 0, shoff, 0, 52, 0, 0, 40, shnum, shnum - 1))
+
+    section_headers = bytes(40)
+    for ((_, sh_type, link, info), name_offset) in zip(sections, name_offsets):
+        section_headers += struct.pack(endian + 'IIIIIIIIII', name_offset, sh_type, 0, 0, 52, 0, link, info, 1, 0)
+    section_headers += struct.pack(endian + 'IIIIIIIIII', name_offsets[-1], SHT_STRTAB, 0, 0, 52, len(names), 0, 0, 1, 0)
+    return header + names + section_headers
+
+
+def build_archive(members: List[Tuple[str, bytes]]) -> bytes:
+    long_names = b''
+    headers = []
+    for (name, _) in members:
+        if len(name) < 16:
+            headers.append(name + '/')
+        else:
+            headers.append('/%d' % len(long_names))
+            long_names += name.encode() + b'/\n'
+
+    def member(name: str, data: bytes) -> bytes:
+        header = '%-16s%-12s%-6s%-6s%-8s%-10d`\n' % (name, 0, 0, 0, 644, len(data))
+        return header.encode() + data + b'\n' * (len(data) % 2)
+
+    archive = b'!<arch>\n' + member('/', struct.pack('>I', 0))
+    if long_names:
+        archive += member('//', long_names)
+    for (header, (_, data)) in zip(headers, members):
+        archive += member(header, data)
+    return archive
+
+
+class ArchiveReaderTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def write_library(self, data: bytes) -> str:
+        library = os.path.join(self.test_dir, 'libfreertos.a')
+        with open(library, 'wb') as f:
+            f.write(data)
+        return library
+
+    def test_read_sections(self) -> None:
+        for endian in ('<', '>'):
+            sections = [('.text', SHT_PROGBITS, 0, 0),
+                        ('.literal.prvCheckPendingReadyList', SHT_PROGBITS, 0, 0),
+                        ('.text.prvCheckPendingReadyList', SHT_PROGBITS, 0, 0),
+                        ('.rela.text.prvCheckPendingReadyList', SHT_RELA, 6, 3),
+                        ('.bss', SHT_NOBITS, 0, 0),
+                        ('.symtab', SHT_SYMTAB, 7, 0),
+                        ('.strtab', SHT_STRTAB, 0, 0)]
+            library = self.write_library(build_archive([('croutine.c.obj', build_object(endian, sections)),
+                                                        ('event_groups.c.obj', build_object(endian, sections[:1]))]))
+
+            archive, objects = read_archive_sections(library)
+            self.assertEqual('libfreertos.a', archive)
+            self.assertEqual({'croutine.c.obj': ['.text', '.literal.prvCheckPendingReadyList',
+                                                 '.text.prvCheckPendingReadyList', '.bss'],
+                              'event_groups.c.obj': ['.text']}, objects)
+
+    def test_unhandled_relocations(self) -> None:
+        # relocations without the symbol table are listed as a section
+        sections = [('.text', SHT_PROGBITS, 0, 0), ('.rela.text', SHT_RELA, 0, 1)]
+        library = self.write_library(build_archive([('croutine.c.obj', build_object('<', sections))]))
+        self.assertEqual(['.text', '.rela.text'], read_archive_sections(library)[1]['croutine.c.obj'])
+
+    def test_not_archive(self) -> None:
+        library = self.write_library(b'INPUT(-lfreertos)\n')
+        with self.assertRaises(ArchiveReaderError):
+            read_archive_sections(library)
+
+    def test_not_elf(self) -> None:
+        library = self.write_library(build_archive([('croutine.c.obj', b'BC\xc0\xde')]))
+        with self.assertRaises(ArchiveReaderError):
+            read_archive_sections(library)
+
+
+if __name__ == '__main__':
+    unittest.main()
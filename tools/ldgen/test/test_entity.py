@@ -220,6 +220,36 @@ class EntityDBTest(unittest.TestCase):
         expected = set(['.literal.prvGetNextExpireTime', '.literal.prvInsertTimerInActiveList'])
         self.assertEqual(set(sections), expected)
 
+    def test_get_matching_sections(self):
+        sections = self.entities.get_matching_sections('libfreertos.a', 'croutine.c', '.literal.*')
+        self.assertEqual(sections, ['.literal.prvCheckPendingReadyList', '.literal.prvCheckDelayedList'])
+
+        sections = self.entities.get_matching_sections('libfreertos.a', 'croutine.c', '.literal.prvCheck*List')
+        self.assertEqual(sections, ['.literal.prvCheckPendingReadyList', '.literal.prvCheckDelayedList'])
+
+        sections = self.entities.get_matching_sections('libfreertos.a', 'croutine.S', '.debug_*')
+        self.assertEqual(sections, ['.debug_frame', '.debug_info', '.debug_abbrev'])
+
+        sections = self.entities.get_matching_sections('libfreertos.a', 'timers', '.text.*')
+        self.assertEqual(sections, [])
+
+    def test_check_exists(self):
+        self.assertTrue(self.entities.check_exists(Entity('libfreertos.a', 'timers')))
+        self.assertFalse(self.entities.check_exists(Entity('libfreertos.a', 'tasks')))
+
+        self.assertTrue(self.entities.check_exists(Entity('libfreertos.a', 'croutine.c', 'prvCheckDelayedList')))
+        # symbols are matched as the suffix of the section name
+        self.assertTrue(self.entities.check_exists(Entity('libfreertos.a', 'croutine.c', 'DelayedList')))
+        self.assertFalse(self.entities.check_exists(Entity('libfreertos.a', 'croutine.c', 'prvCheckDelayed')))
+
+    def test_add_sections(self):
+        self.entities.add_sections('libfreertos.a', {'croutine.c.obj': ['.text.prvCheckDelayedList'],
+                                                     'event_groups.c.obj': ['.text.xEventGroupCreate']})
+
+        # the indices of the archive are rebuilt
+        self.assertEqual(self.entities.get_sections('libfreertos.a', 'croutine'), ['.text.prvCheckDelayedList'])
+        self.assertTrue(self.entities.check_exists(Entity('libfreertos.a', 'event_groups', 'xEventGroupCreate')))
+
     def test_parsing(self):
         # Tests parsing objdump with the following:
         #
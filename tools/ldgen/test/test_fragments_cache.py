@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    from ldgen.fragments import FragmentFile
+    from ldgen.fragments_cache import FragmentsCache
+    from ldgen.sdkconfig import SDKConfig
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    from ldgen.fragments import FragmentFile
+    from ldgen.fragments_cache import FragmentsCache
+    from ldgen.sdkconfig import SDKConfig
+
+FRAGMENT = """
+[sections:text]
+entries:
+    .text+
+    .literal+
+
+[scheme:noflash]
+entries:
+    if PERFORMANCE_LEVEL = 0:
+        text -> flash_text
+    else:
+        text -> iram0_text
+"""
+
+
+class FragmentsCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.test_dir, 'cache', 'fragments.pickle')
+        self.fragment_path = os.path.join(self.test_dir, 'linker.lf')
+        self.write_fragment(FRAGMENT)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def write_fragment(self, content: str) -> None:
+        with open(self.fragment_path, 'w') as f:
+            f.write(content)
+
+    def get_sdkconfig(self, performance_level: int, a: str = 'y') -> SDKConfig:
+        sdkconfig_path = os.path.join(self.test_dir, 'sdkconfig')
+        with open(sdkconfig_path, 'w') as f:
+            f.write('CONFIG_PERFORMANCE_LEVEL=%d\n' % performance_level)
+            f.write('CONFIG_A=%s\n' % a)
+        return SDKConfig('data/Kconfig', sdkconfig_path)
+
+    @staticmethod
+    def get_targets(fragment_file: FragmentFile) -> list:
+        scheme = [fragment for fragment in fragment_file.fragments if fragment.name == 'noflash'][0]
+        return sorted(target for (_, target) in scheme.entries)
+
+    def parse(self, sdkconfig: SDKConfig) -> FragmentsCache:
+        cache = FragmentsCache(self.cache_path)
+        self.fragment_file = cache.parse(self.fragment_path, sdkconfig)
+        cache.save([self.fragment_path])
+        return cache
+
+    def test_hit(self) -> None:
+        cache = self.parse(self.get_sdkconfig(0))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertEqual(['flash_text'], self.get_targets(self.fragment_file))
+
+        cache = self.parse(self.get_sdkconfig(0))
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+        self.assertEqual(['flash_text'], self.get_targets(self.fragment_file))
+        self.assertEqual(self.fragment_path, self.fragment_file.path)
+
+    def test_unrelated_config_change(self) -> None:
+        self.parse(self.get_sdkconfig(0, a='y'))
+        cache = self.parse(self.get_sdkconfig(0, a='n'))
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+    def test_referenced_config_change(self) -> None:
+        self.parse(self.get_sdkconfig(0))
+        cache = self.parse(self.get_sdkconfig(1))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertEqual(['iram0_text'], self.get_targets(self.fragment_file))
+
+        # both variants are kept
+        cache = self.parse(self.get_sdkconfig(0))
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+        self.assertEqual(['flash_text'], self.get_targets(self.fragment_file))
+
+    def test_content_change(self) -> None:
+        self.parse(self.get_sdkconfig(0))
+        self.write_fragment(FRAGMENT.replace('flash_text', 'flash_rodata'))
+        cache = self.parse(self.get_sdkconfig(0))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertEqual(['flash_rodata'], self.get_targets(self.fragment_file))
+
+    def test_corrupted_cache(self) -> None:
+        self.parse(self.get_sdkconfig(0))
+        with open(self.cache_path, 'wb') as f:
+            f.write(b'\x80\x04garbage')
+        cache = self.parse(self.get_sdkconfig(0))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test_sources_change(self) -> None:
+        self.parse(self.get_sdkconfig(0))
+        with mock.patch('ldgen.fragments_cache.get_sources_digest', return_value='0' * 64):
+            cache = self.parse(self.get_sdkconfig(0))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test_without_path(self) -> None:
+        cache = FragmentsCache()
+        cache.parse(self.fragment_path, self.get_sdkconfig(0))
+        cache.parse(self.fragment_path, self.get_sdkconfig(0))
+        cache.save([self.fragment_path])
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertFalse(os.path.exists(self.cache_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
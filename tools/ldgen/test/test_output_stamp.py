@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    from ldgen.output_stamp import PLACEMENTS, OutputStamp
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    from ldgen.output_stamp import PLACEMENTS, OutputStamp
+
+OUTPUT = '/* Automatically generated file; DO NOT EDIT */\n'
+
+PLACEMENTS_1: PLACEMENTS = {
+    'flash_text': ['*(.literal .literal.* .text .text.*)'],
+    'iram0_text': [],
+}
+
+
+class OutputStampTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = tempfile.mkdtemp()
+        self.stamp_path = os.path.join(self.test_dir, 'cache', 'sections.ld.stamp')
+        self.output_path = os.path.join(self.test_dir, 'sections.ld')
+        self.fragment_path = os.path.join(self.test_dir, 'linker.lf')
+        with open(self.fragment_path, 'w') as f:
+            f.write('[mapping:freertos]\n')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def get_stamp(self, template: str = 'SECTIONS {}') -> OutputStamp:
+        stamp = OutputStamp(self.stamp_path)
+        stamp.add_input('template', template)
+        stamp.add_input_file('fragments', self.fragment_path)
+        return stamp
+
+    def generate(self, stamp: OutputStamp, placements: PLACEMENTS) -> None:
+        with open(self.output_path, 'w') as f:
+            f.write(OUTPUT)
+        stamp.save(OUTPUT, placements)
+
+    def test_up_to_date(self) -> None:
+        stamp = self.get_stamp()
+        self.assertFalse(stamp.is_up_to_date(self.output_path))
+        self.generate(stamp, PLACEMENTS_1)
+
+        self.assertTrue(self.get_stamp().is_up_to_date(self.output_path))
+
+    def test_inputs_changed(self) -> None:
+        self.generate(self.get_stamp(), PLACEMENTS_1)
+
+        self.assertFalse(self.get_stamp('SECTIONS { }').is_up_to_date(self.output_path))
+
+        with open(self.fragment_path, 'a') as f:
+            f.write('archive: libfreertos.a\n')
+        self.assertFalse(self.get_stamp().is_up_to_date(self.output_path))
+
+    def test_sources_changed(self) -> None:
+        self.generate(self.get_stamp(), PLACEMENTS_1)
+
+        with mock.patch('ldgen.output_stamp.get_sources_digest', return_value='0' * 64):
+            self.assertFalse(self.get_stamp().is_up_to_date(self.output_path))
+
+    def test_input_boundaries(self) -> None:
+        # moving content from one input to another changes the digest
+        stamp_a = OutputStamp()
+        stamp_a.add_input('a', 'bc')
+        stamp_a.add_input('d', '')
+        stamp_b = OutputStamp()
+        stamp_b.add_input('a', 'b')
+        stamp_b.add_input('cd', '')
+        self.assertNotEqual(stamp_a.inputs.hexdigest(), stamp_b.inputs.hexdigest())
+
+    def test_output_modified(self) -> None:
+        self.generate(self.get_stamp(), PLACEMENTS_1)
+
+        with open(self.output_path, 'a') as f:
+            f.write('\n')
+        self.assertFalse(self.get_stamp().is_up_to_date(self.output_path))
+
+        os.remove(self.output_path)
+        self.assertFalse(self.get_stamp().is_up_to_date(self.output_path))
+
+    def test_corrupted_stamp(self) -> None:
+        self.generate(self.get_stamp(), PLACEMENTS_1)
+
+        with open(self.stamp_path, 'w') as f:
+            f.write('{"version": 1')
+        self.assertFalse(self.get_stamp().is_up_to_date(self.output_path))
+
+    def test_get_changes(self) -> None:
+        stamp = self.get_stamp()
+        self.assertEqual({'flash_text': {'added': ['*(.literal .literal.* .text .text.*)'], 'removed': []}},
+                         stamp.get_changes(PLACEMENTS_1))
+        self.generate(stamp, PLACEMENTS_1)
+
+        placements = {
+            'flash_text': ['*(EXCLUDE_FILE(*libfreertos.a) .literal .literal.* .text .text.*)'],
+            'iram0_text': ['*libfreertos.a:(.literal .literal.* .text .text.*)'],
+        }
+        self.assertEqual({'flash_text': {'added': ['*(EXCLUDE_FILE(*libfreertos.a) .literal .literal.* .text .text.*)'],
+                                         'removed': ['*(.literal .literal.* .text .text.*)']},
+                          'iram0_text': {'added': ['*libfreertos.a:(.literal .literal.* .text .text.*)'],
+                                         'removed': []}},
+                         self.get_stamp().get_changes(placements))
+
+        self.assertEqual({}, self.get_stamp().get_changes(PLACEMENTS_1))
+
+
+if __name__ == '__main__':
+    unittest.main()
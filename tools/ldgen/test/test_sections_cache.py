@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+try:
+    from ldgen.sections_cache import SectionsCache, read_sections
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    from ldgen.sections_cache import SectionsCache, read_sections
+
+SECTIONS = {'croutine.c.obj': ['.literal.prvCheckPendingReadyList', '.text.prvCheckPendingReadyList']}
+
+
+class SectionsCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.test_dir, 'cache', 'sections.json')
+        self.library = os.path.join(self.test_dir, 'libfreertos.a')
+        with open(self.library, 'wb') as f:
+            f.write(b'!<arch>\n')
+
+        cache = SectionsCache(self.cache_path)
+        cache.put(self.library, 'libfreertos.a', SECTIONS)
+        cache.save([self.library])
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def test_hit(self) -> None:
+        cache = SectionsCache(self.cache_path)
+        self.assertEqual(('libfreertos.a', SECTIONS), cache.get(self.library))
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+    def test_hit_same_content(self) -> None:
+        stat = os.stat(self.library)
+        os.utime(self.library, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        cache = SectionsCache(self.cache_path)
+        self.assertEqual(('libfreertos.a', SECTIONS), cache.get(self.library))
+
+    def test_miss_changed_content(self) -> None:
+        with open(self.library, 'ab') as f:
+            f.write(b'\n')
+
+        cache = SectionsCache(self.cache_path)
+        self.assertIsNone(cache.get(self.library))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test_stats(self) -> None:
+        cache = SectionsCache(self.cache_path)
+        cache.get(self.library)
+        cache.get(os.path.join(self.test_dir, 'libmissing.a'))
+        cache.save([self.library])
+
+        cache = SectionsCache(self.cache_path)
+        self.assertEqual((1, 1), (cache.total_hits, cache.total_misses))
+        self.assertIn('in total 1 hits, 1 misses (50.0% hit rate)', cache.get_stats())
+
+    def test_drop_unused(self) -> None:
+        cache = SectionsCache(self.cache_path)
+        cache.save([])
+
+        cache = SectionsCache(self.cache_path)
+        self.assertIsNone(cache.get(self.library))
+
+    def test_read_cached(self) -> None:
+        # cached libraries are not dumped, objdump is not called
+        cache = SectionsCache(self.cache_path)
+        self.assertEqual([('libfreertos.a', SECTIONS)], read_sections([self.library], '', cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,10 +5,16 @@
 #
 
 import argparse
+import copy
 import csv
 import distutils.dir_util
+import io
 import os
 import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from itertools import zip_longest
 
 try:
@@ -184,31 +190,40 @@ def get_fileid_val(file_identifier, key_value_data, fileid_value):
     return fileid_value
 
 
-def add_data_to_file(config_data_to_write, key_value_pair, output_csv_file):
+def get_device_rows(config_data_to_write, key_value_pair):
+    """ Get rows (key, type, encoding, value) of a single device in the same order
+    as they are written to csv target file
+    """
+    device_rows = []
+
+    for namespace_config_data in config_data_to_write:
+        for data in namespace_config_data:
+            data_to_write = data[:]
+            if 'namespace' in data:
+                data_to_write.append('')
+                device_rows.append(data_to_write)
+            else:
+                key = data[0]
+                while key not in key_value_pair[0]:
+                    del key_value_pair[0]
+                if key in key_value_pair[0]:
+                    value = key_value_pair[0][1]
+                    data_to_write.append(value)
+                    del key_value_pair[0]
+                    device_rows.append(data_to_write)
+
+    return device_rows
+
+
+def add_data_to_file(device_rows, output_csv_file):
     """ Add data to csv target file
     """
     header = ['key', 'type', 'encoding', 'value']
-    data_to_write = []
 
     with open(output_csv_file, 'w', newline='') as target_csv_file:
         output_file_writer = csv.writer(target_csv_file, delimiter=',')
         output_file_writer.writerow(header)
-
-        for namespace_config_data in config_data_to_write:
-            for data in namespace_config_data:
-                data_to_write = data[:]
-                if 'namespace' in data:
-                    data_to_write.append('')
-                    output_file_writer.writerow(data_to_write)
-                else:
-                    key = data[0]
-                    while key not in key_value_pair[0]:
-                        del key_value_pair[0]
-                    if key in key_value_pair[0]:
-                        value = key_value_pair[0][1]
-                        data_to_write.append(value)
-                        del key_value_pair[0]
-                        output_file_writer.writerow(data_to_write)
+        output_file_writer.writerows(device_rows)
 
 
 def create_dir(filetype, output_dir_path):
@@ -249,40 +264,47 @@ def set_repeat_value(total_keys_repeat, keys, csv_file, target_filename):
     return target_filename
 
 
-def create_intermediate_csv(args, keys_in_values_file, keys_repeat, is_encr=False):
+def get_device_data(args, keys_in_values_file, keys_repeat):
+    """ Yield file identifier value and rows (key, type, encoding, value) for each device
+    in values file. Config file is parsed only once and intermediate csv files are written
+    only if not skipped by `--skip_csv`
+    """
     file_identifier_value = '0'
     # Add config data per namespace to `config_data_to_write` list
     config_data_to_write = add_config_data_per_namespace(args.conf)
 
-    try:
-        with open(args.values, 'r') as csv_values_file:
-            values_file_reader = csv.reader(csv_values_file, delimiter=',')
-            keys = next(values_file_reader)
-
-        filename, file_ext = os.path.splitext(args.values)
-        target_filename = filename + '_created' + file_ext
-        if keys_repeat:
-            target_values_file = set_repeat_value(keys_repeat, keys, args.values, target_filename)
-        else:
-            target_values_file = args.values
+    with open(args.values, 'r') as csv_values_file:
+        values_file_reader = csv.reader(csv_values_file, delimiter=',')
+        keys = next(values_file_reader)
+
+    filename, file_ext = os.path.splitext(args.values)
+    target_filename = filename + '_created' + file_ext
+    if keys_repeat:
+        target_values_file = set_repeat_value(keys_repeat, keys, args.values, target_filename)
+    else:
+        target_values_file = args.values
 
-        with open(target_values_file, 'r') as csv_values_file:
-            values_file_reader = csv.reader(csv_values_file, delimiter=',')
-            next(values_file_reader)
+    with open(target_values_file, 'r') as csv_values_file:
+        values_file_reader = csv.reader(csv_values_file, delimiter=',')
+        next(values_file_reader)
 
-            # Create new directory(if doesn't exist) to store csv file generated
+        # Create new directory(if doesn't exist) to store csv file generated
+        if not args.skip_csv:
             output_csv_target_dir = create_dir('csv', args.outdir)
-            # Create new directory(if doesn't exist) to store bin file generated
+        # Create new directory(if doesn't exist) to store bin file generated
+        if not args.archive:
             output_bin_target_dir = create_dir('bin', args.outdir)
 
-            for values_data_line in values_file_reader:
-                key_value_data = list(zip_longest(keys_in_values_file, values_data_line))
+        for values_data_line in values_file_reader:
+            key_value_data = list(zip_longest(keys_in_values_file, values_data_line))
 
-                # Get file identifier value from values file
-                file_identifier_value = get_fileid_val(args.fileid, key_value_data, file_identifier_value)
+            # Get file identifier value from values file
+            file_identifier_value = get_fileid_val(args.fileid, key_value_data, file_identifier_value)
 
-                key_value_pair = key_value_data[:]
+            key_value_pair = key_value_data[:]
+            device_rows = get_device_rows(config_data_to_write, key_value_pair)
 
+            if not args.skip_csv:
                 # Verify if output csv file does not exist
                 csv_filename = args.prefix + '-' + file_identifier_value + '.' + 'csv'
                 output_csv_file = output_csv_target_dir + csv_filename
@@ -290,30 +312,139 @@ def create_intermediate_csv(args, keys_in_values_file, keys_repeat, is_encr=Fals
                     raise SystemExit('Target csv file: %s already exists.`' % output_csv_file)
 
                 # Add values corresponding to each key to csv intermediate file
-                add_data_to_file(config_data_to_write, key_value_pair, output_csv_file)
+                add_data_to_file(device_rows, output_csv_file)
                 print('\nCreated CSV file: ===>', output_csv_file)
 
+            if not args.archive:
                 # Verify if output bin file does not exist
                 bin_filename = args.prefix + '-' + file_identifier_value + '.' + 'bin'
                 output_bin_file = output_bin_target_dir + bin_filename
                 if os.path.isfile(output_bin_file):
                     raise SystemExit('Target binary file: %s already exists.`' % output_bin_file)
 
-                args.input = output_csv_file
-                args.output = os.path.join('bin', bin_filename)
-                if args.keygen:
-                    args.keyfile = 'keys-' + args.prefix + '-' + file_identifier_value
+            yield file_identifier_value, device_rows
 
-                if is_encr:
-                    nvs_partition_gen.encrypt(args)
-                else:
-                    nvs_partition_gen.generate(args)
 
+def generate_device_bin(args, file_identifier_value, device_rows, encr_key=None):
+    """ Generate NVS binary of a single device directly from its rows, without
+    re-reading intermediate csv file. Binary is written to `bin` dir in output dir,
+    or returned as bytes if it is to be stored in archive
+    """
+    bin_filename = args.prefix + '-' + file_identifier_value + '.' + 'bin'
+    max_key_len = 15
+
+    if args.keygen:
+        key_args = copy.copy(args)
+        key_args.keyfile = 'keys-' + args.prefix + '-' + file_identifier_value
+        encr_key = nvs_partition_gen.generate_key(key_args)
+
+    output_buf = io.BytesIO()
+    nvs_obj = nvs_partition_gen.nvs_open(output_buf, args.input_size, args.nvs_version,
+                                         is_encrypt=encr_key is not None, key=encr_key)
+    for key, datatype, encoding, value in device_rows:
+        # Comments are skipped
+        if key.startswith('#'):
+            continue
+        if len(key) > max_key_len:
+            raise nvs_partition_gen.InputError('Length of key `%s` should be <= 15 characters.' % key)
+        nvs_partition_gen.write_entry(nvs_obj, key, datatype, encoding, value)
+    nvs_partition_gen.nvs_close(nvs_obj)
+
+    if args.archive:
+        return bin_filename, output_buf.getvalue()
+
+    output_bin_file = os.path.join(args.outdir, 'bin', bin_filename)
+    with open(output_bin_file, 'wb') as output_file:
+        output_file.write(output_buf.getbuffer())
+    return output_bin_file, None
+
+
+def get_input_key(args):
+    """ Get key for encrypting NVS partition from file given via `--inputkey`
+    """
+    if args.keygen and args.inputkey:
+        raise SystemExit('Error. --keygen and --inputkey both are not allowed.')
+
+    filename, ext = os.path.splitext(args.inputkey)
+    if ext != '.bin':
+        raise SystemExit('Error: `%s`. Only `.bin` extension allowed.' % args.inputkey)
+    with open(args.inputkey, 'rb') as key_f:
+        return key_f.read(64)
+
+
+def generate_device_bins(args, keys_in_values_file, keys_repeat, is_encr=False):
+    """ Generate NVS binaries of all devices in values file. Binaries are generated
+    in `--jobs` worker processes as device rows are streamed from values file, and
+    stored either as separate files or in a single archive
+    """
+    # Limits number of devices waiting for a worker so memory stays bounded
+    max_pending_per_job = 16
+    encr_key = None
+    archive = None
+    executor = None
+    pending = deque()
+    device_count = 0
+
+    try:
+        args.input_size = nvs_partition_gen.check_size(args.size)
+        args.nvs_version = nvs_partition_gen.Page.VERSION1 if args.version == 1 else nvs_partition_gen.Page.VERSION2
+        if is_encr and args.inputkey:
+            encr_key = get_input_key(args)
+
+        if args.nvs_version == nvs_partition_gen.Page.VERSION1:
+            print('\nCreating NVS binaries with version:', nvs_partition_gen.VERSION1_PRINT)
+        else:
+            print('\nCreating NVS binaries with version:', nvs_partition_gen.VERSION2_PRINT)
+
+        if args.archive:
+            archive_file = os.path.join(args.outdir, args.archive)
+            if os.path.isfile(archive_file):
+                raise SystemExit('Target archive file: %s already exists.`' % archive_file)
+            distutils.dir_util.mkpath(os.path.dirname(os.path.abspath(archive_file)))
+            archive = zipfile.ZipFile(archive_file, 'w', zipfile.ZIP_DEFLATED)
+
+        def store_device_bin(result):
+            output_bin_file, data = result
+            if archive:
+                archive.writestr(output_bin_file, data)
+                print('\nAdded NVS binary to archive: ===>', output_bin_file)
+            else:
+                print('\nCreated NVS binary: ===>', output_bin_file)
+
+        if args.jobs > 1:
+            executor = ProcessPoolExecutor(max_workers=args.jobs)
+
+        start_time = time.perf_counter()
+        for file_identifier_value, device_rows in get_device_data(args, keys_in_values_file, keys_repeat):
+            if executor:
+                pending.append(executor.submit(generate_device_bin, args, file_identifier_value, device_rows, encr_key))
+                if len(pending) >= args.jobs * max_pending_per_job:
+                    store_device_bin(pending.popleft().result())
+            else:
+                store_device_bin(generate_device_bin(args, file_identifier_value, device_rows, encr_key))
+            device_count += 1
+
+        while pending:
+            store_device_bin(pending.popleft().result())
+        elapsed_time = time.perf_counter() - start_time
+
+        if archive:
+            print('\nFiles generated in %s, NVS binaries stored in %s ...' % (args.outdir, archive_file))
+        else:
             print('\nFiles generated in %s ...' % args.outdir)
+        print('Generated %d NVS binaries in %.2f s (%.1f devices/s)'
+              % (device_count, elapsed_time, device_count / elapsed_time if elapsed_time else 0))
 
     except Exception as e:
         print(e)
         exit(1)
+    finally:
+        for future in pending:
+            future.cancel()
+        if executor:
+            executor.shutdown()
+        if archive:
+            archive.close()
 
 
 def verify_file_format(args):
@@ -374,8 +505,8 @@ def generate(args):
     if (args.keygen or args.inputkey):
         encryption_enabled = True
         print('\nGenerating encrypted NVS binary images...')
-    # Create intermediate csv file
-    create_intermediate_csv(args, keys_in_values_file, keys_repeat, is_encr=encryption_enabled)
+    # Create intermediate csv files and NVS binaries
+    generate_device_bins(args, keys_in_values_file, keys_repeat, is_encr=encryption_enabled)
 
 
 def generate_key(args):
@@ -445,6 +576,18 @@ def main():
         parser_gen.add_argument('--kp_hmac_inputkey',
                                 default=None,
                                 help='File having the HMAC key for generating the NVS encryption keys')
+        parser_gen.add_argument('--jobs',
+                                default=os.cpu_count() or 1,
+                                type=int,
+                                help='Number of worker processes generating NVS binaries\
+                                    \n(Default: number of CPUs)')
+        parser_gen.add_argument('--skip_csv',
+                                action='store_true',
+                                help='Do not write intermediate csv file for each device')
+        parser_gen.add_argument('--archive',
+                                default=None,
+                                help='''Store all NVS binaries in a single zip archive with given\
+                                    \nfilename (relative to outdir) instead of separate files''')
         parser_gen.add_argument('--input',
                                 default=None,
                                 help=argparse.SUPPRESS)
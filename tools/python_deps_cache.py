@@ -0,0 +1,94 @@
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Cache of the successful Python dependency check. It is written by "idf_tools.py check-python-dependencies" and
+# read by idf.py on every start, so only the standard library may be used here.
+
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+PYTHON_DEPS_CACHE_FILE = 'idf-python-deps-check.json'
+PYTHON_DEPS_CACHE_VERSION = 1
+
+# The environment variables which select the checked Python environment, requirements and constraints
+ENV_VARS = ['IDF_PATH', 'IDF_TOOLS_PATH', 'IDF_PYTHON_ENV_PATH', 'IDF_PYTHON_CHECK_CONSTRAINTS']
+
+
+def get_cache_path() -> str:
+    """
+    The cache is stored in the Python environment it was created for.
+    """
+    return os.path.join(sys.prefix, PYTHON_DEPS_CACHE_FILE)
+
+
+def _file_sha256(path: str) -> Optional[str]:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _sys_path_state() -> Dict[str, int]:
+    # Installing, upgrading or removing a package adds or removes its metadata directory (*.dist-info, *.egg-info)
+    # in the directory it is installed to, therefore, the modification times of the directories in sys.path change.
+    state = {}
+    for path in sys.path:
+        try:
+            state[path] = os.stat(path or os.curdir).st_mtime_ns
+        except OSError:
+            pass
+    return state
+
+
+def get_key(files: List[str]) -> Dict[str, Any]:
+    """
+    Returns the state the result of the check depends on: the Python interpreter, the environment variables, the
+    hashes of the given files (requirements, constraints, ...) and the state of the installed packages.
+    """
+    return {
+        'version': PYTHON_DEPS_CACHE_VERSION,
+        'python': [sys.executable, sys.version],
+        'env': {var: os.environ.get(var) for var in ENV_VARS},
+        'files': {path: _file_sha256(path) for path in files},
+        'sys_path': _sys_path_state(),
+    }
+
+
+def is_satisfied(path: Optional[str] = None) -> bool:
+    """
+    Returns True if the requirements were found satisfied in this Python environment and nothing they depend on
+    has changed since then.
+    """
+    try:
+        with open(path or get_cache_path(), 'r') as f:
+            key = json.load(f)
+        return bool(key == get_key(list(key['files'])))
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+
+def save(files: List[str], path: Optional[str] = None) -> None:
+    """
+    Records that the requirements are satisfied, the files are the inputs of the check.
+    """
+    cache_path = path or get_cache_path()
+    tmp_path = cache_path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(get_key(files), f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # The cache is just an optimization, e.g. the Python environment can be read-only
+        pass
+
+
+def invalidate(path: Optional[str] = None) -> None:
+    try:
+        os.remove(path or get_cache_path())
+    except OSError:
+        pass
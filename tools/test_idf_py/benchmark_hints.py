@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+# Measures the matching of hints from hints.yml on the output of a failing build. The compiled hints are compared with
+# searching for every hint separately. A build log can be given, e.g. build/log/idf_py_stderr_output_*. Otherwise, a
+# log of a verbose build failing with the errors from error_output.yml is generated.
+#
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Callable, Iterable, List
+
+import yaml
+
+CWD = os.path.dirname(__file__)
+IDF_PATH = os.environ.get('IDF_PATH') or os.path.realpath(os.path.join(CWD, '..', '..'))
+sys.path.append(os.path.join(IDF_PATH, 'tools'))
+from idf_py_actions.tools import CompiledHints  # noqa: E402
+
+HINTS_YML = os.path.join(IDF_PATH, 'tools', 'idf_py_actions', 'hints.yml')
+ERR_OUT_YML = os.path.join(CWD, 'error_output.yml')
+
+
+def generate_log(lines: int) -> List[str]:
+    with open(ERR_OUT_YML) as f:
+        errors = list(yaml.safe_load(f))
+
+    log = []
+    for i in range(lines):
+        obj = 'esp-idf/driver/CMakeFiles/__idf_driver.dir/src/file_{}.c.obj'.format(i)
+        log += ['[{}/{}] {}/xtensa-esp32-elf-gcc -DESP_PLATFORM -DIDF_VER=\\"v5.2\\" -I{}/components/driver/include '
+                '-mlongcalls -ffunction-sections -fdata-sections -Wall -Werror=all -Wno-error=unused-function '
+                '-Wno-error=deprecated-declarations -Wextra -ggdb -Og -std=gnu17 -o {} -c file_{}.c\n'
+                .format(i, lines, '/opt/xtensa-esp-elf/bin', IDF_PATH, obj, i),
+                '{}/components/driver/src/file_{}.c:{}:5: warning: unused variable \'tmp\' [-Wunused-variable]\n'
+                .format(IDF_PATH, i, i % 500)]
+    # the build fails at the end
+    return log + [error if error.endswith('\n') else error + '\n' for error in errors] + ['ninja: build stopped: subcommand failed.\n']
+
+
+def normalize(output: str) -> str:
+    # hints expect new lines trimmed
+    return ' '.join(line.strip() for line in output.splitlines() if line.strip())
+
+
+def search_each(hints: CompiledHints, output: str) -> List[str]:
+    # every regular expression is searched for separately in the output
+    return [rule['re'] for rule in hints.rules if re.compile(rule['re']).search(output)]
+
+
+def search_compiled(hints: CompiledHints, output: str) -> List[str]:
+    return list(hints.generate(output))
+
+
+def compile_yml() -> CompiledHints:
+    with open(HINTS_YML, 'r') as f:
+        return CompiledHints.from_yml(yaml.safe_load(f))
+
+
+def measure(func: Callable, outputs: Iterable[str], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for output in outputs:
+            func(output)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark of matching hints on a build log')
+    parser.add_argument('--log', help='Build log, a log of a failing build is generated if not given')
+    parser.add_argument('--lines', help='Number of compiled files in the generated log', type=int, default=10000)
+    parser.add_argument('--runs', help='Number of runs of each variant', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, 'r') as f:
+            lines = f.readlines()
+    else:
+        lines = generate_log(args.lines)
+    print('Log: {} lines, {} bytes'.format(len(lines), sum(len(line) for line in lines)))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_path = os.path.join(tmpdir, 'cache.json')
+        load_yml = measure(lambda _: compile_yml(), [''], args.runs)
+        CompiledHints.load(HINTS_YML, cache_path)
+        load_cache = measure(lambda _: CompiledHints.load(HINTS_YML, cache_path), [''], args.runs)
+        hints = CompiledHints.load(HINTS_YML, cache_path)
+    print('{:>24}: {:.1f} ms'.format('load hints.yml', load_yml * 1000))
+    print('{:>24}: {:.1f} ms'.format('load cached hints', load_cache * 1000))
+
+    line_outputs = [normalize(line) for line in lines]
+    log_output = normalize(''.join(lines))
+    for (name, outputs) in [('line by line', line_outputs), ('whole log', [log_output])]:
+        found_each = [len(search_each(hints, output)) for output in outputs]
+        found_compiled = [len(search_compiled(hints, output)) for output in outputs]
+        if found_each != found_compiled:
+            raise RuntimeError('The compiled hints found different hints for the {}'.format(name))
+        each = measure(lambda output: search_each(hints, output), outputs, args.runs)
+        compiled = measure(lambda output: search_compiled(hints, output), outputs, args.runs)
+        print('{:>24}: each hint {:.3f} s, compiled hints {:.3f} s ({} hints found)'.format(
+            name, each, compiled, sum(found_compiled)))
+
+
+if __name__ == '__main__':
+    main()
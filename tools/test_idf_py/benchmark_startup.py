@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+#
+# SPDX-FileCopyrightText: 2023 Espressif Systems (Shanghai) CO LTD
+# SPDX-License-Identifier: Apache-2.0
+#
+# Measures the start-up time of idf.py with and without the cached result of the Python dependency check.
+# Run it in an ESP-IDF shell environment.
+#
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+IDF_PATH = os.environ.get('IDF_PATH') or os.path.realpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(IDF_PATH, 'tools'))
+import python_deps_cache  # noqa: E402
+
+
+def measure(cmd: List[str], runs: int, cold: bool) -> List[float]:
+    times = []
+    for _ in range(runs):
+        if cold:
+            python_deps_cache.invalidate()
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark of the idf.py start-up time')
+    parser.add_argument('--runs', help='Number of runs of each variant', type=int, default=10)
+    parser.add_argument('idf_py_args', help='Arguments of idf.py (default: --version)', nargs='*')
+    args = parser.parse_args()
+
+    cmd = [sys.executable, os.path.join(IDF_PATH, 'tools', 'idf.py')] + (args.idf_py_args or ['--version'])
+    print('Measuring: {}'.format(' '.join(cmd)))
+    for (name, cold) in [('dependency check', True), ('cached dependency check', False)]:
+        times = measure(cmd, args.runs, cold)
+        print('{:>24}: min {:.3f} s, median {:.3f} s'.format(name, min(times), statistics.median(times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,14 @@
 # SPDX-FileCopyrightText: 2022-2023 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
 import os
+import re
 import sys
 import tempfile
 import unittest
 from pathlib import Path
 from subprocess import run
-from typing import List
+from typing import Any, Dict, List
+from unittest import mock
 
 import yaml
 
@@ -23,10 +25,10 @@ CWD = os.path.join(os.path.dirname(__file__))
 ERR_OUT_YML = os.path.join(CWD, 'error_output.yml')
 
 try:
-    from idf_py_actions.tools import generate_hints
+    from idf_py_actions.tools import CompiledHints, generate_hints
 except ImportError:
     sys.path.append(os.path.join(CWD, '..'))
-    from idf_py_actions.tools import generate_hints
+    from idf_py_actions.tools import CompiledHints, generate_hints
 
 
 class TestHintsMassages(unittest.TestCase):
@@ -48,6 +50,90 @@ class TestHintsMassages(unittest.TestCase):
         self.tmpdir.cleanup()
 
 
+class TestCompiledHints(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def search_each(self, yml: List[Dict], output: str) -> List[str]:
+        # reference matching every hint separately
+        hints = []
+        for hint in yml:
+            match = re.search(hint['re'], output)
+            if match:
+                extra_info = ', '.join(match.groups()) if hint.get('match_to_output') else ''
+                hints.append('HINT: ' + hint['hint'].format(extra_info))
+        return hints
+
+    def test_same_as_searching_each_hint(self) -> None:
+        yml: List[Dict] = [
+            {'re': 'Error: ABC', 'hint': 'overlapping 1'},
+            {'re': 'ABCDEF', 'hint': 'overlapping 2'},
+            {'re': 'ABCD', 'hint': 'prefix'},
+            {'re': '(?i)case insensitive', 'hint': 'no literal 1'},
+            {'re': '[0-9]+ errors', 'hint': 'no literal 2'},
+            {'re': 'ERROR: .* is (missing|broken)', 'hint': 'not limited offset {}', 'match_to_output': True},
+            {'re': '^at the start (here|there)!', 'hint': 'anchor'},
+            {'re': r'(?<=\[)FAILED\]', 'hint': 'lookbehind'},
+            {'re': r'\w{2,4}: (FIRST|SECOND) in a row', 'hint': 'limited offset {}', 'match_to_output': True},
+        ]
+        hints = CompiledHints.from_yml(yml)
+        self.assertIsNone(hints.rules[3]['literals'])
+        # a match starts at most 12 characters before ' in a row'
+        self.assertEqual(hints.rules[8]['literals'], [' in a row'])
+        self.assertEqual(hints.rules[8]['max_offset'], 12)
+
+        outputs = [
+            'Error: ABCDEF',
+            'at the start here! at the start there!',
+            'xyz at the start here!',
+            'CASE INSENSITIVE 12 errors [FAILED] FAILED]',
+            'ERROR: x ERROR: component is broken',
+            'xy: FIRST in a row abcd: SECOND in a row',
+            'ERROR: nothing',
+        ]
+        for output in outputs:
+            self.assertEqual(list(hints.generate(output)), self.search_each(yml, output), output)
+
+    def test_without_regex_parser(self) -> None:
+        # the private parser of regular expressions is not available or it has changed
+        yml: List[Dict] = [
+            {'re': 'error: first', 'hint': 'first'},
+            {'re': "error: '(second)'", 'hint': 'second {}', 'match_to_output': True},
+        ]
+        patches: List[Any] = [mock.patch('idf_py_actions.tools.sre_parse', None),
+                              mock.patch('idf_py_actions.tools._find_literals', side_effect=AttributeError)]
+        for patch in patches:
+            with patch:
+                hints = CompiledHints.from_yml(yml)
+            self.assertTrue(all(rule['literals'] is None for rule in hints.rules))
+            output = "error: first error: 'second'"
+            self.assertEqual(list(hints.generate(output)), self.search_each(yml, output))
+            self.assertEqual(list(hints.generate('no error')), [])
+
+    def test_cache(self) -> None:
+        hints_path = os.path.join(self.tmpdir.name, 'hints.yml')
+        cache_path = os.path.join(self.tmpdir.name, 'cache.json')
+        with open(hints_path, 'w') as f:
+            f.write('-\n    re: "error: first"\n    hint: "first hint"\n')
+
+        hints = CompiledHints.load(hints_path, cache_path)
+        # the temporary file of this process replaced the cache
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['cache.json', 'hints.yml'])
+        # the YAML file is not parsed again
+        with mock.patch('yaml.safe_load', side_effect=AssertionError):
+            cached = CompiledHints.load(hints_path, cache_path)
+        self.assertEqual(cached.rules, hints.rules)
+        self.assertEqual(list(cached.generate('error: first')), ['HINT: first hint'])
+
+        with open(hints_path, 'w') as f:
+            f.write('-\n    re: "error: second"\n    hint: "second hint"\n')
+        hints = CompiledHints.load(hints_path, cache_path)
+        self.assertEqual(list(hints.generate('error: first error: second')), ['HINT: second hint'])
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+
 class TestHintModuleComponentRequirements(unittest.TestCase):
     def run_idf(self, args: List[str]) -> str:
         # Simple helper to run idf command and return it's stdout.
@@ -5,8 +5,10 @@
 
 import json
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
 from unittest import TestCase, main, mock
 
 import elftools.common.utils as ecu
@@ -86,6 +88,65 @@ class TestExtensions(TestWithoutExtensions):
             os.remove(link_path)
 
 
+class TestLazyExtensions(TestWithoutExtensions):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='idf_py_tmp')
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def test_manifest(self):
+        ext_path = os.path.join(self.temp_dir, 'foo_ext.py')
+        with open(ext_path, 'w') as f:
+            f.write('# foo extension\n')
+        manifest_path = os.path.join(self.temp_dir, idf.ActionsManifest.FILE_NAME)
+        manifest = idf.ActionsManifest(manifest_path, current_dir, 'esp32')
+        manifest.update(ext_path, {'actions': {'foo': {'aliases': ['f'], 'dependencies': ['all']}}})
+        manifest.save()
+
+        manifest = idf.ActionsManifest(manifest_path, current_dir, 'esp32')
+        self.assertFalse(manifest.get(ext_path)['always_load'])
+        self.assertEqual(manifest.get_required_actions(['--dry-run', 'f']), {'foo', 'all'})
+        self.assertIsNone(idf.ActionsManifest(manifest_path, current_dir, 'esp32s2').get(ext_path))
+        with open(ext_path, 'a') as f:
+            f.write('# modified\n')
+        self.assertIsNone(idf.ActionsManifest(manifest_path, current_dir, 'esp32').get(ext_path))
+
+        manifest.update(ext_path, {'actions': {'foo': {'options': [{'names': ['--bar'], 'scope': 'global'}]}}})
+        self.assertTrue(manifest.get(ext_path)['always_load'])
+
+    def test_loaded_extensions(self):
+        with mock.patch.object(sys, 'prefix', self.temp_dir):
+            # all the extensions are loaded when the manifest is created
+            self.assertIn('create-project', idf.init_cli(argv=['--dry-run', 'build']).list_commands(None))
+            commands = idf.init_cli(argv=['--dry-run', 'build']).list_commands(None)
+            self.assertIn('all', commands)
+            self.assertIn('flash', commands)
+            self.assertNotIn('create-project', commands)
+            self.assertIn('create-project', idf.init_cli(argv=['create-project', 'foo']).list_commands(None))
+            self.assertIn('create-project', idf.init_cli(argv=['--help']).list_commands(None))
+            self.assertIn('create-project', idf.init_cli().list_commands(None))
+
+    def test_extensions_using_lazy_actions(self):
+        ext_dir = os.path.join(self.temp_dir, 'extensions')
+        os.mkdir(ext_dir)
+        with open(os.path.join(ext_dir, 'patch_uf2_ext.py'), 'w') as f:
+            f.write('def action_extensions(base_actions, project_path):\n'
+                    '    base_actions["actions"]["uf2"]["short_help"] += " (patched)"\n'
+                    '    return {}\n')
+        with open(os.path.join(ext_dir, 'use_uf2_ext.py'), 'w') as f:
+            f.write('def action_extensions(base_actions, project_path):\n'
+                    '    dependencies = base_actions["actions"]["uf2-app"]["dependencies"]\n'
+                    '    return {"actions": {"use-uf2": {"callback": print, "dependencies": dependencies}}}\n')
+        with mock.patch.object(sys, 'prefix', self.temp_dir), \
+                mock.patch.dict(os.environ, {'IDF_EXTRA_ACTIONS_PATH': ext_dir}):
+            idf.init_cli(argv=['--dry-run', 'build'])
+            # the extensions owning the patched or used actions are loaded with the manifest as well
+            for argv in (['--dry-run', 'build'], ['--dry-run', 'use-uf2']):
+                cli = idf.init_cli(argv=argv)
+                self.assertTrue(cli.get_command(None, 'uf2').short_help.endswith(' (patched)'))
+            self.assertIn('use-uf2', cli.list_commands(None))
+            self.assertNotIn('create-project', cli.list_commands(None))
+
+
 class TestDependencyManagement(TestWithoutExtensions):
     def test_dependencies(self):
         result = idf.init_cli()(
@@ -3,13 +3,19 @@
 # SPDX-FileCopyrightText: 2019-2021 Espressif Systems (Shanghai) CO LTD
 # SPDX-License-Identifier: Apache-2.0
 
+import hashlib
+import io
 import json
 import os
 import re
 import shutil
 import sys
+import tarfile
 import tempfile
+import threading
 import unittest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
 try:
     from contextlib import redirect_stdout
@@ -522,5 +528,219 @@ class TestMaintainer(unittest.TestCase):
             self.assertEqual(json.load(f1), expected_json, "Please check 'tools/tools.new.json' to find a cause!")
 
 
+@unittest.skipIf(sys.platform == 'win32', 'the test tool is a shell script')
+class TestToolVersionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='idf_tools_tmp')
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.cache_path = os.path.join(self.temp_dir, idf_tools.TOOLS_VERSION_CACHE_FILE)
+        self.runs_path = os.path.join(self.temp_dir, 'runs')
+        self.tool_dirs = [os.path.join(self.temp_dir, version, 'bin') for version in ['1.0', '2.0']]
+        for tool_dir in self.tool_dirs:
+            self.write_tool(tool_dir, 'test-tool version {}'.format(tool_dir.split(os.sep)[-2]))
+
+    def write_tool(self, tool_dir, output):
+        os.makedirs(tool_dir, exist_ok=True)
+        tool_path = os.path.join(tool_dir, 'test-tool')
+        with open(tool_path, 'w') as f:
+            f.write('#!/bin/sh\necho run >> {}\necho "{}"\n'.format(self.runs_path, output))
+        os.chmod(tool_path, 0o755)
+
+    def get_runs(self):
+        if not os.path.exists(self.runs_path):
+            return 0
+        with open(self.runs_path, 'r') as f:
+            return len(f.readlines())
+
+    def get_outputs(self):
+        cache = idf_tools.ToolVersionCache(self.cache_path)
+        probes = [('test-tool', ['test-tool', '--version'], [tool_dir]) for tool_dir in self.tool_dirs]
+        cache.prefetch(probes)
+        outputs = [cache.run(*probe) for probe in probes]
+        cache.save()
+        return outputs
+
+    def test_cached_outputs(self):
+        expected = [b'test-tool version 1.0\n', b'test-tool version 2.0\n']
+        self.assertEqual(self.get_outputs(), expected)
+        self.assertEqual(self.get_runs(), 2)
+        # the outputs are taken from the cache
+        self.assertEqual(self.get_outputs(), expected)
+        self.assertEqual(self.get_runs(), 2)
+
+    def test_modified_tool(self):
+        self.get_outputs()
+        self.write_tool(self.tool_dirs[1], 'test-tool version 2.1 with a longer output')
+        self.assertEqual(self.get_outputs(), [b'test-tool version 1.0\n', b'test-tool version 2.1 with a longer output\n'])
+        self.assertEqual(self.get_runs(), 3)
+
+    def test_tool_not_found(self):
+        cache = idf_tools.ToolVersionCache(self.cache_path)
+        probe = ('test-tool', ['test-tool-missing', '--version'], self.tool_dirs)
+        cache.prefetch([probe])
+        with self.assertRaises(OSError):
+            cache.run(*probe)
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='idf_tools_tmp')
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.archive_path = os.path.join(self.temp_dir, 'archive.tar.gz')
+        with open(self.archive_path, 'wb') as f:
+            f.write(os.urandom(3 * 1024 * 1024 + 17))
+        size, sha256 = idf_tools.get_file_size_sha256(self.archive_path)
+        url = 'file://' + self.archive_path.replace(os.sep, '/')
+        self.download_obj = idf_tools.IDFToolDownload('linux-amd64', url, size, sha256)
+
+    def download(self):
+        destination = os.path.join(self.temp_dir, 'downloaded.tar.gz')
+        sha256 = hashlib.sha256()
+        self.assertIsNone(idf_tools.download(self.download_obj.url, destination, sha256, show_progress=False))
+        return destination, sha256
+
+    def test_hash_calculated_while_downloading(self):
+        destination, sha256 = self.download()
+        self.assertEqual(sha256.hexdigest(), self.download_obj.sha256)
+        self.assertTrue(idf_tools.IDFTool.check_download_file(self.download_obj, destination, sha256))
+
+    def test_hash_mismatch(self):
+        destination, sha256 = self.download()
+        sha256.update(b'x')
+        self.assertFalse(idf_tools.IDFTool.check_download_file(self.download_obj, destination, sha256))
+
+
+class TestMirrorInstall(unittest.TestCase):
+    """
+    Tools are downloaded from a local HTTP server given by IDF_MIRROR_PREFIX_MAP and installed by concurrent jobs.
+    """
+    TOOLS = ['test-tool-a', 'test-tool-b', 'test-tool-c']
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='idf_tools_tmp')
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.mirror_dir = os.path.join(self.temp_dir, 'mirror')
+        os.mkdir(self.mirror_dir)
+        self.tools_path = os.path.join(self.temp_dir, 'tools_path')
+
+        tools_json = {'version': 1, 'tools': []}
+        self.contents = {}
+        for tool in self.TOOLS:
+            # every tool is packed in a directory, which is stripped when the tool is installed
+            self.contents[tool] = {'bin/{}'.format(tool): os.urandom(512 * 1024), 'share/README': tool.encode()}
+            archive_path = os.path.join(self.mirror_dir, '{}-1.0.tar.gz'.format(tool))
+            with tarfile.open(archive_path, 'w:gz') as archive:
+                for name, content in self.contents[tool].items():
+                    tar_info = tarfile.TarInfo('{}/{}'.format(tool, name))
+                    tar_info.size = len(content)
+                    archive.addfile(tar_info, io.BytesIO(content))
+            size, sha256 = idf_tools.get_file_size_sha256(archive_path)
+            tools_json['tools'].append({
+                'description': tool, 'export_paths': [['bin']], 'export_vars': {}, 'info_url': '', 'install': 'never',
+                'is_executable': False, 'license': '', 'name': tool, 'strip_container_dirs': 1, 'supported_targets': ['all'],
+                'version_cmd': [''], 'version_regex': '', 'versions': [{
+                    'name': '1.0', 'status': 'recommended',
+                    'any': {'sha256': sha256, 'size': size,
+                            'url': 'https://dl.espressif.com/dl/{}'.format(os.path.basename(archive_path))},
+                }],
+            })
+        self.tools_json = os.path.join(self.temp_dir, 'tools.json')
+        with open(self.tools_json, 'w') as f:
+            json.dump(tools_json, f)
+
+        self.requests = []
+        requests = self.requests
+        mirror_dir = self.mirror_dir
+
+        class MirrorHandler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=mirror_dir, **kwargs)
+
+            def do_GET(self):
+                requests.append(self.path)
+                super().do_GET()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), MirrorHandler)
+        self.addCleanup(server.server_close)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        self.mirror_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+    def install(self, tools):
+        env = {'IDF_TOOLS_PATH': self.tools_path, 'IDF_MIRROR_PREFIX_MAP': 'https://dl.espressif.com/dl,' + self.mirror_url}
+        output_stream = StringIO()
+        with mock.patch.dict(os.environ, env), redirect_stdout(output_stream):
+            idf_tools.main(['--non-interactive', '--tools-json', self.tools_json, 'install', '--jobs', '2'] + tools)
+        return output_stream.getvalue()
+
+    def test_concurrent_install(self):
+        # the same version of a tool requested twice is downloaded and installed once
+        output = self.install(self.TOOLS + ['test-tool-a@1.0'])
+        self.assertEqual(sorted(self.requests), ['/{}-1.0.tar.gz'.format(tool) for tool in self.TOOLS])
+        self.assertIn('Downloaded', output)
+        for tool in self.TOOLS:
+            archive_name = '{}-1.0.tar.gz'.format(tool)
+            with open(os.path.join(self.mirror_dir, archive_name), 'rb') as f:
+                mirrored = hashlib.sha256(f.read()).hexdigest()
+            with open(os.path.join(self.tools_path, 'dist', archive_name), 'rb') as f:
+                self.assertEqual(hashlib.sha256(f.read()).hexdigest(), mirrored)
+
+            tool_dir = os.path.join(self.tools_path, 'tools', tool, '1.0')
+            installed = {}
+            for root, _, files in os.walk(tool_dir):
+                for name in files:
+                    with open(os.path.join(root, name), 'rb') as f:
+                        installed[os.path.relpath(os.path.join(root, name), tool_dir).replace(os.sep, '/')] = f.read()
+            self.assertEqual(installed, self.contents[tool])
+        self.assertFalse([name for name in os.listdir(os.path.join(self.tools_path, 'dist')) if name.endswith('.tmp')])
+
+        # the installed tools are skipped
+        output = self.install(self.TOOLS)
+        self.assertEqual(len(self.requests), len(self.TOOLS))
+        self.assertIn('Skipping test-tool-b@1.0 (already installed)', output)
+
+
+class TestPythonDepsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='idf_tools_tmp')
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.cache_path = os.path.join(self.temp_dir, idf_tools.python_deps_cache.PYTHON_DEPS_CACHE_FILE)
+        self.req_path = os.path.join(self.temp_dir, 'requirements.txt')
+        with open(self.req_path, 'w') as f:
+            f.write('esptool\n')
+        self.site_dir = os.path.join(self.temp_dir, 'site-packages')
+        os.mkdir(self.site_dir)
+        sys.path.append(self.site_dir)
+        self.addCleanup(sys.path.remove, self.site_dir)
+
+    def test_cached_result(self):
+        self.assertFalse(idf_tools.python_deps_cache.is_satisfied(self.cache_path))
+        idf_tools.python_deps_cache.save([self.req_path], self.cache_path)
+        self.assertTrue(idf_tools.python_deps_cache.is_satisfied(self.cache_path))
+        idf_tools.python_deps_cache.invalidate(self.cache_path)
+        self.assertFalse(idf_tools.python_deps_cache.is_satisfied(self.cache_path))
+
+    def test_modified_requirements(self):
+        idf_tools.python_deps_cache.save([self.req_path], self.cache_path)
+        with open(self.req_path, 'a') as f:
+            f.write('click\n')
+        self.assertFalse(idf_tools.python_deps_cache.is_satisfied(self.cache_path))
+
+    def test_installed_package(self):
+        idf_tools.python_deps_cache.save([self.req_path], self.cache_path)
+        os.mkdir(os.path.join(self.site_dir, 'click-8.1.3.dist-info'))
+        # make sure the change is visible even with a coarse file system timestamp resolution
+        os.utime(self.site_dir, ns=(0, 0))
+        self.assertFalse(idf_tools.python_deps_cache.is_satisfied(self.cache_path))
+
+
 if __name__ == '__main__':
     unittest.main()